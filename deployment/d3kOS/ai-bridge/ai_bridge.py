@@ -15,9 +15,12 @@ Endpoints:
   POST /anchor/activate   start anchor watch
   POST /anchor/dismiss    dismiss anchor alarm
   GET  /anchor/advice     get AI corrective action
+  GET  /anchor/track      swing-circle history + drift trend
   POST /webhook/arrival   Node-RED: trigger port briefing
   POST /webhook/alert     Node-RED: push custom TTS alert
   POST /webhook/query     Node-RED: arbitrary AI query
+  GET  /webhook/query/<id>     status/result of an async query
+  DELETE /webhook/query/<id>   cancel an async query
 """
 
 import os
@@ -41,9 +44,11 @@ if os.path.isfile(_ENV_PATH):
 from features.route_analyzer import RouteAnalyzer
 from features.port_arrival   import PortArrivalMonitor
 from features.voyage_logger  import VoyageLogger
-from features.anchor_watch   import AnchorWatch
+from features.anchor_watch   import AnchorWatch, TREND_WINDOW_S
 from utils                   import tts
 from utils.signalk_client    import is_reachable as sk_reachable
+from utils.signalk_stream    import stream as sk_stream
+from utils.ai_broker         import broker as ai_broker, PRIORITY_QUERY
 from utils.avnav_client      import get_status as avnav_status
 
 # ── Logging ────────────────────────────────────────────────────────────────────
@@ -105,6 +110,9 @@ def status():
         'port':          PORT,
         'timestamp':     datetime.now(timezone.utc).isoformat(),
         'signalk':       'up' if sk_up    else 'down',
+        'signalk_stream': sk_stream.status(),
+        'anchor_watch':  anchor_watch.status(),
+        'ai_broker':     ai_broker.status(),
         'avnav':         'up' if avnav_ok else 'down',
         'gemini_proxy':  'up' if gemini_up else 'down',
         'tts_engine':    os.environ.get('TTS_ENGINE', 'espeak-ng'),
@@ -215,6 +223,23 @@ def anchor_advice():
     return jsonify(result)
 
 
+@app.route('/anchor/track', methods=['GET'])
+def anchor_track():
+    """
+    Swing-circle point cloud and drift trend.
+    Query: ?window=120 (trend seconds, default ANCHOR_TREND_WINDOW_S),
+           ?limit=300 (newest N points)
+    """
+    try:
+        window_s = float(request.args.get('window', TREND_WINDOW_S))
+        limit    = request.args.get('limit')
+        limit    = int(limit) if limit is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'ok': False, 'error': 'window and limit must be numbers'}), 400
+
+    return jsonify(anchor_watch.get_track(window_s, limit))
+
+
 # ── Node-RED webhook endpoints ─────────────────────────────────────────────────
 
 @app.route('/webhook/arrival', methods=['POST'])
@@ -259,8 +284,11 @@ def webhook_alert():
 def webhook_query():
     """
     Node-RED can send arbitrary marine queries to AI and get a response.
-    Body: {'query': str}
+    Body: {'query': str, 'async': bool}
     Response: {'response': str, 'source': 'gemini|ollama'}
+    With 'async': true returns 202 {'id': str} at once — poll /webhook/query/<id>.
+    Queries go through the AI broker, so a slow LLM call never holds more
+    than one Flask worker and never delays anchor advice.
     """
     data  = request.get_json(silent=True) or {}
     query = data.get('query', '').strip()
@@ -268,22 +296,32 @@ def webhook_query():
     if not query:
         return jsonify({'ok': False, 'error': 'query required'}), 400
 
-    try:
-        resp = requests.post(
-            f'{GEMINI_PROXY_URL}/ask',
-            json={'message': query},
-            timeout=60,
-        )
-        resp.raise_for_status()
-        result = resp.json()
-        return jsonify({
-            'ok':       True,
-            'response': result.get('response', ''),
-            'source':   result.get('source', 'unknown'),
-        })
-    except Exception as exc:
-        log.warning('webhook_query AI call failed: %s', exc)
-        return jsonify({'ok': False, 'error': str(exc)}), 503
+    if data.get('async'):
+        req = ai_broker.submit(query, PRIORITY_QUERY)
+        return jsonify({'ok': True, **req.to_dict()}), 202
+
+    result = ai_broker.ask(query, PRIORITY_QUERY)
+    if not result.get('response'):
+        log.warning('webhook_query AI call failed (source=%s)', result.get('source'))
+        return jsonify({'ok': False, 'error': 'AI unavailable'}), 503
+
+    return jsonify({
+        'ok':       True,
+        'response': result.get('response', ''),
+        'source':   result.get('source', 'unknown'),
+    })
+
+
+@app.route('/webhook/query/<request_id>', methods=['GET', 'DELETE'])
+def webhook_query_status(request_id):
+    """Poll (GET) or cancel (DELETE) an async query."""
+    req = ai_broker.get(request_id)
+    if req is None:
+        return jsonify({'ok': False, 'error': 'unknown query id'}), 404
+
+    if request.method == 'DELETE':
+        return jsonify({'ok': ai_broker.cancel(request_id), **req.to_dict()})
+    return jsonify({'ok': True, **req.to_dict()})
 
 
 # ── HELM mute control ──────────────────────────────────────────────────────────
@@ -315,6 +353,7 @@ def voyage_list():
 
 def _start_background_services():
     log.info('Starting AI Bridge background services...')
+    sk_stream.start()
     route_analyzer.start()
     port_arrival.start()
     voyage_logger.start()
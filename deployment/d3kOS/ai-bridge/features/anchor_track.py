@@ -0,0 +1,119 @@
+"""
+d3kOS AI Bridge — Anchor swing-circle history
+
+Fixed-size ring buffer of recent vessel positions relative to the anchor,
+stored in three parallel array('d') columns (time, north, east) rather than
+a list of dicts — 600 samples cost ~14 KB and never reallocate.
+
+Used by AnchorWatch for:
+  GET /anchor/track   swing-circle point cloud + drift trend for the dashboard
+  trend warning       steady outward drift detected before the radius is breached
+
+Positions are metres north/east of the anchor on a local flat-earth plane,
+which is accurate to well under a metre inside any realistic swing circle.
+"""
+
+import math
+import threading
+from array import array
+
+from utils.geo import nm_to_metres
+
+_DEFAULT_CAPACITY = 600  # 10 min at 1 Hz
+
+
+def offset_from_anchor(anchor_lat: float, anchor_lon: float,
+                       lat: float, lon: float) -> tuple[float, float]:
+    """(north_m, east_m) of a position relative to the anchor."""
+    north = nm_to_metres((lat - anchor_lat) * 60.0)
+    east  = nm_to_metres((lon - anchor_lon) * 60.0 * math.cos(math.radians(anchor_lat)))
+    return north, east
+
+
+class AnchorTrack:
+    """Array-backed ring buffer of (t, north_m, east_m) samples."""
+
+    def __init__(self, capacity: int = _DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._t     = array('d', bytes(8 * capacity))
+        self._north = array('d', bytes(8 * capacity))
+        self._east  = array('d', bytes(8 * capacity))
+        self._head  = 0   # next write index
+        self._count = 0
+        self._lock  = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+
+    def add(self, t: float, north_m: float, east_m: float):
+        with self._lock:
+            i = self._head
+            self._t[i]     = t
+            self._north[i] = north_m
+            self._east[i]  = east_m
+            self._head  = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _indices(self):
+        """Buffer indices oldest → newest. Caller holds the lock."""
+        start = (self._head - self._count) % self.capacity
+        return [(start + k) % self.capacity for k in range(self._count)]
+
+    def points(self, limit: int | None = None) -> list[list[float]]:
+        """[[north_m, east_m], ...] oldest → newest, optionally the newest `limit` only."""
+        with self._lock:
+            idx = self._indices()
+            if limit is not None:
+                idx = idx[-limit:] if limit > 0 else []
+            return [[round(self._north[i], 1), round(self._east[i], 1)] for i in idx]
+
+    def trend(self, window_s: float, now: float | None = None) -> dict | None:
+        """
+        Least-squares drift over the last window_s seconds.
+
+        Returns None with fewer than 3 samples or no time spread, else:
+          radius_m          latest distance from anchor
+          radial_speed_ms   rate of change of distance (+ = moving away)
+          drift_speed_ms    speed of the position fit (any direction)
+          drift_bearing     direction of that drift, degrees true
+          samples, span_s
+        """
+        with self._lock:
+            idx = self._indices()
+            if not idx:
+                return None
+            t_end = self._t[idx[-1]] if now is None else now
+            sel = [i for i in idx if t_end - self._t[i] <= window_s]
+            ts = [self._t[i] for i in sel]
+            ns = [self._north[i] for i in sel]
+            es = [self._east[i] for i in sel]
+
+        if len(ts) < 3:
+            return None
+        t0 = ts[0]
+        xs = [t - t0 for t in ts]
+        mean_x = sum(xs) / len(xs)
+        sxx = sum((x - mean_x) ** 2 for x in xs)
+        if sxx <= 0:
+            return None
+
+        def slope(ys):
+            mean_y = sum(ys) / len(ys)
+            return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+
+        radii = [math.hypot(n, e) for n, e in zip(ns, es)]
+        v_north = slope(ns)
+        v_east  = slope(es)
+        return {
+            'radius_m':        round(radii[-1], 1),
+            'radial_speed_ms': round(slope(radii), 3),
+            'drift_speed_ms':  round(math.hypot(v_north, v_east), 3),
+            'drift_bearing':   round((math.degrees(math.atan2(v_east, v_north)) + 360) % 360, 0),
+            'samples':         len(ts),
+            'span_s':          round(xs[-1], 1),
+        }
@@ -2,8 +2,23 @@
 d3kOS AI Bridge — Feature 4: Anchor Watch AI Alerts
 
 Safety-critical feature. The alarm NEVER waits for AI.
-Pre-written audio fires the instant drag is confirmed (3 consecutive polls).
-AI corrective action is on-demand only.
+Pre-written audio fires the instant drag is confirmed. AI corrective action
+is on-demand only.
+
+Vessel positions relative to the anchor are kept in an AnchorTrack ring
+buffer (swing circle for /anchor/track), sampled at most ANCHOR_TRACK_RATE_HZ
+so a 10 Hz GPS stream cannot shrink the history below the trend window. A steady outward drift that will
+breach the radius within ANCHOR_TREND_WARN_S raises an early 'anchor_trend'
+warning — the drag alarm itself still requires a confirmed breach.
+
+Two detection modes:
+  Event — while the Signal K delta stream is live, every currentRadius /
+          position update is fed through DragFilter (time-window median).
+          Drag is confirmed within a few seconds of a real breach. Runs on
+          the stream thread from the cache only; the alert itself (snapshot,
+          audio, event log) is handed to an 'anchor-alert' thread.
+  Poll  — REST fallback: check every ANCHOR_POLL_INTERVAL seconds,
+          DRAG_CONFIRM_COUNT consecutive exceedances required.
 
 Signal K paths monitored:
   navigation.anchor.maxRadius     (metres — set by skipper)
@@ -15,26 +30,44 @@ Signal K paths monitored:
 import os
 import json
 import logging
+import math
+import statistics
 import threading
 import time
+from collections import deque
 from datetime import datetime, timezone
 
-import requests
-
-from utils.signalk_client import get_anchor_data, get_navigation_snapshot
-from utils.geo import bearing_degrees, metres_to_nm, ms_to_knots
+from utils.signalk_client import get_anchor_data, get_navigation_snapshot, get_position
+from utils.signalk_stream import stream
+from features.anchor_track import AnchorTrack, offset_from_anchor
+from utils.geo import bearing_degrees, haversine_nm, metres_to_nm, ms_to_knots, nm_to_metres
 from utils import tts
+from utils.ai_broker import broker as ai_broker, PRIORITY_ANCHOR, throttled_relay
 
 log = logging.getLogger(__name__)
 
 ANCHOR_POLL_INTERVAL   = int(os.environ.get('ANCHOR_POLL_INTERVAL', 15))
 DRAG_CONFIRM_COUNT     = int(os.environ.get('ANCHOR_DRAG_CONFIRM_COUNT', 3))
-GEMINI_PROXY_URL       = os.environ.get('GEMINI_PROXY_URL', 'http://localhost:3001')
+DRAG_WINDOW_S          = float(os.environ.get('ANCHOR_DRAG_WINDOW_S', 5))
+DRAG_CONFIRM_S         = float(os.environ.get('ANCHOR_DRAG_CONFIRM_S', 2))
+DRAG_MIN_SAMPLES       = int(os.environ.get('ANCHOR_DRAG_MIN_SAMPLES', 3))
+TREND_WINDOW_S         = float(os.environ.get('ANCHOR_TREND_WINDOW_S', 120))
+TRACK_HISTORY_S        = float(os.environ.get('ANCHOR_TRACK_HISTORY_S', 600))
+TRACK_RATE_HZ          = float(os.environ.get('ANCHOR_TRACK_RATE_HZ', 1))
+# Ring capacity follows history × rate, and always spans the trend window
+TRACK_SIZE             = max(int(os.environ.get('ANCHOR_TRACK_SIZE', 0)) or
+                             math.ceil(TRACK_HISTORY_S * TRACK_RATE_HZ),
+                             math.ceil(TREND_WINDOW_S * TRACK_RATE_HZ))
+TREND_MIN_SPEED_MS     = float(os.environ.get('ANCHOR_TREND_MIN_SPEED_MS', 0.05))
+TREND_WARN_S           = float(os.environ.get('ANCHOR_TREND_WARN_S', 120))
 VESSEL_NAME            = os.environ.get('VESSEL_NAME', 'the vessel')
 LOG_DIR                = os.environ.get('LOG_DIR', '/home/d3kos/logs')
 
 _ANCHOR_LOG_DIR = os.path.join(LOG_DIR, 'anchor-events')
 
+# Signal K paths that trigger an event-mode evaluation
+_RADIUS_PATHS = ('navigation.anchor.currentRadius', 'navigation.position')
+
 _AI_ADVICE_PROMPT = """\
 Marine emergency: vessel {vessel_name} anchor drag detected.
 
@@ -49,9 +82,67 @@ Provide a brief, calm, practical 3-4 step corrective action plan.
 Steps should be in order of urgency. Be direct. This is an emergency."""
 
 
+class DragFilter:
+    """
+    Time-window median filter on distance-from-anchor samples.
+
+    A single GPS jump only moves the median if it persists for more than half
+    the window, so jitter is rejected without a fixed poll counter. Drag is
+    confirmed once the filtered radius has stayed beyond max radius for
+    confirm_s seconds and the window holds at least min_samples samples.
+    """
+
+    def __init__(self, window_s: float = DRAG_WINDOW_S,
+                 confirm_s: float = DRAG_CONFIRM_S,
+                 min_samples: int = DRAG_MIN_SAMPLES):
+        self.window_s    = window_s
+        self.confirm_s   = confirm_s
+        self.min_samples = min_samples
+        self.reset()
+
+    def reset(self):
+        self._samples = deque()      # (monotonic t, radius_m)
+        self.filtered_m   = None
+        self.first_exceed = None     # first raw sample beyond max radius
+        self.exceed_since = None     # filtered radius beyond max radius since
+
+    def update(self, t: float, radius_m: float, max_r: float) -> bool:
+        """Add a sample. Returns True when drag is confirmed."""
+        self._samples.append((t, radius_m))
+        while self._samples and t - self._samples[0][0] > self.window_s:
+            self._samples.popleft()
+        self.filtered_m = statistics.median(r for _, r in self._samples)
+
+        if radius_m > max_r and self.first_exceed is None:
+            self.first_exceed = t
+
+        if self.filtered_m <= max_r:
+            self.exceed_since = None
+            if radius_m <= max_r:
+                self.first_exceed = None
+            return False
+
+        if self.exceed_since is None:
+            self.exceed_since = t
+        return (len(self._samples) >= self.min_samples and
+                t - self.exceed_since >= self.confirm_s)
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        return {
+            'samples':        len(self._samples),
+            'filtered_m':     round(self.filtered_m, 1) if self.filtered_m is not None else None,
+            'exceeding_for_s': round(now - self.exceed_since, 1) if self.exceed_since else None,
+            'window_s':       self.window_s,
+            'confirm_s':      self.confirm_s,
+            'min_samples':    self.min_samples,
+        }
+
+
 class AnchorWatch:
     """
-    Background thread that monitors Signal K for anchor drag.
+    Monitors Signal K for anchor drag — event-driven from the delta stream
+    when live, with a background polling thread as fallback.
     broadcast_fn(event_type, data) pushes SSE to dashboard.
     """
 
@@ -65,15 +156,24 @@ class AnchorWatch:
         self._drag_confirm_counter = 0
         self._last_drag_alert_time = None
         self._dismissed = False
+        self._filter = DragFilter()
+        self._filter_lock = threading.Lock()
+        self._evaluations = 0
+        self._last_latency_s = None
+        self._track = AnchorTrack(TRACK_SIZE)
+        self._last_track_t = None       # monotonic time of the newest track sample
+        self._trend_warned = False
+        self._trend_quiet_since = None  # monotonic time the outward trend stopped
 
     def start(self):
         self._stop_event.clear()
+        stream.add_listener(_RADIUS_PATHS, self._on_stream_update)
         self._thread = threading.Thread(
             target=self._loop, daemon=True, name='anchor-watch'
         )
         self._thread.start()
-        log.info('AnchorWatch started (poll=%ds, confirm=%d)',
-                 ANCHOR_POLL_INTERVAL, DRAG_CONFIRM_COUNT)
+        log.info('AnchorWatch started (poll=%ds, confirm=%d, window=%.0fs, confirm=%.0fs)',
+                 ANCHOR_POLL_INTERVAL, DRAG_CONFIRM_COUNT, DRAG_WINDOW_S, DRAG_CONFIRM_S)
 
     def stop(self):
         self._stop_event.set()
@@ -88,6 +188,12 @@ class AnchorWatch:
         self._dismissed = False
         self._drag_confirm_counter = 0
         self._alarm_active = False
+        with self._filter_lock:
+            self._filter.reset()
+        self._track.clear()
+        self._last_track_t = None
+        self._trend_warned = False
+        self._trend_quiet_since = None
 
         snap = get_navigation_snapshot()
         current_radius = None
@@ -111,6 +217,10 @@ class AnchorWatch:
         self._alarm_active = False
         self._dismissed = True
         self._drag_confirm_counter = 0
+        self._trend_warned = False
+        self._trend_quiet_since = None
+        with self._filter_lock:
+            self._filter.reset()
 
         if self._repeat_thread and self._repeat_thread.is_alive():
             # Signal repeat thread to stop via alarm flag already False
@@ -124,6 +234,35 @@ class AnchorWatch:
         })
         return {'ok': True}
 
+    def status(self) -> dict:
+        """Detection mode, filter state and last alarm latency for /status."""
+        with self._filter_lock:
+            filter_state = self._filter.state()
+        return {
+            'active':      self._active,
+            'alarm':       self._alarm_active,
+            'mode':        'event' if stream.is_live() else 'poll',
+            'evaluations': self._evaluations,
+            'last_detection_latency_s': self._last_latency_s,
+            'filter':      filter_state,
+        }
+
+    def get_track(self, window_s: float = TREND_WINDOW_S,
+                  limit: int | None = None) -> dict:
+        """Swing-circle point cloud (metres N/E of anchor) and drift trend."""
+        anchor = get_anchor_data()
+        return {
+            'ok':           True,
+            'active':       self._active,
+            'anchor_lat':   anchor.get('anchor_lat'),
+            'anchor_lon':   anchor.get('anchor_lon'),
+            'max_radius_m': anchor.get('max_radius_m'),
+            'capacity':     self._track.capacity,
+            'count':        len(self._track),
+            'points':       self._track.points(limit),
+            'trend':        self._track.trend(window_s),
+        }
+
     def get_ai_advice(self) -> dict:
         """
         Generate AI corrective action for current drag event.
@@ -153,7 +292,10 @@ class AnchorWatch:
             timestamp    = datetime.now(timezone.utc).isoformat(),
         )
 
-        result = _call_ai(prompt)
+        # Stream partial advice to the dashboard while the skipper waits
+        on_chunk = throttled_relay(lambda partial: self._broadcast(
+            'anchor_advice', {'advice': partial, 'source': 'loading', 'partial': True}))
+        result = _call_ai(prompt, on_chunk)
         return {
             'ok':     True,
             'advice': result.get('response', 'AI unavailable.'),
@@ -163,8 +305,12 @@ class AnchorWatch:
     def _loop(self):
         while not self._stop_event.is_set():
             try:
-                if self._active:
+                # Event mode handles detection (and auto-activation) while
+                # the delta stream is live
+                if not stream.is_live():
                     self._check_drag()
+                    if self._active:
+                        self._record_position(get_anchor_data(), get_position())
             except Exception as exc:
                 log.error('AnchorWatch error: %s', exc)
 
@@ -173,6 +319,124 @@ class AnchorWatch:
                     return
                 time.sleep(1)
 
+    def _on_stream_update(self, changed: set):
+        """
+        Event mode — called on the stream thread for every radius/position delta.
+        Reads the stream cache only (rest=False): listeners must never block
+        on I/O, so a stale or missing value skips this update instead.
+        """
+        anchor = get_anchor_data(rest=False)
+        max_r  = anchor.get('max_radius_m')
+        if not self._active:
+            if max_r is None or max_r <= 0:
+                return
+            self._auto_activate()
+
+        pos = get_position(rest=False) if 'navigation.position' in changed else None
+        self._record_position(anchor, pos)
+
+        if self._alarm_active or max_r is None or max_r <= 0:
+            return
+
+        radius = self._radius_from_update(anchor, changed, pos)
+        if radius is None:
+            return
+
+        now = time.monotonic()
+        with self._filter_lock:
+            self._evaluations += 1
+            confirmed = self._filter.update(now, radius, max_r)
+            if not confirmed:
+                return
+            drift_m = self._filter.filtered_m
+            self._last_latency_s = round(now - (self._filter.first_exceed or now), 2)
+
+        log.info('Anchor drag confirmed in %.2fs (filtered %.1fm > %.1fm)',
+                 self._last_latency_s, drift_m, max_r)
+        self._alarm_active = True  # latch now — later deltas must not re-fire
+        threading.Thread(
+            target=self._fire_drag_alert,
+            args=(anchor, drift_m, max_r),
+            daemon=True, name='anchor-alert',
+        ).start()
+
+    def _record_position(self, anchor: dict, pos: dict | None):
+        """
+        Append the vessel position to the swing track (at most TRACK_RATE_HZ)
+        and check the drift trend.
+        """
+        if pos is None or anchor.get('anchor_lat') is None or anchor.get('anchor_lon') is None:
+            return
+        now = time.monotonic()
+        if self._last_track_t is not None and now - self._last_track_t < 1.0 / TRACK_RATE_HZ:
+            return
+        self._last_track_t = now
+        north, east = offset_from_anchor(anchor['anchor_lat'], anchor['anchor_lon'],
+                                         pos['latitude'], pos['longitude'])
+        self._track.add(now, north, east)
+        self._check_trend(anchor.get('max_radius_m'))
+
+    def _check_trend(self, max_r: float | None):
+        """
+        Early warning: vessel moving steadily outward and projected to breach
+        the radius within TREND_WARN_S. Latched until dismiss/re-activate or
+        the outward trend has stayed below TREND_MIN_SPEED_MS for TREND_WINDOW_S
+        — a boat swinging on its rode crosses zero radial speed every swing
+        and would otherwise re-warn each time.
+        """
+        if max_r is None or max_r <= 0 or self._alarm_active:
+            return
+        trend = self._track.trend(TREND_WINDOW_S)
+        if trend is None:
+            return
+
+        radial = trend['radial_speed_ms']
+        if radial < TREND_MIN_SPEED_MS:
+            now = time.monotonic()
+            if self._trend_quiet_since is None:
+                self._trend_quiet_since = now
+            elif now - self._trend_quiet_since >= TREND_WINDOW_S:
+                self._trend_warned = False
+            return
+        self._trend_quiet_since = None
+        time_to_breach = max(0.0, (max_r - trend['radius_m']) / radial)
+        if time_to_breach > TREND_WARN_S or self._trend_warned:
+            return
+
+        self._trend_warned = True
+        log.warning('Anchor drift trend: %.2f m/s outward, breach in ~%.0fs',
+                    radial, time_to_breach)
+        tts.speak(f'Anchor watch. Vessel drifting away from anchor. '
+                  f'{trend["radius_m"]:.0f} metres.')
+        self._broadcast('anchor_trend', {
+            'warning':           True,
+            'radius_m':          trend['radius_m'],
+            'max_radius_m':      round(max_r, 1),
+            'radial_speed_ms':   radial,
+            'drift_bearing':     trend['drift_bearing'],
+            'time_to_breach_s':  round(time_to_breach, 0),
+            'timestamp':         datetime.now(timezone.utc).isoformat(),
+        })
+
+    @staticmethod
+    def _radius_from_update(anchor: dict, changed: set,
+                            pos: dict | None) -> float | None:
+        """
+        Distance from anchor for this delta. Signal K's currentRadius is used
+        when the anchor alarm plugin publishes it; otherwise the radius is
+        computed from vessel and anchor positions on each position update.
+        """
+        current_r = anchor.get('current_radius_m')
+        if current_r is not None:
+            return current_r if 'navigation.anchor.currentRadius' in changed else None
+
+        if 'navigation.position' not in changed:
+            return None
+        if pos is None or anchor.get('anchor_lat') is None or anchor.get('anchor_lon') is None:
+            return None
+        return nm_to_metres(haversine_nm(anchor['anchor_lat'], anchor['anchor_lon'],
+                                         pos['latitude'], pos['longitude']))
+
     def _check_drag(self):
         anchor = get_anchor_data()
         max_r     = anchor.get('max_radius_m')
@@ -182,10 +446,7 @@ class AnchorWatch:
             # Anchor watch not set in Signal K — auto-detect activation
             return
 
-        # Auto-activate if Signal K has anchor data but we weren't manually activated
-        if not self._active:
-            self._active = True
-            self._dismissed = False
+        self._auto_activate()
 
         if self._alarm_active:
             return  # Alarm already firing — don't re-evaluate until dismissed
@@ -208,6 +469,14 @@ class AnchorWatch:
         if self._drag_confirm_counter >= DRAG_CONFIRM_COUNT:
             self._fire_drag_alert(anchor, current_r, max_r)
 
+    def _auto_activate(self):
+        """Signal K has an anchor radius set but we weren't manually activated."""
+        if self._active:
+            return
+        self._active = True
+        self._dismissed = False
+        log.info('Anchor watch auto-activated from Signal K anchor radius')
+
     def _fire_drag_alert(self, anchor: dict, current_r: float, max_r: float):
         self._alarm_active = True
         self._dismissed = False
@@ -305,15 +574,6 @@ def _log_drag_event(anchor_lat, anchor_lon, vessel_lat, vessel_lon,
     log.info('Anchor drag event logged: %s', path)
 
 
-def _call_ai(prompt: str) -> dict:
-    try:
-        resp = requests.post(
-            f'{GEMINI_PROXY_URL}/ask',
-            json={'message': prompt},
-            timeout=60,
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as exc:
-        log.warning('AI proxy call failed: %s', exc)
-        return {'response': '', 'source': 'error'}
+def _call_ai(prompt: str, on_chunk=None) -> dict:
+    """Brokered call to the Gemini proxy. Returns {'response': str, 'source': str}."""
+    return ai_broker.ask(prompt, PRIORITY_ANCHOR, on_chunk=on_chunk)
@@ -4,26 +4,31 @@ d3kOS AI Bridge — Feature 2: Port Arrival Briefing
 Fires once when vessel reaches ARRIVAL_TRIGGER_NM (default 2.0nm) from
 final destination waypoint. Delivers full briefing to screen + short audio.
 Will not re-fire for the same destination.
+
+Briefings are cached per destination (utils/response_cache.py) for
+ARRIVAL_CACHE_TTL — a port the vessel has visited recently is briefed from
+disk instead of asking the LLM again.
 """
 
 import os
 import time
 import logging
 import threading
-import requests
 
 from utils.avnav_client import get_nav_data
 from utils.signalk_client import get_navigation_snapshot
 from utils.geo import haversine_nm, ms_to_knots
 from utils import tts
+from utils.ai_broker import broker as ai_broker, PRIORITY_ARRIVAL
+from utils.response_cache import cache as response_cache, quantize
 
 log = logging.getLogger(__name__)
 
 ARRIVAL_TRIGGER_NM    = float(os.environ.get('ARRIVAL_TRIGGER_NM', 2.0))
 ARRIVAL_POLL_INTERVAL = int(os.environ.get('ARRIVAL_POLL_INTERVAL', 60))
-GEMINI_PROXY_URL      = os.environ.get('GEMINI_PROXY_URL', 'http://localhost:3001')
 VESSEL_NAME           = os.environ.get('VESSEL_NAME', 'the vessel')
 HOME_PORT             = os.environ.get('HOME_PORT', 'home port')
+ARRIVAL_CACHE_TTL     = int(os.environ.get('ARRIVAL_CACHE_TTL', 7 * 24 * 3600))
 
 _BRIEFING_PROMPT = """\
 You are a marine navigation assistant for vessel {vessel_name}, home port {home_port}.
@@ -151,9 +156,20 @@ class PortArrivalMonitor:
             distance    = distance_nm,
         )
 
-        ai_result = _call_ai(prompt)
-        briefing_text = ai_result.get('response', '')
-        source = ai_result.get('source', 'error')
+        cache_parts = {
+            'destination': destination,
+            'lat':         quantize(dest_lat, 0.01),
+            'lon':         quantize(dest_lon, 0.01),
+        }
+        cached = response_cache.get('arrival', cache_parts, ARRIVAL_CACHE_TTL)
+        if cached:
+            log.info('Arrival briefing for %s from cache (%ds old)', destination, cached['age_s'])
+            briefing_text, source = cached['response'], cached['source']
+        else:
+            ai_result = _call_ai(prompt)
+            briefing_text = ai_result.get('response', '')
+            source = ai_result.get('source', 'error')
+            response_cache.put('arrival', cache_parts, briefing_text, source)
 
         if not briefing_text:
             briefing_text = f'AI briefing unavailable. Approaching {destination} in {distance_nm:.1f}nm.'
@@ -164,18 +180,10 @@ class PortArrivalMonitor:
             'briefing':    briefing_text,
             'source':      source,
             'offline':     source == 'ollama',
+            'cached':      cached is not None,
         })
 
 
 def _call_ai(prompt: str) -> dict:
-    try:
-        resp = requests.post(
-            f'{GEMINI_PROXY_URL}/ask',
-            json={'message': prompt},
-            timeout=60,
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as exc:
-        log.warning('AI proxy call failed: %s', exc)
-        return {'response': '', 'source': 'error'}
+    """Brokered call to the Gemini proxy. Returns {'response': str, 'source': str}."""
+    return ai_broker.ask(prompt, PRIORITY_ARRIVAL)
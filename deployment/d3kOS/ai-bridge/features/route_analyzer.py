@@ -4,24 +4,34 @@ d3kOS AI Bridge — Feature 1: Always-On Route Analysis Widget
 Polls AvNav every ROUTE_ANALYSIS_INTERVAL seconds (default 5 min).
 Generates a 4-6 sentence passage brief via Gemini proxy at :3001.
 Re-triggers immediately on route change or explicit "Analyze Now" request.
+
+Briefs are cached (utils/response_cache.py) keyed on route, next waypoint and
+quantized position / SOG / COG — an unchanged situation is re-broadcast from
+disk without an AI call. "Analyze Now" always bypasses the cache.
 """
 
 import os
 import time
 import logging
 import threading
-import requests
 
 from utils.avnav_client import get_nav_data, read_current_leg
 from utils.signalk_client import get_navigation_snapshot
 from utils.geo import ms_to_knots, rad_to_deg, metres_to_nm
+from utils.ai_broker import broker as ai_broker, PRIORITY_ROUTE, throttled_relay
+from utils.response_cache import cache as response_cache, quantize
 
 log = logging.getLogger(__name__)
 
 ROUTE_ANALYSIS_INTERVAL = int(os.environ.get('ROUTE_ANALYSIS_INTERVAL', 300))
-GEMINI_PROXY_URL         = os.environ.get('GEMINI_PROXY_URL', 'http://localhost:3001')
 VESSEL_NAME              = os.environ.get('VESSEL_NAME', 'the vessel')
 HOME_PORT                = os.environ.get('HOME_PORT', 'home port')
+ROUTE_CACHE_TTL          = int(os.environ.get('ROUTE_CACHE_TTL', 1800))
+
+# Cache key quantization — a change smaller than one step reuses the brief
+_POS_STEP_DEG = 0.01   # ~0.6 nm
+_SOG_STEP_KTS = 1.0
+_COG_STEP_DEG = 15.0
 
 _PROMPT_TEMPLATE = """\
 You are a marine navigation assistant for vessel {vessel_name}, home port {home_port}.
@@ -69,9 +79,10 @@ class RouteAnalyzer:
         self._force_flag.set()
 
     def _loop(self):
+        forced = False
         while not self._stop_event.is_set():
             try:
-                self._run_analysis()
+                self._run_analysis(force=forced)
             except Exception as exc:
                 log.error('RouteAnalyzer error: %s', exc)
                 self._broadcast('route_update', {
@@ -86,9 +97,10 @@ class RouteAnalyzer:
                     break
                 time.sleep(1)
 
+            forced = self._force_flag.is_set()
             self._force_flag.clear()
 
-    def _run_analysis(self):
+    def _run_analysis(self, force: bool = False):
         nav = get_nav_data()
         sk  = get_navigation_snapshot()
 
@@ -133,6 +145,21 @@ class RouteAnalyzer:
             })
             return
 
+        cache_parts = {
+            'route':   route_name,
+            'wp':      wp_name,
+            'lat':     quantize(lat, _POS_STEP_DEG),
+            'lon':     quantize(lon, _POS_STEP_DEG),
+            'sog':     quantize(sog_kts, _SOG_STEP_KTS),
+            'cog':     quantize(cog_deg, _COG_STEP_DEG) % 360,
+        }
+        cached = None if force else response_cache.get('route', cache_parts, ROUTE_CACHE_TTL)
+        if cached:
+            log.debug('Route brief cache hit (%ds old)', cached['age_s'])
+            self._broadcast_brief(cached['response'], cached['source'], route_name,
+                                  wp_name, sog_kts, cog_deg, cached=True)
+            return
+
         prompt = _PROMPT_TEMPLATE.format(
             vessel_name    = VESSEL_NAME,
             home_port      = HOME_PORT,
@@ -146,21 +173,21 @@ class RouteAnalyzer:
             dtw_nm         = dtw_nm,
         )
 
-        ai_result = _call_ai(prompt)
+        # Relay partial text as it streams — final ACTIVE broadcast follows
+        on_chunk = throttled_relay(lambda partial: self._broadcast('route_update', {
+            'state':      'STREAMING',
+            'text':       partial,
+            'source':     'loading',
+            'route_name': route_name,
+            'wp_name':    wp_name,
+        }))
+        ai_result = _call_ai(prompt, on_chunk)
         source = ai_result.get('source', 'unknown')
         text   = ai_result.get('response', '')
 
         if text:
-            self._broadcast('route_update', {
-                'state':  'ACTIVE',
-                'text':   text,
-                'source': source,
-                'offline': source == 'ollama',
-                'route_name': route_name,
-                'wp_name': wp_name,
-                'sog_kts': round(sog_kts, 1),
-                'cog_deg': round(cog_deg, 0),
-            })
+            response_cache.put('route', cache_parts, text, source)
+            self._broadcast_brief(text, source, route_name, wp_name, sog_kts, cog_deg)
         else:
             self._broadcast('route_update', {
                 'state':  'AI_UNAVAILABLE',
@@ -168,17 +195,21 @@ class RouteAnalyzer:
                 'source': 'error',
             })
 
-
-def _call_ai(prompt: str) -> dict:
-    """POST to Gemini proxy at :3001/ask. Returns {'response': str, 'source': str}."""
-    try:
-        resp = requests.post(
-            f'{GEMINI_PROXY_URL}/ask',
-            json={'message': prompt},
-            timeout=60,
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as exc:
-        log.warning('AI proxy call failed: %s', exc)
-        return {'response': '', 'source': 'error'}
+    def _broadcast_brief(self, text: str, source: str, route_name: str, wp_name: str,
+                         sog_kts: float, cog_deg: float, cached: bool = False):
+        self._broadcast('route_update', {
+            'state':  'ACTIVE',
+            'text':   text,
+            'source': source,
+            'offline': source == 'ollama',
+            'cached': cached,
+            'route_name': route_name,
+            'wp_name': wp_name,
+            'sog_kts': round(sog_kts, 1),
+            'cog_deg': round(cog_deg, 0),
+        })
+
+
+def _call_ai(prompt: str, on_chunk=None) -> dict:
+    """Brokered call to the Gemini proxy. Returns {'response': str, 'source': str}."""
+    return ai_broker.ask(prompt, PRIORITY_ROUTE, on_chunk=on_chunk)
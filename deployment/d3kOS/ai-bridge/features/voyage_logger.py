@@ -15,14 +15,12 @@ import threading
 import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
 
-import requests
-
 from utils.avnav_client import get_nav_data, download_track_gpx, get_track_list
 from utils.geo import gpx_total_distance_nm
+from utils.ai_broker import broker as ai_broker, PRIORITY_VOYAGE
 
 log = logging.getLogger(__name__)
 
-GEMINI_PROXY_URL = os.environ.get('GEMINI_PROXY_URL', 'http://localhost:3001')
 VESSEL_NAME      = os.environ.get('VESSEL_NAME', 'the vessel')
 HOME_PORT        = os.environ.get('HOME_PORT', 'home port')
 LOG_DIR          = os.environ.get('LOG_DIR', '/home/d3kos/logs')
@@ -288,14 +286,5 @@ def _save_summary(text: str, source_filename: str) -> str:
 
 
 def _call_ai(prompt: str) -> dict:
-    try:
-        resp = requests.post(
-            f'{GEMINI_PROXY_URL}/ask',
-            json={'message': prompt},
-            timeout=60,
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as exc:
-        log.warning('AI proxy call failed: %s', exc)
-        return {'response': '', 'source': 'error'}
+    """Brokered call to the Gemini proxy. Returns {'response': str, 'source': str}."""
+    return ai_broker.ask(prompt, PRIORITY_VOYAGE)
@@ -11,8 +11,14 @@ Run from deployment/d3kOS/ai-bridge/:
 
 import sys
 import os
+import tempfile
 
 # ai-bridge/ directory (one level above this file)
 _AI_BRIDGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if _AI_BRIDGE_ROOT not in sys.path:
     sys.path.insert(0, _AI_BRIDGE_ROOT)
+
+# Keep the AI response cache out of /home/d3kos during tests
+os.environ.setdefault(
+    'AI_CACHE_DB', os.path.join(tempfile.mkdtemp(prefix='d3kos-test-'), 'responses.db')
+)
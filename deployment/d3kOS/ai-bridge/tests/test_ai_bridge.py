@@ -6,8 +6,12 @@ Covers:
   utils/geo.py            pure math — no mocking
   utils/avnav_client.py   POST-only enforcement, parsers, disk-preferred reads
   utils/signalk_client.py envelope extraction, mocked HTTP
+  utils/signalk_stream.py delta-stream state cache, REST fallback
   utils/tts.py            binary detection, empty-string guard, shell quoting
-  features/anchor_watch.py   state machine, 3-poll debounce
+  features/anchor_watch.py   state machine, 3-poll debounce, event-mode filter
+  features/anchor_track.py   swing-circle ring buffer, drift trend
+  utils/ai_broker.py         priority lanes, de-duplication, cancellation, streaming
+  utils/response_cache.py    semantic keys, TTL, LRU eviction; route/arrival cache use
   features/voyage_logger.py  GPX parser, privacy (no raw GPS in AI prompt)
   ai_bridge.py Flask routes  /status, /stream, /webhook/*, /anchor/*, /voyages
 
@@ -381,6 +385,188 @@ class TestSignalKNavigationSnapshot:
         assert all(v is None for v in snap.values())
 
 
+# =============================================================================
+# signalk_stream.py — delta-stream state cache
+# =============================================================================
+
+_SELF = 'vessels.urn:mrn:signalk:uuid:d3kos'
+
+
+def _delta(values, context=_SELF):
+    return {'context': context,
+            'updates': [{'values': [{'path': p, 'value': v} for p, v in values.items()]}]}
+
+
+class TestSignalKStreamStore:
+    def _make(self):
+        from utils.signalk_stream import SignalKStream
+        s = SignalKStream(url='ws://test')
+        s.apply_message(json.dumps({'self': _SELF, 'version': '2.0.0'}))
+        return s
+
+    def test_not_live_until_first_delta(self):
+        s = self._make()
+        assert s.is_live() is False
+        assert s.view() is None
+
+    def test_delta_stored_and_live(self):
+        s = self._make()
+        s.apply_delta(_delta({'navigation.speedOverGround': 2.5}))
+        assert s.is_live() is True
+        assert s.get('navigation.speedOverGround') == 2.5
+
+    def test_later_delta_overwrites(self):
+        s = self._make()
+        s.apply_delta(_delta({'navigation.speedOverGround': 2.5}))
+        s.apply_delta(_delta({'navigation.speedOverGround': 3.0}))
+        assert s.get('navigation.speedOverGround') == 3.0
+
+    def test_other_vessel_context_ignored(self):
+        s = self._make()
+        s.apply_delta(_delta({'navigation.speedOverGround': 9.9},
+                             context='vessels.urn:mrn:imo:mmsi:316000000'))
+        assert s.get('navigation.speedOverGround') is None
+
+    def test_max_age_expires_value(self):
+        s = self._make()
+        s.apply_delta(_delta({'navigation.speedOverGround': 2.5}))
+        with patch('utils.signalk_stream.time.monotonic', return_value=1e12):
+            assert s.get('navigation.speedOverGround', max_age=10) is None
+
+    def test_non_json_frame_ignored(self):
+        s = self._make()
+        s.apply_message('not json')
+        assert s.is_live() is False
+
+    def test_status_fields(self):
+        s = self._make()
+        s.apply_delta(_delta({'navigation.speedOverGround': 2.5}))
+        st = s.status()
+        assert st['live'] is True
+        assert st['paths'] == 1
+        assert st['deltas'] == 1
+
+
+class TestSignalKClientStreamServed:
+    """While the stream is live, fresh values must not touch the REST API."""
+
+    def _live_stream(self):
+        from utils.signalk_stream import SignalKStream
+        s = SignalKStream(url='ws://test')
+        s.apply_delta(_delta({
+            'navigation.position': {'latitude': 43.686, 'longitude': -79.520},
+            'navigation.speedOverGround': 2.5,
+            'navigation.courseOverGroundTrue': 1.0,
+            'navigation.anchor.maxRadius': 30,
+            'navigation.anchor.currentRadius': 12,
+            'navigation.anchor.position': {'latitude': 43.685, 'longitude': -79.519},
+        }, context=None))
+        return s
+
+    def test_position_from_stream_no_http(self):
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_client.requests.get') as mock_get:
+            from utils.signalk_client import get_position
+            pos = get_position()
+        assert pos == {'latitude': 43.686, 'longitude': -79.520}
+        mock_get.assert_not_called()
+
+    def test_snapshot_from_stream_no_http(self):
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_client.requests.get') as mock_get:
+            from utils.signalk_client import get_navigation_snapshot
+            snap = get_navigation_snapshot()
+        mock_get.assert_not_called()
+        assert snap['sog_ms'] == 2.5
+        assert snap['anchor_max_radius_m'] == 30.0
+        assert snap['anchor_current_radius_m'] == 12.0
+        assert snap['anchor_lat'] == 43.685
+
+    def test_snapshot_stale_fields_fall_back_to_rest(self):
+        """An old stream position must not reach the snapshot; config paths stay."""
+        import time as _time
+        mock_resp = MagicMock()
+        mock_resp.json.return_value = {'value': {'latitude': 43.7, 'longitude': -79.5}}
+        later = _time.monotonic() + 3600
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_stream.time.monotonic', return_value=later), \
+             patch('utils.signalk_client.requests.get', return_value=mock_resp) as mock_get:
+            from utils.signalk_client import get_navigation_snapshot
+            snap = get_navigation_snapshot()
+        fetched = [c[0][0] for c in mock_get.call_args_list]
+        assert any(url.endswith('/navigation/position') for url in fetched)
+        assert not any('/anchor/' in url for url in fetched)
+        assert (snap['lat'], snap['lon']) == (43.7, -79.5)
+        assert snap['anchor_max_radius_m'] == 30.0
+
+    def test_snapshot_missing_field_falls_back_to_rest(self):
+        from utils.signalk_stream import SignalKStream
+        s = SignalKStream(url='ws://test')
+        s.apply_delta(_delta({
+            'navigation.position': {'latitude': 43.686, 'longitude': -79.520},
+        }, context=None))
+        mock_resp = MagicMock()
+        mock_resp.json.return_value = {'value': 1.5}
+        with patch('utils.signalk_client.stream', s), \
+             patch('utils.signalk_client.requests.get', return_value=mock_resp) as mock_get:
+            from utils.signalk_client import get_navigation_snapshot
+            snap = get_navigation_snapshot()
+        fetched = [c[0][0] for c in mock_get.call_args_list]
+        assert any(url.endswith('/navigation/speedOverGround') for url in fetched)
+        assert not any(url.endswith('/navigation/position') for url in fetched)
+        assert snap['sog_ms'] == 1.5
+
+    def test_view_drops_stale_paths(self):
+        import time as _time
+        s = self._live_stream()
+        later = _time.monotonic() + 30
+        with patch('utils.signalk_stream.time.monotonic', return_value=later):
+            view = s.view({'navigation.position': 5.0})
+        assert 'navigation.position' not in view
+        assert view['navigation.speedOverGround'] == 2.5
+
+    def test_missing_path_falls_back_to_rest(self):
+        mock_resp = MagicMock()
+        mock_resp.json.return_value = {'value': 0.5}
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_client.requests.get', return_value=mock_resp) as mock_get:
+            from utils.signalk_client import get_heading_magnetic
+            assert get_heading_magnetic() == 0.5
+        mock_get.assert_called_once()
+        assert mock_get.call_args[0][0].endswith('/navigation/headingMagnetic')
+
+    def test_stale_position_falls_back_to_rest(self):
+        import time as _time
+        s = self._live_stream()
+        mock_resp = MagicMock()
+        mock_resp.json.return_value = {'value': {'latitude': 43.7, 'longitude': -79.5}}
+        later = _time.monotonic() + 30
+        with patch('utils.signalk_client.stream', s), \
+             patch('utils.signalk_stream.time.monotonic', return_value=later), \
+             patch('utils.signalk_client.requests.get', return_value=mock_resp) as mock_get:
+            from utils.signalk_client import get_position
+            pos = get_position()
+        assert pos == {'latitude': 43.7, 'longitude': -79.5}
+        mock_get.assert_called_once()
+
+    def test_stale_config_path_still_served_from_stream(self):
+        """Paths without a max age (anchor radius) are served however old."""
+        import time as _time
+        later = _time.monotonic() + 3600
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_stream.time.monotonic', return_value=later), \
+             patch('utils.signalk_client.requests.get') as mock_get:
+            from utils.signalk_client import _get
+            assert _get('navigation/anchor/maxRadius') == {'value': 30}
+        mock_get.assert_not_called()
+
+    def test_is_reachable_true_when_live(self):
+        with patch('utils.signalk_client.stream', self._live_stream()), \
+             patch('utils.signalk_client.requests.get', side_effect=ConnectionError):
+            from utils.signalk_client import is_reachable
+            assert is_reachable() is True
+
+
 # =============================================================================
 # tts.py — binary detection, empty-string guard, shell quoting
 # =============================================================================
@@ -731,6 +917,513 @@ class TestAnchorWatchDebounce:
         assert aw._alarm_active is True
 
 
+class TestDragFilter:
+    """Time-window median filter used in event mode."""
+
+    def _make(self):
+        from features.anchor_watch import DragFilter
+        return DragFilter(window_s=5.0, confirm_s=2.0, min_samples=3)
+
+    def test_single_jitter_spike_rejected(self):
+        f = self._make()
+        results = [f.update(t, r, 30.0) for t, r in
+                   [(0, 20.0), (1, 21.0), (2, 80.0), (3, 20.0), (4, 21.0)]]
+        assert not any(results)
+        assert f.exceed_since is None
+
+    def test_sustained_breach_confirms_within_seconds(self):
+        f = self._make()
+        f.update(0, 25.0, 30.0)
+        confirmed_at = None
+        for t in range(1, 10):
+            if f.update(t, 40.0, 30.0):
+                confirmed_at = t
+                break
+        assert confirmed_at is not None
+        assert confirmed_at - f.first_exceed <= 4
+
+    def test_not_confirmed_before_min_samples(self):
+        f = self._make()
+        assert f.update(0.0, 40.0, 30.0) is False
+        assert f.update(2.5, 40.0, 30.0) is False  # 2 samples only
+
+    def test_old_samples_leave_window(self):
+        f = self._make()
+        for t in range(5):
+            f.update(t, 40.0, 30.0)
+        f.update(20, 20.0, 30.0)
+        assert f.state()['samples'] == 1
+        assert f.filtered_m == 20.0
+
+
+class TestAnchorWatchEventMode:
+    def _make_active(self):
+        from features.anchor_watch import AnchorWatch
+        aw = AnchorWatch(broadcast_fn=MagicMock())
+        aw._active = True
+        return aw
+
+    def _anchor(self, current_r):
+        return {'max_radius_m': 30.0, 'current_radius_m': current_r,
+                'anchor_lat': 43.686, 'anchor_lon': -79.520}
+
+    def test_sustained_drag_fires_once_with_latency(self):
+        aw = self._make_active()
+        clock = iter(float(t) for t in range(100))
+        with patch('features.anchor_watch.get_anchor_data',
+                   return_value=self._anchor(45.0)), \
+             patch('features.anchor_watch.time.monotonic', side_effect=lambda: next(clock)), \
+             patch('features.anchor_watch.threading.Thread') as mock_thread:
+            for _ in range(10):
+                aw._on_stream_update({'navigation.anchor.currentRadius'})
+        # alert handed to a worker thread exactly once; alarm latched meanwhile
+        assert mock_thread.call_count == 1
+        assert mock_thread.call_args.kwargs['target'] == aw._fire_drag_alert
+        mock_thread.return_value.start.assert_called_once()
+        assert aw._alarm_active is True
+        assert aw._last_latency_s is not None
+        assert aw._last_latency_s <= 4
+
+    def test_inactive_without_radius_ignores_updates(self):
+        aw = self._make_active()
+        aw._active = False
+        with patch('features.anchor_watch.get_anchor_data',
+                   return_value={'max_radius_m': None, 'current_radius_m': None,
+                                 'anchor_lat': None, 'anchor_lon': None}):
+            aw._on_stream_update({'navigation.anchor.currentRadius'})
+        assert aw._active is False
+        assert aw._evaluations == 0
+
+    def test_radius_set_in_signalk_auto_activates(self):
+        aw = self._make_active()
+        aw._active = False
+        with patch('features.anchor_watch.get_anchor_data',
+                   return_value=self._anchor(12.0)):
+            aw._on_stream_update({'navigation.anchor.currentRadius'})
+        assert aw._active is True
+        assert aw._evaluations == 1
+
+    def test_listener_never_calls_rest(self):
+        """Stale stream values are skipped on the stream thread, not fetched."""
+        import time as _time
+        from utils.signalk_stream import SignalKStream
+        s = SignalKStream(url='ws://test')
+        s.apply_delta(_delta({
+            'navigation.position': {'latitude': 43.687, 'longitude': -79.520},
+            'navigation.anchor.maxRadius': 30,
+            'navigation.anchor.position': {'latitude': 43.686, 'longitude': -79.520},
+        }, context=None))
+        aw = self._make_active()
+        later = _time.monotonic() + 3600
+        with patch('utils.signalk_client.stream', s), \
+             patch('utils.signalk_stream.time.monotonic', return_value=later), \
+             patch('utils.signalk_client.requests.get') as mock_get:
+            aw._on_stream_update({'navigation.position'})
+        mock_get.assert_not_called()
+        assert aw._evaluations == 0
+        assert len(aw._track) == 0
+
+    def test_radius_computed_from_position_when_no_current_radius(self):
+        from features.anchor_watch import AnchorWatch
+        anchor = self._anchor(None)
+        r = AnchorWatch._radius_from_update(
+            anchor, {'navigation.position'},
+            {'latitude': 43.687, 'longitude': -79.520})
+        assert 100 < r < 120  # 0.001 deg latitude ≈ 111 m
+
+    def test_status_reports_mode_and_filter(self):
+        aw = self._make_active()
+        st = aw.status()
+        assert st['mode'] in ('event', 'poll')
+        assert 'filter' in st and 'window_s' in st['filter']
+        assert st['last_detection_latency_s'] is None
+
+
+class TestAnchorTrack:
+    def _make(self, capacity=5):
+        from features.anchor_track import AnchorTrack
+        return AnchorTrack(capacity)
+
+    def test_empty_track(self):
+        tr = self._make()
+        assert len(tr) == 0
+        assert tr.points() == []
+        assert tr.trend(60) is None
+
+    def test_ring_wraps_keeping_newest(self):
+        tr = self._make(capacity=3)
+        for i in range(5):
+            tr.add(float(i), float(i), 0.0)
+        assert len(tr) == 3
+        assert tr.points() == [[2.0, 0.0], [3.0, 0.0], [4.0, 0.0]]
+
+    def test_points_limit(self):
+        tr = self._make()
+        for i in range(4):
+            tr.add(float(i), float(i), 0.0)
+        assert tr.points(limit=2) == [[2.0, 0.0], [3.0, 0.0]]
+
+    def test_outward_drift_trend(self):
+        tr = self._make(capacity=100)
+        for i in range(20):
+            tr.add(float(i), 0.0, 10.0 + 0.5 * i)  # drifting due east at 0.5 m/s
+        trend = tr.trend(60)
+        assert abs(trend['radial_speed_ms'] - 0.5) < 0.01
+        assert abs(trend['drift_speed_ms'] - 0.5) < 0.01
+        assert trend['drift_bearing'] == 90
+        assert trend['samples'] == 20
+
+    def test_trend_window_limits_samples(self):
+        tr = self._make(capacity=100)
+        for i in range(20):
+            tr.add(float(i), 0.0, 10.0)
+        assert tr.trend(5)['samples'] == 6
+
+    def test_offset_from_anchor_north(self):
+        from features.anchor_track import offset_from_anchor
+        north, east = offset_from_anchor(43.686, -79.520, 43.687, -79.520)
+        assert 110 < north < 112
+        assert abs(east) < 0.001
+
+
+class TestAnchorWatchTrend:
+    def _make_active(self):
+        from features.anchor_watch import AnchorWatch
+        aw = AnchorWatch(broadcast_fn=MagicMock())
+        aw._active = True
+        return aw
+
+    def test_steady_outward_drift_warns_once_before_breach(self):
+        aw = self._make_active()
+        for i in range(30):
+            aw._track.add(float(i), 0.0, 10.0 + 0.3 * i)  # 10 m → 18.7 m, limit 30 m
+        with patch('features.anchor_watch.tts.speak') as mock_speak:
+            aw._check_trend(30.0)
+            aw._check_trend(30.0)
+        events = [c.args[0] for c in aw._broadcast.call_args_list]
+        assert events.count('anchor_trend') == 1
+        assert mock_speak.call_count == 1
+        assert aw._alarm_active is False
+
+    def test_swing_back_does_not_rearm_warning(self):
+        """A brief inward swing must not clear the latch — only a sustained stop does."""
+        from features.anchor_watch import TREND_WINDOW_S
+        aw = self._make_active()
+        outward = [(float(i), 0.0, 10.0 + 0.3 * i) for i in range(30)]
+        inward  = [(float(30 + i), 0.0, 18.7 - 0.3 * i) for i in range(30)]
+        with patch('features.anchor_watch.tts.speak'), \
+             patch('features.anchor_watch.time.monotonic') as mock_now:
+            for cycle in range(3):
+                mock_now.return_value = cycle * 60.0
+                aw._track.clear()
+                for t, n, e in outward:
+                    aw._track.add(t, n, e)
+                aw._check_trend(30.0)
+                mock_now.return_value = cycle * 60.0 + 30.0
+                aw._track.clear()
+                for t, n, e in inward:
+                    aw._track.add(t, n, e)
+                aw._check_trend(30.0)
+            events = [c.args[0] for c in aw._broadcast.call_args_list]
+            assert events.count('anchor_trend') == 1
+
+            # quiet for a whole window — the next outward drift warns again
+            aw._check_trend(30.0)
+            mock_now.return_value += TREND_WINDOW_S + 1
+            aw._check_trend(30.0)
+            aw._track.clear()
+            for t, n, e in outward:
+                aw._track.add(t, n, e)
+            aw._check_trend(30.0)
+        events = [c.args[0] for c in aw._broadcast.call_args_list]
+        assert events.count('anchor_trend') == 2
+
+    def test_fast_position_stream_keeps_full_trend_window(self):
+        """10 Hz positions are decimated so the ring still spans TREND_WINDOW_S."""
+        from features.anchor_watch import TREND_WINDOW_S
+        aw = self._make_active()
+        anchor = {'max_radius_m': 300.0, 'anchor_lat': 43.686, 'anchor_lon': -79.520}
+        pos = {'latitude': 43.6861, 'longitude': -79.520}
+        steps = int((TREND_WINDOW_S + 60) * 10)
+        with patch('features.anchor_watch.time.monotonic') as mock_now:
+            for i in range(steps):
+                mock_now.return_value = i / 10
+                aw._record_position(anchor, pos)
+            trend = aw._track.trend(TREND_WINDOW_S)
+        assert len(aw._track) < aw._track.capacity
+        assert trend['span_s'] >= TREND_WINDOW_S - 1
+
+    def test_stationary_swing_no_warning(self):
+        aw = self._make_active()
+        for i in range(30):
+            aw._track.add(float(i), 0.0, 15.0 + (1 if i % 2 else -1))
+        aw._check_trend(30.0)
+        aw._broadcast.assert_not_called()
+
+
+# =============================================================================
+# ai_broker.py — priority lanes, de-duplication, cancellation
+# =============================================================================
+
+class TestAIBroker:
+    def _make(self):
+        from utils.ai_broker import AIBroker
+        b = AIBroker(workers=1, proxy_url='http://test')
+        b._threads = [MagicMock()]  # suppress real workers — drive _next() by hand
+        return b
+
+    def test_duplicate_prompt_shares_request(self):
+        b = self._make()
+        r1 = b.submit('same prompt', 3)
+        r2 = b.submit('same prompt', 3)
+        assert r1 is r2
+        assert b.status()['deduplicated'] == 1
+
+    def test_higher_priority_served_first(self):
+        from utils.ai_broker import PRIORITY_ANCHOR, PRIORITY_VOYAGE
+        b = self._make()
+        b.submit('voyage', PRIORITY_VOYAGE)
+        b.submit('anchor', PRIORITY_ANCHOR)
+        assert b._next(4).prompt == 'anchor'
+        assert b._next(4).prompt == 'voyage'
+
+    def test_duplicate_at_higher_priority_is_promoted(self):
+        from utils.ai_broker import PRIORITY_ANCHOR, PRIORITY_ROUTE, PRIORITY_VOYAGE
+        b = self._make()
+        b.submit('other', PRIORITY_ROUTE)
+        r = b.submit('p', PRIORITY_VOYAGE)
+        b.submit('p', PRIORITY_ANCHOR)
+        assert r.priority == PRIORITY_ANCHOR
+        assert b._next(4) is r
+
+    def test_reserved_worker_only_takes_anchor_lane(self):
+        from utils.ai_broker import PRIORITY_ANCHOR, PRIORITY_ROUTE
+        b = self._make()
+        b.submit('route', PRIORITY_ROUTE)
+        b.submit('anchor', PRIORITY_ANCHOR)
+        assert b._next(PRIORITY_ANCHOR).prompt == 'anchor'
+        assert b.status()['queued'][PRIORITY_ROUTE] == 1
+
+    def test_cancel_queued_request(self):
+        b = self._make()
+        r = b.submit('p', 3)
+        assert b.cancel(r.id) is True
+        assert r.state == 'cancelled'
+        assert r.wait(0) == {'response': '', 'source': 'error'}
+        assert b.status()['queued'][3] == 0
+        # A new submit of the same prompt is a fresh request
+        assert b.submit('p', 3) is not r
+
+    def test_timeout_of_one_waiter_keeps_shared_request(self):
+        """Two ask() callers share a prompt; only the last one to time out cancels it."""
+        import threading
+        from utils.ai_broker import AIRequest
+        b = self._make()
+        timed_out = {'response': '', 'source': 'error'}
+        first_waiting, release_first = threading.Event(), threading.Event()
+        seen = {}
+
+        def fake_wait(req, timeout=None):
+            if not first_waiting.is_set():
+                first_waiting.set()
+                release_first.wait(5)
+            else:
+                release_first.set()
+                first.join(5)
+                seen['state'], seen['waiters'] = req.state, req.waiters
+            return timed_out
+
+        results = []
+        with patch.object(AIRequest, 'wait', fake_wait):
+            first = threading.Thread(target=lambda: results.append(b.ask('shared', 3, timeout=1)))
+            first.start()
+            first_waiting.wait(5)
+            results.append(b.ask('shared', 3, timeout=1))
+
+        assert results == [timed_out, timed_out]
+        assert seen == {'state': 'queued', 'waiters': 1}   # first timeout left it alive
+        assert b.status()['deduplicated'] == 1
+        assert b.status()['cancelled'] == 1
+        assert b.status()['queued'][3] == 0
+
+    def test_worker_posts_with_session_and_finishes(self):
+        from utils.ai_broker import AIBroker
+        b = AIBroker(workers=1, proxy_url='http://test')
+        fake = MagicMock()
+        fake.json.return_value = {'response': 'Steer 270', 'source': 'gemini'}
+        with patch('utils.ai_broker.requests.Session.post', return_value=fake) as mock_post:
+            result = b.ask('where?', 3, timeout=5)
+        assert result['response'] == 'Steer 270'
+        assert mock_post.call_args.kwargs['json'] == {'message': 'where?'}
+        assert b.status()['completed'] == 1
+
+    def test_worker_error_returns_error_result(self):
+        from utils.ai_broker import AIBroker
+        b = AIBroker(workers=1, proxy_url='http://test')
+        with patch('utils.ai_broker.requests.Session.post', side_effect=ConnectionError):
+            result = b.ask('where?', 3, timeout=5)
+        assert result == {'response': '', 'source': 'error'}
+
+    def _stream_response(self, lines):
+        fake = MagicMock()
+        fake.__enter__.return_value = fake
+        fake.iter_lines.return_value = lines
+        return fake
+
+    def test_on_chunk_uses_stream_endpoint_and_relays_chunks(self):
+        from utils.ai_broker import AIBroker
+        b = AIBroker(workers=1, proxy_url='http://test')
+        fake = self._stream_response([
+            'event: chunk', 'data: {"text": "Steer "}', '',
+            'event: chunk', 'data: {"text": "270"}', '',
+            'event: done', 'data: {"source": "gemini", "tokens": 2}', '',
+        ])
+        seen = []
+        with patch('utils.ai_broker.requests.Session.post', return_value=fake) as mock_post:
+            result = b.ask('where?', 3, timeout=5,
+                           on_chunk=lambda text, partial: seen.append(partial))
+        assert mock_post.call_args.args[0] == 'http://test/ask/stream'
+        assert mock_post.call_args.kwargs['stream'] is True
+        assert seen == ['Steer ', 'Steer 270']
+        assert result['response'] == 'Steer 270' and result['source'] == 'gemini'
+
+    def test_stream_error_event_is_error_result(self):
+        from utils.ai_broker import AIBroker
+        b = AIBroker(workers=1, proxy_url='http://test')
+        fake = self._stream_response([
+            'event: chunk', 'data: {"text": "Ste"}', '',
+            'event: error', 'data: {"error": "stream interrupted"}', '',
+        ])
+        with patch('utils.ai_broker.requests.Session.post', return_value=fake):
+            result = b.ask('where?', 3, timeout=5, on_chunk=lambda t, p: None)
+        assert result == {'response': '', 'source': 'error'}
+
+    def test_throttled_relay_limits_emits(self):
+        from utils.ai_broker import throttled_relay
+        emitted = []
+        relay = throttled_relay(emitted.append, interval=60)
+        relay('a', 'a')
+        relay('b', 'ab')
+        assert emitted == ['a']
+
+
+# =============================================================================
+# response_cache.py — semantic-key TTL/LRU cache
+# =============================================================================
+
+class TestResponseCache:
+    def _make(self, tmp_path, max_entries=10):
+        from utils.response_cache import ResponseCache
+        return ResponseCache(str(tmp_path / 'cache.db'), max_entries=max_entries)
+
+    def test_miss_then_hit(self, tmp_path):
+        c = self._make(tmp_path)
+        parts = {'route': 'Kingston', 'wp': 'WP3'}
+        assert c.get('route', parts, 60) is None
+        c.put('route', parts, 'Brief text', 'gemini')
+        hit = c.get('route', parts, 60)
+        assert hit['response'] == 'Brief text'
+        assert hit['source'] == 'gemini'
+        assert c.stats()['hits'] == 1 and c.stats()['misses'] == 1
+
+    def test_ttl_expiry(self, tmp_path):
+        c = self._make(tmp_path)
+        c.put('route', {'k': 1}, 'x', 'gemini')
+        with patch('utils.response_cache.time.time', return_value=1e12):
+            assert c.get('route', {'k': 1}, 60) is None
+
+    def test_lru_eviction(self, tmp_path):
+        c = self._make(tmp_path, max_entries=2)
+        with patch('utils.response_cache.time.time', side_effect=[1, 2, 3, 4]):
+            c.put('route', {'k': 1}, 'a', 'gemini')
+            c.put('route', {'k': 2}, 'b', 'gemini')
+            c.get('route', {'k': 1}, 1e12)          # k=1 now most recently used
+            c.put('route', {'k': 3}, 'c', 'gemini')  # evicts k=2
+        assert c.get('route', {'k': 2}, 1e12) is None
+        assert c.get('route', {'k': 1}, 1e12)['response'] == 'a'
+        assert c.stats()['entries'] == 2
+
+    def test_namespaces_do_not_collide(self, tmp_path):
+        c = self._make(tmp_path)
+        c.put('route', {'k': 1}, 'route text', 'gemini')
+        assert c.get('arrival', {'k': 1}, 60) is None
+
+    def test_empty_response_not_stored(self, tmp_path):
+        c = self._make(tmp_path)
+        c.put('route', {'k': 1}, '', 'error')
+        assert c.get('route', {'k': 1}, 60) is None
+
+    def test_unwritable_path_disables_cache(self):
+        from utils.response_cache import ResponseCache
+        c = ResponseCache('/proc/no-such-dir/cache.db')
+        c.put('route', {'k': 1}, 'x', 'gemini')
+        assert c.get('route', {'k': 1}, 60) is None
+        assert c.stats()['enabled'] is False
+
+    def test_quantize(self):
+        from utils.response_cache import quantize
+        assert quantize(43.6861, 0.01) == 43.69
+        assert quantize(6.4, 1.0) == 6.0
+        assert quantize(None, 1.0) is None
+
+
+class TestRouteAnalyzerCache:
+    def _nav(self):
+        return {'route_name': 'Kingston', 'wp_name': 'WP3', 'lat': None, 'lon': None,
+                'sog_ms': None, 'cog_deg': None, 'route_numpoints': 5,
+                'wp_distance_m': 1852.0}
+
+    def _sk(self, lat=43.686):
+        return {'lat': lat, 'lon': -79.520, 'sog_ms': 3.0, 'cog_rad': 1.0}
+
+    def _run(self, ra, tmp_path, sk, force=False):
+        with patch('features.route_analyzer.get_nav_data', return_value=self._nav()), \
+             patch('features.route_analyzer.get_navigation_snapshot', return_value=sk), \
+             patch('features.route_analyzer.response_cache', self.cache), \
+             patch('features.route_analyzer._call_ai',
+                   return_value={'response': 'Brief', 'source': 'gemini'}) as mock_ai:
+            ra._run_analysis(force=force)
+        return mock_ai.call_count
+
+    def test_unchanged_situation_served_from_cache(self, tmp_path):
+        from features.route_analyzer import RouteAnalyzer
+        from utils.response_cache import ResponseCache
+        self.cache = ResponseCache(str(tmp_path / 'c.db'))
+        ra = RouteAnalyzer(broadcast_fn=MagicMock())
+        assert self._run(ra, tmp_path, self._sk()) == 1
+        assert self._run(ra, tmp_path, self._sk(lat=43.6862)) == 0   # same bucket
+        last = ra._broadcast.call_args_list[-1].args[1]
+        assert last['cached'] is True and last['text'] == 'Brief'
+
+    def test_moved_or_forced_calls_ai(self, tmp_path):
+        from features.route_analyzer import RouteAnalyzer
+        from utils.response_cache import ResponseCache
+        self.cache = ResponseCache(str(tmp_path / 'c.db'))
+        ra = RouteAnalyzer(broadcast_fn=MagicMock())
+        self._run(ra, tmp_path, self._sk())
+        assert self._run(ra, tmp_path, self._sk(lat=43.80)) == 1
+        assert self._run(ra, tmp_path, self._sk(lat=43.80), force=True) == 1
+
+    def test_partial_text_broadcast_as_streaming(self, tmp_path):
+        from features.route_analyzer import RouteAnalyzer
+        from utils.response_cache import ResponseCache
+        self.cache = ResponseCache(str(tmp_path / 'c.db'))
+        ra = RouteAnalyzer(broadcast_fn=MagicMock())
+
+        def fake_ai(prompt, on_chunk=None):
+            on_chunk('Hold ', 'Hold ')
+            return {'response': 'Hold 270', 'source': 'gemini'}
+
+        with patch('features.route_analyzer.get_nav_data', return_value=self._nav()), \
+             patch('features.route_analyzer.get_navigation_snapshot', return_value=self._sk()), \
+             patch('features.route_analyzer.response_cache', self.cache), \
+             patch('features.route_analyzer._call_ai', side_effect=fake_ai):
+            ra._run_analysis()
+        states = [c.args[1]['state'] for c in ra._broadcast.call_args_list]
+        assert states[-2:] == ['STREAMING', 'ACTIVE']
+        assert ra._broadcast.call_args_list[-2].args[1]['text'] == 'Hold '
+
+
 # =============================================================================
 # ai_bridge.py — Flask route tests
 # =============================================================================
@@ -906,6 +1599,28 @@ class TestFlaskVoyages:
         assert isinstance(data.get('summaries'), list)
 
 
+class TestFlaskAnchorTrack:
+    def test_returns_points_and_trend(self, client):
+        with patch('features.anchor_watch.get_anchor_data',
+                   return_value={'max_radius_m': 30.0, 'current_radius_m': 10.0,
+                                 'anchor_lat': 43.686, 'anchor_lon': -79.520}):
+            data = json.loads(client.get('/anchor/track').data)
+        assert data['ok'] is True
+        assert isinstance(data['points'], list)
+        assert 'trend' in data and 'capacity' in data
+
+    def test_invalid_window_returns_400(self, client):
+        assert client.get('/anchor/track?window=abc').status_code == 400
+
+    def test_default_window_is_trend_window(self, client):
+        import ai_bridge
+        from features.anchor_watch import TREND_WINDOW_S
+        with patch.object(ai_bridge.anchor_watch, 'get_track',
+                          return_value={'ok': True}) as mock_track:
+            client.get('/anchor/track')
+        mock_track.assert_called_once_with(TREND_WINDOW_S, None)
+
+
 class TestFlaskAnalyzeRoute:
     def test_returns_200(self, client):
         assert client.post('/analyze-route').status_code == 200
@@ -929,10 +1644,8 @@ class TestFlaskWebhookQuery:
         assert resp.status_code == 400
 
     def test_valid_query_proxied_to_gemini(self, client):
-        fake_ai = MagicMock(status_code=200)
-        fake_ai.json.return_value = {'response': 'VHF 16 is distress channel', 'source': 'gemini'}
-        fake_ai.raise_for_status = lambda: None
-        with patch('ai_bridge.requests.post', return_value=fake_ai):
+        fake_ai = {'response': 'VHF 16 is distress channel', 'source': 'gemini'}
+        with patch('ai_bridge.ai_broker.ask', return_value=fake_ai) as mock_ask:
             resp = client.post('/webhook/query',
                                json={'query': 'What is VHF channel 16?'},
                                content_type='application/json')
@@ -940,6 +1653,28 @@ class TestFlaskWebhookQuery:
         data = json.loads(resp.data)
         assert data['ok'] is True
         assert 'response' in data
+        from utils.ai_broker import PRIORITY_QUERY
+        assert mock_ask.call_args.args[1] == PRIORITY_QUERY
+
+    def test_ai_failure_returns_503(self, client):
+        with patch('ai_bridge.ai_broker.ask',
+                   return_value={'response': '', 'source': 'error'}):
+            resp = client.post('/webhook/query', json={'query': 'Tides?'})
+        assert resp.status_code == 503
+
+    def test_async_query_returns_202_and_is_pollable(self, client):
+        from utils.ai_broker import AIRequest
+        req = AIRequest('Tides?', 2)
+        with patch('ai_bridge.ai_broker.submit', return_value=req), \
+             patch('ai_bridge.ai_broker.get', return_value=req):
+            resp = client.post('/webhook/query', json={'query': 'Tides?', 'async': True})
+            assert resp.status_code == 202
+            qid = json.loads(resp.data)['id']
+            data = json.loads(client.get(f'/webhook/query/{qid}').data)
+        assert data['state'] == 'queued'
+
+    def test_unknown_query_id_returns_404(self, client):
+        assert client.get('/webhook/query/nope').status_code == 404
 
 
 # =============================================================================
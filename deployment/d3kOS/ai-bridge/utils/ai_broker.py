@@ -0,0 +1,332 @@
+"""
+d3kOS AI Bridge — shared AI request broker
+
+Every AI call from the bridge goes through one broker instead of each feature
+POSTing to the Gemini proxy (:3001/ask) on its own thread:
+
+  Priority lanes   anchor advice > arrival briefing > Node-RED query >
+                   route analysis > voyage summary
+  Worker pool      AI_BROKER_WORKERS general workers (default 2) take the
+                   highest non-empty lane; one extra worker is reserved for
+                   the anchor lane so a slow route/voyage call can never
+                   delay safety-critical advice.
+  De-duplication   an identical prompt already queued or running is shared —
+                   both callers get the same result from one LLM call. A
+                   caller whose ask() times out only gives up its own wait;
+                   the request is cancelled when the last caller gives up.
+  Keep-alive       each worker holds its own requests.Session to the proxy.
+  Cancellation     queued requests are dropped; running requests finish but
+                   their result is discarded.
+  Streaming        when a caller passes on_chunk, the worker uses the proxy's
+                   /ask/stream endpoint and calls on_chunk(text, partial) as
+                   each chunk arrives, so features can relay partial text over SSE.
+
+Callers use ask() (blocking, returns {'response', 'source'}) or submit()
+(returns an AIRequest to wait on, poll or cancel).
+"""
+
+import os
+import json
+import uuid
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+GEMINI_PROXY_URL  = os.environ.get('GEMINI_PROXY_URL', 'http://localhost:3001')
+AI_BROKER_WORKERS = int(os.environ.get('AI_BROKER_WORKERS', 2))
+AI_TIMEOUT        = int(os.environ.get('AI_TIMEOUT', 60))
+
+# Priority lanes — lower number is served first
+PRIORITY_ANCHOR  = 0
+PRIORITY_ARRIVAL = 1
+PRIORITY_QUERY   = 2
+PRIORITY_ROUTE   = 3
+PRIORITY_VOYAGE  = 4
+_LANES = 5
+
+_FINISHED_KEEP_S = 600   # finished requests stay queryable for 10 min
+_RELAY_INTERVAL_S = 0.25 # minimum gap between partial-text SSE broadcasts
+_ERROR_RESULT = {'response': '', 'source': 'error'}
+
+
+class AIRequest:
+    """One brokered AI call. Shared by every caller that submitted the same prompt."""
+
+    def __init__(self, prompt: str, priority: int):
+        self.id       = uuid.uuid4().hex[:12]
+        self.prompt   = prompt
+        self.priority = priority
+        self.state    = 'queued'     # queued | running | done | error | cancelled
+        self.result: dict | None = None
+        self.partial  = ''
+        self.created  = time.monotonic()
+        self.finished = None
+        self.waiters  = 1            # callers sharing this request (submit() count)
+        self._done    = threading.Event()
+        self._chunk_listeners: list = []
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> dict:
+        """Block until finished. Returns the proxy result or an error result."""
+        if not self._done.wait(timeout):
+            return dict(_ERROR_RESULT)
+        return self.result or dict(_ERROR_RESULT)
+
+    def to_dict(self) -> dict:
+        out = {'id': self.id, 'state': self.state, 'priority': self.priority}
+        if self.result is not None:
+            out['response'] = self.result.get('response', '')
+            out['source']   = self.result.get('source', 'unknown')
+        return out
+
+    def _finish(self, state: str, result: dict | None):
+        self.state    = state
+        self.result   = result
+        self.finished = time.monotonic()
+        self._done.set()
+
+
+class AIBroker:
+    """Bounded worker pool with priority lanes. Workers start on first submit."""
+
+    def __init__(self, workers: int = AI_BROKER_WORKERS, proxy_url: str = GEMINI_PROXY_URL):
+        self._workers   = max(1, workers)
+        self._proxy_url = proxy_url
+        self._lanes     = [deque() for _ in range(_LANES)]
+        self._cond      = threading.Condition()
+        self._inflight: dict[str, AIRequest] = {}   # prompt → queued/running request
+        self._requests: dict[str, AIRequest] = {}   # id → request (for status lookup)
+        self._threads: list[threading.Thread] = []
+        self._local     = threading.local()
+        self._stats     = {'submitted': 0, 'deduplicated': 0, 'completed': 0,
+                           'errors': 0, 'cancelled': 0}
+
+    # ── Public API ─────────────────────────────────────────────────────────────
+
+    def submit(self, prompt: str, priority: int = PRIORITY_ROUTE,
+               on_chunk=None) -> AIRequest:
+        """
+        Queue a prompt. Returns the existing request if the same prompt is in flight.
+        on_chunk(text, partial) — optional; requests a streamed answer.
+        """
+        priority = min(max(priority, 0), _LANES - 1)
+        with self._cond:
+            self._ensure_started()
+            self._prune()
+            self._stats['submitted'] += 1
+
+            existing = self._inflight.get(prompt)
+            if existing is not None:
+                self._stats['deduplicated'] += 1
+                existing.waiters += 1
+                if on_chunk is not None:
+                    existing._chunk_listeners.append(on_chunk)
+                if existing.state == 'queued' and priority < existing.priority:
+                    self._lanes[existing.priority].remove(existing)
+                    existing.priority = priority
+                    self._lanes[priority].append(existing)
+                return existing
+
+            req = AIRequest(prompt, priority)
+            if on_chunk is not None:
+                req._chunk_listeners.append(on_chunk)
+            self._inflight[prompt] = req
+            self._requests[req.id] = req
+            self._lanes[priority].append(req)
+            self._cond.notify_all()
+            return req
+
+    def ask(self, prompt: str, priority: int = PRIORITY_ROUTE,
+            timeout: float = AI_TIMEOUT, on_chunk=None) -> dict:
+        """
+        Blocking convenience wrapper. Returns {'response': str, 'source': str};
+        on timeout this caller gets an error result, and the request is
+        cancelled if no other caller is still waiting on it.
+        """
+        req = self.submit(prompt, priority, on_chunk)
+        result = req.wait(timeout + 5)
+        if not req.done:
+            log.warning('AI request %s timed out after %.0fs', req.id, timeout)
+            self._give_up(req)
+        return result
+
+    def get(self, request_id: str) -> AIRequest | None:
+        with self._cond:
+            return self._requests.get(request_id)
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a request. Queued → removed; running → result discarded."""
+        with self._cond:
+            req = self._requests.get(request_id)
+            if req is None or req.done:
+                return False
+            if req.state == 'queued':
+                self._lanes[req.priority].remove(req)
+            self._inflight.pop(req.prompt, None)
+            self._stats['cancelled'] += 1
+            req._finish('cancelled', None)
+            return True
+
+    def _give_up(self, req: AIRequest) -> bool:
+        """One waiter stops waiting. Cancels the request once none are left."""
+        with self._cond:
+            req.waiters -= 1
+            if req.waiters > 0:
+                return False
+            return self.cancel(req.id)
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                'workers': self._workers,
+                'queued':  [len(lane) for lane in self._lanes],
+                'running': sum(1 for r in self._inflight.values() if r.state == 'running'),
+                **self._stats,
+            }
+
+    # ── Workers ────────────────────────────────────────────────────────────────
+
+    def _ensure_started(self):
+        """Start worker threads on first use. Caller holds the condition lock."""
+        if self._threads:
+            return
+        for i in range(self._workers):
+            self._spawn(f'ai-broker-{i}', max_priority=_LANES - 1)
+        self._spawn('ai-broker-anchor', max_priority=PRIORITY_ANCHOR)
+        log.info('AIBroker started (%d workers + 1 reserved for anchor)', self._workers)
+
+    def _spawn(self, name: str, max_priority: int):
+        t = threading.Thread(target=self._worker, args=(max_priority,),
+                             daemon=True, name=name)
+        self._threads.append(t)
+        t.start()
+
+    def _next(self, max_priority: int) -> AIRequest:
+        """Block until a request in lanes 0..max_priority is available."""
+        with self._cond:
+            while True:
+                for lane in self._lanes[:max_priority + 1]:
+                    if lane:
+                        req = lane.popleft()
+                        req.state = 'running'
+                        return req
+                self._cond.wait()
+
+    def _worker(self, max_priority: int):
+        while True:
+            req = self._next(max_priority)
+            try:
+                if req._chunk_listeners:
+                    result = self._post_stream(req)
+                else:
+                    result = self._post(req.prompt)
+                state = 'done' if result.get('response') else 'error'
+            except Exception as exc:
+                log.warning('AI proxy call failed: %s', exc)
+                result, state = dict(_ERROR_RESULT), 'error'
+
+            with self._cond:
+                if self._inflight.get(req.prompt) is req:
+                    del self._inflight[req.prompt]
+                if req.state == 'cancelled':
+                    continue
+                self._stats['completed' if state == 'done' else 'errors'] += 1
+                req._finish(state, result)
+
+    def _session(self) -> requests.Session:
+        """Per-worker keep-alive session to the Gemini proxy."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _post(self, prompt: str) -> dict:
+        resp = self._session().post(
+            f'{self._proxy_url}/ask',
+            json={'message': prompt},
+            timeout=AI_TIMEOUT,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def _post_stream(self, req: AIRequest) -> dict:
+        """
+        POST to /ask/stream and relay each chunk to the request's listeners.
+        A stream that ends in an error event yields an error result.
+        """
+        event, result = None, dict(_ERROR_RESULT)
+        with self._session().post(
+            f'{self._proxy_url}/ask/stream',
+            json={'message': req.prompt},
+            timeout=AI_TIMEOUT,
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines(decode_unicode=True):
+                if line.startswith('event:'):
+                    event = line[6:].strip()
+                    continue
+                if not line.startswith('data:'):
+                    continue
+                data = json.loads(line[5:].strip())
+                if event == 'chunk':
+                    text = data.get('text', '')
+                    req.partial += text
+                    for fn in list(req._chunk_listeners):
+                        try:
+                            fn(text, req.partial)
+                        except Exception as exc:
+                            log.debug('AI chunk listener error: %s', exc)
+                elif event == 'done':
+                    result = {'response': req.partial,
+                              'source':   data.get('source', 'unknown'),
+                              'tokens':   data.get('tokens', 0)}
+                elif event == 'error':
+                    log.warning('AI stream error: %s', data.get('error'))
+        return result
+
+    def _prune(self):
+        """Forget finished requests older than _FINISHED_KEEP_S. Caller holds the lock."""
+        now = time.monotonic()
+        stale = [rid for rid, r in self._requests.items()
+                 if r.finished is not None and now - r.finished > _FINISHED_KEEP_S]
+        for rid in stale:
+            del self._requests[rid]
+
+
+def throttled_relay(emit, interval: float = _RELAY_INTERVAL_S):
+    """
+    Build an on_chunk callback that calls emit(partial) at most once per
+    interval — partial text for SSE without flooding the dashboard on
+    token-by-token Ollama streams. The final full answer is broadcast by the
+    caller as before.
+    """
+    last = [0.0]
+
+    def on_chunk(text: str, partial: str):
+        now = time.monotonic()
+        if now - last[0] >= interval:
+            last[0] = now
+            emit(partial)
+
+    return on_chunk
+
+
+# Shared instance — used by every feature and the Node-RED query webhook
+broker = AIBroker()
+
+
+def ask(prompt: str, priority: int = PRIORITY_ROUTE, on_chunk=None) -> dict:
+    """Module-level shortcut for broker.ask()."""
+    return broker.ask(prompt, priority, on_chunk=on_chunk)
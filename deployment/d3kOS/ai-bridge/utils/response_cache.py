@@ -0,0 +1,154 @@
+"""
+d3kOS AI Bridge — persistent AI response cache
+
+Situation-keyed cache for AI passage briefs and port arrival briefings, so an
+unchanged situation is answered from disk instead of spending Gemini tokens
+or Ollama GPU time.
+
+Keys are semantic, not prompt text: each feature passes a namespace plus the
+facts that actually change the answer (route, waypoint, quantized position /
+SOG / COG, destination). The parts are hashed — the cache stores only the
+key hash, the response text and its source.
+
+Storage: SQLite (stdlib) at AI_CACHE_DB, one table, TTL checked on read,
+least-recently-used entries evicted above AI_CACHE_MAX entries.
+If the database cannot be opened the cache is disabled and every lookup misses.
+
+Environment:
+  AI_CACHE_DB=/home/d3kos/cache/ai-bridge-responses.db
+  AI_CACHE_MAX=500
+"""
+
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+AI_CACHE_DB  = os.environ.get('AI_CACHE_DB', '/home/d3kos/cache/ai-bridge-responses.db')
+AI_CACHE_MAX = int(os.environ.get('AI_CACHE_MAX', 500))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    namespace  TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    source     TEXT NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+"""
+
+
+def quantize(value: float | None, step: float) -> float | None:
+    """Round value to the nearest multiple of step (None stays None)."""
+    if value is None:
+        return None
+    return round(round(value / step) * step, 6)
+
+
+def make_key(namespace: str, parts: dict) -> str:
+    """Stable hash of namespace + key parts."""
+    blob = json.dumps([namespace, parts], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed TTL + LRU cache. Thread-safe; connection opened lazily."""
+
+    def __init__(self, path: str = AI_CACHE_DB, max_entries: int = AI_CACHE_MAX):
+        self._path = path
+        self._max = max_entries
+        self._conn = None
+        self._disabled = False
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _db(self) -> sqlite3.Connection | None:
+        """Open (once) and return the connection. Caller holds the lock."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        except (OSError, sqlite3.Error) as exc:
+            log.warning('AI response cache disabled (%s): %s', self._path, exc)
+            self._disabled = True
+        return self._conn
+
+    def get(self, namespace: str, parts: dict, ttl_s: float) -> dict | None:
+        """Cached {'response', 'source', 'age_s'} or None on miss/expiry."""
+        key = make_key(namespace, parts)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            if db is None:
+                self._misses += 1
+                return None
+            try:
+                row = db.execute(
+                    'SELECT response, source, created FROM responses WHERE key = ?',
+                    (key,),
+                ).fetchone()
+                if row is None or now - row[2] > ttl_s:
+                    self._misses += 1
+                    return None
+                db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+                db.commit()
+            except sqlite3.Error as exc:
+                log.warning('AI response cache read failed: %s', exc)
+                self._misses += 1
+                return None
+            self._hits += 1
+        return {'response': row[0], 'source': row[1], 'age_s': round(now - row[2])}
+
+    def put(self, namespace: str, parts: dict, response: str, source: str):
+        """Store a response and evict least-recently-used entries above the cap."""
+        if not response:
+            return
+        key = make_key(namespace, parts)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    'INSERT OR REPLACE INTO responses '
+                    '(key, namespace, response, source, created, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, namespace, response, source, now, now),
+                )
+                db.execute(
+                    'DELETE FROM responses WHERE key IN ('
+                    '  SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self._max,),
+                )
+                db.commit()
+            except sqlite3.Error as exc:
+                log.warning('AI response cache write failed: %s', exc)
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._conn          # don't open the database just to report on it
+            entries = 0
+            if db is not None:
+                try:
+                    entries = db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {'entries': entries, 'max_entries': self._max,
+                    'hits': self._hits, 'misses': self._misses,
+                    'enabled': not self._disabled}
+
+
+# Shared instance — used by route_analyzer and port_arrival
+cache = ResponseCache()
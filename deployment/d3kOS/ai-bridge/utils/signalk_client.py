@@ -1,7 +1,11 @@
 """
-d3kOS AI Bridge — Signal K client (REST polling, no WebSocket dependency)
+d3kOS AI Bridge — Signal K client
 
-Uses Signal K REST API at http://localhost:8099/signalk/v1/api/vessels/self/
+Reads are served from the delta-stream state cache (signalk_stream.py) while
+it is live. When it is not (websocket-client missing, Signal K restarting),
+or the path is missing from the cache or older than its _STREAM_MAX_AGE
+(a sensor that stopped sending), the getter falls back to the Signal K REST API at
+http://localhost:8099/signalk/v1/api/vessels/self/
 Confirmed key paths from live Pi probe (2026-03-13):
   navigation.position.latitude   / longitude
   navigation.speedOverGround     (m/s)
@@ -12,18 +16,50 @@ import os
 import logging
 import requests
 
+from utils.signalk_stream import stream
+
 log = logging.getLogger(__name__)
 
 _SK_BASE = 'http://localhost:8099/signalk/v1/api/vessels/self'
 _TIMEOUT = 5  # seconds
 
-
-def _get(path: str) -> dict | None:
+# Oldest stream value served per dotted path (seconds); older goes to REST.
+# Paths not listed are served at any age — config-like values (anchor radius)
+# are only sent when they change.
+_STREAM_MAX_AGE = {
+    'navigation.position':               5.0,
+    'navigation.speedOverGround':        5.0,
+    'navigation.courseOverGroundTrue':   5.0,
+    'navigation.headingMagnetic':        5.0,
+    'environment.depth.belowTransducer': 5.0,
+    'propulsion.0.coolantTemperature':   10.0,
+    'propulsion.0.oilPressure':          10.0,
+}
+
+
+def _get(path: str, view: dict | None = None, rest: bool = True) -> dict | None:
     """
-    GET a Signal K path under /vessels/self.
+    Read a Signal K path under /vessels/self.
     path: e.g. 'navigation/position'
+    view: optional consistent snapshot from stream.view(_STREAM_MAX_AGE) —
+          used by get_navigation_snapshot() so all fields come from the same
+          instant. A path missing from it (never sent, or stale) goes to REST.
+    rest: False serves the stream cache only and never blocks — for callers
+          on the stream thread (add_listener callbacks).
     Returns the Signal K value envelope dict or None on failure.
     """
+    key = path.replace('/', '.')
+    if view is not None:
+        if view.get(key) is not None:
+            return {'value': view[key]}
+    elif stream.is_live():
+        value = stream.get(key, max_age=_STREAM_MAX_AGE.get(key))
+        if value is not None:
+            return {'value': value}
+    # not live, or missing / stale in the stream — ask REST
+    if not rest:
+        return None
+
     url = f'{_SK_BASE}/{path}'
     try:
         resp = requests.get(url, timeout=_TIMEOUT)
@@ -41,24 +77,24 @@ def _extract_value(envelope: dict | None):
     return envelope.get('value')
 
 
-def get_position() -> dict | None:
+def get_position(view: dict | None = None, rest: bool = True) -> dict | None:
     """
     Returns {'latitude': float, 'longitude': float} or None.
     Confirmed live path: navigation/position
     """
-    data = _get('navigation/position')
+    data = _get('navigation/position', view, rest)
     val = _extract_value(data)
     if isinstance(val, dict) and 'latitude' in val:
         return {'latitude': float(val['latitude']), 'longitude': float(val['longitude'])}
     return None
 
 
-def get_sog() -> float | None:
+def get_sog(view: dict | None = None) -> float | None:
     """
     Speed over ground in m/s. Convert to knots with geo.ms_to_knots().
     Confirmed live path: navigation/speedOverGround
     """
-    data = _get('navigation/speedOverGround')
+    data = _get('navigation/speedOverGround', view)
     val = _extract_value(data)
     try:
         return float(val) if val is not None else None
@@ -66,12 +102,12 @@ def get_sog() -> float | None:
         return None
 
 
-def get_cog() -> float | None:
+def get_cog(view: dict | None = None) -> float | None:
     """
     Course over ground in radians. Convert to degrees with geo.rad_to_deg().
     Confirmed live path: navigation/courseOverGroundTrue
     """
-    data = _get('navigation/courseOverGroundTrue')
+    data = _get('navigation/courseOverGroundTrue', view)
     val = _extract_value(data)
     try:
         return float(val) if val is not None else None
@@ -79,9 +115,9 @@ def get_cog() -> float | None:
         return None
 
 
-def get_heading_magnetic() -> float | None:
+def get_heading_magnetic(view: dict | None = None) -> float | None:
     """Magnetic heading in radians. May not be present on all setups."""
-    data = _get('navigation/headingMagnetic')
+    data = _get('navigation/headingMagnetic', view)
     val = _extract_value(data)
     try:
         return float(val) if val is not None else None
@@ -89,7 +125,7 @@ def get_heading_magnetic() -> float | None:
         return None
 
 
-def get_anchor_data() -> dict:
+def get_anchor_data(view: dict | None = None, rest: bool = True) -> dict:
     """
     Returns anchor watch state from Signal K:
       max_radius_m:     float or None  (metres — set by skipper)
@@ -98,6 +134,7 @@ def get_anchor_data() -> dict:
       anchor_lon:       float or None
 
     All values None if anchor watch is not active.
+    rest=False reads the stream cache only (see _get).
     """
     result = {
         'max_radius_m':     None,
@@ -106,13 +143,13 @@ def get_anchor_data() -> dict:
         'anchor_lon':       None,
     }
 
-    max_r = _get('navigation/anchor/maxRadius')
+    max_r = _get('navigation/anchor/maxRadius', view, rest)
     result['max_radius_m'] = _safe_float(_extract_value(max_r))
 
-    cur_r = _get('navigation/anchor/currentRadius')
+    cur_r = _get('navigation/anchor/currentRadius', view, rest)
     result['current_radius_m'] = _safe_float(_extract_value(cur_r))
 
-    pos = _get('navigation/anchor/position')
+    pos = _get('navigation/anchor/position', view, rest)
     pos_val = _extract_value(pos)
     if isinstance(pos_val, dict):
         result['anchor_lat'] = _safe_float(pos_val.get('latitude'))
@@ -121,7 +158,7 @@ def get_anchor_data() -> dict:
     return result
 
 
-def get_engine_data() -> dict:
+def get_engine_data(view: dict | None = None) -> dict:
     """
     Returns engine data. Keys may be absent if NMEA 2000 engine not connected.
       run_time_s:          seconds (int) or None
@@ -134,13 +171,13 @@ def get_engine_data() -> dict:
         'oil_pressure_pa': None,
     }
 
-    rt = _get('propulsion/0/runTime')
+    rt = _get('propulsion/0/runTime', view)
     result['run_time_s'] = _safe_float(_extract_value(rt))
 
-    ct = _get('propulsion/0/coolantTemperature')
+    ct = _get('propulsion/0/coolantTemperature', view)
     result['coolant_temp_k'] = _safe_float(_extract_value(ct))
 
-    op = _get('propulsion/0/oilPressure')
+    op = _get('propulsion/0/oilPressure', view)
     result['oil_pressure_pa'] = _safe_float(_extract_value(op))
 
     return result
@@ -148,17 +185,21 @@ def get_engine_data() -> dict:
 
 def get_navigation_snapshot() -> dict:
     """
-    Fetch all navigation fields in parallel (separate REST calls).
-    Returns a consolidated dict — used by features that need the full picture.
+    Fetch all navigation fields as one consolidated dict — used by features
+    that need the full picture. From the stream cache this is a single
+    in-memory copy; the REST fallback makes separate calls per field, and
+    also fills in any field missing from the copy or older than its
+    _STREAM_MAX_AGE.
 
     Keys (all may be None):
       lat, lon, sog_ms, cog_rad,
       anchor_max_radius_m, anchor_current_radius_m, anchor_lat, anchor_lon
     """
-    pos     = get_position()
-    sog     = get_sog()
-    cog     = get_cog()
-    anchor  = get_anchor_data()
+    view    = stream.view(_STREAM_MAX_AGE)
+    pos     = get_position(view)
+    sog     = get_sog(view)
+    cog     = get_cog(view)
+    anchor  = get_anchor_data(view)
 
     return {
         'lat':                    pos['latitude']  if pos else None,
@@ -173,7 +214,9 @@ def get_navigation_snapshot() -> dict:
 
 
 def is_reachable() -> bool:
-    """Quick connectivity check — returns True if Signal K REST API responds."""
+    """Quick connectivity check — True if the delta stream is live or REST responds."""
+    if stream.is_live():
+        return True
     try:
         resp = requests.get('http://localhost:8099/signalk', timeout=3)
         return resp.status_code == 200
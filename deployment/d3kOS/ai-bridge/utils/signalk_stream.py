@@ -0,0 +1,229 @@
+"""
+d3kOS AI Bridge — Signal K delta-stream state cache
+
+One background subscriber to the Signal K WebSocket delta stream keeps an
+in-process, timestamped copy of every vessels.self path. signalk_client.py
+serves reads from this store while the stream is live and falls back to
+REST polling when it is not (websocket-client missing, Signal K down).
+
+Stream URL: ws://localhost:8099/signalk/v1/stream?subscribe=self
+Signal K sends cached values for all self paths on connect, so once the
+first delta has arrived the store is authoritative — a missing path means
+Signal K has no value for it, exactly as the REST API would report.
+
+Environment:
+  SIGNALK_WS_URL=ws://localhost:8099/signalk/v1/stream?subscribe=self
+"""
+
+import os
+import json
+import logging
+import threading
+import time
+
+try:
+    import websocket  # websocket-client
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+SIGNALK_WS_URL = os.environ.get(
+    'SIGNALK_WS_URL', 'ws://localhost:8099/signalk/v1/stream?subscribe=self'
+)
+
+_RECV_TIMEOUT   = 5    # seconds — lets the thread notice stop() promptly
+_BACKOFF_MIN    = 1    # seconds between reconnect attempts
+_BACKOFF_MAX    = 30
+
+
+class SignalKStream:
+    """
+    Background WebSocket subscriber + vessel state store.
+
+    Values are keyed by dotted Signal K path ('navigation.position') and
+    stored as (value, monotonic receive time). All reads take the lock, so
+    view() gives every feature a consistent snapshot across paths.
+    """
+
+    def __init__(self, url: str = SIGNALK_WS_URL):
+        self._url = url
+        self._lock = threading.Lock()
+        self._values: dict[str, tuple] = {}
+        self._self_context = None
+        self._live = False
+        self._deltas = 0
+        self._last_delta = None
+        self._listeners: list[tuple] = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────────
+
+    def start(self) -> bool:
+        """Start the subscriber thread. Returns False if websocket-client is missing."""
+        if not WEBSOCKET_AVAILABLE:
+            log.warning('websocket-client not installed — Signal K REST polling only')
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name='signalk-stream'
+        )
+        self._thread.start()
+        log.info('SignalKStream started (%s)', self._url)
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        self._set_live(False)
+
+    def is_live(self) -> bool:
+        """True once connected and at least one delta has been applied."""
+        return self._live
+
+    # ── Reads ──────────────────────────────────────────────────────────────────
+
+    def get(self, path: str, max_age: float | None = None):
+        """
+        Value for a dotted Signal K path, or None if absent (or older than
+        max_age seconds when given).
+        """
+        with self._lock:
+            entry = self._values.get(path)
+        if entry is None:
+            return None
+        value, received = entry
+        if max_age is not None and time.monotonic() - received > max_age:
+            return None
+        return value
+
+    def age(self, path: str) -> float | None:
+        """Seconds since path was last updated, or None if never seen."""
+        with self._lock:
+            entry = self._values.get(path)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def view(self, max_age: dict | None = None) -> dict | None:
+        """
+        Consistent copy of all current values {path: value}, taken under one
+        lock. Returns None when the stream is not live — callers fall back to REST.
+        max_age: optional {path: seconds}; a listed path older than that is
+        left out of the copy, as if the stream had never sent it.
+        """
+        if not self._live:
+            return None
+        max_age = max_age or {}
+        now = time.monotonic()
+        with self._lock:
+            return {path: value for path, (value, received) in self._values.items()
+                    if path not in max_age or now - received <= max_age[path]}
+
+    def status(self) -> dict:
+        """Stream health for /status."""
+        age = None
+        if self._last_delta is not None:
+            age = round(time.monotonic() - self._last_delta, 1)
+        return {
+            'available':      WEBSOCKET_AVAILABLE,
+            'live':           self._live,
+            'paths':          len(self._values),
+            'deltas':         self._deltas,
+            'last_delta_age_s': age,
+        }
+
+    def add_listener(self, paths, fn):
+        """
+        Call fn(changed_paths: set) after every delta that touches any of paths.
+        Runs on the stream thread — keep it short and never block on I/O.
+        """
+        self._listeners.append((frozenset(paths), fn))
+
+    # ── Delta handling ─────────────────────────────────────────────────────────
+
+    def apply_message(self, raw: str | bytes):
+        """Parse one WebSocket text frame and apply it to the store."""
+        try:
+            msg = json.loads(raw)
+        except (TypeError, ValueError):
+            log.debug('Signal K stream: non-JSON frame ignored')
+            return
+        if not isinstance(msg, dict):
+            return
+
+        # Hello message — remember our own context so foreign deltas are ignored
+        if 'self' in msg and 'updates' not in msg:
+            self._self_context = msg.get('self')
+            return
+
+        self.apply_delta(msg)
+
+    def apply_delta(self, delta: dict):
+        """
+        Apply a Signal K delta:
+          {'context': 'vessels.urn:...', 'updates': [{'values': [{'path', 'value'}]}]}
+        Deltas for other vessels (AIS targets) are ignored.
+        """
+        context = delta.get('context')
+        if (context and self._self_context and context != self._self_context
+                and context != 'vessels.self'):
+            return
+
+        now = time.monotonic()
+        changed = set()
+        with self._lock:
+            for update in delta.get('updates') or []:
+                for item in update.get('values') or []:
+                    path = item.get('path')
+                    if not path:
+                        continue
+                    self._values[path] = (item.get('value'), now)
+                    changed.add(path)
+            self._deltas += 1
+            self._last_delta = now
+        self._set_live(True)
+
+        for paths, fn in self._listeners:
+            if changed & paths:
+                try:
+                    fn(changed)
+                except Exception as exc:
+                    log.error('Signal K stream listener error: %s', exc)
+
+    # ── Internals ──────────────────────────────────────────────────────────────
+
+    def _set_live(self, live: bool):
+        if live != self._live:
+            log.info('Signal K stream %s', 'live' if live else 'down — REST fallback')
+        self._live = live
+
+    def _run(self):
+        backoff = _BACKOFF_MIN
+        while not self._stop_event.is_set():
+            ws = None
+            try:
+                ws = websocket.create_connection(self._url, timeout=_RECV_TIMEOUT)
+                backoff = _BACKOFF_MIN
+                while not self._stop_event.is_set():
+                    try:
+                        self.apply_message(ws.recv())
+                    except websocket.WebSocketTimeoutException:
+                        continue
+            except Exception as exc:
+                log.debug('Signal K stream error: %s', exc)
+            finally:
+                self._set_live(False)
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, _BACKOFF_MAX)
+
+
+# Shared instance — started once by ai_bridge, read by signalk_client
+stream = SignalKStream()
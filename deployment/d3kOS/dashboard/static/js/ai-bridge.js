@@ -92,6 +92,13 @@ function _handleRouteUpdate(d) {
       stateEl.className   = 'ai-state dim';
       break;
 
+    case 'STREAMING':
+      // Partial brief as the AI writes it — replaced by the ACTIVE update
+      stateEl.textContent = 'Analyzing...';
+      stateEl.className   = 'ai-state dim';
+      textEl.textContent  = d.text || '';
+      break;
+
     case 'NO_GPS':
       stateEl.textContent = 'Waiting for GPS';
       stateEl.className   = 'ai-state dim';
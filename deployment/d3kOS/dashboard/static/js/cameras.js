@@ -1,21 +1,47 @@
 /**
  * cameras.js — d3kOS v0.9.2.2 Session 3
  * Cameras tab: loads slot list from :8084, renders forward-watch primary view
- * + display_in_grid 2×2 grid. Polls /camera/frame/<slot_id> at 500ms.
+ * + display_in_grid 2×2 grid. Each view is one MJPEG stream
+ * (/camera/stream/<slot_id>); falls back to polling /camera/frame/<slot_id>
+ * at 500ms if the stream cannot be opened.
  */
 
 const CAM_API   = 'http://localhost:8084';
-const CAM_FPS   = 500;   // ms between frame refreshes
+const CAM_FPS   = 500;   // ms between frame refreshes (polling fallback)
+const CAM_STREAM_FPS_PRIMARY = 15;
+const CAM_STREAM_FPS_GRID    = 5;
+const CAM_SIZE_PRIMARY = 'full';   // JPEG size tier served by :8084
+const CAM_SIZE_GRID    = 'grid';
 
 let _camIntervals = [];
+let _camStreams   = [];   // <img> elements holding an open MJPEG connection
 
 /**
- * Stop all running camera frame refresh intervals.
+ * Stop all running camera frame refresh intervals and close MJPEG streams.
  * Called by closeSplit() and before each loadCameras() run.
  */
 function clearCamIntervals() {
   _camIntervals.forEach(id => clearInterval(id));
   _camIntervals = [];
+  _camStreams.forEach(img => { img.onerror = null; img.src = ''; });
+  _camStreams = [];
+}
+
+/**
+ * Show a slot in an <img> as a live MJPEG stream. If the stream fails
+ * (older camera service, proxy buffering) fall back to frame polling.
+ */
+function _startCamStream(imgEl, slotId, fps, size) {
+  imgEl.onerror = () => {
+    imgEl.onerror = null;
+    _camStreams = _camStreams.filter(img => img !== imgEl);
+    imgEl.src = _frameUrl(slotId, size);
+    _camIntervals.push(setInterval(() => {
+      imgEl.src = _frameUrl(slotId, size);
+    }, CAM_FPS));
+  };
+  imgEl.src = CAM_API + '/camera/stream/' + slotId + '?fps=' + fps + '&size=' + size;
+  _camStreams.push(imgEl);
 }
 
 /**
@@ -66,10 +92,7 @@ async function loadCameras() {
     const imgEl = document.getElementById('cam-primary-img');
     if (imgEl) {
       if (fwSlot.assigned) {
-        imgEl.src = _frameUrl(fwSlot.slot_id);
-        _camIntervals.push(setInterval(() => {
-          imgEl.src = _frameUrl(fwSlot.slot_id);
-        }, CAM_FPS));
+        _startCamStream(imgEl, fwSlot.slot_id, CAM_STREAM_FPS_PRIMARY, CAM_SIZE_PRIMARY);
       } else {
         _setImgPlaceholder(imgEl, fwSlot.label + ' — No camera assigned');
       }
@@ -90,10 +113,7 @@ async function loadCameras() {
       const img = document.createElement('img');
       img.style.cssText = 'width:100%;height:100%;object-fit:cover;display:block;';
       img.alt = slot.label;
-      img.src = _frameUrl(slot.slot_id);
-      _camIntervals.push(setInterval(() => {
-        img.src = _frameUrl(slot.slot_id);
-      }, CAM_FPS));
+      _startCamStream(img, slot.slot_id, CAM_STREAM_FPS_GRID, CAM_SIZE_GRID);
       cell.appendChild(img);
     } else {
       const ph = document.createElement('div');
@@ -124,8 +144,8 @@ async function loadCameras() {
   }
 }
 
-function _frameUrl(slotId) {
-  return CAM_API + '/camera/frame/' + slotId + '?t=' + Date.now();
+function _frameUrl(slotId, size) {
+  return CAM_API + '/camera/frame/' + slotId + '?size=' + (size || 'full') + '&t=' + Date.now();
 }
 
 function _setImgPlaceholder(imgEl, text) {
@@ -4,16 +4,43 @@ Routes marine queries to:
   1. Gemini API (https://generativelanguage.googleapis.com) — when online
   2. Ollama (http://192.168.1.36:11434)                    — offline fallback
 
+Endpoints:
+  POST /ask          full answer as JSON
+  POST /ask/stream   same routing, answer streamed as Server-Sent Events
+                     (event: chunk → {text}, event: done → {source, tokens},
+                      event: error → {error}) — first words arrive sub-second
+
+Connectivity:
+  A background monitor probes the internet (captive.apple.com) and Ollama on
+  a timer and keeps a circuit breaker per upstream (internet, gemini, ollama).
+  Request routing is an in-memory lookup — no probe on the request path.
+  A failed call or probe opens its breaker; it is retried after an
+  exponential backoff (CONNECTIVITY_BACKOFF_MIN..MAX seconds), and a single
+  successful trial closes it again.
+
+Response store:
+  Answers are kept in SQLite (RESPONSE_DB, WAL mode) keyed by a SHA-256 of
+  the normalised question, so a repeated question is answered locally in
+  milliseconds. Caching is opt-in per request: only a body with
+  "cache": true is looked up or stored, so time-sensitive questions (weather,
+  "is the fuel dock open") are never answered from an old entry. Callers
+  should opt in only for questions whose answer does not change. Entries
+  expire after RESPONSE_CACHE_TTL seconds; above RESPONSE_CACHE_MAX entries
+  the least recently used are evicted. Hit/miss counts are in /status.
+
 Privacy rules:
-  - Never store user query text
-  - Cache stores: timestamp, source, token count, response text only
-  - Cache max: 10 entries (CACHE_MAX)
+  - Never store user query text — only its hash
+  - Store holds: prompt hash, timestamps, source, token count, response text
 """
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response
 import requests
 import os
 import json
+import logging
 import time
+import hashlib
+import sqlite3
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -22,6 +49,13 @@ load_dotenv(Path(__file__).parent / 'config' / 'gemini.env')
 # (override=False so gemini.env takes precedence if both have the key)
 load_dotenv(Path(__file__).parent.parent / 'dashboard' / 'config' / 'api-keys.env', override=False)
 
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+)
+log = logging.getLogger('gemini_proxy')
+
 app = Flask(__name__)
 
 
@@ -39,8 +73,14 @@ OLLAMA_MODEL   = os.getenv('OLLAMA_MODEL',   'qwen3-coder:30b')
 VESSEL_NAME    = os.getenv('VESSEL_NAME',    'Your Vessel')
 HOME_PORT      = os.getenv('HOME_PORT',      'Home Port')
 
-CACHE_FILE = Path(__file__).parent / 'cache' / 'response_cache.json'
-CACHE_MAX  = 10
+RESPONSE_DB        = Path(os.getenv('RESPONSE_DB', Path(__file__).parent / 'cache' / 'responses.db'))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 6 * 3600))
+RESPONSE_CACHE_MAX = int(os.getenv('RESPONSE_CACHE_MAX', 500))
+
+CONNECTIVITY_INTERVAL    = int(os.getenv('CONNECTIVITY_INTERVAL',    30))   # probe period while healthy
+CONNECTIVITY_FAILURES    = int(os.getenv('CONNECTIVITY_FAILURES',    2))    # failures that open a breaker
+CONNECTIVITY_BACKOFF_MIN = int(os.getenv('CONNECTIVITY_BACKOFF_MIN', 5))
+CONNECTIVITY_BACKOFF_MAX = int(os.getenv('CONNECTIVITY_BACKOFF_MAX', 300))
 
 SYSTEM_PROMPT = (
     f"You are the AI assistant for a vessel named {VESSEL_NAME}, "
@@ -60,19 +100,133 @@ SYSTEM_PROMPT = (
 )
 
 
-def load_cache() -> list:
-    try:
-        if CACHE_FILE.exists():
-            return json.loads(CACHE_FILE.read_text())
-    except Exception:
-        pass
-    return []
+def prompt_key(user_message: str) -> str:
+    """SHA-256 of the normalised question (case and whitespace folded). The text itself is never stored."""
+    normalised = ' '.join(user_message.lower().split())
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+
+class ResponseStore:
+    """
+    On-disk answer cache: SQLite, WAL journal, primary-key lookup by prompt
+    hash, TTL on read, LRU eviction above max_entries. One connection shared
+    under a lock (Flask serves requests on threads). If the database cannot
+    be opened the store is disabled and every lookup misses.
+    """
 
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key        TEXT PRIMARY KEY,
+        source     TEXT NOT NULL,
+        tokens     INTEGER NOT NULL,
+        response   TEXT NOT NULL,
+        created    REAL NOT NULL,
+        last_used  REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+    """
 
-def save_cache(entries: list) -> None:
-    """Persist last CACHE_MAX entries — never store query text."""
-    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    CACHE_FILE.write_text(json.dumps(entries[-CACHE_MAX:], indent=2))
+    def __init__(self, path: Path = RESPONSE_DB, ttl_s: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX):
+        self.path        = Path(path)
+        self.ttl_s       = ttl_s
+        self.max_entries = max_entries
+        self._conn       = None
+        self._disabled   = False
+        self._lock       = threading.Lock()
+        self.hits        = 0
+        self.misses      = 0
+
+    def _db(self):
+        """Open (once) and return the connection. Caller holds the lock."""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+        except (OSError, sqlite3.Error) as exc:
+            log.warning('Response store disabled (%s): %s', self.path, exc)
+            self._disabled = True
+        return self._conn
+
+    def get(self, user_message: str) -> dict | None:
+        """Cached {text, tokens, source, age_s} for this question, or None."""
+        key = prompt_key(user_message)
+        now = time.time()
+        with self._lock:
+            db  = self._db()
+            row = None
+            if db is not None:
+                try:
+                    row = db.execute(
+                        'SELECT source, tokens, response, created FROM responses WHERE key = ?',
+                        (key,),
+                    ).fetchone()
+                    if row is not None and now - row[3] > self.ttl_s:
+                        db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                        row = None
+                    elif row is not None:
+                        db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+                    db.commit()
+                except sqlite3.Error as exc:
+                    log.warning('Response store read failed: %s', exc)
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {'source': row[0], 'tokens': row[1], 'text': row[2], 'age_s': round(now - row[3])}
+
+    def put(self, user_message: str, result: dict) -> None:
+        """Store an answer under the question's hash and evict beyond max_entries."""
+        if not result.get('text'):
+            return
+        key = prompt_key(user_message)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return
+            try:
+                db.execute(
+                    'INSERT OR REPLACE INTO responses '
+                    '(key, source, tokens, response, created, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, result['source'], result.get('tokens', 0), result['text'], now, now),
+                )
+                db.execute(
+                    'DELETE FROM responses WHERE key IN ('
+                    '  SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                )
+                db.commit()
+            except sqlite3.Error as exc:
+                log.warning('Response store write failed: %s', exc)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = 0
+            if self._conn is not None:
+                try:
+                    entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                'entries':     entries,
+                'max_entries': self.max_entries,
+                'ttl_s':       self.ttl_s,
+                'hits':        self.hits,
+                'misses':      self.misses,
+                'hit_rate':    round(self.hits / lookups, 3) if lookups else None,
+                'enabled':     not self._disabled,
+            }
+
+
+store = ResponseStore()
 
 
 def check_internet() -> bool:
@@ -93,6 +247,144 @@ def check_ollama() -> bool:
         return False
 
 
+class CircuitBreaker:
+    """
+    Health of one upstream service.
+      closed     healthy — requests allowed
+      open       failing — requests skipped until retry_at
+      half_open  backoff elapsed — one trial request (or probe) allowed
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CONNECTIVITY_FAILURES,
+                 backoff_min: float = CONNECTIVITY_BACKOFF_MIN,
+                 backoff_max: float = CONNECTIVITY_BACKOFF_MAX):
+        self.name              = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff_min       = backoff_min
+        self.backoff_max       = backoff_max
+        self.state     = 'closed'
+        self.failures  = 0        # consecutive
+        self.retry_at  = 0.0      # monotonic time the open breaker may be retried
+        self.last_change = time.monotonic()
+        self._lock     = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        True if a request may be sent now. An expired open breaker admits one
+        trial; a trial that never reports back is given up after backoff_max.
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if now >= self.retry_at:
+                self.retry_at = now + self.backoff_max
+                self._set('half_open')
+                return True
+            return False
+
+    def is_up(self) -> bool:
+        """Read-only view for /status — no trial is consumed."""
+        return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._set('closed')
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                extra   = max(0, self.failures - self.failure_threshold)
+                backoff = min(self.backoff_min * (2 ** extra), self.backoff_max)
+                self.retry_at = time.monotonic() + backoff
+                self._set('open')
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker may be retried (0 when closed)."""
+        if self.state == 'closed':
+            return 0.0
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def status(self) -> dict:
+        return {
+            'state':      self.state,
+            'failures':   self.failures,
+            'retry_in_s': round(self.retry_in(), 1),
+            'since_s':    round(time.monotonic() - self.last_change, 1),
+        }
+
+    def _set(self, state: str):
+        if state != self.state:
+            log.info('Connectivity %s: %s -> %s', self.name, self.state, state)
+            self.state = state
+            self.last_change = time.monotonic()
+
+
+class ConnectivityMonitor:
+    """
+    Background prober for internet and Ollama. Gemini has no free probe, so
+    its breaker is driven by real request outcomes and gated on the internet
+    breaker. Probes run every CONNECTIVITY_INTERVAL while healthy and on the
+    breaker's backoff schedule while failing.
+    """
+
+    def __init__(self, interval: float = CONNECTIVITY_INTERVAL):
+        self.interval = interval
+        self.internet = CircuitBreaker('internet')
+        self.gemini   = CircuitBreaker('gemini')
+        self.ollama   = CircuitBreaker('ollama')
+        self._next_probe = {'internet': 0.0, 'ollama': 0.0}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='connectivity')
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def gemini_available(self) -> bool:
+        return bool(GEMINI_API_KEY) and self.internet.is_up() and self.gemini.allow()
+
+    def ollama_available(self) -> bool:
+        return self.ollama.allow()
+
+    def probe_due(self, now: float | None = None):
+        """Run every probe whose time has come. Called by the monitor thread."""
+        now = time.monotonic() if now is None else now
+        for name, probe in (('internet', check_internet), ('ollama', check_ollama)):
+            if now < self._next_probe[name]:
+                continue
+            breaker = getattr(self, name)
+            if probe():
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            wait = breaker.retry_in() if breaker.state == 'open' else self.interval
+            self._next_probe[name] = time.monotonic() + max(wait, 1.0)
+
+    def status(self) -> dict:
+        return {name: getattr(self, name).status()
+                for name in ('internet', 'gemini', 'ollama')}
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.probe_due()
+            except Exception as exc:
+                log.error('Connectivity probe error: %s', exc)
+            self._stop_event.wait(1.0)
+
+
+monitor = ConnectivityMonitor()
+
+
 def query_gemini(user_message: str) -> dict:
     """
     Send query to Gemini API.
@@ -142,6 +434,72 @@ def query_ollama(user_message: str) -> dict:
     return {'text': text, 'tokens': tokens, 'source': 'ollama'}
 
 
+def stream_gemini(user_message: str, meta: dict):
+    """
+    Stream a Gemini answer chunk by chunk.
+    Endpoint: .../models/{model}:streamGenerateContent?alt=sse
+    Yields text chunks; fills meta['tokens'] from the final usageMetadata.
+    """
+    url = (
+        f'https://generativelanguage.googleapis.com/v1beta/models/'
+        f'{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}'
+    )
+    payload = {
+        'contents': [{'parts': [{'text': user_message}]}],
+        'systemInstruction': {'parts': [{'text': SYSTEM_PROMPT}]},
+        'generationConfig': {'maxOutputTokens': 800},
+    }
+    with requests.post(url, json=payload, timeout=20, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = json.loads(line[5:].strip())
+            meta['tokens'] = data.get('usageMetadata', {}).get('totalTokenCount', meta.get('tokens', 0))
+            for cand in data.get('candidates', [])[:1]:
+                for part in cand.get('content', {}).get('parts', []):
+                    if part.get('text'):
+                        yield part['text']
+
+
+def stream_ollama(user_message: str, meta: dict):
+    """
+    Stream an Ollama answer chunk by chunk via /api/chat with stream: true
+    (newline-delimited JSON). Yields text chunks; fills meta['tokens'] from the
+    final message.
+    """
+    url = f'{OLLAMA_URL}/api/chat'
+    payload = {
+        'model':  OLLAMA_MODEL,
+        'stream': True,
+        'messages': [
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user',   'content': user_message},
+        ],
+    }
+    with requests.post(url, json=payload, timeout=120, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            data = json.loads(line)
+            text = data.get('message', {}).get('content', '')
+            if text:
+                yield text
+            if data.get('done'):
+                meta['tokens'] = data.get('prompt_eval_count', 0) + data.get('eval_count', 0)
+                break
+
+
+def _sse(event: str, data: dict) -> str:
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def _use_cache(body: dict) -> bool:
+    """Response store is opt-in — see module docstring."""
+    return body.get('cache') is True
+
+
 @app.route('/')
 def chat_ui():
     return render_template('chat.html', vessel=VESSEL_NAME, model=GEMINI_MODEL)
@@ -149,13 +507,15 @@ def chat_ui():
 
 @app.route('/status')
 def status():
-    """Health check endpoint — polled by dashboard connectivity-check.js."""
+    """Health check endpoint — polled by dashboard connectivity-check.js. Served from the monitor."""
     return jsonify({
-        'online':     check_internet(),
-        'ollama':     check_ollama(),
+        'online':     monitor.internet.is_up(),
+        'ollama':     monitor.ollama.is_up(),
         'gemini_key': bool(GEMINI_API_KEY),
         'model':      GEMINI_MODEL,
         'ollama_model': OLLAMA_MODEL,
+        'connectivity': monitor.status(),
+        'cache':      store.stats(),
     })
 
 
@@ -163,8 +523,8 @@ def status():
 def ask():
     """
     Handle a marine query.
-    Routing: Gemini (online + key) → Ollama (LAN fallback) → 503
-    Privacy: NEVER log or cache query text (CLAUDE.md hard rule).
+    Routing: response store → Gemini (online + key) → Ollama (LAN fallback) → 503
+    Privacy: NEVER log or cache query text (CLAUDE.md hard rule) — the store keys on its hash.
     """
     body = request.get_json()
     if not body or 'message' not in body:
@@ -174,21 +534,37 @@ def ask():
     if not user_message:
         return jsonify({'error': 'Empty message'}), 400
 
+    use_cache = _use_cache(body)
+    if use_cache:
+        hit = store.get(user_message)
+        if hit is not None:
+            return jsonify({
+                'response': hit['text'],
+                'source':   hit['source'],
+                'tokens':   hit['tokens'],
+                'cached':   True,
+                'age_s':    hit['age_s'],
+            })
+
     result = None
     error  = None
 
-    # Route 1: Gemini (online + key present)
-    if check_internet() and GEMINI_API_KEY:
+    # Route 1: Gemini (online + key present + breaker closed)
+    if monitor.gemini_available():
         try:
             result = query_gemini(user_message)
+            monitor.gemini.record_success()
         except Exception as e:
+            monitor.gemini.record_failure()
             error = f'Gemini error: {e}'
 
     # Route 2: Ollama fallback
-    if result is None and check_ollama():
+    if result is None and monitor.ollama_available():
         try:
             result = query_ollama(user_message)
+            monitor.ollama.record_success()
         except Exception as e:
+            monitor.ollama.record_failure()
             error = f'Ollama error: {e}'
 
     if result is None:
@@ -197,22 +573,84 @@ def ask():
             'detail': error,
         }), 503
 
-    # Cache: response text + metadata ONLY — never query text
-    cache = load_cache()
-    cache.append({
-        'timestamp': int(time.time()),
-        'source':    result['source'],
-        'tokens':    result['tokens'],
-        'response':  result['text'],
-    })
-    save_cache(cache)
+    if use_cache:
+        store.put(user_message, result)
 
     return jsonify({
         'response': result['text'],
         'source':   result['source'],
         'tokens':   result['tokens'],
+        'cached':   False,
     })
 
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """
+    Streaming variant of /ask — same routing, same privacy rules.
+    A backend that fails before its first chunk falls through to the next;
+    a failure mid-answer ends the stream with an error event.
+    """
+    body = request.get_json()
+    if not body or 'message' not in body:
+        return jsonify({'error': 'No message provided'}), 400
+
+    user_message = body['message'].strip()
+    if not user_message:
+        return jsonify({'error': 'Empty message'}), 400
+
+    use_cache = _use_cache(body)
+    hit = store.get(user_message) if use_cache else None
+
+    backends = [
+        ('gemini', stream_gemini, monitor.gemini_available, monitor.gemini),
+        ('ollama', stream_ollama, monitor.ollama_available, monitor.ollama),
+    ]
+
+    def generate():
+        if hit is not None:
+            yield _sse('chunk', {'text': hit['text']})
+            yield _sse('done', {'source': hit['source'], 'tokens': hit['tokens'], 'cached': True})
+            return
+
+        error = None
+        for source, streamer, available, breaker in backends:
+            if not available():
+                continue
+            meta   = {'tokens': 0}
+            chunks = []
+            try:
+                for text in streamer(user_message, meta):
+                    chunks.append(text)
+                    yield _sse('chunk', {'text': text})
+            except Exception as e:
+                breaker.record_failure()
+                error = f'{source.capitalize()} error: {e}'
+                if chunks:
+                    yield _sse('error', {'error': error})
+                    return
+                continue
+            breaker.record_success()
+            if not chunks:
+                continue
+            if use_cache:
+                result = {'text': ''.join(chunks), 'source': source, 'tokens': meta['tokens']}
+                store.put(user_message, result)
+            yield _sse('done', {'source': source, 'tokens': meta['tokens']})
+            return
+
+        yield _sse('error', {
+            'error':  'No AI service available. Check internet or Ollama at 192.168.1.36:11434.',
+            'detail': error,
+        })
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 if __name__ == '__main__':
+    monitor.start()
     app.run(host='0.0.0.0', port=3001, debug=False)
@@ -11,6 +11,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import gemini_proxy as gp
 
 
+@pytest.fixture(autouse=True)
+def fresh_monitor(monkeypatch):
+    """Each test starts with all breakers closed and no background probing."""
+    monkeypatch.setattr(gp, 'monitor', gp.ConnectivityMonitor())
+    return gp.monitor
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch, tmp_path):
+    """Each test gets an empty response store in its own temp directory."""
+    monkeypatch.setattr(gp, 'store', gp.ResponseStore(tmp_path / 'responses.db'))
+    return gp.store
+
+
 @pytest.fixture
 def client():
     gp.app.config['TESTING'] = True
@@ -48,51 +62,91 @@ def test_ask_no_body(client):
     assert res.status_code in (400, 415)
 
 
-def test_cache_load_empty():
-    """Cache load on non-existent file returns empty list."""
-    import tempfile
-    gp.CACHE_FILE = Path(tempfile.mktemp(suffix='.json'))
-    result = gp.load_cache()
-    assert result == []
+def test_store_miss_then_hit():
+    """A stored answer is returned for the same question; metrics count both."""
+    store = gp.store
+    assert store.get('Where is the fuel dock?') is None
+    store.put('Where is the fuel dock?', {'text': 'North pier.', 'source': 'gemini', 'tokens': 12})
+    hit = store.get('Where is the fuel dock?')
+    assert hit['text'] == 'North pier.' and hit['source'] == 'gemini' and hit['tokens'] == 12
+    stats = store.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['entries'] == 1
 
 
-def test_cache_save_and_load(tmp_path):
-    """Cache round-trip: save then load returns identical data."""
-    gp.CACHE_FILE = tmp_path / 'test_cache.json'
-    entries = [{'timestamp': 1, 'source': 'test', 'tokens': 10, 'response': 'ok'}]
-    gp.save_cache(entries)
-    loaded = gp.load_cache()
-    assert loaded == entries
+def test_store_key_normalises_case_and_whitespace():
+    """Trivial rephrasing (case, spacing) hits the same entry."""
+    gp.store.put('Tide at  Kingston?', {'text': 'High 14:10', 'source': 'ollama', 'tokens': 4})
+    assert gp.store.get('tide at kingston?')['text'] == 'High 14:10'
 
 
-def test_cache_max_enforced(tmp_path):
-    """Cache never exceeds CACHE_MAX (10) entries."""
-    gp.CACHE_FILE = tmp_path / 'cache.json'
-    entries = [
-        {'timestamp': i, 'source': 'test', 'tokens': i, 'response': f'r{i}'}
-        for i in range(20)
-    ]
-    gp.save_cache(entries)
-    loaded = gp.load_cache()
-    assert len(loaded) <= gp.CACHE_MAX
+def test_store_ttl_expires(tmp_path):
+    """Entries older than the TTL miss and are removed."""
+    store = gp.ResponseStore(tmp_path / 'ttl.db', ttl_s=-1)
+    store.put('q', {'text': 'a', 'source': 'gemini', 'tokens': 1})
+    assert store.get('q') is None
+    assert store.stats()['entries'] == 0
+
+
+def test_store_max_enforced(tmp_path):
+    """Store never exceeds max_entries; least recently used goes first."""
+    store = gp.ResponseStore(tmp_path / 'max.db', max_entries=3)
+    for i in range(3):
+        store.put(f'q{i}', {'text': f'r{i}', 'source': 'test', 'tokens': i})
+    store.get('q0')                       # q0 is now most recently used
+    store.put('q3', {'text': 'r3', 'source': 'test', 'tokens': 3})
+    assert store.stats()['entries'] == 3
+    assert store.get('q0') is not None
+    assert store.get('q1') is None
+
+
+def test_store_contains_no_query_text(tmp_path):
+    """The database must never contain the question text (privacy rule)."""
+    import sqlite3
+    store = gp.ResponseStore(tmp_path / 'priv.db')
+    store.put('Secret anchorage near Main Duck?', {'text': 'Port info here.', 'source': 'gemini', 'tokens': 50})
+    conn = sqlite3.connect(str(tmp_path / 'priv.db'))
+    rows = conn.execute('SELECT * FROM responses').fetchall()
+    assert rows and all('Secret anchorage' not in str(v) for row in rows for v in row)
+    columns = [c[1] for c in conn.execute('PRAGMA table_info(responses)')]
+    assert 'query' not in columns and 'message' not in columns
+
+
+def test_store_uses_wal_and_creates_parent_dir(tmp_path):
+    """Store creates its directory and runs in WAL mode."""
+    store = gp.ResponseStore(tmp_path / 'new_subdir' / 'r.db')
+    store.put('q', {'text': 'a', 'source': 'ollama', 'tokens': 1})
+    assert (tmp_path / 'new_subdir' / 'r.db').exists()
+    assert store._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
 
 
-def test_cache_contains_no_query_text(tmp_path):
-    """Cache entries must not contain a 'query' or 'message' field (privacy rule)."""
-    gp.CACHE_FILE = tmp_path / 'cache.json'
-    entry = {'timestamp': 1, 'source': 'gemini', 'tokens': 50, 'response': 'Port info here.'}
-    gp.save_cache([entry])
-    loaded = gp.load_cache()
-    for item in loaded:
-        assert 'query'   not in item, "Query text must never be stored in cache"
-        assert 'message' not in item, "User message must never be stored in cache"
+def test_ask_served_from_store(client, monkeypatch):
+    """A repeated opted-in question is answered from the store without calling an AI."""
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+    calls = []
 
+    def fake_gemini(msg):
+        calls.append(msg)
+        return {'text': 'Channel 16.', 'tokens': 9, 'source': 'gemini'}
+    monkeypatch.setattr(gp, 'query_gemini', fake_gemini)
 
-def test_cache_creates_parent_dir(tmp_path):
-    """Cache save creates parent directory if it does not exist."""
-    gp.CACHE_FILE = tmp_path / 'new_subdir' / 'cache.json'
-    gp.save_cache([{'timestamp': 1, 'source': 'ollama', 'tokens': 5, 'response': 'ok'}])
-    assert gp.CACHE_FILE.exists()
+    first  = client.post('/ask', json={'message': 'Distress channel?', 'cache': True}).get_json()
+    second = client.post('/ask', json={'message': 'Distress channel?', 'cache': True}).get_json()
+    assert first['cached'] is False and second['cached'] is True
+    assert second['response'] == 'Channel 16.' and second['source'] == 'gemini'
+    assert len(calls) == 1
+    client.post('/ask', json={'message': 'Distress channel?'})
+    assert len(calls) == 2
+
+
+def test_ask_not_cached_by_default(client, monkeypatch, fresh_store):
+    """Without "cache": true an answer is neither served from nor written to the store."""
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(gp, 'query_gemini',
+                        lambda msg: {'text': 'Gale warning.', 'tokens': 5, 'source': 'gemini'})
+    res = client.post('/ask', json={'message': 'Weather now?'}).get_json()
+    assert res['cached'] is False
+    assert fresh_store.get('Weather now?') is None
+    assert fresh_store.stats()['entries'] == 0
 
 
 def test_chat_ui_loads(client):
@@ -100,3 +154,135 @@ def test_chat_ui_loads(client):
     res = client.get('/')
     assert res.status_code == 200
     assert b'<!DOCTYPE html' in res.data or b'html' in res.data.lower()
+
+
+def _sse_events(data: bytes) -> list:
+    """Parse an SSE body into [(event, data_dict), ...]."""
+    import json
+    events = []
+    for block in data.decode().strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_ask_stream_empty_message(client):
+    """Streaming endpoint validates input like /ask."""
+    res = client.post('/ask/stream', json={'message': ''})
+    assert res.status_code == 400
+
+
+def test_ask_stream_relays_gemini_chunks(client, monkeypatch):
+    """Chunks are relayed in order, then a done event with source and tokens."""
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+
+    def fake_stream(msg, meta):
+        meta['tokens'] = 42
+        yield 'Channel 16 '
+        yield 'is distress.'
+    monkeypatch.setattr(gp, 'stream_gemini', fake_stream)
+
+    res = client.post('/ask/stream', json={'message': 'VHF 16?', 'cache': True})
+    assert res.status_code == 200
+    assert 'text/event-stream' in res.content_type
+    events = _sse_events(res.data)
+    assert events == [
+        ('chunk', {'text': 'Channel 16 '}),
+        ('chunk', {'text': 'is distress.'}),
+        ('done',  {'source': 'gemini', 'tokens': 42}),
+    ]
+    assert gp.store.get('VHF 16?')['text'] == 'Channel 16 is distress.'
+
+    again = _sse_events(client.post('/ask/stream', json={'message': 'VHF 16?', 'cache': True}).data)
+    assert again[0] == ('chunk', {'text': 'Channel 16 is distress.'})
+    assert again[-1] == ('done', {'source': 'gemini', 'tokens': 42, 'cached': True})
+
+
+def test_ask_stream_falls_back_to_ollama_before_first_chunk(client, monkeypatch):
+    """Gemini failing before any text falls through to Ollama."""
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+
+    def broken(msg, meta):
+        raise ConnectionError('offline')
+        yield  # pragma: no cover
+    monkeypatch.setattr(gp, 'stream_gemini', broken)
+    monkeypatch.setattr(gp, 'stream_ollama', lambda msg, meta: iter(['Local answer']))
+
+    events = _sse_events(client.post('/ask/stream', json={'message': 'Tides?'}).data)
+    assert events[0] == ('chunk', {'text': 'Local answer'})
+    assert events[-1][0] == 'done' and events[-1][1]['source'] == 'ollama'
+
+
+def test_ask_stream_no_backend_sends_error_event(client, monkeypatch, fresh_monitor):
+    """No reachable AI ends the stream with a single error event."""
+    monkeypatch.setattr(gp, 'check_internet', lambda: False)
+    monkeypatch.setattr(gp, 'check_ollama', lambda: False)
+    fresh_monitor.probe_due()
+    fresh_monitor.probe_due(now=float('inf'))   # second failure opens the breakers
+    events = _sse_events(client.post('/ask/stream', json={'message': 'Tides?'}).data)
+    assert [e for e, _ in events] == ['error']
+
+
+def test_breaker_opens_after_threshold_and_backs_off():
+    """Consecutive failures open the breaker; backoff doubles per extra failure."""
+    b = gp.CircuitBreaker('test', failure_threshold=2, backoff_min=5, backoff_max=300)
+    b.record_failure()
+    assert b.state == 'closed' and b.allow()
+    b.record_failure()
+    assert b.state == 'open' and not b.allow()
+    assert 4 < b.retry_in() <= 5
+    b.retry_at = 0                      # backoff elapsed
+    assert b.allow() and b.state == 'half_open'
+    assert not b.allow()                # only one trial in flight
+    b.record_failure()
+    assert b.state == 'open' and 9 < b.retry_in() <= 10
+    b.retry_at = 0
+    assert b.allow()
+    b.record_success()
+    assert b.state == 'closed' and b.failures == 0
+
+
+def test_ask_routes_without_probing(client, monkeypatch):
+    """/ask never calls a connectivity probe on the request path."""
+    def no_probe():
+        raise AssertionError('probe on request path')
+    monkeypatch.setattr(gp, 'check_internet', no_probe)
+    monkeypatch.setattr(gp, 'check_ollama', no_probe)
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(gp, 'query_gemini',
+                        lambda msg: {'text': 'Aye', 'tokens': 3, 'source': 'gemini'})
+    res = client.post('/ask', json={'message': 'Tides?'})
+    assert res.status_code == 200
+    assert res.get_json()['source'] == 'gemini'
+
+
+def test_ask_skips_open_gemini_breaker(client, monkeypatch, fresh_monitor):
+    """After Gemini fails twice, the next request goes straight to Ollama."""
+    monkeypatch.setattr(gp, 'GEMINI_API_KEY', 'test-key')
+    calls = []
+
+    def broken(msg):
+        calls.append('gemini')
+        raise ConnectionError('offline')
+    monkeypatch.setattr(gp, 'query_gemini', broken)
+    monkeypatch.setattr(gp, 'query_ollama',
+                        lambda msg: {'text': 'Local', 'tokens': 1, 'source': 'ollama'})
+
+    for _ in range(3):
+        res = client.post('/ask', json={'message': 'Tides?', 'cache': False})
+        assert res.get_json()['source'] == 'ollama'
+    assert calls == ['gemini', 'gemini']
+    assert fresh_monitor.gemini.state == 'open'
+
+
+def test_status_served_from_monitor(client, monkeypatch, fresh_monitor):
+    """/status reports cached breaker state instead of probing."""
+    monkeypatch.setattr(gp, 'check_internet', lambda: False)
+    monkeypatch.setattr(gp, 'check_ollama', lambda: True)
+    fresh_monitor.probe_due()
+    fresh_monitor.probe_due(now=float('inf'))
+    monkeypatch.setattr(gp, 'check_internet', lambda: 1 / 0)
+    data = client.get('/status').get_json()
+    assert data['online'] is False
+    assert data['ollama'] is True
+    assert data['connectivity']['internet']['state'] == 'open'
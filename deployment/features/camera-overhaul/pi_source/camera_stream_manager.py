@@ -15,17 +15,54 @@ Core model:
 Frame buffer: one background RTSP decoder per hardware entry.
 Any number of /camera/frame/<slot_id> requests read from the buffer —
 zero additional RTSP decode load per browser client.
+The buffer holds the raw decoded frame; JPEG is encoded only when a client
+asks, once per frame per size tier (?size=full|grid|thumb), and shared by
+every client of that tier. A camera nobody has read for CONSUMER_IDLE_S
+is idle: whatever the backend, it is reopened through FfmpegCapture with
+keyframe-only decode on its sub stream (cv2.VideoCapture cannot skip
+decoding — its grab() decodes every frame) and keeps one frame every
+IDLE_DECODE_S. If ffmpeg will not open, an opencv camera stays on
+cv2.VideoCapture and drains idle frames with grab().
+Decode backend (CAMERA_DECODE_BACKEND): 'opencv' (cv2.VideoCapture, default)
+or 'ffmpeg' (frame_decoder.FfmpegCapture — ffmpeg subprocess, newest-frame-wins
+pipe reader) for cameras in use. The ffmpeg backend also selects the stream
+per camera: the main stream for forward_watch / fish_detection slots, the
+sub stream for everything else.
+Frame bus: each camera assigned to a fish_detection slot also publishes its
+raw frames into a shared-memory ring (frame_bus.py) that fish_detector maps
+directly — no JPEG encode/HTTP/decode per inference. The detector's
+heartbeat in the ring counts as a consumer for idle detection.
+MJPEG streams (/camera/stream/...) wait on the buffer's condition variable,
+so each client receives a frame the moment the grabber produces it over one
+long-lived multipart/x-mixed-replace connection.
+Pre-roll (opt-in, CAMERA_CLIP_PREROLL_S > 0): each camera assigned to a
+forward_watch or fish_detection slot keeps its last CAMERA_CLIP_PREROLL_S
+seconds of compressed main-stream video in memory (preroll.py — ffmpeg stream
+copy, no decode). Each buffer costs one more ffmpeg process and one more RTSP
+session on the camera (Reolink cameras allow only a few), plus bitrate ×
+seconds of RAM — ~8 MB for 16 s of a 4 Mbit/s main stream — so it is off by
+default. POST /camera/clips saves a clip from pre_s before an event (fish
+detection, anchor alarm, MOB) to post_s after it, by stream copy. Manual
+recording is an open-ended clip from the same buffer — or from a buffer run
+only for the recording when pre-roll is off — replacing the VLC instance
+that re-encoded the stream to H.264 at 8 Mbps.
 
 New endpoints:
   GET    /camera/slots                  — all slots + resolved hardware status
   GET    /camera/hardware               — all discovered hardware
   POST   /camera/slots                  — create a new slot
-  PATCH  /camera/slots/<slot_id>        — update label, display_order, or roles
+  PATCH  /camera/slots/<slot_id>        — update label, display_order, roles, or motion_sensitivity
   POST   /camera/slots/<slot_id>/assign — assign hardware_id to slot
   POST   /camera/slots/<slot_id>/unassign — remove hardware assignment
   DELETE /camera/slots/<slot_id>        — delete slot (hardware returned to pool)
   POST   /camera/scan                   — trigger network discovery scan
-  GET    /camera/frame/<slot_id>        — single frame by slot
+  GET    /camera/frame/<slot_id>        — single frame by slot (?size=full|grid|thumb)
+  GET    /camera/stream/<slot_id>       — MJPEG stream by slot (?fps=N caps the rate, ?size=)
+  GET    /camera/stream/hw/<hardware_id> — MJPEG stream by hardware (setup wizard)
+  POST   /camera/clips                  — clip around an event {slot_id|'all', event, pre_s, post_s}
+  GET    /camera/clips                  — recent clips + pre-roll buffer status
+  GET    /camera/clips/<clip_id>        — clip status (recording | remuxing | done | failed)
+  GET    /camera/clips/<clip_id>/file   — the finished .mp4
 
 Backwards-compatible endpoints (unchanged callers):
   GET  /camera/status       — active camera status (returns forward_watch slot)
@@ -46,14 +83,19 @@ import time
 import os
 import json
 from datetime import datetime, timezone
-from threading import Thread, Lock
-from typing import Optional
+from functools import lru_cache
+from threading import Thread, Lock, Condition
+from typing import Callable, Optional
 import io
+from collections import OrderedDict
 
 import cv2
 import numpy as np
-import vlc
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, jsonify, send_file, request, Response
+
+from frame_decoder import FfmpegCapture
+from frame_bus import FrameRing, FrameIndex, segment_name
+from preroll import PrerollBuffer, Clip
 
 app = Flask(__name__)
 
@@ -75,18 +117,53 @@ SCAN_END     = 200
 SCAN_PORT    = 554
 SCAN_TIMEOUT = 0.3  # seconds per IP
 
+# MJPEG streaming
+MJPEG_BOUNDARY = 'd3kosframe'
+MJPEG_MAX_FPS  = 15    # per-client ceiling; ?fps= may lower it
+MJPEG_IDLE_S   = 5.0   # resend last frame / placeholder this often when no new frame arrives
+
+# JPEG size tiers — (max width px, 0 = native; JPEG quality)
+FRAME_TIERS = {
+    'full':  (0,   85),   # forward watch, capture, fish detector
+    'grid':  (640, 75),   # dashboard grid cells
+    'thumb': (320, 60),   # setup wizard / small previews
+}
+CONSUMER_IDLE_S = 10.0   # no reader for this long → camera is idle
+IDLE_DECODE_S   = 5.0    # idle cameras decode one frame this often
+
+# Decode backend
+DECODE_BACKEND = os.getenv('CAMERA_DECODE_BACKEND', 'opencv')   # opencv | ffmpeg
+
+# Shared-memory frame bus for fish_detector
+FRAME_BUS = os.getenv('CAMERA_FRAME_BUS', '1') == '1'
+
+# fish_detector motion gate, per slot (slots.json 'motion_sensitivity')
+MOTION_SENSITIVITIES = ('high', 'medium', 'low', 'off')
+
+# Pre-roll buffers and event clips
+CLIP_PREROLL_S  = float(os.getenv('CAMERA_CLIP_PREROLL_S', '0'))    # e.g. 15; 0 = no buffers (see docstring for cost)
+CLIP_PRE_S      = float(os.getenv('CAMERA_CLIP_PRE_S', '10'))       # default seconds before the event
+CLIP_POST_S     = float(os.getenv('CAMERA_CLIP_POST_S', '10'))      # default seconds after it
+CLIP_MAX_POST_S = 300
+CLIPS_KEPT      = 100   # clip statuses remembered for GET /camera/clips
+
 # ── Global state ───────────────────────────────────────────────────────────────
 
 slots    = {}   # slot_id    → slot dict
 hardware = {}   # hardware_id → hw dict
-hw_state = {}   # hardware_id → {'cap', 'frame', 'lock', 'connected', 'thread'}
+hw_state = {}   # hardware_id → {'cap', 'url', 'frame', 'jpeg', 'seq', 'lock', 'cond',
+                #                'clients', 'last_read', 'bus', 'connected', 'thread'}
+frame_index = None   # FrameIndex — slot_id → ring name, read by fish_detector
 
 config_lock = Lock()  # serialises writes to slots.json / hardware.json
 
+preroll = {}            # hardware_id → PrerollBuffer
+clips   = OrderedDict() # clip_id → Clip, newest last
+clip_lock = Lock()      # guards preroll and clips (Flask threads, save_slots)
+
 # Recording state (always applies to forward_watch slot)
-recording_instance = None
-recording_player   = None
-recording_active   = False
+recording_clip   = None   # open-ended Clip while recording
+recording_active = False
 
 
 # ── Data layer ─────────────────────────────────────────────────────────────────
@@ -114,6 +191,8 @@ def save_slots() -> None:
     with config_lock:
         with open(SLOTS_CONFIG, 'w') as f:
             json.dump(list(slots.values()), f, indent=2)
+    update_frame_bus()   # assignments / fish_detection roles may have changed
+    update_preroll()
 
 
 def save_hardware() -> None:
@@ -155,7 +234,18 @@ def _clear_exclusive_role(role: str, except_slot_id: str) -> None:
 
 # ── Frame buffer ───────────────────────────────────────────────────────────────
 
-def _open_cap(rtsp_url: str) -> Optional[cv2.VideoCapture]:
+def _open_cap(rtsp_url: str, keyframes_only: bool = False):
+    """Open a stream with the configured decode backend. None if it won't open.
+    keyframes_only (idle camera) always uses FfmpegCapture; with the opencv
+    backend a cv2.VideoCapture is opened instead if ffmpeg won't start.
+    """
+    if DECODE_BACKEND == 'ffmpeg' or keyframes_only:
+        cap = FfmpegCapture(rtsp_url, keyframes_only=keyframes_only)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        if DECODE_BACKEND == 'ffmpeg':
+            return None
     cap = cv2.VideoCapture(rtsp_url)
     if cap.isOpened():
         return cap
@@ -163,42 +253,188 @@ def _open_cap(rtsp_url: str) -> Optional[cv2.VideoCapture]:
     return None
 
 
+def _wants_main_stream(hardware_id: str) -> bool:
+    """Forward watch and fish detection need full resolution; grid tiles don't."""
+    slot  = slots.get(hardware.get(hardware_id, {}).get('assigned_to_slot') or '')
+    roles = (slot or {}).get('roles', {})
+    return bool(roles.get('forward_watch') or roles.get('fish_detection'))
+
+
+def _stream_url(hardware_id: str, idle: bool = False) -> str:
+    """RTSP URL to decode for one hardware entry.
+    opencv backend, in use: the configured rtsp_url, unchanged.
+    ffmpeg backend: rtsp_url_main / rtsp_url_sub if configured, else the
+    Reolink h264Preview_NN_main / _sub path derived from rtsp_url.
+    Idle (either backend): the sub stream, chosen the same way.
+    """
+    hw  = hardware.get(hardware_id, {})
+    url = hw.get('rtsp_url', '')
+    if (DECODE_BACKEND != 'ffmpeg' and not idle) or not url:
+        return url
+    main = _wants_main_stream(hardware_id) and not idle
+    explicit = hw.get('rtsp_url_main' if main else 'rtsp_url_sub')
+    if explicit:
+        return explicit
+    return re.sub(r'_(main|sub)$', '_main' if main else '_sub', url)
+
+
+def _reopen_cap(hardware_id: str, state: dict, keyframes_only: bool = False) -> None:
+    """Release the current stream (if any) and open the one this camera should decode."""
+    cap = state['cap']
+    if cap is not None:
+        try:
+            cap.release()
+        except Exception:
+            pass
+    state['url']  = _stream_url(hardware_id, keyframes_only)
+    state['idle'] = keyframes_only
+    state['cap']  = _open_cap(state['url'], keyframes_only)
+
+
+def _needs_reopen(hardware_id: str, state: dict, idle: bool) -> bool:
+    """Idle state or stream choice no longer matches the open capture."""
+    return state['idle'] != idle or state['url'] != _stream_url(hardware_id, idle)
+
+
+def _decoder_status(state: dict) -> dict:
+    cap = state.get('cap')
+    url = state.get('url', '')
+    return {
+        'backend':        getattr(cap, 'backend', 'opencv') if cap else DECODE_BACKEND,
+        'stream':         'main' if url.endswith('_main') else 'sub' if url.endswith('_sub') else None,
+        'keyframes_only': getattr(cap, 'keyframes_only', False),
+        'dropped_frames': getattr(cap, 'dropped', 0),
+    }
+
+
+def _is_idle(state: dict) -> bool:
+    """True when no stream is open, no frame was read for CONSUMER_IDLE_S
+    and no frame bus reader (fish_detector) is active."""
+    if state['clients'] or time.monotonic() - state['last_read'] <= CONSUMER_IDLE_S:
+        return False
+    bus = state['bus']
+    return not (bus is not None and bus.reader_active(CONSUMER_IDLE_S))
+
+
+def _publish_to_bus(hardware_id: str, state: dict, frame: np.ndarray) -> None:
+    bus = state['bus']
+    if bus is None:
+        return
+    try:
+        bus.publish(frame)
+    except (OSError, ValueError) as e:
+        print(f'⚠ Frame bus disabled for {hardware_id}: {e}', flush=True)
+        state['bus'] = None
+        bus.close()
+
+
+def update_frame_bus() -> None:
+    """Give every camera assigned to a fish_detection slot a shared-memory ring,
+    remove rings from the others, and republish the slot → ring index."""
+    global frame_index
+    if not FRAME_BUS:
+        return
+    wanted = {
+        sid: slot['hardware_id'] for sid, slot in slots.items()
+        if slot.get('assigned') and slot.get('hardware_id') in hw_state
+        and slot.get('roles', {}).get('fish_detection')
+    }
+    for hw_id, state in hw_state.items():
+        if hw_id in wanted.values():
+            if state['bus'] is None:
+                state['bus'] = FrameRing(segment_name(hw_id))
+        elif state['bus'] is not None:
+            ring, state['bus'] = state['bus'], None
+            ring.close()
+    try:
+        if frame_index is None:
+            frame_index = FrameIndex()
+        frame_index.write({sid: segment_name(hw_id) for sid, hw_id in wanted.items()})
+    except OSError as e:
+        print(f'⚠ Frame bus index unavailable: {e}', flush=True)
+
+
+def _clip_stream_url(hardware_id: str) -> str:
+    """Main stream for clips: rtsp_url_main if configured, else the Reolink
+    h264Preview_NN_main path derived from rtsp_url."""
+    hw  = hardware.get(hardware_id, {})
+    url = hw.get('rtsp_url', '')
+    return hw.get('rtsp_url_main') or re.sub(r'_sub$', '_main', url)
+
+
+def update_preroll() -> None:
+    """Give each camera of a forward_watch / fish_detection slot a pre-roll
+    buffer, stop the others'. Nothing when CLIP_PREROLL_S is 0."""
+    if CLIP_PREROLL_S <= 0:
+        return
+    wanted = {slot['hardware_id'] for slot in slots.values()
+              if slot.get('assigned') and slot.get('hardware_id') in hardware
+              and _wants_main_stream(slot['hardware_id'])}
+    with clip_lock:
+        for hw_id in wanted:
+            url = _clip_stream_url(hw_id)
+            buf = preroll.get(hw_id)
+            if buf is not None and buf.url != url:
+                preroll.pop(hw_id).stop()
+                buf = None
+            if buf is None and url:
+                preroll[hw_id] = PrerollBuffer(url, CLIP_PREROLL_S, name=hw_id)
+                print(f'✓ Pre-roll buffer: {hw_id} ({CLIP_PREROLL_S:g}s)')
+        for hw_id in set(preroll) - wanted:
+            preroll.pop(hw_id).stop()
+
+
 def _frame_grabber_thread(hardware_id: str) -> None:
-    """Decode RTSP for one hardware entry continuously, write JPEG to hw_state.
+    """Decode RTSP for one hardware entry continuously, write the raw frame to hw_state.
     One thread per hardware entry — never per browser client.
+    The stream is reopened when the camera turns idle or busy (keyframe-only
+    FfmpegCapture on the sub stream while idle) and, with the ffmpeg backend,
+    when its role changes main/sub. While idle, frames are pulled with grab()
+    to keep the pipe drained and one per IDLE_DECODE_S is retrieved so the
+    buffer is never stale when a client arrives.
     """
     state = hw_state[hardware_id]
     reconnect_delay = 10
     last_attempt = 0.0
+    last_decode = 0.0
 
     while True:
         cap = state['cap']
         if cap and cap.isOpened():
-            ret, frame = cap.read()
+            now  = time.monotonic()
+            idle = _is_idle(state)
+            if _needs_reopen(hardware_id, state, idle):
+                _reopen_cap(hardware_id, state, keyframes_only=idle)
+                last_attempt = time.time()
+                continue
+            if idle and now - last_decode < IDLE_DECODE_S:
+                ret, frame = cap.grab(), None
+            else:
+                ret, frame = cap.read()
+                last_decode = now
             if ret and frame is not None:
-                _, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                with state['lock']:
-                    state['frame']     = jpeg.tobytes()
+                with state['cond']:
+                    state['frame']     = frame
+                    state['jpeg']      = {}          # encodings are per frame
+                    state['seq']      += 1
                     state['connected'] = True
+                    state['cond'].notify_all()   # wake MJPEG stream clients
+                _publish_to_bus(hardware_id, state, frame)
+            elif ret:
+                state['connected'] = True
             else:
                 state['connected'] = False
                 now = time.time()
                 if now - last_attempt > reconnect_delay:
                     last_attempt = now
-                    try:
-                        cap.release()
-                    except Exception:
-                        pass
-                    hw = hardware.get(hardware_id, {})
-                    state['cap'] = _open_cap(hw.get('rtsp_url', ''))
+                    _reopen_cap(hardware_id, state, keyframes_only=_is_idle(state))
             time.sleep(0.033)   # ~30 fps decode loop
         else:
             state['connected'] = False
             now = time.time()
             if now - last_attempt > reconnect_delay:
                 last_attempt = now
-                hw = hardware.get(hardware_id, {})
-                state['cap'] = _open_cap(hw.get('rtsp_url', ''))
+                _reopen_cap(hardware_id, state, keyframes_only=_is_idle(state))
             time.sleep(2)
 
 
@@ -210,13 +446,23 @@ def start_grabber(hardware_id: str) -> None:
     if hardware_id in hw_state:
         return  # already running
 
+    lock  = Lock()
     state = {
-        'cap':       _open_cap(hw['rtsp_url']),
-        'frame':     None,
-        'lock':      Lock(),
+        'cap':       None,
+        'url':       '',                # stream currently decoded (main or sub)
+        'idle':      False,             # capture opened for idle (keyframe-only) decode
+        'frame':     None,              # raw BGR frame (numpy array)
+        'jpeg':      {},                # tier → JPEG bytes for the current frame
+        'seq':       0,                 # bumped on every new frame
+        'lock':      lock,
+        'cond':      Condition(lock),   # notified on every new frame
+        'clients':   0,                 # open MJPEG streams
+        'last_read': 0.0,               # monotonic time of the last frame request
+        'bus':       None,              # FrameRing while assigned to a fish_detection slot
         'connected': False,
         'thread':    None,
     }
+    _reopen_cap(hardware_id, state)
     hw_state[hardware_id] = state
     t = Thread(target=_frame_grabber_thread, args=(hardware_id,), daemon=True)
     t.start()
@@ -231,6 +477,7 @@ def start_all_grabbers() -> None:
 
 # ── Frame helpers ──────────────────────────────────────────────────────────────
 
+@lru_cache(maxsize=64)
 def _offline_placeholder(label: str = 'Offline') -> bytes:
     img = np.zeros((240, 426, 3), dtype=np.uint8)
     cv2.putText(img, label, (20, 130),
@@ -239,26 +486,128 @@ def _offline_placeholder(label: str = 'Offline') -> bytes:
     return buf.tobytes()
 
 
-def _get_frame_for_slot(slot_id: str) -> Optional[bytes]:
-    """Resolve slot → hardware → frame buffer. Returns JPEG bytes or None."""
-    slot = slots.get(slot_id)
-    if not slot or not slot.get('assigned') or not slot.get('hardware_id'):
+def _encoded_frame(state: dict, tier: str = 'full') -> Optional[bytes]:
+    """JPEG of the buffer's current frame at a size tier, encoded on first request.
+    The encoding is cached until the grabber publishes the next frame, so any
+    number of clients of one tier cost one encode per frame. Marks the camera
+    as in use.
+    """
+    width, quality = FRAME_TIERS.get(tier, FRAME_TIERS['full'])
+    with state['lock']:
+        state['last_read'] = time.monotonic()
+        frame, seq = state['frame'], state['seq']
+        cached = state['jpeg'].get(tier)
+    if cached is not None or frame is None:
+        return cached
+    if width and frame.shape[1] > width:
+        height = round(frame.shape[0] * width / frame.shape[1])
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
         return None
-    state = hw_state.get(slot['hardware_id'])
+    data = buf.tobytes()
+    with state['lock']:
+        if state['seq'] == seq:
+            state['jpeg'][tier] = data
+    return data
+
+
+def _get_frame_for_slot(slot_id: str, tier: str = 'full') -> Optional[bytes]:
+    """Resolve slot → hardware → frame buffer. Returns JPEG bytes or None."""
+    state = _state_for_slot(slot_id)
     if not state:
         return None
-    with state['lock']:
-        return state['frame']
+    return _encoded_frame(state, tier)
 
 
-def _frame_or_placeholder(slot_id: str) -> bytes:
-    data = _get_frame_for_slot(slot_id)
+def _frame_or_placeholder(slot_id: str, tier: str = 'full') -> bytes:
+    data = _get_frame_for_slot(slot_id, tier)
     if data:
         return data
     slot = slots.get(slot_id, {})
     return _offline_placeholder(slot.get('label', slot_id) + ' Offline')
 
 
+def _state_for_slot(slot_id: str) -> Optional[dict]:
+    """Current hw_state for a slot — re-resolved so a stream follows reassignment."""
+    slot = slots.get(slot_id)
+    if not slot or not slot.get('assigned') or not slot.get('hardware_id'):
+        return None
+    return hw_state.get(slot['hardware_id'])
+
+
+def _mjpeg_part(jpeg: bytes) -> bytes:
+    return (b'--' + MJPEG_BOUNDARY.encode() + b'\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n'
+            + jpeg + b'\r\n')
+
+
+def _mjpeg_stream(resolve_state: Callable[[], Optional[dict]], label: str,
+                  max_fps: float, tier: str = 'full') -> Response:
+    """multipart/x-mixed-replace response fed from a frame buffer.
+
+    Each client blocks on the buffer's condition variable and is sent the
+    newest frame as soon as the grabber publishes it, at most max_fps per
+    second. With no new frame for MJPEG_IDLE_S the last frame (or an offline
+    placeholder) is resent, which keeps the connection alive and lets a
+    closed browser tab be noticed.
+    """
+    min_interval = 1.0 / max(0.1, min(max_fps, MJPEG_MAX_FPS))
+
+    def generate():
+        state, last_seq, last_sent = None, -1, 0.0
+        try:
+            while True:
+                current = resolve_state()
+                if current is not state:
+                    if state is not None:
+                        with state['lock']:
+                            state['clients'] -= 1
+                    state, last_seq = current, -1
+                    if state is not None:
+                        with state['lock']:
+                            state['clients'] += 1
+
+                if state is None:
+                    yield _mjpeg_part(_offline_placeholder(label + ' Offline'))
+                    time.sleep(MJPEG_IDLE_S)
+                    continue
+
+                wait = min_interval - (time.monotonic() - last_sent)
+                if wait > 0:
+                    time.sleep(wait)
+                with state['cond']:
+                    state['cond'].wait_for(lambda: state['seq'] != last_seq,
+                                           timeout=MJPEG_IDLE_S)
+                    last_seq = state['seq']
+                frame = _encoded_frame(state, tier)
+                last_sent = time.monotonic()
+                yield _mjpeg_part(frame or _offline_placeholder(label + ' Offline'))
+        finally:
+            if state is not None:
+                with state['lock']:
+                    state['clients'] -= 1
+
+    return Response(
+        generate(),
+        mimetype=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}',
+        headers={'Cache-Control': 'no-cache, no-store', 'X-Accel-Buffering': 'no'},
+    )
+
+
+def _requested_tier() -> str:
+    tier = request.args.get('size', 'full')
+    return tier if tier in FRAME_TIERS else 'full'
+
+
+def _requested_fps() -> float:
+    try:
+        return float(request.args.get('fps', MJPEG_MAX_FPS))
+    except ValueError:
+        return MJPEG_MAX_FPS
+
+
 def _mask_rtsp(url: str) -> str:
     """Replace RTSP credentials with **** for safe display."""
     return re.sub(r'(rtsp://)([^@]+)(@)', r'\1****\3', url)
@@ -377,6 +726,7 @@ def _slot_response(slot: dict) -> dict:
         'label':         slot['label'],
         'display_order': slot.get('display_order', 0),
         'roles':         slot.get('roles', {}),
+        'motion_sensitivity': slot.get('motion_sensitivity', 'medium'),
         'assigned':      slot.get('assigned', False),
         'hardware_id':   slot.get('hardware_id'),
         'status':        _slot_status(slot),
@@ -415,6 +765,10 @@ def get_hardware():
             'assigned_to_slot': hw.get('assigned_to_slot'),
             'connected':        state.get('connected', False),
             'has_frame':        state.get('frame') is not None,
+            'stream_clients':   state.get('clients', 0),
+            'idle':             _is_idle(state) if state else True,
+            'decoder':          _decoder_status(state),
+            'frame_bus':        bool(state.get('bus')),
         })
     return jsonify(result)
 
@@ -474,6 +828,11 @@ def update_slot(slot_id):
     if 'display_order' in data:
         slot['display_order'] = int(data['display_order'])
 
+    if 'motion_sensitivity' in data:
+        if data['motion_sensitivity'] not in MOTION_SENSITIVITIES:
+            return jsonify({'error': f"motion_sensitivity must be one of {', '.join(MOTION_SENSITIVITIES)}"}), 400
+        slot['motion_sensitivity'] = data['motion_sensitivity']
+
     if 'roles' in data:
         for role, val in data['roles'].items():
             if role in ('forward_watch', 'active_default') and val:
@@ -564,7 +923,7 @@ def get_frame_by_slot(slot_id):
     """Return JPEG by slot_id (resolves slot → hardware → frame buffer)."""
     if slot_id not in slots:
         return jsonify({'error': f'Unknown slot: {slot_id}'}), 404
-    data = _frame_or_placeholder(slot_id)
+    data = _frame_or_placeholder(slot_id, _requested_tier())
     return send_file(io.BytesIO(data), mimetype='image/jpeg')
 
 
@@ -573,8 +932,7 @@ def get_frame_by_hardware(hardware_id: str):
     """Return JPEG by hardware_id — used by setup wizard before slot assignment."""
     state = hw_state.get(hardware_id)
     if state:
-        with state['lock']:
-            frame = state['frame']
+        frame = _encoded_frame(state, _requested_tier())
         if frame:
             return send_file(io.BytesIO(frame), mimetype='image/jpeg')
     hw = hardware.get(hardware_id, {})
@@ -582,6 +940,26 @@ def get_frame_by_hardware(hardware_id: str):
     return send_file(io.BytesIO(_offline_placeholder(label)), mimetype='image/jpeg')
 
 
+@app.route('/camera/stream/<slot_id>', methods=['GET'])
+def stream_by_slot(slot_id):
+    """MJPEG stream by slot_id — one connection instead of polling /camera/frame."""
+    if slot_id not in slots:
+        return jsonify({'error': f'Unknown slot: {slot_id}'}), 404
+    label = slots[slot_id].get('label', slot_id)
+    return _mjpeg_stream(lambda: _state_for_slot(slot_id), label, _requested_fps(),
+                         _requested_tier())
+
+
+@app.route('/camera/stream/hw/<hardware_id>', methods=['GET'])
+def stream_by_hardware(hardware_id: str):
+    """MJPEG stream by hardware_id — setup wizard live preview."""
+    if hardware_id not in hardware:
+        return jsonify({'error': f'Unknown hardware: {hardware_id}'}), 404
+    label = hardware[hardware_id].get('model', hardware_id)
+    return _mjpeg_stream(lambda: hw_state.get(hardware_id), label, _requested_fps(),
+                         _requested_tier())
+
+
 # ── Backwards-compatible endpoints ────────────────────────────────────────────
 
 @app.route('/camera/status', methods=['GET'])
@@ -657,11 +1035,105 @@ def legacy_assign():
     }), 410
 
 
+# ── Event clips ───────────────────────────────────────────────────────────────
+
+def _start_clip(slot_id: str, buf: PrerollBuffer, event: str, pre_s: float,
+                post_s: Optional[float], prefix: str = 'clip', on_done=None) -> Clip:
+    ts       = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'{prefix}_{slot_id}_{event}_{ts}.mp4' if prefix == 'clip' else f'{prefix}_{slot_id}_{ts}.mp4'
+    clip = Clip(buf, os.path.join(RECORDING_PATH, filename),
+                event=event, pre_s=pre_s, post_s=post_s, on_done=on_done or _clip_done)
+    clip.slot_id = slot_id
+    with clip_lock:
+        clips[clip.clip_id] = clip
+        while len(clips) > CLIPS_KEPT:
+            clips.popitem(last=False)
+    print(f'✓ Clip {clip.clip_id} started: {filename} ({event}, -{pre_s:g}s'
+          + (f' / +{post_s:g}s)' if post_s is not None else ' until stopped)'))
+    return clip.start()
+
+
+def _clip_done(clip: Clip) -> None:
+    if clip.status == 'done':
+        print(f'✓ Clip {clip.clip_id} saved: {os.path.basename(clip.path)} '
+              f'({clip.info()["duration_s"]}s, {clip.info()["size_mb"]} MB)')
+
+
+def _clip_info(clip: Clip) -> dict:
+    return {**clip.info(), 'slot_id': clip.slot_id}
+
+
+@app.route('/camera/clips', methods=['POST'])
+def create_clips():
+    """
+    Save a clip around an event from the pre-roll buffer — stream copy, no re-encode.
+    Body: slot_id (default forward watch; 'all' = every camera with a buffer),
+    event (label in the filename: fish, anchor_alarm, mob, ...), pre_s, post_s.
+    Returns 202 at once; the clip is written post_s seconds later.
+    """
+    body  = request.get_json(silent=True) or {}
+    event = re.sub(r'[^A-Za-z0-9-]+', '-', str(body.get('event') or 'event')).strip('-')[:32] or 'event'
+    try:
+        pre_s  = min(max(float(body.get('pre_s', CLIP_PRE_S)), 0.0), CLIP_PREROLL_S)
+        post_s = min(max(float(body.get('post_s', CLIP_POST_S)), 0.0), CLIP_MAX_POST_S)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'pre_s and post_s must be numbers'}), 400
+
+    slot_id = body.get('slot_id') or get_forward_watch_slot_id()
+    if slot_id != 'all' and slot_id not in slots:
+        return jsonify({'error': f'Unknown slot: {slot_id}'}), 404
+    with clip_lock:        # each buffer read once — update_preroll() may replace it
+        buffers = {sid: preroll.get(slot.get('hardware_id')) for sid, slot in slots.items()
+                   if slot.get('assigned') and (slot_id == 'all' or sid == slot_id)}
+    targets = {sid: buf for sid, buf in buffers.items() if buf is not None}
+    if not targets:
+        if slot_id != 'all':
+            return jsonify({'error': f'No pre-roll buffer for {slot_id}'}), 503
+        return jsonify({'error': 'No pre-roll buffers running'}), 503
+
+    started = [_clip_info(_start_clip(sid, buf, event, pre_s, post_s)) for sid, buf in targets.items()]
+    return jsonify({'clips': started}), 202
+
+
+@app.route('/camera/clips', methods=['GET'])
+def list_clips():
+    with clip_lock:
+        recent  = list(reversed(clips.values()))
+        buffers = {slot_id: preroll[slot['hardware_id']]
+                   for slot_id, slot in slots.items() if slot.get('hardware_id') in preroll}
+    return jsonify({'clips': [_clip_info(c) for c in recent],
+                    'buffers': {slot_id: buf.status() for slot_id, buf in buffers.items()},
+                    'preroll_s': CLIP_PREROLL_S})
+
+
+@app.route('/camera/clips/<int:clip_id>', methods=['GET'])
+def get_clip(clip_id):
+    with clip_lock:
+        clip = clips.get(clip_id)
+    if not clip:
+        return jsonify({'error': 'Clip not found'}), 404
+    return jsonify(_clip_info(clip))
+
+
+@app.route('/camera/clips/<int:clip_id>/file', methods=['GET'])
+def get_clip_file(clip_id):
+    with clip_lock:
+        clip = clips.get(clip_id)
+    if not clip:
+        return jsonify({'error': 'Clip not found'}), 404
+    if clip.status != 'done' or not os.path.exists(clip.path):
+        return jsonify({'error': f'Clip is {clip.status}'}), 409
+    return send_file(clip.path, mimetype='video/mp4', as_attachment=True,
+                     download_name=os.path.basename(clip.path))
+
+
 # ── Recording ─────────────────────────────────────────────────────────────────
 
 @app.route('/camera/record/start', methods=['POST'])
 def start_recording():
-    global recording_instance, recording_player, recording_active
+    """Record the forward-watch camera until /camera/record/stop — an open-ended
+    clip from its pre-roll buffer (stream copy; no second decoder/encoder)."""
+    global recording_clip, recording_active
     if recording_active:
         return jsonify({'error': 'Already recording'}), 400
     fw_id = get_forward_watch_slot_id()
@@ -671,47 +1143,41 @@ def start_recording():
     state = hw_state.get(hw['hardware_id'], {})
     if not state.get('connected'):
         return jsonify({'error': 'Camera not connected'}), 503
-    url = hw.get('rtsp_url', '')
+    url = _clip_stream_url(hw['hardware_id'])
     if not url:
         return jsonify({'error': 'No RTSP URL'}), 503
-    ts       = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'recording_{fw_id}_{ts}.mp4'
-    filepath = os.path.join(RECORDING_PATH, filename)
+    with clip_lock:
+        buf = preroll.get(hw['hardware_id'])
+    on_done = None
+    if buf is None:
+        # Pre-roll is off for this camera — run a buffer for the length of the
+        # recording, stopped once the clip has detached from it and finished
+        buf = PrerollBuffer(url, 0, name=f'{hw["hardware_id"]}-recording')
+
+        def on_done(clip, buf=buf):
+            buf.stop()
+            _clip_done(clip)
     os.makedirs(RECORDING_PATH, exist_ok=True)
-    try:
-        recording_instance = vlc.Instance()
-        recording_player   = recording_instance.media_player_new()
-        media = recording_instance.media_new(url)
-        media.add_options(f':sout=#transcode{{vcodec=h264,vb=8000}}:file{{dst={filepath}}}')
-        media.add_options(':sout-keep')
-        recording_player.set_media(media)
-        recording_player.play()
-        recording_active = True
-        print(f'✓ Recording started: {filename}')
-        return jsonify({'status': 'recording_started', 'filename': filename, 'path': filepath})
-    except Exception as e:
-        recording_active = False
-        return jsonify({'error': f'Failed to start recording: {e}'}), 500
+    recording_clip   = _start_clip(fw_id, buf, 'manual', 0, None, prefix='recording', on_done=on_done)
+    recording_active = True
+    filename = os.path.basename(recording_clip.path)
+    print(f'✓ Recording started: {filename}')
+    return jsonify({'status': 'recording_started', 'filename': filename,
+                    'path': recording_clip.path, 'clip_id': recording_clip.clip_id})
 
 
 @app.route('/camera/record/stop', methods=['POST'])
 def stop_recording():
-    global recording_instance, recording_player, recording_active
+    global recording_clip, recording_active
     if not recording_active:
         return jsonify({'error': 'Not recording'}), 400
-    try:
-        if recording_player:
-            recording_player.stop()
-            recording_player.release()
-            recording_player = None
-        if recording_instance:
-            recording_instance.release()
-            recording_instance = None
-        recording_active = False
-        print('✓ Recording stopped')
-        return jsonify({'status': 'recording_stopped'})
-    except Exception as e:
-        return jsonify({'error': f'Failed to stop recording: {e}'}), 500
+    clip = recording_clip
+    clip.stop()                 # a recording-only buffer is stopped by the clip's on_done
+    recording_clip   = None
+    recording_active = False
+    print('✓ Recording stopped')
+    return jsonify({'status': 'recording_stopped', 'filename': os.path.basename(clip.path),
+                    'clip_id': clip.clip_id})
 
 
 @app.route('/camera/recordings', methods=['GET'])
@@ -733,9 +1199,8 @@ def list_recordings():
 def capture_photo():
     fw_id = get_forward_watch_slot_id()
     hw    = get_hw_for_slot(fw_id) if fw_id else None
-    state = hw_state.get((hw or {}).get('hardware_id', ''), {})
-    with state.get('lock', Lock()):
-        frame_bytes = state.get('frame')
+    state = hw_state.get((hw or {}).get('hardware_id', ''))
+    frame_bytes = _encoded_frame(state) if state else None
     if not frame_bytes:
         return jsonify({'error': 'No frame available'}), 503
     ts       = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -761,6 +1226,8 @@ if __name__ == '__main__':
     print('=' * 60)
     load_config()
     start_all_grabbers()
+    update_frame_bus()
+    update_preroll()
     # Non-blocking startup scan — runs in background, doesn't delay service start
     Thread(target=run_discovery_scan, daemon=True).start()
     print()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+d3kOS Capture Files — content-addressed capture images with renditions
+Pi path: /opt/d3kos/services/marine-vision/capture_files.py
+
+  Storage      the full JPEG is named by the SHA-1 of its bytes:
+               <captures>/<h[:2]>/<h>.jpg — identical images share one file,
+               and two captures in the same second no longer overwrite each
+               other (the old catch_YYYYmmdd_HHMMSS.jpg names did)
+  Renditions   <h>_thumb.jpg (320 px, q70) and <h>_medium.jpg (960 px, q80)
+               are written next to it by a background writer thread, so
+               save_capture() only pays for the full-size encode. Captures
+               saved before this existed get their renditions on first request.
+  Dedup        a 64-bit DCT perceptual hash per capture; a capture within
+               dedup_bits of the previous one from the same slot inside
+               dedup_window_s is not stored again — a fish sitting alongside
+               for a minute is one capture, not six
+  Serving      content-addressed files never change, so they are served with
+               ETag = hash and a one-year immutable Cache-Control
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+FULL_QUALITY = 95
+RENDITIONS = {
+    'thumb':  (320, 70),    # gallery grid
+    'medium': (960, 80),    # detail view
+}
+
+
+def phash(image: np.ndarray) -> int:
+    """64-bit perceptual hash: 8x8 low frequencies of the 32x32 greyscale DCT vs their median."""
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(grey, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def rendition_path(image_path: str, size: str) -> str:
+    """Path of a rendition ('thumb' | 'medium') next to the full image; 'full' is the image."""
+    if size not in RENDITIONS:
+        return image_path
+    stem, ext = os.path.splitext(image_path)
+    return f'{stem}_{size}{ext}'
+
+
+def content_hash(image_path: str) -> Optional[str]:
+    """The SHA-1 a content-addressed capture is named by, or None for older names."""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return stem if len(stem) == 40 and all(c in '0123456789abcdef' for c in stem) else None
+
+
+class CaptureFiles:
+    """Writes capture images and renditions; remembers recent hashes per slot."""
+
+    def __init__(self, root: str, dedup_bits: int = 6, dedup_window_s: float = 120.0):
+        self.root           = root
+        self.dedup_bits     = dedup_bits
+        self.dedup_window_s = dedup_window_s
+        self.written  = 0               # files written (full + renditions)
+        self.deduped  = 0               # captures skipped as near-duplicates
+        self._recent  = {}              # slot → (phash, monotonic time, capture_id)
+        self._pending = {}              # full path → Event set once written
+        self._lock    = threading.Lock()
+        self._queue   = queue.Queue()
+        threading.Thread(target=self._writer, daemon=True, name='capture-writer').start()
+
+    # ── Dedup ─────────────────────────────────────────────────────────────────
+
+    def duplicate_of(self, slot_id, image_hash: int) -> Optional[int]:
+        """capture_id of a recent near-identical capture from this slot, else None."""
+        with self._lock:
+            recent = self._recent.get(slot_id)
+            if (recent and time.monotonic() - recent[1] < self.dedup_window_s
+                    and hamming(recent[0], image_hash) <= self.dedup_bits):
+                self.deduped += 1
+                return recent[2]
+        return None
+
+    def remember(self, slot_id, image_hash: int, capture_id: int) -> None:
+        with self._lock:
+            self._recent[slot_id] = (image_hash, time.monotonic(), capture_id)
+
+    # ── Storage ───────────────────────────────────────────────────────────────
+
+    def store(self, image: np.ndarray) -> str:
+        """Encode the full JPEG and queue it plus renditions for writing. Returns its path."""
+        ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, FULL_QUALITY])
+        if not ok:
+            raise ValueError('JPEG encode failed')
+        digest = hashlib.sha1(jpeg).hexdigest()
+        path = os.path.join(self.root, digest[:2], f'{digest}.jpg')
+        with self._lock:
+            if path in self._pending or os.path.exists(path):
+                return path
+            self._pending[path] = threading.Event()
+        self._queue.put((path, jpeg, image))
+        return path
+
+    def wait(self, path: str, timeout: float = 5.0) -> None:
+        """Block until a just-stored capture is on disk."""
+        with self._lock:
+            event = self._pending.get(path)
+        if event is not None:
+            event.wait(timeout)
+
+    def rendition(self, image_path: str, size: str) -> Optional[str]:
+        """Path of a rendition on disk, generating it from the full image if missing."""
+        self.wait(image_path)
+        path = rendition_path(image_path, size)
+        if os.path.exists(path):
+            return path
+        if path == image_path:
+            return None
+        image = cv2.imread(image_path)
+        if image is None:
+            return None
+        self._write_rendition(image_path, image, size)
+        return path
+
+    def remove(self, image_path: str) -> None:
+        """Delete a full image and its renditions (a fish event kept a better frame)."""
+        self.wait(image_path)
+        for size in ('full', *RENDITIONS):
+            try:
+                os.remove(rendition_path(image_path, size))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {'written': self.written, 'deduped': self.deduped, 'queued': self._queue.qsize()}
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _writer(self) -> None:
+        while True:
+            path, jpeg, image = self._queue.get()
+            try:
+                self._write(path, jpeg.tobytes())
+                for size in RENDITIONS:
+                    self._write_rendition(path, image, size)
+            except OSError as e:
+                print(f"⚠ Capture write failed ({path}): {e}")
+            finally:
+                with self._lock:
+                    event = self._pending.pop(path, None)
+                if event:
+                    event.set()
+
+    def _write_rendition(self, image_path: str, image: np.ndarray, size: str) -> None:
+        width, quality = RENDITIONS[size]
+        height, full_w = image.shape[:2]
+        if full_w > width:
+            image = cv2.resize(image, (width, max(1, round(height * width / full_w))),
+                               interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            self._write(rendition_path(image_path, size), jpeg.tobytes())
+
+    def _write(self, path: str, data: bytes) -> None:
+        """Write via a temp file and rename, so a reader never sees half a JPEG."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.written += 1
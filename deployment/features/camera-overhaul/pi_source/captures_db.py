@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+d3kOS Captures Store — fish_detector's captures database
+Pi path: /opt/d3kos/services/marine-vision/captures_db.py
+
+  Connections  a bounded pool of pool_size connections, opened on first use
+               and checked out per call (Flask's threaded server starts a new
+               thread per request, so per-thread connections were reopened —
+               PRAGMAs and all — on every request); WAL journal so gallery
+               reads never wait on a capture insert, synchronous=NORMAL
+  Schema       CREATE TABLE first, then any column an older database lacks is
+               added; indexes on timestamp, slot_id, species, gemini_species
+  Rows         sqlite3.Row → dicts by column name, so column order (older
+               databases have 'location' in the middle) doesn't matter
+  Events       a capture is one fish event (tracker.py): the row is written
+               when the event starts and update_event() rewrites it with the
+               best frame, end time, frame count and species vote when it ends
+  Paging       keyset on (timestamp, id), newest first: each page returns a
+               next_cursor and the following page starts strictly after it,
+               so page cost stays flat however many captures exist
+
+Filters for list(): slot_id, species (ONNX classifier), gemini_species,
+since / until (ISO date or datetime), min_confidence (fish confidence).
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+PAGE_DEFAULT = 50
+PAGE_MAX     = 200
+POOL_SIZE    = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures
+    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+     timestamp TEXT NOT NULL,
+     image_path TEXT NOT NULL,
+     person_detected INTEGER,
+     fish_detected INTEGER,
+     person_confidence REAL,
+     fish_confidence REAL,
+     species TEXT,
+     species_confidence REAL,
+     species_top3 TEXT,
+     location TEXT,
+     slot_id TEXT,
+     gemini_species TEXT,
+     gemini_response TEXT,
+     detections TEXT,
+     event_end TEXT,
+     event_duration_s REAL,
+     event_frames INTEGER,
+     species_votes TEXT);
+"""
+
+# Columns added since the first release — ALTERed into older databases
+_COLUMNS = [
+    ('location',           'TEXT'),
+    ('species_confidence', 'REAL'),
+    ('species_top3',       'TEXT'),
+    ('slot_id',            'TEXT'),
+    ('gemini_species',     'TEXT'),
+    ('gemini_response',    'TEXT'),
+    ('detections',         'TEXT'),
+    ('event_end',          'TEXT'),
+    ('event_duration_s',   'REAL'),
+    ('event_frames',       'INTEGER'),
+    ('species_votes',      'TEXT'),
+]
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_captures_timestamp ON captures(timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_captures_slot      ON captures(slot_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_captures_species   ON captures(species, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_captures_gemini    ON captures(gemini_species, timestamp, id);
+"""
+
+_JSON_FIELDS = ('species_top3', 'gemini_response', 'detections', 'species_votes')
+
+
+class CaptureStore:
+    """Pooled access to captures.db."""
+
+    def __init__(self, path: str, pool_size: int = POOL_SIZE):
+        self.path      = path
+        self.pool_size = max(1, pool_size)
+        self._pool     = queue.Queue()      # idle connections
+        self._opened   = 0
+        self._lock     = threading.Lock()
+
+    def init(self) -> None:
+        """Create the table, add missing columns and indexes."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+            existing = {row['name'] for row in db.execute('PRAGMA table_info(captures)')}
+            for name, kind in _COLUMNS:
+                if name not in existing:
+                    db.execute(f'ALTER TABLE captures ADD COLUMN {name} {kind}')
+                    print(f"✓ Added {name} column to captures table")
+            db.executescript(_INDEXES)
+            db.commit()
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def add(self, timestamp: str, image_path: str, person_conf: float, fish_conf: float,
+            species: Optional[str] = None, species_conf: Optional[float] = None,
+            species_top3=None, slot_id: Optional[str] = None,
+            gemini_species: Optional[str] = None, gemini_response=None,
+            detections=None) -> int:
+        """Insert a capture. Returns its id."""
+        with self._db() as db, db:
+            cur = db.execute(
+                '''INSERT INTO captures
+                   (timestamp, image_path, person_detected, fish_detected,
+                    person_confidence, fish_confidence, species, species_confidence,
+                    species_top3, slot_id, gemini_species, gemini_response, detections)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (timestamp, image_path, 0, 1,
+                 float(person_conf), float(fish_conf),
+                 species, float(species_conf) if species_conf else None,
+                 json.dumps(species_top3) if species_top3 else None,
+                 slot_id, gemini_species,
+                 json.dumps(gemini_response) if gemini_response else None,
+                 json.dumps(detections) if detections else None))
+        return cur.lastrowid
+
+    def set_gemini(self, capture_id: int, result: dict) -> None:
+        """Store a Gemini identification — overwrites any earlier attempt."""
+        with self._db() as db, db:
+            db.execute('UPDATE captures SET gemini_species = ?, gemini_response = ? WHERE id = ?',
+                       (result.get('common_name'), json.dumps(result), capture_id))
+
+    def update_event(self, capture_id: int, event_end: str, duration_s: float, frames: int,
+                     species: Optional[str], species_conf: Optional[float], species_votes,
+                     best: Optional[dict] = None) -> None:
+        """Record how a capture's fish event ended. best, if given, replaces the
+        image: image_path, fish_confidence, species_top3, detections."""
+        with self._db() as db, db:
+            db.execute(
+                '''UPDATE captures SET event_end = ?, event_duration_s = ?, event_frames = ?,
+                   species = ?, species_confidence = ?, species_votes = ? WHERE id = ?''',
+                (event_end, round(float(duration_s), 2), int(frames), species,
+                 float(species_conf) if species_conf else None,
+                 json.dumps(species_votes) if species_votes else None, capture_id))
+            if best:
+                db.execute(
+                    '''UPDATE captures SET image_path = ?, fish_confidence = ?,
+                       species_top3 = ?, detections = ? WHERE id = ?''',
+                    (best['image_path'], float(best['fish_confidence']),
+                     json.dumps(best['species_top3']) if best.get('species_top3') else None,
+                     json.dumps(best['detections']) if best.get('detections') else None,
+                     capture_id))
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def get(self, capture_id: int) -> Optional[dict]:
+        with self._db() as db:
+            row = db.execute('SELECT * FROM captures WHERE id = ?', (capture_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def image_path(self, capture_id: int) -> Optional[str]:
+        with self._db() as db:
+            row = db.execute('SELECT image_path FROM captures WHERE id = ?',
+                             (capture_id,)).fetchone()
+        return row['image_path'] if row else None
+
+    def image_in_use(self, image_path: str) -> bool:
+        """True if any capture still points at this file (content-addressed files are shared)."""
+        with self._db() as db:
+            return db.execute('SELECT 1 FROM captures WHERE image_path = ? LIMIT 1',
+                              (image_path,)).fetchone() is not None
+
+    def list(self, limit: int = PAGE_DEFAULT, cursor: Optional[str] = None,
+             slot_id: Optional[str] = None, species: Optional[str] = None,
+             gemini_species: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+             min_confidence: Optional[float] = None) -> Tuple[list, Optional[str]]:
+        """(captures newest first, next_cursor or None). Raises ValueError on a bad cursor."""
+        limit = max(1, min(int(limit), PAGE_MAX))
+        where, args = [], []
+        if cursor:
+            ts, _, last_id = cursor.rpartition(',')
+            if not ts or not last_id.isdigit():
+                raise ValueError(f'bad cursor: {cursor}')
+            where.append('(timestamp, id) < (?, ?)')
+            args += [ts, int(last_id)]
+        if slot_id:
+            where.append('slot_id = ?')
+            args.append(slot_id)
+        if species:
+            where.append('species = ?')
+            args.append(species)
+        if gemini_species:
+            where.append('gemini_species = ?')
+            args.append(gemini_species)
+        if since:
+            where.append('timestamp >= ?')
+            args.append(since)
+        if until:
+            where.append('timestamp <= ?')
+            args.append(until + 'T23:59:59.999999' if len(until) == 10 else until)
+        if min_confidence is not None:
+            where.append('fish_confidence >= ?')
+            args.append(float(min_confidence))
+
+        sql = 'SELECT * FROM captures'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        with self._db() as db:
+            rows = db.execute(sql, args + [limit + 1]).fetchall()
+
+        captures = [_to_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = captures[-1]
+            next_cursor = f"{last['timestamp']},{last['id']}"
+        return captures, next_cursor
+
+    def count(self) -> int:
+        with self._db() as db:
+            return db.execute('SELECT COUNT(*) FROM captures').fetchone()[0]
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _db(self):
+        """Check a connection out of the pool for one call. Opens up to pool_size,
+        then waits for one to come back."""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()                 # an exception left a write open
+            self._pool.put(conn)
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._opened < self.pool_size
+            if grow:
+                self._opened += 1
+        if not grow:
+            return self._pool.get()
+        try:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error:
+            with self._lock:
+                self._opened -= 1
+            raise
+        return conn
+
+
+def _to_dict(row: sqlite3.Row) -> dict:
+    capture = dict(row)
+    capture['person_detected'] = bool(capture.get('person_detected'))
+    capture['fish_detected']   = bool(capture.get('fish_detected'))
+    for field in _JSON_FIELDS:
+        capture[field] = json.loads(capture[field]) if capture.get(field) else None
+    return capture
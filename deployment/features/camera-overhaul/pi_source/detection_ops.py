@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+d3kOS Detection Ops — vectorized YOLOv8 post-processing for fish_detector
+Pi path: /opt/d3kos/services/marine-vision/detection_ops.py
+
+The single-class detector outputs (1, 5, 8400): per anchor x_center,
+y_center, width, height, fish confidence, in 640x640 model space.
+
+  decode_predictions(pred, thr)   one threshold mask over the confidence row
+                                  → (boxes [N, 4] centre format, scores [N])
+  nms(boxes, scores, iou)         greedy non-maximum suppression; each kept
+                                  box is compared with all remaining boxes in
+                                  one array operation
+  yolo_detections(pred, thr, iou) both, as fish_detector's detection dicts
+
+Results are identical to the original per-anchor loop and pairwise
+compute_iou NMS: same strict thresholds, same float64 box arithmetic, and
+ties in confidence keep their anchor order (stable sort).
+"""
+
+import numpy as np
+
+NMS_IOU = 0.4
+
+
+def decode_predictions(predictions: np.ndarray, confidence_threshold: float):
+    """(boxes, scores) of the anchors whose confidence is above the threshold.
+    predictions is one image's output, shape (5, anchors)."""
+    scores = predictions[4]
+    keep = scores > confidence_threshold
+    boxes = predictions[:4, keep].T.astype(np.float64)
+    return boxes, scores[keep].astype(np.float64)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = NMS_IOU) -> list:
+    """Indices of the boxes kept by greedy NMS, highest score first.
+    A box is dropped when its IoU with a kept box is above iou_threshold."""
+    if len(boxes) == 0:
+        return []
+    x1 = boxes[:, 0] - boxes[:, 2] / 2
+    y1 = boxes[:, 1] - boxes[:, 3] / 2
+    x2 = boxes[:, 0] + boxes[:, 2] / 2
+    y2 = boxes[:, 1] + boxes[:, 3] / 2
+    areas = (x2 - x1) * (y2 - y1)
+
+    order = np.argsort(-scores, kind='stable')
+    kept = []
+    with np.errstate(invalid='ignore', divide='ignore'):
+        while order.size:
+            i, rest = order[0], order[1:]
+            kept.append(int(i))
+            iw = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+            ih = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+            inter = np.where((iw > 0) & (ih > 0), iw * ih, 0.0)
+            iou = inter / (areas[i] + areas[rest] - inter)
+            order = rest[~(iou > iou_threshold)]
+    return kept
+
+
+def yolo_detections(predictions: np.ndarray, confidence_threshold: float,
+                    iou_threshold: float = NMS_IOU) -> list:
+    """Detection dicts (class_name, confidence, bbox) after threshold and NMS."""
+    boxes, scores = decode_predictions(predictions, confidence_threshold)
+    return [
+        {
+            'class_name': 'fish',
+            'confidence': float(scores[i]),
+            'bbox': {
+                'x_center': float(boxes[i, 0]),
+                'y_center': float(boxes[i, 1]),
+                'width': float(boxes[i, 2]),
+                'height': float(boxes[i, 3])
+            }
+        }
+        for i in nms(boxes, scores, iou_threshold)
+    ]
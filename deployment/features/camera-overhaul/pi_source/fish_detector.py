@@ -2,19 +2,80 @@
 """
 Fish Detector Service - WITH Species Identification
 Detects fish using YOLOv8, then identifies species using 483-species classifier
+
+Frames for fish_detection slots are read as raw arrays from the camera
+manager's shared-memory frame bus (frame_bus.py); the JPEG endpoint on :8084
+is only used when a slot is not on the bus (or the bus is unavailable).
+
+Continuous detection: a scheduler thread round-robins every fish_detection
+slot, runs detection only on frames whose bus sequence number has changed
+and that pass the motion gate (motion_gate.py — per-slot sensitivity from
+slots.json), and keeps inference within DETECT_CPU_BUDGET (share of wall
+time spent in inference). slots.json is re-read when it changes. Results are pushed to GET /detect/events (Server-Sent Events);
+POST /detect/frame still runs a one-off detection.
+
+Inference: both models run through onnx_runner — tuned CPU session options
+and a batching layer. Each scheduler pass stacks the new frames of up to
+DETECT_BATCH_MAX cameras into one run when the detection model has a dynamic
+batch axis; with a fixed batch of 1 (the default YOLOv8 export) a pass takes
+one frame, so no camera's result waits behind another's inference. Input
+tensors come from preprocess.py: letterboxed into buffers reused per slot,
+greyscale and scaling fused.
+
+Species: each detected fish is cropped from the frame (box plus
+DETECT_CROP_PAD on every side) and all crops of a batch are classified in
+one species run, so every detection carries its own species result. The
+capture's species is that of its most confident detection.
+
+Fish events: tracker.py associates detections across frames per slot (IoU,
+then centroid distance). A fish that stays in view is one event and one
+capture — saved when the event starts, then rewritten with the event's
+best-confidence frame, duration, frame count and species vote once the fish
+has been out of view for DETECT_EVENT_GAP_S (or DETECT_EVENT_MAX_S passed).
+Finished events are pushed to /detect/events as 'fish_event'. With
+DETECT_EVENT_CLIPS=1, the camera manager is asked for a pre-roll clip of that
+camera when an event starts (POST :8084/camera/clips) — it needs the camera
+manager's pre-roll buffers, which are off unless CAMERA_CLIP_PREROLL_S is set.
+An image uploaded to /detect/frame is a single still: it is not tracked, and
+its capture is filed under the UPLOAD_SLOT pseudo-slot so it never touches a
+camera's tracks or dedup history. capture_triggered is True only when a new
+capture was written — a phash duplicate reports deduplicated with the earlier id.
+
+Gemini Vision: POST /detect/identify/<id> queues a job (gemini_queue.py) and
+returns at once; workers call Gemini at GEMINI_RATE_PER_MIN with the image
+downscaled to GEMINI_MAX_SIDE, answer repeat requests for an image from a
+cache keyed by its hash, and store the result on the capture. The UI polls
+GET /detect/identify/jobs/<job_id>.
+
+Captures: stored by capture_files.py — content-addressed JPEGs with thumb and
+medium renditions written off the request path, and near-identical
+consecutive captures from a slot (perceptual hash within CAPTURE_DEDUP_BITS,
+inside CAPTURE_DEDUP_WINDOW_S) folded into the earlier one. Renditions are
+served with ETags and long-lived cache headers.
 """
 from flask import Flask, jsonify, request, send_file
 import cv2
 import numpy as np
-import onnxruntime as ort
 from datetime import datetime
-import sqlite3
 import os
 import io
 import base64
 import requests
 import json
 import time
+import queue
+import hashlib
+import threading
+
+from frame_bus import FrameBusClient
+from onnx_runner import create_session, BatchRunner
+from detection_ops import yolo_detections
+from preprocess import DetectionPreprocessor, SpeciesPreprocessor
+from motion_gate import MotionGate
+from captures_db import CaptureStore, PAGE_DEFAULT
+from capture_files import CaptureFiles, RENDITIONS, content_hash, phash
+from tracker import FishTracker, event_update
+from gemini_queue import IdentifyQueue, RateLimited, TokenBucket
 
 app = Flask(__name__)
 
@@ -31,6 +92,29 @@ CAPTURES_PATH = "/home/d3kos/camera-recordings/captures"
 DB_PATH = "/opt/d3kos/data/marine-vision/captures.db"
 CAMERA_STREAM_URL = "http://localhost:8084/camera/frame"
 SLOTS_CONFIG      = "/opt/d3kos/config/slots.json"
+CAMERA_CLIPS_URL  = "http://localhost:8084/camera/clips"
+
+# Continuous detection scheduler
+DETECT_SCHEDULER           = os.getenv('DETECT_SCHEDULER', '1') == '1'
+DETECT_CPU_BUDGET          = float(os.getenv('DETECT_CPU_BUDGET', '0.5'))   # share of wall time in inference
+DETECT_MAX_FPS             = float(os.getenv('DETECT_MAX_FPS', '5'))        # per camera
+DETECT_BATCH_MAX           = int(os.getenv('DETECT_BATCH_MAX', '4'))       # cameras per inference run (≤ model batch)
+DETECT_CROP_PAD            = float(os.getenv('DETECT_CROP_PAD', '0.15'))    # fraction of box size per side
+DETECT_CROP_MIN            = int(os.getenv('DETECT_CROP_MIN', '32'))        # smallest crop side, pixels
+DETECT_MOTION_GATE         = os.getenv('DETECT_MOTION_GATE', '1') == '1'
+DETECT_MOTION_SENSITIVITY  = os.getenv('DETECT_MOTION_SENSITIVITY', 'medium')  # high | medium | low | off
+DETECT_MOTION_DELTA        = int(os.getenv('DETECT_MOTION_DELTA', '18'))    # grey levels that count as change
+DETECT_MOTION_MAX_SKIP_S   = float(os.getenv('DETECT_MOTION_MAX_SKIP_S', '30'))  # run at least this often
+DETECT_MOTION_HOLD_S       = float(os.getenv('DETECT_MOTION_HOLD_S', '5'))  # keep running after fish seen
+DETECT_EVENT_IOU           = float(os.getenv('DETECT_EVENT_IOU', '0.3'))    # box overlap that continues a track
+DETECT_EVENT_GAP_S         = float(os.getenv('DETECT_EVENT_GAP_S', '5'))    # unseen this long → event ends
+DETECT_EVENT_MAX_S         = float(os.getenv('DETECT_EVENT_MAX_S', '300'))  # longest event before a new capture
+DETECT_EVENT_CLIPS         = os.getenv('DETECT_EVENT_CLIPS', '0') == '1'    # pre-roll clip per fish event (needs CAMERA_CLIP_PREROLL_S)
+CAPTURE_DEDUP_BITS         = int(os.getenv('CAPTURE_DEDUP_BITS', '6'))     # phash distance that counts as the same shot
+CAPTURE_DEDUP_WINDOW_S     = float(os.getenv('CAPTURE_DEDUP_WINDOW_S', '120'))
+CAPTURE_CACHE_MAX_AGE      = 365 * 24 * 3600                              # content-addressed files never change
+CAPTURE_DB_POOL            = int(os.getenv('CAPTURE_DB_POOL', '4'))        # captures.db connections shared by all threads
+UPLOAD_SLOT                = 'upload'                                     # pseudo-slot for images posted to /detect/frame
 
 
 # ── Gemini Vision configuration ────────────────────────────────────────────
@@ -68,12 +152,15 @@ FISH_ID_PROMPT = (
     '"visual_features":"Reason identification was not possible","ontario_note":""}'
 )
 
-GEMINI_COOLDOWN_SEC = 15   # minimum seconds between Gemini Vision calls
-GEMINI_RETRY_WAIT   = 8    # seconds to wait before a single retry on 429
-_gemini_last_call   = 0.0  # module-level timestamp of last successful/attempted call
+GEMINI_RATE_PER_MIN = float(os.getenv('GEMINI_RATE_PER_MIN', '10'))  # free tier quota for flash
+GEMINI_BURST        = int(os.getenv('GEMINI_BURST', '2'))              # calls that may go back to back
+GEMINI_WORKERS      = int(os.getenv('GEMINI_WORKERS', '2'))
+GEMINI_QUEUE_MAX    = int(os.getenv('GEMINI_QUEUE_MAX', '50'))         # waiting jobs before 503
+GEMINI_MAX_SIDE     = int(os.getenv('GEMINI_MAX_SIDE', '1024'))        # longest image side uploaded
+GEMINI_RETRY_WAIT   = 8    # seconds to back off on a 429 without Retry-After
 
 if GEMINI_API_KEY:
-    print(f"✓ Gemini Vision ready — model: {GEMINI_MODEL} (cooldown {GEMINI_COOLDOWN_SEC}s)")
+    print(f"✓ Gemini Vision ready — model: {GEMINI_MODEL} ({GEMINI_RATE_PER_MIN:g}/min, burst {GEMINI_BURST})")
 else:
     print("⚠ Gemini API key not found — species ID via Gemini will be skipped")
 
@@ -89,22 +176,38 @@ def load_fish_detection_slots():
     return [s['slot_id'] for s in slots if s.get('roles', {}).get('fish_detection')]
 
 
+def load_motion_sensitivity():
+    """Return {slot_id: motion_sensitivity} for slots that set one in slots.json."""
+    if not os.path.exists(SLOTS_CONFIG):
+        return {}
+    with open(SLOTS_CONFIG) as f:
+        slots = json.load(f)
+    return {s['slot_id']: s['motion_sensitivity'] for s in slots if s.get('motion_sensitivity')}
+
+
 # Load Fish Detection Model (YOLOv8 - generic fish detection)
 print("=" * 60)
 print("Loading Fish Detection Model...")
-detection_session = ort.InferenceSession(DETECTION_MODEL_PATH, providers=['CPUExecutionProvider'])
+detection_session = create_session(DETECTION_MODEL_PATH)
 detection_input_name = detection_session.get_inputs()[0].name
+detection_runner = BatchRunner(detection_session)
+detection_input_shape = detection_session.get_inputs()[0].shape
+detection_pre = DetectionPreprocessor(
+    detection_input_shape[2] if isinstance(detection_input_shape[2], int) else 640)
 print(f"✓ Detection model loaded: {DETECTION_MODEL_PATH}")
 print(f"✓ Detection model: YOLOv8n single-class (fish)")
 
 # Load Species Classification Model (483 species)
 print("\nLoading Species Classification Model...")
-species_session = ort.InferenceSession(SPECIES_MODEL_PATH, providers=['CPUExecutionProvider'])
+species_session = create_session(SPECIES_MODEL_PATH)
 species_input_name = species_session.get_inputs()[0].name
+species_runner = BatchRunner(species_session)
 species_input_shape = species_session.get_inputs()[0].shape
 species_input_size = species_input_shape[2] if len(species_input_shape) > 2 else 224
 print(f"✓ Species model loaded: {SPECIES_MODEL_PATH}")
 print(f"✓ Species input size: {species_input_size}x{species_input_size}")
+species_pre = SpeciesPreprocessor(species_input_size)
+print(f"✓ Batching: detection max {detection_runner.max_batch}, species max {species_runner.max_batch}")
 
 # Load Species Names
 print("\nLoading species list...")
@@ -122,86 +225,52 @@ if fish_detection_slots:
 else:
     print("⚠ No fish_detection slots found — will use active camera frame")
 
+# Shared-memory frame bus — raw frames straight from the camera manager
+frame_bus = FrameBusClient()
+
+
+def fetch_bus_frame(slot_id, after_seq=0):
+    """(seq, frame) — newest raw frame for a slot from the frame bus if its seq is
+    greater than after_seq. None if the slot isn't on the bus or has nothing new."""
+    try:
+        frame = frame_bus.read(slot_id, after_seq)
+    except (OSError, ValueError) as e:
+        print(f"⚠ Frame bus read failed for {slot_id}: {e}")
+        return None
+    return (frame[0], frame[2]) if frame else None
+
+
+def fetch_http_frame(slot_id):
+    """JPEG frame from the camera manager, decoded. Raises on HTTP errors."""
+    frame_url = f'http://localhost:8084/camera/frame/{slot_id}' if slot_id else CAMERA_STREAM_URL
+    response = requests.get(frame_url, timeout=5)
+    response.raise_for_status()
+    npimg = np.frombuffer(response.content, np.uint8)
+    return cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+
 # Initialize database
+captures_db = CaptureStore(DB_PATH, CAPTURE_DB_POOL)
+capture_files = CaptureFiles(CAPTURES_PATH, CAPTURE_DEDUP_BITS, CAPTURE_DEDUP_WINDOW_S)
+tracker = FishTracker(DETECT_EVENT_IOU, DETECT_EVENT_GAP_S, DETECT_EVENT_MAX_S)
+
 def init_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     os.makedirs(CAPTURES_PATH, exist_ok=True)
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Check if species_confidence column exists
-    c.execute("PRAGMA table_info(captures)")
-    columns = [col[1] for col in c.fetchall()]
-    
-    if 'species_confidence' not in columns:
-        # Add new columns for species identification
-        print("Upgrading database schema for species identification...")
-        c.execute('ALTER TABLE captures ADD COLUMN species_confidence REAL')
-        c.execute('ALTER TABLE captures ADD COLUMN species_top3 TEXT')
-        print("✓ Database schema upgraded")
-
-    if 'slot_id' not in columns:
-        c.execute('ALTER TABLE captures ADD COLUMN slot_id TEXT')
-        print("✓ Added slot_id column to captures table")
-
-    if 'gemini_species' not in columns:
-        c.execute('ALTER TABLE captures ADD COLUMN gemini_species TEXT')
-        c.execute('ALTER TABLE captures ADD COLUMN gemini_response TEXT')
-        print("✓ Added gemini_species / gemini_response columns to captures table")
-
-    c.execute('''CREATE TABLE IF NOT EXISTS captures
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  timestamp TEXT NOT NULL,
-                  image_path TEXT NOT NULL,
-                  person_detected INTEGER,
-                  fish_detected INTEGER,
-                  person_confidence REAL,
-                  fish_confidence REAL,
-                  species TEXT,
-                  species_confidence REAL,
-                  species_top3 TEXT,
-                  location TEXT,
-                  slot_id TEXT,
-                  gemini_species TEXT,
-                  gemini_response TEXT)''')
-    conn.commit()
-    conn.close()
+    captures_db.init()
 
 init_db()
 
-def preprocess_detection(image):
-    """Preprocess image for YOLOv8 fish detection"""
-    img_resized = cv2.resize(image, (640, 640))
-    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-    img_gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
-    img_3ch = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2RGB)
-    img_normalized = img_3ch.astype(np.float32) / 255.0
-    img_chw = img_normalized.transpose(2, 0, 1)
-    img_batch = np.expand_dims(img_chw, axis=0)
-    return img_batch
-
-def preprocess_species(image):
-    """Preprocess image for species classification"""
-    # Resize to model input size
-    img_resized = cv2.resize(image, (species_input_size, species_input_size))
-    
-    # Convert BGR to RGB
-    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-    
-    # Normalize to [0, 1]
-    img_normalized = img_rgb.astype(np.float32) / 255.0
-    
-    # ImageNet normalization (EfficientNet standard)
-    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-    img_normalized = (img_normalized - mean) / std
-    
-    # CHW format
-    img_chw = img_normalized.transpose(2, 0, 1)
-    img_batch = np.expand_dims(img_chw, axis=0)
-    
-    return img_batch
+def crop_detection(image, box, pad=DETECT_CROP_PAD, min_side=DETECT_CROP_MIN):
+    """Crop a detection box from a frame with pad × box size added on every side,
+    grown to at least min_side pixels and clipped to the frame. Returns a view."""
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = box
+    pad_x = max((x2 - x1) * pad, (min_side - (x2 - x1)) / 2, 0)
+    pad_y = max((y2 - y1) * pad, (min_side - (y2 - y1)) / 2, 0)
+    x1, x2 = max(0, int(x1 - pad_x)), min(width, int(round(x2 + pad_x)))
+    y1, y2 = max(0, int(y1 - pad_y)), min(height, int(round(y2 + pad_y)))
+    if x2 <= x1 or y2 <= y1:
+        return image
+    return image[y1:y2, x1:x2]
 
 def _call_gemini_api(img_b64):
     """Make one Gemini Vision API call. Returns parsed dict or raises."""
@@ -230,12 +299,11 @@ def _call_gemini_api(img_b64):
 
 def identify_species_gemini(img):
     """
-    Send captured JPEG to Gemini Vision for Ontario fish species identification.
-    Enforces a cooldown between calls and retries once on 429.
+    Send a capture to Gemini Vision for Ontario fish species identification.
+    The image is downscaled to GEMINI_MAX_SIDE before upload. Rate limiting is
+    gemini_queue's job: a 429 raises RateLimited for the queue to retry.
     Returns dict: common_name, scientific_name, confidence, visual_features, ontario_note
     """
-    global _gemini_last_call
-
     if not GEMINI_API_KEY:
         return {
             'common_name': 'Unknown', 'scientific_name': '', 'confidence': 'low',
@@ -243,21 +311,11 @@ def identify_species_gemini(img):
             'ontario_note': '', 'source': 'gemini_unavailable'
         }
 
-    # Enforce cooldown — prevents burst calls consuming free-tier quota
-    now = time.time()
-    elapsed = now - _gemini_last_call
-    if elapsed < GEMINI_COOLDOWN_SEC:
-        wait_left = int(GEMINI_COOLDOWN_SEC - elapsed)
-        print(f"⚠ Gemini cooldown — {wait_left}s remaining")
-        return {
-            'common_name': 'Unknown', 'scientific_name': '', 'confidence': 'low',
-            'visual_features': f'Please wait {wait_left}s before next identification.',
-            'ontario_note': '', 'source': 'cooldown'
-        }
-
-    _gemini_last_call = time.time()
-
-    # Encode image
+    # Downscale and encode — a 1080p capture is ~4x the bytes Gemini needs
+    height, width = img.shape[:2]
+    if max(height, width) > GEMINI_MAX_SIDE:
+        scale = GEMINI_MAX_SIDE / max(height, width)
+        img = cv2.resize(img, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
     _, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
     img_b64 = base64.b64encode(buf.tobytes()).decode('utf-8')
 
@@ -269,23 +327,13 @@ def identify_species_gemini(img):
 
     except requests.exceptions.HTTPError as e:
         if e.response is not None and e.response.status_code == 429:
-            # Rate limited — wait and retry once
-            print(f"⚠ Gemini 429 rate limit — waiting {GEMINI_RETRY_WAIT}s then retrying...")
-            time.sleep(GEMINI_RETRY_WAIT)
-            try:
-                result = _call_gemini_api(img_b64)
-                result['source'] = 'gemini'
-                print(f"✓ Gemini ID (retry): {result.get('common_name')} ({result.get('confidence')})")
-                return result
-            except requests.exceptions.HTTPError as e2:
-                if e2.response is not None and e2.response.status_code == 429:
-                    return {
-                        'common_name': 'Unknown', 'scientific_name': '', 'confidence': 'low',
-                        'visual_features': 'Gemini rate limit reached. Free tier allows ~10 requests/min. Wait 1 minute and try again.',
-                        'ontario_note': '', 'source': 'rate_limited'
-                    }
-                raise e2
-        raise
+            raise RateLimited(_retry_after(e.response))
+        print(f"⚠ Gemini Vision error: {e}")
+        return {
+            'common_name': 'Unknown', 'scientific_name': '', 'confidence': 'low',
+            'visual_features': f'Identification error: {str(e)[:100]}',
+            'ontario_note': '', 'source': 'gemini_error'
+        }
 
     except requests.exceptions.Timeout:
         print("⚠ Gemini Vision timeout")
@@ -303,6 +351,42 @@ def identify_species_gemini(img):
         }
 
 
+def _retry_after(response):
+    """Seconds a 429 asks us to wait: Retry-After header, else the RetryInfo
+    retryDelay ("17s") in Gemini's error body. None if neither is there."""
+    header = response.headers.get('Retry-After', '')
+    if header.replace('.', '', 1).isdigit():
+        return float(header)
+    try:
+        for detail in response.json().get('error', {}).get('details', []):
+            delay = detail.get('retryDelay', '')
+            if delay.endswith('s'):
+                return float(delay[:-1])
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+def _identify_file(image_path):
+    """gemini_queue's identify function: one capture image → Gemini result dict."""
+    img = cv2.imread(image_path)
+    if img is None:
+        raise ValueError('Failed to decode capture image')
+    return identify_species_gemini(img)
+
+
+def _store_gemini(job, result):
+    # Persist result to DB — overwrites prior attempt so UI always shows latest
+    captures_db.set_gemini(job['capture_id'], result)
+
+
+gemini_queue = IdentifyQueue(
+    _identify_file, TokenBucket(GEMINI_RATE_PER_MIN, GEMINI_BURST), on_done=_store_gemini,
+    # Only real identifications are cached — "Try Again" after an Unknown must ask again
+    cacheable=lambda r: r.get('source') == 'gemini' and r.get('common_name', 'Unknown') != 'Unknown',
+    workers=GEMINI_WORKERS, max_pending=GEMINI_QUEUE_MAX, retry_wait=GEMINI_RETRY_WAIT)
+
+
 def classify_species(image):
     """
     Classify fish species from image.
@@ -311,92 +395,37 @@ def classify_species(image):
     NOTE: This model was trained on Australian/Indo-Pacific fish. For Ontario
     freshwater species, use identify_species_gemini() instead.
     """
-    input_tensor = preprocess_species(image)
-    outputs = species_session.run(None, {species_input_name: input_tensor})
-    log_probs = outputs[0][0]
-
-    # Convert log-softmax → probability (values were negative raw log-softmax)
-    probabilities = np.exp(log_probs)
-
-    top_3_idx = np.argsort(probabilities)[-3:][::-1]
-    top_3_predictions = [
-        {
-            'species': idx_to_species.get(int(idx), f"unknown_class_{idx}"),
-            'confidence': float(probabilities[idx])
-        }
-        for idx in top_3_idx
-    ]
-
-    best_species = top_3_predictions[0]['species']
-    best_confidence = top_3_predictions[0]['confidence']
+    return classify_species_batch([image])[0]
 
-    return best_species, best_confidence, top_3_predictions
 
+def classify_species_batch(images):
+    """classify_species() for several images in as few ONNX runs as possible."""
+    outputs = species_runner.run(species_pre(images))
+    results = []
+    for output in outputs:
+        log_probs = output[0]
 
-def compute_iou(b1, b2):
-    """Compute IoU between two bounding boxes (center format: x_center, y_center, w, h)."""
-    ax1 = b1['x_center'] - b1['width'] / 2
-    ay1 = b1['y_center'] - b1['height'] / 2
-    ax2 = b1['x_center'] + b1['width'] / 2
-    ay2 = b1['y_center'] + b1['height'] / 2
+        # Convert log-softmax → probability (values were negative raw log-softmax)
+        probabilities = np.exp(log_probs)
 
-    bx1 = b2['x_center'] - b2['width'] / 2
-    by1 = b2['y_center'] - b2['height'] / 2
-    bx2 = b2['x_center'] + b2['width'] / 2
-    by2 = b2['y_center'] + b2['height'] / 2
+        top_3_idx = np.argsort(probabilities)[-3:][::-1]
+        top_3_predictions = [
+            {
+                'species': idx_to_species.get(int(idx), f"unknown_class_{idx}"),
+                'confidence': float(probabilities[idx])
+            }
+            for idx in top_3_idx
+        ]
 
-    ix1, iy1 = max(ax1, bx1), max(ay1, by1)
-    ix2, iy2 = min(ax2, bx2), min(ay2, by2)
-
-    if ix2 <= ix1 or iy2 <= iy1:
-        return 0.0
-
-    inter = (ix2 - ix1) * (iy2 - iy1)
-    area_a = (ax2 - ax1) * (ay2 - ay1)
-    area_b = (bx2 - bx1) * (by2 - by1)
-    return inter / (area_a + area_b - inter)
-
-
-def apply_nms(detections, iou_threshold=0.4):
-    """Collapse overlapping bounding boxes — keeps highest-confidence box per cluster."""
-    if len(detections) <= 1:
-        return detections
-    detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
-    kept = []
-    suppressed = set()
-    for i in range(len(detections)):
-        if i in suppressed:
-            continue
-        kept.append(detections[i])
-        for j in range(i + 1, len(detections)):
-            if j not in suppressed:
-                if compute_iou(detections[i]['bbox'], detections[j]['bbox']) > iou_threshold:
-                    suppressed.add(j)
-    return kept
+        best_species = top_3_predictions[0]['species']
+        best_confidence = top_3_predictions[0]['confidence']
+        results.append((best_species, best_confidence, top_3_predictions))
+    return results
 
 
 def postprocess_detections(outputs, confidence_threshold=0.45):
     """Post-process YOLOv8 fish detection output with NMS to suppress duplicate boxes."""
-    predictions = outputs[0][0]
-    predictions = predictions.T
-
-    detections = []
-    for pred in predictions:
-        x_center, y_center, width, height, fish_confidence = pred
-
-        if fish_confidence > confidence_threshold:
-            detections.append({
-                'class_name': 'fish',
-                'confidence': float(fish_confidence),
-                'bbox': {
-                    'x_center': float(x_center),
-                    'y_center': float(y_center),
-                    'width': float(width),
-                    'height': float(height)
-                }
-            })
-
-    return apply_nms(detections)
+    return yolo_detections(outputs[0][0], confidence_threshold)
 
 @app.route('/detect/status', methods=['GET'])
 def detection_status():
@@ -442,11 +471,118 @@ def detection_status():
         'camera_status': 'online' if camera_online else 'offline',
         'fish_detection_slots': fish_detection_slots,
         'slot_statuses': slot_statuses,
+        'frame_bus_slots': frame_bus.slots(),
+        'scheduler': scheduler.status(),
+        'capture_files': capture_files.stats(),
+        'gemini_queue': gemini_queue.stats(),
         'ready': True,
         'model': 'YOLOv8n + EfficientNet-483',
         'classes': str(len(species_map)) + ' species',
     })
 
+# One inference at a time — the scheduler and on-demand requests share the CPU
+_inference_lock = threading.Lock()
+
+
+def run_detection(img, slot_id, save=True, track=True):
+    """Fish detection + species classification on one BGR frame.
+    Detections feed the fish tracker when save is True; a capture is saved when
+    a new fish event starts. With track=False (a single still) the frame is not
+    tracked and a capture is saved whenever a fish is seen. Returns the result dict."""
+    return run_detection_batch([(img, slot_id, save)], track=track)[0]
+
+
+def run_detection_batch(frames, track=True):
+    """run_detection() for several frames — frames is a list of (img, slot_id, save),
+    at most one frame per slot (input tensors are reused per slot).
+    Detection runs as one batch where the model allows it, and the crops of
+    every detection are classified in one species batch. Results are in input order."""
+    with _inference_lock:
+        # Step 1: Fish Detection
+        inputs, letterboxes = [], []
+        for img, slot_id, _ in frames:
+            tensor, lb = detection_pre(img, slot_id)
+            inputs.append(tensor)
+            letterboxes.append(lb)
+        outputs = detection_runner.run(inputs)
+        all_detections = [postprocess_detections([output], confidence_threshold=0.25)
+                          for output in outputs]
+
+        # Step 2: ONNX species classifier on each detection's crop
+        crops, owners = [], []
+        for (img, _, _), lb, detections in zip(frames, letterboxes, all_detections):
+            for d in detections:
+                d['box'] = lb.box(d['bbox'])
+                d['bbox'] = lb.bbox(d['bbox'])      # model space → frame pixels
+                crops.append(crop_detection(img, d['box']))
+                owners.append(d)
+        if crops:
+            for d, (name, conf, top3) in zip(owners, classify_species_batch(crops)):
+                d['species'], d['species_confidence'], d['species_top3'] = name, conf, top3
+
+    # Step 3: Gemini Vision — NOT called automatically.
+    # User calls POST /detect/identify/<capture_id> on demand to avoid rate limits.
+
+    results = []
+    for i, (img, slot_id, save) in enumerate(frames):
+        detections = all_detections[i]
+        fish_detected = len(detections) > 0
+        best = max(detections, key=lambda d: d['confidence']) if fish_detected else {}
+        fish_confidence = best.get('confidence', 0.0)
+        species_name = best.get('species')
+        species_confidence = best.get('species_confidence')
+        species_top3 = best.get('species_top3')
+
+        # Person detection (disabled for now)
+        person_detected = False
+        person_confidence = 0.0
+
+        # Auto-capture: one capture per fish event, saved when the event starts
+        capture_triggered = False
+        deduplicated = False
+        capture_id = None
+
+        if fish_detected and save:
+            # An untracked still is its own event; tracked frames capture when an event starts
+            events, started = (tracker.update(slot_id, img, detections, datetime.now())
+                               if track else ([], []))
+            if started or not track:
+                capture_id, deduplicated = save_capture(
+                    img,
+                    person_confidence,
+                    fish_confidence,
+                    species_name,
+                    species_confidence,
+                    species_top3,
+                    slot_id=slot_id,
+                    gemini_result=None,
+                    detections=detections
+                )
+                for event in started:
+                    event.capture_id = capture_id
+                capture_triggered = not deduplicated
+                if DETECT_EVENT_CLIPS and started and slot_id:
+                    request_clip(slot_id)
+            if events:
+                capture_id = next(e for d, e in zip(detections, events) if d is best).capture_id
+
+        results.append({
+            'timestamp': datetime.now().isoformat(),
+            'slot_id': slot_id,
+            'detections': detections,
+            'person_detected': person_detected,
+            'person_confidence': person_confidence,
+            'fish_detected': fish_detected,
+            'fish_confidence': fish_confidence,
+            'species': species_name,
+            'species_confidence': species_confidence,
+            'capture_triggered': capture_triggered,
+            'deduplicated': deduplicated,
+            'capture_id': capture_id,
+            'event_id': best.get('event_id'),
+        })
+    return results
+
 @app.route('/detect/frame', methods=['POST'])
 def detect_frame():
     """Detect fish and identify species"""
@@ -459,226 +595,234 @@ def detect_frame():
     img = None
 
     if 'image' in request.files:
+        # An uploaded still is not from any camera — keep it out of the slot's tracks and dedup
         file = request.files['image']
         npimg = np.frombuffer(file.read(), np.uint8)
         img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+        if img is None:
+            return jsonify({'error': 'Failed to decode image'}), 400
+        return jsonify(run_detection(img, UPLOAD_SLOT, track=False))
     else:
-        # Fetch from per-slot endpoint if slot_id known, else fall back to legacy URL
-        if slot_id:
-            frame_url = f'http://localhost:8084/camera/frame/{slot_id}'
+        # Raw frame from the shared-memory bus — no JPEG round trip
+        frame = fetch_bus_frame(slot_id) if slot_id else None
+        if frame is not None:
+            img = frame[1]
         else:
-            frame_url = CAMERA_STREAM_URL
-        try:
-            response = requests.get(frame_url, timeout=5)
-            if response.status_code == 200:
-                npimg = np.frombuffer(response.content, np.uint8)
-                img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-            else:
+            # Not on the bus: JPEG from per-slot endpoint if slot_id known, else legacy URL
+            try:
+                img = fetch_http_frame(slot_id)
+            except requests.exceptions.HTTPError:
                 return jsonify({'status': 'offline', 'reason': 'camera unavailable', 'detections': [], 'slot_id': slot_id})
-        except Exception as e:
-            return jsonify({'status': 'offline', 'reason': f'camera error: {str(e)}', 'detections': [], 'slot_id': slot_id})
+            except Exception as e:
+                return jsonify({'status': 'offline', 'reason': f'camera error: {str(e)}', 'detections': [], 'slot_id': slot_id})
 
     if img is None:
         return jsonify({'error': 'Failed to decode image'}), 400
 
-    # Step 1: Fish Detection
-    img_preprocessed = preprocess_detection(img)
-    outputs = detection_session.run(None, {detection_input_name: img_preprocessed})
-    detections = postprocess_detections(outputs, confidence_threshold=0.25)
-
-    fish_detected = len(detections) > 0
-    fish_confidence = max([d['confidence'] for d in detections]) if fish_detected else 0.0
-
-    # Step 2: ONNX species classifier (background — kept for data, not shown to user)
-    species_name = None
-    species_confidence = None
-    species_top3 = None
-
-    if fish_detected:
-        species_name, species_confidence, species_top3 = classify_species(img)
-
-    # Step 3: Gemini Vision — NOT called automatically.
-    # User calls POST /detect/identify/<capture_id> on demand to avoid rate limits.
-
-    # Person detection (disabled for now)
-    person_detected = False
-    person_confidence = 0.0
-
-    # Auto-capture trigger
-    capture_triggered = fish_detected
-    capture_id = None
-
-    if capture_triggered:
-        capture_id = save_capture(
-            img,
-            person_confidence,
-            fish_confidence,
-            species_name,
-            species_confidence,
-            species_top3,
-            slot_id=slot_id,
-            gemini_result=None
-        )
-
-    return jsonify({
-        'timestamp': datetime.now().isoformat(),
-        'slot_id': slot_id,
-        'detections': detections,
-        'person_detected': person_detected,
-        'person_confidence': person_confidence,
-        'fish_detected': fish_detected,
-        'fish_confidence': fish_confidence,
-        'capture_triggered': capture_triggered,
-        'capture_id': capture_id
-    })
+    return jsonify(run_detection(img, slot_id))
 
 def save_capture(img, person_conf, fish_conf, species=None, species_conf=None,
-                 species_top3=None, slot_id=None, gemini_result=None):
-    """Save capture to database and disk"""
-    timestamp = datetime.now().isoformat()
-    filename = f"catch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-    filepath = os.path.join(CAPTURES_PATH, filename)
+                 species_top3=None, slot_id=None, gemini_result=None, detections=None):
+    """Save capture to database and disk — or reuse the earlier id if it is a near-duplicate.
+    Returns (capture_id, deduplicated)."""
+    image_hash = phash(img)
+    duplicate_id = capture_files.duplicate_of(slot_id, image_hash)
+    if duplicate_id is not None:
+        print(f"✓ Capture skipped: same scene as ID {duplicate_id} (Slot: {slot_id})")
+        return duplicate_id, True
 
-    cv2.imwrite(filepath, img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    timestamp = datetime.now().isoformat()
+    filepath = capture_files.store(img)
 
     gemini_species = gemini_result.get('common_name') if gemini_result else None
-    gemini_json    = json.dumps(gemini_result) if gemini_result else None
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''INSERT INTO captures
-                 (timestamp, image_path, person_detected, fish_detected,
-                  person_confidence, fish_confidence, species, species_confidence,
-                  species_top3, slot_id, gemini_species, gemini_response)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-              (timestamp, filepath, 0, 1,
-               float(person_conf), float(fish_conf),
-               species, float(species_conf) if species_conf else None,
-               json.dumps(species_top3) if species_top3 else None,
-               slot_id, gemini_species, gemini_json))
-    capture_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    capture_id = captures_db.add(timestamp, filepath, person_conf, fish_conf,
+                                 species, species_conf, species_top3, slot_id,
+                                 gemini_species, gemini_result, detections)
+    capture_files.remember(slot_id, image_hash, capture_id)
 
     label = gemini_species or species or 'unidentified'
-    print(f"✓ Capture saved: {filename} (ID: {capture_id}, Species: {label}, Slot: {slot_id})")
-    return capture_id
+    print(f"✓ Capture saved: {os.path.basename(filepath)} (ID: {capture_id}, Species: {label}, Slot: {slot_id})")
+    return capture_id, False
+
+def finish_event(event):
+    """Write a finished fish event into its capture: best frame, duration, species vote.
+    Events that re-found a fish already captured (phash dedup) merge into that row."""
+    frame, best_det, best_dets = event.best
+    if event.capture_id is None:        # ended before its opening capture was saved
+        event.capture_id, _ = save_capture(frame, 0.0, event.best_conf, slot_id=event.slot_id,
+                                           detections=best_dets)
+    row = captures_db.get(event.capture_id)
+    if row is None:
+        return None
+
+    update = event_update(row, event)
+    ended = update['event_end']
+
+    best, old_path = None, None
+    if update['replace_image']:
+        old_path = row['image_path']
+        best = {'image_path': capture_files.store(frame), 'fish_confidence': event.best_conf,
+                'species_top3': best_det.get('species_top3'), 'detections': best_dets}
+        if best['image_path'] == old_path:
+            best, old_path = None, None
+
+    captures_db.update_event(event.capture_id, ended.isoformat(), update['duration_s'],
+                             update['frames'], update['species'], update['species_confidence'],
+                             update['votes'], best)
+    if best:
+        capture_files.remember(event.slot_id, phash(frame), event.capture_id)
+        if not captures_db.image_in_use(old_path):
+            capture_files.remove(old_path)
+
+    summary = {**event.summary(), 'capture_id': event.capture_id, 'started': row['timestamp'],
+               'ended': ended.isoformat(), 'duration_s': round(update['duration_s'], 2),
+               'species': update['species'], 'species_confidence': update['species_confidence'],
+               'votes': update['votes']}
+    print(f"✓ Fish event {event.event_id} ended: {summary['duration_s']}s, {event.frames} frames, "
+          f"{summary['species'] or 'unidentified'} (Capture {event.capture_id}, Slot: {event.slot_id})")
+    broadcast('fish_event', summary)
+    return summary
+
+def request_clip(slot_id):
+    """Ask the camera manager to save a clip around a new fish event — in the
+    background, so detection never waits on it."""
+    def post():
+        try:
+            r = requests.post(CAMERA_CLIPS_URL, json={'slot_id': slot_id, 'event': 'fish'}, timeout=5)
+            if r.status_code == 202:
+                print(f"✓ Fish clip requested: {r.json()['clips'][0]['filename']}")
+            else:
+                print(f"⚠ Fish clip not started ({slot_id}): {r.json().get('error', r.status_code)}")
+        except Exception as e:
+            print(f"⚠ Fish clip request failed ({slot_id}): {e}")
+    threading.Thread(target=post, daemon=True, name='clip-request').start()
+
+def _event_reaper():
+    """Finish fish events once their fish has been out of view for DETECT_EVENT_GAP_S."""
+    while True:
+        time.sleep(1.0)
+        for event in tracker.expire():
+            try:
+                finish_event(event)
+            except Exception as e:
+                print(f"⚠ Fish event {event.event_id} not recorded: {e}")
 
 @app.route('/captures', methods=['GET'])
 def list_captures():
-    """List all captures"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT * FROM captures ORDER BY timestamp DESC LIMIT 50')
-    rows = c.fetchall()
-    conn.close()
-
-    captures = []
-    for row in rows:
-        captures.append({
-            'id': row[0],
-            'timestamp': row[1],
-            'image_path': row[2],
-            'person_detected': bool(row[3]),
-            'fish_detected': bool(row[4]),
-            'person_confidence': row[5],
-            'fish_confidence': row[6],
-            'species': row[7],
-            'location': row[8] if len(row) > 8 else None,
-            'species_confidence': row[9] if len(row) > 9 else None,
-            'species_top3': json.loads(row[10]) if len(row) > 10 and row[10] else None,
-            'slot_id': row[11] if len(row) > 11 else None,
-            'gemini_species': row[12] if len(row) > 12 else None,
-            'gemini_response': json.loads(row[13]) if len(row) > 13 and row[13] else None,
-        })
+    """
+    List captures, newest first, one page at a time.
+    Query: limit (default 50, max 200), cursor (next_cursor of the previous
+    page), slot_id, species, gemini_species, since / until (ISO date or datetime),
+    min_confidence (fish confidence 0-1).
+    """
+    args = request.args
+    try:
+        captures, next_cursor = captures_db.list(
+            limit=int(args.get('limit', PAGE_DEFAULT)),
+            cursor=args.get('cursor'),
+            slot_id=args.get('slot_id'),
+            species=args.get('species'),
+            gemini_species=args.get('gemini_species'),
+            since=args.get('since'),
+            until=args.get('until'),
+            min_confidence=float(args['min_confidence']) if args.get('min_confidence') else None,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify({'captures': captures, 'count': len(captures)})
+    for capture in captures:
+        capture['image_urls'] = _image_urls(capture['id'])
+    return jsonify({'captures': captures, 'count': len(captures), 'next_cursor': next_cursor})
 
 @app.route('/captures/<int:capture_id>', methods=['GET'])
 def get_capture(capture_id):
     """Get capture details"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT * FROM captures WHERE id = ?', (capture_id,))
-    row = c.fetchone()
-    conn.close()
-
-    if not row:
+    capture = captures_db.get(capture_id)
+    if not capture:
         return jsonify({'error': 'Capture not found'}), 404
+    capture['image_urls'] = _image_urls(capture_id)
+    return jsonify(capture)
 
-    return jsonify({
-        'id': row[0],
-        'timestamp': row[1],
-        'image_path': row[2],
-        'person_detected': bool(row[3]),
-        'fish_detected': bool(row[4]),
-        'person_confidence': row[5],
-        'fish_confidence': row[6],
-        'species': row[7],
-        'location': row[8] if len(row) > 8 else None,
-        'species_confidence': row[9] if len(row) > 9 else None,
-        'species_top3': json.loads(row[10]) if len(row) > 10 and row[10] else None,
-        'slot_id': row[11] if len(row) > 11 else None,
-        'gemini_species': row[12] if len(row) > 12 else None,
-        'gemini_response': json.loads(row[13]) if len(row) > 13 and row[13] else None,
-    })
+def _image_urls(capture_id):
+    base = f'/captures/{capture_id}/image'
+    return {'full': base, **{size: f'{base}?size={size}' for size in RENDITIONS}}
 
 @app.route('/captures/<int:capture_id>/image', methods=['GET'])
 def get_capture_image(capture_id):
-    """Get capture image"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT image_path FROM captures WHERE id = ?', (capture_id,))
-    row = c.fetchone()
-    conn.close()
-
-    if not row or not os.path.exists(row[0]):
+    """
+    Get capture image. Query: size = thumb (320 px) | medium (960 px) | full (default).
+    Content-addressed images carry ETag <hash>-<size> and a one-year immutable
+    Cache-Control; older catch_*.jpg files get Flask's default ETag.
+    """
+    size = request.args.get('size', 'full')
+    if size != 'full' and size not in RENDITIONS:
+        return jsonify({'error': f'Unknown size: {size}'}), 400
+    image_path = captures_db.image_path(capture_id)
+    if not image_path:
         return jsonify({'error': 'Image not found'}), 404
-
-    return send_file(row[0], mimetype='image/jpeg')
+    capture_files.wait(image_path)
+    if not os.path.exists(image_path):
+        return jsonify({'error': 'Image not found'}), 404
+    path = capture_files.rendition(image_path, size) if size != 'full' else image_path
+    if not path:
+        return jsonify({'error': 'Failed to render image'}), 500
+
+    digest = content_hash(image_path)
+    response = send_file(path, mimetype='image/jpeg', conditional=True,
+                         etag=f'{digest}-{size}' if digest else True,
+                         max_age=CAPTURE_CACHE_MAX_AGE if digest else None)
+    if digest:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
 
 @app.route('/detect/identify/<int:capture_id>', methods=['POST'])
 def identify_capture(capture_id):
     """
     On-demand species identification for a saved capture via Gemini Vision.
     Called by the angler when they want a species ID — not automatically.
-    Supports retries: call again if first result was low confidence or Unknown.
+    Queues a job and returns 202 with its job_id, position and ETA; poll
+    GET /detect/identify/jobs/<job_id>. An image identified before is answered
+    from the cache (200, status done). refresh=1 skips the cache — "Try Again"
+    after a low-confidence or Unknown result.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT image_path FROM captures WHERE id = ?', (capture_id,))
-    row = c.fetchone()
-    conn.close()
-
-    if not row:
+    image_path = captures_db.image_path(capture_id)
+    if not image_path:
         return jsonify({'error': 'Capture not found'}), 404
-    if not os.path.exists(row[0]):
+    capture_files.wait(image_path)
+    if not os.path.exists(image_path):
         return jsonify({'error': 'Image file not found on disk'}), 404
 
-    img = cv2.imread(row[0])
-    if img is None:
-        return jsonify({'error': 'Failed to decode capture image'}), 400
+    key = content_hash(image_path)
+    if key is None:
+        with open(image_path, 'rb') as f:
+            key = hashlib.sha1(f.read()).hexdigest()
+    try:
+        job = gemini_queue.submit(capture_id, image_path, key,
+                                  refresh=request.args.get('refresh') == '1')
+    except queue.Full as e:
+        return jsonify({'error': f'Identification queue full: {e}'}), 503
+    return jsonify(_job_response(job)), 200 if job['status'] == 'done' else 202
 
-    result = identify_species_gemini(img)
 
-    # Persist result to DB — overwrites prior attempt so UI always shows latest
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        'UPDATE captures SET gemini_species = ?, gemini_response = ? WHERE id = ?',
-        (result.get('common_name'), json.dumps(result), capture_id)
-    )
-    conn.commit()
-    conn.close()
+@app.route('/detect/identify/jobs/<int:job_id>', methods=['GET'])
+def identify_job(job_id):
+    """Status of an identification job: queued (position, eta_s) | running | done | failed."""
+    job = gemini_queue.job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_response(job))
 
-    return jsonify({'capture_id': capture_id, 'gemini_id': result})
+
+def _job_response(job):
+    return {**job, 'gemini_id': job['result'],
+            'status_url': f"/detect/identify/jobs/{job['job_id']}"}
 
 
 @app.route('/detect/reload', methods=['POST'])
 def reload_slots():
     """Re-read slots.json and update fish_detection_slots without restarting the service"""
-    global fish_detection_slots
-    fish_detection_slots = load_fish_detection_slots()
+    refresh_slot_config(force=True)
     print(f"✓ Slots reloaded: fish_detection_slots = {fish_detection_slots}")
     return jsonify({
         'status': 'reloaded',
@@ -686,5 +830,255 @@ def reload_slots():
     })
 
 
+# ── Continuous detection ──────────────────────────────────────────────────────
+
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+
+def broadcast(event_type, data):
+    """Push a Server-Sent Event to every /detect/events client."""
+    payload = f'event: {event_type}\ndata: {json.dumps(data)}\n\n'
+    dead = []
+    with _subscribers_lock:
+        for q in _subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                dead.append(q)
+        for q in dead:
+            _subscribers.remove(q)
+
+
+class DetectionScheduler:
+    """
+    Runs detection continuously on every fish_detection slot.
+
+    Each pass walks the slots round-robin (starting after the last slot
+    served) and collects a new frame from every slot that is due, up to
+    batch_max. A slot is due when its frame bus seq has moved since its last
+    check (slots not on the bus are fetched over HTTP), at most
+    DETECT_MAX_FPS times a second, and its frame passes the motion gate.
+    The collected frames run as one batch — batch_max is capped at the
+    detection model's batch size, so a fixed-batch model runs one frame per
+    pass instead of queueing frames it would run one by one anyway;
+    afterwards the thread sleeps in proportion to the inference time, so
+    inference uses at most cpu_budget of wall time whatever the camera count.
+    Captures follow fish events (tracker.py) — one per fish in view, not
+    one per frame.
+    """
+
+    def __init__(self, cpu_budget=DETECT_CPU_BUDGET, max_fps=DETECT_MAX_FPS,
+                 batch_max=DETECT_BATCH_MAX, gate=None):
+        self.gate         = gate
+        self.cpu_budget   = min(max(cpu_budget, 0.05), 1.0)
+        self.min_interval = 1.0 / max(max_fps, 0.1)
+        self.batch_max    = max(1, min(batch_max, detection_runner.max_batch))
+        self._stop    = threading.Event()
+        self._thread  = None
+        self._next    = 0
+        self._slots   = {}          # slot_id → seq, timings, counters, last result
+        self._busy_s  = 0.0
+        self._batches = 0
+        self._frames  = 0
+        self._started = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='detect-scheduler')
+        self._thread.start()
+        print(f"✓ Detection scheduler started (CPU budget {self.cpu_budget:.0%}, "
+              f"max {1 / self.min_interval:g} fps per camera, batch ≤ {self.batch_max})")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        uptime = time.monotonic() - self._started if self._started else 0.0
+        return {
+            'running':    bool(self._thread and self._thread.is_alive()),
+            'cpu_budget': self.cpu_budget,
+            'cpu_share':  round(self._busy_s / uptime, 3) if uptime else 0.0,
+            'max_fps':    round(1 / self.min_interval, 2),
+            'batch_max':  self.batch_max,
+            'mean_batch': round(self._frames / self._batches, 2) if self._batches else 0.0,
+            'onnx': {'detection': detection_runner.stats(), 'species': species_runner.stats()},
+            'motion_gate': self.gate.stats() if self.gate else None,
+            'events': tracker.stats(),
+            'slots': {     # list() snapshots — the scheduler thread adds slots meanwhile
+                slot_id: {k: v for k, v in list(st.items())
+                          if k not in ('result', 'last_run', 'last_check')}
+                for slot_id, st in list(self._slots.items())
+            },
+        }
+
+    def latest(self):
+        """Last detection result per slot."""
+        return {slot_id: st['result'] for slot_id, st in list(self._slots.items()) if st['result']}
+
+    def _slot(self, slot_id):
+        return self._slots.setdefault(slot_id, {
+            'seq': 0, 'last_run': 0.0, 'last_check': 0.0, 'processed': 0,
+            'unchanged': 0, 'no_motion': 0, 'errors': 0, 'latency_ms': None, 'fps': 0.0,
+            'result': None,
+        })
+
+    def _frame(self, slot_id, st):
+        """New frame for a slot, or None if its seq hasn't changed."""
+        frame = fetch_bus_frame(slot_id, st['seq'])
+        if frame is not None:
+            st['seq'] = frame[0]
+            return frame[1]
+        if slot_id in frame_bus.slots():
+            st['unchanged'] += 1
+            return None
+        return fetch_http_frame(slot_id)
+
+    def _due_frame(self, slot_id, now):
+        """New frame worth detecting on for a slot whose DETECT_MAX_FPS interval
+        has passed, else None."""
+        st = self._slot(slot_id)
+        if now - st['last_check'] < self.min_interval:
+            return None
+        try:
+            img = self._frame(slot_id, st)
+        except Exception as e:
+            st['errors'] += 1
+            st['last_check'] = now          # back off a failing camera at the fps cap
+            print(f"⚠ Scheduler frame error ({slot_id}): {e}")
+            return None
+        if img is None:
+            return None
+        st['last_check'] = now
+        if self.gate and not self.gate.check(slot_id, img):
+            st['no_motion'] += 1
+            return None
+        return img
+
+    def step(self, slots):
+        """One pass over slots. Returns inference seconds (0 = nothing new anywhere)."""
+        now, batch = time.monotonic(), []
+        for i in range(len(slots)):
+            slot_id = slots[(self._next + i) % len(slots)]
+            img = self._due_frame(slot_id, now)
+            if img is not None:
+                batch.append((slot_id, img))
+                if len(batch) >= self.batch_max:
+                    break
+        self._next = (self._next + (i + 1 if len(batch) >= self.batch_max else 1)) % len(slots)
+        if not batch:
+            return 0.0
+
+        frames = [(img, slot_id, True) for slot_id, img in batch]
+        start = time.monotonic()
+        results = run_detection_batch(frames)
+        busy = time.monotonic() - start
+        self._busy_s  += busy
+        self._batches += 1
+        self._frames  += len(batch)
+
+        for (slot_id, _), result in zip(batch, results):
+            st = self._slot(slot_id)
+            if st['last_run']:
+                st['fps'] = round(0.8 * st['fps'] + 0.2 / (start - st['last_run']), 2)
+            st['last_run']   = start
+            st['processed'] += 1
+            st['latency_ms'] = round(busy * 1000, 1)
+            if result['fish_detected'] and self.gate:
+                self.gate.hold(slot_id)
+            result['seq'] = st['seq']
+            result['latency_ms'] = st['latency_ms']
+            result['batch'] = len(batch)
+            st['result'] = result
+            broadcast('detection', result)
+        return busy
+
+    def _run(self):
+        checked_config = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - checked_config > 2.0:
+                checked_config = time.monotonic()
+                try:
+                    refresh_slot_config()
+                except Exception as e:
+                    print(f"⚠ slots.json reload failed: {e}")
+            slots = list(fish_detection_slots)
+            if not slots:
+                self._stop.wait(1.0)
+                continue
+            try:
+                busy = self.step(slots)
+            except Exception as e:
+                print(f"⚠ Scheduler error: {e}")
+                busy = 0.0
+            if busy:
+                self._stop.wait(busy * (1.0 / self.cpu_budget - 1.0))   # stay within budget
+            else:
+                self._stop.wait(0.02)                                   # nothing new anywhere
+
+
+motion_gate = MotionGate(default=DETECT_MOTION_SENSITIVITY, pixel_delta=DETECT_MOTION_DELTA,
+                         max_skip_s=DETECT_MOTION_MAX_SKIP_S, hold_s=DETECT_MOTION_HOLD_S)
+motion_gate.sensitivity = load_motion_sensitivity()
+scheduler = DetectionScheduler(gate=motion_gate if DETECT_MOTION_GATE else None)
+_slots_mtime = os.path.getmtime(SLOTS_CONFIG) if os.path.exists(SLOTS_CONFIG) else None
+
+
+def refresh_slot_config(force=False):
+    """Reload fish_detection slots and motion sensitivity if slots.json changed."""
+    global fish_detection_slots, _slots_mtime
+    mtime = os.path.getmtime(SLOTS_CONFIG) if os.path.exists(SLOTS_CONFIG) else None
+    if mtime == _slots_mtime and not force:
+        return False
+    _slots_mtime = mtime
+    previous = fish_detection_slots
+    fish_detection_slots = load_fish_detection_slots()
+    motion_gate.sensitivity = load_motion_sensitivity()
+    for slot_id in set(previous) - set(fish_detection_slots):
+        detection_pre.forget(slot_id)
+        motion_gate.forget(slot_id)
+    return True
+
+
+@app.route('/detect/events', methods=['GET'])
+def detection_events():
+    """Server-Sent Events: one 'detection' event per scheduler result,
+    one 'fish_event' per finished fish event."""
+    def generate():
+        q = queue.Queue(maxsize=50)
+        with _subscribers_lock:
+            _subscribers.append(q)
+        yield f'event: heartbeat\ndata: {json.dumps({"ts": datetime.now().isoformat()})}\n\n'
+        try:
+            while True:
+                try:
+                    yield q.get(timeout=30)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        except GeneratorExit:
+            with _subscribers_lock:
+                if q in _subscribers:
+                    _subscribers.remove(q)
+
+    return app.response_class(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/detect/scheduler', methods=['GET'])
+def scheduler_status():
+    """Scheduler throughput per slot plus the latest result for each."""
+    return jsonify({**scheduler.status(), 'latest': scheduler.latest(),
+                    'active_events': tracker.active(), 'subscribers': len(_subscribers)})
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8086, debug=False)
\ No newline at end of file
+    threading.Thread(target=_event_reaper, daemon=True, name='event-reaper').start()
+    if DETECT_SCHEDULER:
+        scheduler.start()
+    app.run(host='0.0.0.0', port=8086, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+d3kOS Frame Bus — raw camera frames in shared memory
+Pi path: /opt/d3kos/services/marine-vision/frame_bus.py
+
+camera_stream_manager publishes each decoded frame of a fish_detection
+camera into a POSIX shared-memory ring; fish_detector maps the ring and
+copies the newest frame out directly. That replaces the JPEG encode, HTTP
+transfer and JPEG decode per inference with one memcpy.
+
+Segments (/dev/shm):
+  d3kos_frames_<hardware_id>   one ring per camera
+      header  magic, version, ring size, state, slot capacity, latest seq,
+              reader heartbeat
+      slots   RING_SLOTS × (seq, timestamp, height, width, channels) + pixels
+  d3kos_frame_index            slot_id → ring name (JSON), generation counter
+
+Consistency: the writer zeroes a slot's seq before copying pixels and sets
+it after, then advances the header's latest seq. A reader copies the slot
+and re-checks its seq; a frame overwritten mid-copy is discarded and read
+again. A ring that has to grow (e.g. sub → main stream) is marked retired
+and replaced under the same name; readers re-attach on their next read.
+Sequence numbers start from the wall clock in milliseconds, so they keep
+increasing across a camera manager restart, and readers re-map a ring or
+index that has not changed for STALE_S in case the writer was replaced.
+
+Readers write a heartbeat into the ring header, so the camera manager
+counts the detector as a consumer of that camera.
+"""
+
+import json
+import os
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+from threading import Lock
+from typing import Optional, Tuple
+
+import numpy as np
+
+RING_SLOTS = int(os.getenv('FRAME_BUS_RING', '3'))
+INDEX_NAME = os.getenv('FRAME_BUS_INDEX', 'd3kos_frame_index')
+INDEX_SIZE = 64 * 1024
+STALE_S    = 2.0   # re-map a segment that hasn't changed for this long
+
+_MAGIC   = b'D3FB'
+_VERSION = 1
+_LIVE, _RETIRED = 0, 1
+
+# magic, version, ring, state, capacity, latest_seq, reader_ts
+_HEADER = struct.Struct('<4sIIIQQd')
+# seq, timestamp, height, width, channels
+_SLOT   = struct.Struct('<QdIII4x')
+# magic, version, generation, length
+_INDEX  = struct.Struct('<4sIQI')
+
+_STATE_OFF  = 12
+_LATEST_OFF = 24
+_READER_OFF = 32
+
+
+def segment_name(hardware_id: str) -> str:
+    return f'd3kos_frames_{hardware_id}'
+
+
+def _attach(name: str) -> Optional[shared_memory.SharedMemory]:
+    """Map an existing segment without registering it for cleanup in this process.
+    Before Python 3.13 every attach is tracked, and the resource tracker
+    would unlink the writer's segment when the reader exits.
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except (FileNotFoundError, OSError):
+        return None
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+
+def _create(name: str, size: int) -> shared_memory.SharedMemory:
+    """Create a segment, replacing a stale one left by a killed process."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        stale = _attach(name)
+        if stale is not None:
+            if stale.size >= _HEADER.size and bytes(stale.buf[:4]) == _MAGIC:
+                struct.pack_into('<I', stale.buf, _STATE_OFF, _RETIRED)
+            stale.close()
+            stale.unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+def _slot_offset(ring: int, capacity: int, k: int) -> Tuple[int, int]:
+    """(slot header offset, pixel data offset) of ring slot k."""
+    hdr = _HEADER.size + k * _SLOT.size
+    return hdr, _HEADER.size + ring * _SLOT.size + k * capacity
+
+
+# ── Writer (camera_stream_manager) ────────────────────────────────────────────
+
+class FrameRing:
+    """Writer side of one camera's ring. Segment created on the first publish."""
+
+    def __init__(self, name: str, ring: int = RING_SLOTS):
+        self.name  = name
+        self.ring  = max(2, ring)
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._capacity = 0
+        self._seq  = int(time.time() * 1000)   # above any seq of a previous run
+        self._lock = Lock()
+
+    def publish(self, frame: np.ndarray, ts: Optional[float] = None) -> int:
+        """Copy a uint8 HxWxC frame into the next ring slot. Returns its seq."""
+        with self._lock:
+            if self._shm is None or frame.nbytes > self._capacity:
+                self._allocate(frame.nbytes)
+            self._seq += 1
+            k = self._seq % self.ring
+            hdr_off, data_off = _slot_offset(self.ring, self._capacity, k)
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            buf = self._shm.buf
+            struct.pack_into('<Q', buf, hdr_off, 0)            # slot being written
+            dst = np.ndarray(frame.shape, dtype=np.uint8, buffer=buf, offset=data_off)
+            np.copyto(dst, frame)
+            del dst
+            _SLOT.pack_into(buf, hdr_off, self._seq, ts or time.time(), height, width, channels)
+            struct.pack_into('<Q', buf, _LATEST_OFF, self._seq)
+            return self._seq
+
+    def reader_active(self, within_s: float) -> bool:
+        """True if a reader has taken a frame in the last within_s seconds."""
+        with self._lock:
+            if self._shm is None:
+                return False
+            reader_ts, = struct.unpack_from('<d', self._shm.buf, _READER_OFF)
+        return time.time() - reader_ts < within_s
+
+    def close(self) -> None:
+        """Retire and remove the segment."""
+        with self._lock:
+            self._release()
+
+    def _allocate(self, nbytes: int) -> None:
+        """(Re)create the segment with room for nbytes per slot. Caller holds the lock."""
+        reader_ts = 0.0
+        if self._shm is not None:
+            reader_ts, = struct.unpack_from('<d', self._shm.buf, _READER_OFF)
+            self._release()
+        size = _HEADER.size + self.ring * (_SLOT.size + nbytes)
+        self._shm = _create(self.name, size)
+        self._capacity = nbytes
+        self._shm.buf[:_HEADER.size + self.ring * _SLOT.size] = bytes(
+            _HEADER.size + self.ring * _SLOT.size)
+        _HEADER.pack_into(self._shm.buf, 0, _MAGIC, _VERSION, self.ring, _LIVE,
+                          nbytes, self._seq, reader_ts)
+
+    def _release(self) -> None:
+        if self._shm is None:
+            return
+        struct.pack_into('<I', self._shm.buf, _STATE_OFF, _RETIRED)
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+
+class FrameIndex:
+    """Writer side of the slot_id → ring name index."""
+
+    def __init__(self, name: str = INDEX_NAME):
+        self._shm = _create(name, INDEX_SIZE)
+        self._generation = 0
+        _INDEX.pack_into(self._shm.buf, 0, _MAGIC, _VERSION, 0, 0)
+
+    def write(self, mapping: dict) -> None:
+        payload = json.dumps(mapping).encode()[:INDEX_SIZE - _INDEX.size]
+        buf = self._shm.buf
+        self._generation += 1                                   # odd: being written
+        _INDEX.pack_into(buf, 0, _MAGIC, _VERSION, self._generation, 0)
+        buf[_INDEX.size:_INDEX.size + len(payload)] = payload
+        self._generation += 1
+        _INDEX.pack_into(buf, 0, _MAGIC, _VERSION, self._generation, len(payload))
+
+    def close(self) -> None:
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ── Reader (fish_detector) ────────────────────────────────────────────────────
+
+class FrameReader:
+    """Reader side of one camera's ring. Attaches lazily; survives ring replacement."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._latest  = 0
+        self._changed = 0.0       # monotonic time latest seq last moved
+
+    def read(self, after_seq: int = 0, out: Optional[np.ndarray] = None
+             ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """
+        Newest frame as (seq, timestamp, frame) if its seq is greater than
+        after_seq, else None. The frame is copied into out when out has the
+        right shape, otherwise into a new array. None also when no writer.
+        """
+        for _ in range(3):
+            buf = self._buffer()
+            if buf is None:
+                return None
+            magic, _, ring, state, capacity, latest, _ = _HEADER.unpack_from(buf, 0)
+            if magic != _MAGIC or state == _RETIRED:
+                self.close()
+                continue
+            struct.pack_into('<d', buf, _READER_OFF, time.time())   # heartbeat
+            now = time.monotonic()
+            if latest != self._latest:
+                self._latest, self._changed = latest, now
+            elif now - self._changed > STALE_S:
+                self.close()                       # writer may have been replaced
+                self._changed = now
+                continue
+            if latest == 0 or latest <= after_seq:
+                return None
+            hdr_off, data_off = _slot_offset(ring, capacity, latest % ring)
+            seq, ts, height, width, channels = _SLOT.unpack_from(buf, hdr_off)
+            if seq != latest:
+                continue                                   # overwritten before we got here
+            shape = (height, width, channels) if channels > 1 else (height, width)
+            src = np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=data_off)
+            if out is None or out.shape != shape:
+                out = np.empty(shape, dtype=np.uint8)
+            np.copyto(out, src)
+            del src
+            if struct.unpack_from('<Q', buf, hdr_off)[0] == seq:
+                return seq, ts, out
+        return None
+
+    def close(self) -> None:
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                pass
+            self._shm = None
+
+    def _buffer(self):
+        if self._shm is None:
+            self._shm = _attach(self.name)
+        return self._shm.buf if self._shm is not None else None
+
+
+class FrameBusClient:
+    """Detector-side view of the bus: slot_id → newest raw frame."""
+
+    def __init__(self, index_name: str = INDEX_NAME):
+        self._index_name = index_name
+        self._index: Optional[shared_memory.SharedMemory] = None
+        self._attached = 0.0
+        self._generation = -1
+        self._slots: dict = {}                 # slot_id → ring name
+        self._readers: dict = {}               # ring name → FrameReader
+        self._lock = Lock()
+
+    def read(self, slot_id: str, after_seq: int = 0, out: Optional[np.ndarray] = None
+             ) -> Optional[Tuple[int, float, np.ndarray]]:
+        """(seq, timestamp, frame) for a slot, or None if the slot isn't on the bus
+        or has no frame newer than after_seq."""
+        with self._lock:
+            self._refresh_index()
+            name = self._slots.get(slot_id)
+            if name is None:
+                return None
+            reader = self._readers.get(name)
+            if reader is None:
+                reader = self._readers[name] = FrameReader(name)
+        return reader.read(after_seq, out)
+
+    def slots(self) -> list:
+        with self._lock:
+            self._refresh_index()
+            return list(self._slots)
+
+    def _refresh_index(self) -> None:
+        """Re-read the index if its generation changed. Caller holds the lock."""
+        now = time.monotonic()
+        if self._index is not None and now - self._attached > STALE_S:
+            self._index.close()                    # pick up a restarted writer's index
+            self._index = None
+        if self._index is None:
+            self._index = _attach(self._index_name)
+            self._attached = now
+            self._generation = -1
+            if self._index is None:
+                self._slots = {}
+                return
+        buf = self._index.buf
+        magic, _, generation, length = _INDEX.unpack_from(buf, 0)
+        if magic != _MAGIC or generation == self._generation or generation % 2:
+            return
+        payload = bytes(buf[_INDEX.size:_INDEX.size + length])
+        if _INDEX.unpack_from(buf, 0)[2] != generation:
+            return                                   # rewritten while we read it
+        try:
+            self._slots = json.loads(payload) if payload else {}
+        except ValueError:
+            return
+        self._generation = generation
+        for name in set(self._readers) - set(self._slots.values()):
+            self._readers.pop(name).close()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+d3kOS Gemini Queue — background, rate-limited species identification jobs
+Pi path: /opt/d3kos/services/marine-vision/gemini_queue.py
+
+POST /detect/identify/<id> used to call Gemini Vision inside the request and
+sleep through 429s, holding a Flask worker for up to half a minute. Now:
+
+  TokenBucket     rate_per_min tokens a minute, up to burst saved — matched to
+                  the Gemini quota so a burst of identify taps drains at the
+                  highest rate the key allows instead of tripping 429s.
+                  A 429 empties the bucket and pauses it for Retry-After.
+  IdentifyQueue   submit() returns a job at once; worker threads take a token,
+                  run the identify function and hand the result to on_done
+                  (fish_detector stores it in captures.db). A job for an image
+                  already queued or running is that job; a result for an image
+                  identified before comes from an LRU cache keyed by its hash
+                  without a call. RateLimited from the identify function puts
+                  the job back until max_attempts — at the head of the queue,
+                  ahead of jobs submitted since, and not before Retry-After.
+
+Job states: queued → running → done | failed. job() adds the queue position
+and an ETA from the bucket rate. Workers take jobs in queue order, so the
+position reported is the order they run in; a job still inside its retry
+delay is left in the queue for any worker to take when it is due.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class RateLimited(Exception):
+    """The API answered 429. retry_after in seconds, if it said."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__(f'rate limited (retry after {retry_after}s)')
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Blocking token bucket: rate_per_min refill, burst capacity."""
+
+    def __init__(self, rate_per_min: float, burst: int = 1):
+        self.rate     = max(rate_per_min, 0.1) / 60.0     # tokens per second
+        self.capacity = max(1, burst)
+        self._tokens  = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def take(self, stop: Optional[threading.Event] = None) -> bool:
+        """Wait for a token. False if stop was set first."""
+        while True:
+            with self._lock:
+                wait = self._wait_locked()
+                if wait <= 0:
+                    self._tokens -= 1.0
+                    return True
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket and hand out nothing for seconds (after a 429)."""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            self._paused_until = max(self._paused_until, self._updated + seconds)
+
+    def eta(self, position: int) -> float:
+        """Seconds until the job at this queue position (0 = next) gets its token."""
+        with self._lock:
+            self._wait_locked()
+            tokens = self._tokens
+            paused = max(0.0, self._paused_until - time.monotonic())
+        return paused + max((position + 1 - tokens) / self.rate, 0.0)   # refill starts after a pause
+
+    def _wait_locked(self) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        start = max(self._updated, self._paused_until)
+        self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = now
+        return 0.0 if self._tokens >= 1.0 else (1.0 - self._tokens) / self.rate
+
+
+class IdentifyQueue:
+    """Identification jobs run by worker threads at the bucket's rate."""
+
+    def __init__(self, identify: Callable[[str], dict], bucket: TokenBucket,
+                 on_done: Optional[Callable[[dict, dict], None]] = None,
+                 cacheable: Callable[[dict], bool] = lambda result: True,
+                 workers: int = 1, max_pending: int = 50, max_attempts: int = 3,
+                 retry_wait: float = 8.0, cache_size: int = 256, keep_jobs: int = 200):
+        self.identify     = identify
+        self.bucket       = bucket
+        self.on_done      = on_done
+        self.cacheable    = cacheable
+        self.max_pending  = max_pending
+        self.max_attempts = max_attempts
+        self.retry_wait   = retry_wait
+        self.cache_size   = cache_size
+        self.keep_jobs    = keep_jobs
+        self.calls = self.cache_hits = self.rate_limited = self.failed = 0
+        self._ids     = itertools.count(1)
+        self._jobs    = OrderedDict()   # job_id → job
+        self._active  = {}              # image key → job queued or running
+        self._cache   = OrderedDict()   # image key → result
+        self._order   = []              # queued job_ids in run order: retries, then oldest first
+        self._queued  = {}              # job_id → queued job
+        self._stop    = threading.Event()
+        self._lock    = threading.Lock()
+        self._ready   = threading.Condition(self._lock)   # a job was queued, or stop
+        for n in range(max(1, workers)):
+            threading.Thread(target=self._worker, daemon=True, name=f'gemini-{n}').start()
+
+    def submit(self, capture_id: int, image_path: str, key: str, refresh: bool = False) -> dict:
+        """Queue an identification (or answer it from the cache). Returns the job.
+        Raises queue.Full when max_pending jobs are already waiting."""
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and active['capture_id'] == capture_id:
+                return self._view(active)
+            job = {
+                'job_id': next(self._ids), 'capture_id': capture_id, 'key': key,
+                'image_path': image_path, 'status': 'queued', 'attempts': 0,
+                'submitted': time.time(), 'finished': None, 'result': None, 'error': None,
+            }
+            cached = None if refresh else self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                job.update(status='done', finished=time.time(), result={**cached, 'cached': True})
+            elif len(self._order) >= self.max_pending:
+                raise queue.Full(f'{len(self._order)} identifications already queued')
+            else:
+                self._active[key] = job
+                self._enqueue(job)
+            self._remember(job)
+        if cached is not None:
+            self._finish(job)
+        return self.job(job['job_id'])
+
+    def job(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._view(job) if job else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queued': len(self._order), 'calls': self.calls, 'cache_hits': self.cache_hits,
+                'cached': len(self._cache), 'rate_limited': self.rate_limited, 'failed': self.failed,
+                'rate_per_min': round(self.bucket.rate * 60, 2), 'burst': self.bucket.capacity,
+            }
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            job = self._next()
+            if job is None or not self.bucket.take(self._stop):
+                return
+            with self._lock:
+                self._order.remove(job['job_id'])
+                del self._queued[job['job_id']]
+                job.pop('_claimed')
+                job['status'] = 'running'
+                job['attempts'] += 1
+                self.calls += 1
+            try:
+                result = self.identify(job['image_path'])
+            except RateLimited as e:
+                wait = e.retry_after or self.retry_wait
+                self.bucket.pause(wait)
+                with self._lock:
+                    self.rate_limited += 1
+                    retry = job['attempts'] < self.max_attempts
+                    if retry:
+                        job['status'] = 'queued'
+                        job['_not_before'] = time.monotonic() + wait
+                        self._enqueue(job)
+                print(f"⚠ Gemini 429 — job {job['job_id']} "
+                      + (f"retrying in {wait:g}s" if retry else "giving up"))
+                if retry:
+                    continue
+                self._fail(job, 'Gemini rate limit reached — try again in a minute.')
+                continue
+            except Exception as e:
+                self._fail(job, str(e)[:200])
+                continue
+
+            with self._lock:
+                job.update(status='done', finished=time.time(), result=result)
+                self._active.pop(job['key'], None)
+                if self.cacheable(result):
+                    self._cache[job['key']] = result
+                    self._cache.move_to_end(job['key'])
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            self._finish(job)
+
+    def _next(self) -> Optional[dict]:
+        """Claim the first unclaimed queued job, waiting until there is one and it
+        is due. None on stop. Strictly in order: a retry inside its delay holds
+        the jobs behind it, as the bucket pause that came with the 429 would.
+        The job stays in the queue (position 0 for its ETA) until its token arrives."""
+        with self._ready:
+            while not self._stop.is_set():
+                wait = None
+                for job_id in self._order:
+                    job = self._queued[job_id]
+                    if job.get('_claimed'):
+                        continue
+                    wait = job.get('_not_before', 0.0) - time.monotonic()
+                    if wait <= 0:
+                        job['_claimed'] = True
+                        return job
+                    break
+                self._ready.wait(wait)
+        return None
+
+    def _enqueue(self, job: dict) -> None:
+        """Insert a job in run order — retries ahead of new jobs, behind jobs a
+        worker has already claimed. Caller holds the lock."""
+        rank = lambda j: (j['attempts'] == 0, j['job_id'])
+        position = len(self._order)
+        while position:
+            ahead = self._queued[self._order[position - 1]]
+            if ahead.get('_claimed') or rank(ahead) < rank(job):
+                break
+            position -= 1
+        self._order.insert(position, job['job_id'])
+        self._queued[job['job_id']] = job
+        self._ready.notify()
+
+    def _fail(self, job: dict, error: str) -> None:
+        with self._lock:
+            job.update(status='failed', finished=time.time(), error=error)
+            self._active.pop(job['key'], None)
+            self.failed += 1
+        print(f"⚠ Gemini job {job['job_id']} failed: {error}")
+
+    def _finish(self, job: dict) -> None:
+        if self.on_done:
+            try:
+                self.on_done(job, job['result'])
+            except Exception as e:
+                print(f"⚠ Gemini result for capture {job['capture_id']} not stored: {e}")
+
+    def _remember(self, job: dict) -> None:
+        """Keep the job for status lookups, dropping the oldest finished ones. Caller holds the lock."""
+        self._jobs[job['job_id']] = job
+        while len(self._jobs) > self.keep_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest['status'] not in ('done', 'failed'):
+                break
+            self._jobs.popitem(last=False)
+
+    def _view(self, job: dict) -> dict:
+        """Public copy of a job with queue position and ETA. Caller holds the lock."""
+        view = {k: v for k, v in job.items() if not k.startswith('_') and k not in ('key', 'image_path')}
+        if job['status'] == 'queued' and job['job_id'] in self._order:
+            position = self._order.index(job['job_id'])
+            view['position'] = position
+            view['eta_s'] = round(self.bucket.eta(position), 1)
+        return view
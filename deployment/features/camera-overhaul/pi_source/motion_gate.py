@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+d3kOS Motion Gate — skip fish detection on frames where nothing changed
+Pi path: /opt/d3kos/services/marine-vision/motion_gate.py
+
+Used by fish_detector's scheduler before each inference. Per slot:
+  1. downscale the frame to GATE_WIDTH px wide greyscale (INTER_AREA) and blur
+     it, into buffers reused for that slot
+  2. compare with a running-average background (cv2.accumulateWeighted), so
+     slow light changes — sun, clouds, dusk — fold into the background
+  3. the frame has motion when the share of pixels differing by more than
+     pixel_delta grey levels reaches the slot's min_area
+
+The detector runs on motion, for hold_s after a detection found fish (a fish
+can sit still alongside), and at least every max_skip_s so results never go
+stale. On a static cockpit camera most frames are skipped.
+
+Sensitivity per slot ('motion_sensitivity' in slots.json) → min_area:
+  high 0.05% · medium 0.2% · low 1% of the frame · off = run on every frame
+"""
+
+import time
+from threading import Lock
+
+import cv2
+import numpy as np
+
+GATE_WIDTH = 160
+
+SENSITIVITY = {
+    'high':   0.0005,
+    'medium': 0.002,
+    'low':    0.01,
+    'off':    0.0,
+}
+
+
+class MotionGate:
+    """Per-slot frame differencing against an adaptive background."""
+
+    def __init__(self, default='medium', pixel_delta=18, alpha=0.05,
+                 max_skip_s=30.0, hold_s=5.0, width=GATE_WIDTH):
+        self.default     = default if default in SENSITIVITY else 'medium'
+        self.pixel_delta = pixel_delta
+        self.alpha       = alpha          # background learning rate per checked frame
+        self.max_skip_s  = max_skip_s
+        self.hold_s      = hold_s
+        self.width       = width
+        self.sensitivity = {}             # slot → level name (from slots.json)
+        self._slots = {}                  # slot → buffers, background, timers, counters
+        self._lock  = Lock()
+
+    def check(self, slot, frame):
+        """True if this frame should go to the detector."""
+        now = time.monotonic()
+        with self._lock:
+            st = self._state(slot, frame.shape)
+            small, grey, diff, background = st['small'], st['grey'], st['diff'], st['background']
+            cv2.resize(frame, (small.shape[1], small.shape[0]), dst=small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=grey)
+            cv2.GaussianBlur(grey, (5, 5), 0, dst=grey)
+
+            if not st['primed']:
+                background[:] = grey
+                st['primed'] = True
+                changed = 1.0
+            else:
+                cv2.convertScaleAbs(background, dst=st['bg8'])
+                cv2.absdiff(grey, st['bg8'], dst=diff)
+                changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_delta, 255,
+                                                         cv2.THRESH_BINARY, dst=diff)[1]) / diff.size
+                cv2.accumulateWeighted(grey, background, self.alpha)
+
+            min_area = SENSITIVITY.get(self.sensitivity.get(slot, self.default), SENSITIVITY['medium'])
+            run = (changed >= min_area
+                   or now < st['hold_until']
+                   or now - st['last_run'] >= self.max_skip_s)
+            st['changed'] = round(changed, 5)
+            st['checked'] += 1
+            if run:
+                st['last_run'] = now
+                st['passed'] += 1
+            else:
+                st['skipped'] += 1
+            return run
+
+    def hold(self, slot):
+        """Keep running the detector on this slot for hold_s (fish in view)."""
+        with self._lock:
+            if slot in self._slots:
+                self._slots[slot]['hold_until'] = time.monotonic() + self.hold_s
+
+    def forget(self, slot):
+        with self._lock:
+            self._slots.pop(slot, None)
+
+    def stats(self):
+        """Per-slot counters plus totals, for /detect/scheduler."""
+        with self._lock:
+            slots = {
+                slot: {
+                    'sensitivity': self.sensitivity.get(slot, self.default),
+                    'changed':     st['changed'],
+                    'checked':     st['checked'],
+                    'passed':      st['passed'],
+                    'skipped':     st['skipped'],
+                }
+                for slot, st in self._slots.items()
+            }
+        checked = sum(s['checked'] for s in slots.values())
+        skipped = sum(s['skipped'] for s in slots.values())
+        return {
+            'checked':    checked,
+            'skipped':    skipped,
+            'skip_ratio': round(skipped / checked, 3) if checked else 0.0,
+            'slots':      slots,
+        }
+
+    def _state(self, slot, frame_shape):
+        """Slot state, (re)allocated when the frame size changes. Caller holds the lock."""
+        st = self._slots.get(slot)
+        if st is not None and st['frame_shape'] == frame_shape[:2]:
+            return st
+        frame_h, frame_w = frame_shape[:2]
+        width  = min(self.width, frame_w)
+        height = max(1, round(frame_h * width / frame_w))
+        st = self._slots[slot] = {
+            'frame_shape': frame_shape[:2],
+            'small':       np.empty((height, width, 3), dtype=np.uint8),
+            'grey':        np.empty((height, width), dtype=np.uint8),
+            'diff':        np.empty((height, width), dtype=np.uint8),
+            'bg8':         np.empty((height, width), dtype=np.uint8),
+            'background':  np.zeros((height, width), dtype=np.float32),
+            'primed':      False,
+            'changed':     0.0,
+            'last_run':    0.0,
+            'hold_until':  0.0,
+            'checked':     0,
+            'passed':      0,
+            'skipped':     0,
+        }
+        return st
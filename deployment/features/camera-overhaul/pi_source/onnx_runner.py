@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+d3kOS ONNX Runner — tuned CPU sessions and batched inference
+Pi path: /opt/d3kos/services/marine-vision/onnx_runner.py
+
+Used by fish_detector for both models:
+  create_session(path)   InferenceSession with Pi-tuned SessionOptions
+  BatchRunner(session)   runs a list of inputs as one tensor per run when the
+                         model has a dynamic batch axis (species classifier,
+                         exported with dynamic_axes={'input': {0: 'batch_size'}}),
+                         or one run per input when the batch is fixed (YOLOv8
+                         detector exported with the default dynamic=False).
+
+Session options (environment):
+  ORT_INTRA_THREADS=4     threads inside one operator (Pi 4: 4 cores; 0 = ORT default)
+  ORT_INTER_THREADS=1     threads across operators (sequential execution)
+  ORT_GRAPH_OPT=all       graph optimization: disable | basic | extended | all
+  ORT_MEM_ARENA=1         CPU memory arena (reuse tensor buffers between runs)
+  ORT_SPINNING=0          worker threads spin-wait after a run; off keeps idle
+                          CPU at zero between scheduler inferences
+  ORT_BATCH_MAX=8         largest batch per run
+"""
+
+import os
+from typing import List, Optional, Union
+
+import numpy as np
+import onnxruntime as ort
+
+ORT_INTRA_THREADS = int(os.getenv('ORT_INTRA_THREADS', '4'))
+ORT_INTER_THREADS = int(os.getenv('ORT_INTER_THREADS', '1'))
+ORT_GRAPH_OPT     = os.getenv('ORT_GRAPH_OPT', 'all')
+ORT_MEM_ARENA     = os.getenv('ORT_MEM_ARENA', '1') == '1'
+ORT_SPINNING      = os.getenv('ORT_SPINNING', '0') == '1'
+ORT_BATCH_MAX     = int(os.getenv('ORT_BATCH_MAX', '8'))
+
+_GRAPH_OPT_LEVELS = {
+    'disable':  ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic':    ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all':      ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def session_options(intra_threads: int = ORT_INTRA_THREADS,
+                    inter_threads: int = ORT_INTER_THREADS,
+                    graph_opt: str = ORT_GRAPH_OPT,
+                    mem_arena: bool = ORT_MEM_ARENA,
+                    spinning: bool = ORT_SPINNING) -> ort.SessionOptions:
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = intra_threads
+    so.inter_op_num_threads = inter_threads
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = _GRAPH_OPT_LEVELS.get(
+        graph_opt, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    so.enable_cpu_mem_arena = mem_arena
+    so.enable_mem_pattern = True
+    so.add_session_config_entry('session.intra_op.allow_spinning', '1' if spinning else '0')
+    so.add_session_config_entry('session.inter_op.allow_spinning', '1' if spinning else '0')
+    return so
+
+
+def create_session(path: str, options: Optional[ort.SessionOptions] = None) -> ort.InferenceSession:
+    """CPU InferenceSession with tuned options (defaults from the environment)."""
+    return ort.InferenceSession(path, sess_options=options or session_options(),
+                                providers=['CPUExecutionProvider'])
+
+
+def has_dynamic_batch(session: ort.InferenceSession) -> bool:
+    """True if the first input's batch dimension is symbolic (e.g. 'batch_size')."""
+    dim = session.get_inputs()[0].shape[0]
+    return not isinstance(dim, int) or dim < 1
+
+
+class BatchRunner:
+    """
+    Runs a list of single-item inputs (each shaped [1, C, H, W] or [C, H, W]),
+    or one pre-stacked [N, C, H, W] array, and returns the first model output
+    split back per item.
+
+    With a dynamic batch axis the inputs are stacked into tensors of up to
+    max_batch items — one session.run per chunk. With a fixed batch of 1
+    each input is run on its own, so callers don't need to care which way
+    the model was exported.
+    """
+
+    def __init__(self, session: ort.InferenceSession, max_batch: int = ORT_BATCH_MAX):
+        self.session    = session
+        self.input_name = session.get_inputs()[0].name
+        self.dynamic    = has_dynamic_batch(session)
+        self.max_batch  = max(1, max_batch) if self.dynamic else 1
+        self.runs  = 0          # session.run calls
+        self.items = 0          # inputs processed
+
+    def run(self, inputs: Union[List[np.ndarray], np.ndarray]) -> List[np.ndarray]:
+        """First output per input, each with a leading batch axis of 1.
+        inputs is a list of single items, or one stacked [N, C, H, W] array
+        (sliced per chunk without copying)."""
+        results = []
+        for start in range(0, len(inputs), self.max_batch):
+            if isinstance(inputs, np.ndarray):
+                batch = inputs[start:start + self.max_batch]
+            else:
+                chunk = [x if x.ndim == 4 else x[np.newaxis] for x in inputs[start:start + self.max_batch]]
+                batch = chunk[0] if len(chunk) == 1 else np.concatenate(chunk, axis=0)
+            output = self.session.run(None, {self.input_name: batch})[0]
+            results.extend(output[i:i + 1] for i in range(len(batch)))
+            self.runs  += 1
+            self.items += len(batch)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            'dynamic_batch': self.dynamic,
+            'max_batch':     self.max_batch,
+            'runs':          self.runs,
+            'items':         self.items,
+            'mean_batch':    round(self.items / self.runs, 2) if self.runs else 0.0,
+        }
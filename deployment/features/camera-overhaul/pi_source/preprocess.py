@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+d3kOS Model Preprocessing — fish_detector input tensors without per-frame allocation
+Pi path: /opt/d3kos/services/marine-vision/preprocess.py
+
+  DetectionPreprocessor   frame → (1, 3, 640, 640) float32 for the YOLOv8 detector
+      letterbox    resize preserving aspect ratio, centred on grey (114) padding
+                   — the geometry the detector was trained with; Letterbox.box()
+                   and Letterbox.bbox() map a detection back to frame pixels
+      grayscale    the detector was trained on greyscale replicated to 3 channels:
+                   BGR → grey, then /255 straight into channel 0 of the tensor,
+                   copied to channels 1 and 2
+      buffers      resize, grey and tensor buffers are kept per slot and reused
+                   until that slot's frame size changes
+
+  SpeciesPreprocessor     crops → (N, 3, S, S) float32 for the species classifier
+      resize to S×S, then one fused multiply-subtract per channel writes the
+      ImageNet-normalized RGB plane into a batch tensor that only grows
+
+Returned tensors are views of the buffers: valid until the next call for the
+same slot (detection) or the next call (species). fish_detector calls both
+under its inference lock.
+"""
+
+import cv2
+import numpy as np
+
+DETECT_SIZE = 640
+PAD_VALUE   = np.float32(114) / np.float32(255)    # ultralytics letterbox grey
+
+_255 = np.float32(255)
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD  = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class Letterbox:
+    """Placement of a frame inside the square model input."""
+
+    __slots__ = ('frame_shape', 'scale', 'width', 'height', 'left', 'top')
+
+    def __init__(self, frame_shape, size=DETECT_SIZE):
+        frame_h, frame_w = frame_shape[:2]
+        self.frame_shape = (frame_h, frame_w)
+        self.scale  = min(size / frame_w, size / frame_h)
+        self.width  = max(1, min(size, int(round(frame_w * self.scale))))
+        self.height = max(1, min(size, int(round(frame_h * self.scale))))
+        self.left   = (size - self.width) // 2
+        self.top    = (size - self.height) // 2
+
+    def box(self, bbox):
+        """YOLO bbox (centre/size in model space) → [x1, y1, x2, y2] frame pixels."""
+        frame_h, frame_w = self.frame_shape
+        x1 = (bbox['x_center'] - bbox['width'] / 2 - self.left) / self.scale
+        y1 = (bbox['y_center'] - bbox['height'] / 2 - self.top) / self.scale
+        x2 = (bbox['x_center'] + bbox['width'] / 2 - self.left) / self.scale
+        y2 = (bbox['y_center'] + bbox['height'] / 2 - self.top) / self.scale
+        return [max(0, int(x1)), max(0, int(y1)),
+                min(frame_w, int(round(x2))), min(frame_h, int(round(y2)))]
+
+    def bbox(self, bbox):
+        """YOLO bbox (centre/size in model space) → centre/size in frame pixels,
+        the same clipped region as box()."""
+        x1, y1, x2, y2 = self.box(bbox)
+        return {'x_center': (x1 + x2) / 2, 'y_center': (y1 + y2) / 2,
+                'width': x2 - x1, 'height': y2 - y1}
+
+
+class DetectionPreprocessor:
+    """BGR frame → letterboxed greyscale detector input, one set of buffers per slot."""
+
+    def __init__(self, size=DETECT_SIZE):
+        self.size = size
+        self._buffers = {}      # slot → (letterbox, resized, grey, tensor)
+
+    def __call__(self, image, slot=None):
+        """(tensor, letterbox) for a frame. The tensor is this slot's buffer."""
+        buffers = self._buffers.get(slot)
+        if buffers is None or buffers[0].frame_shape != image.shape[:2]:
+            buffers = self._buffers[slot] = self._allocate(image.shape)
+        lb, resized, grey, tensor = buffers
+
+        cv2.resize(image, (lb.width, lb.height), dst=resized, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY, dst=grey)
+        rows = slice(lb.top, lb.top + lb.height)
+        cols = slice(lb.left, lb.left + lb.width)
+        inner = tensor[0, 0, rows, cols]
+        np.divide(grey, _255, out=inner, dtype=np.float32)
+        tensor[0, 1:, rows, cols] = inner
+        return tensor, lb
+
+    def forget(self, slot):
+        """Drop a slot's buffers (camera removed)."""
+        self._buffers.pop(slot, None)
+
+    def _allocate(self, frame_shape):
+        lb = Letterbox(frame_shape, self.size)
+        resized = np.empty((lb.height, lb.width, 3), dtype=np.uint8)
+        grey    = np.empty((lb.height, lb.width), dtype=np.uint8)
+        tensor  = np.full((1, 3, self.size, self.size), PAD_VALUE, dtype=np.float32)
+        return lb, resized, grey, tensor
+
+
+class SpeciesPreprocessor:
+    """BGR crops → ImageNet-normalized RGB batch for the species classifier."""
+
+    def __init__(self, size):
+        self.size = size
+        self._resized = np.empty((size, size, 3), dtype=np.uint8)
+        self._batch   = np.empty((0, 3, size, size), dtype=np.float32)
+        # ((x / 255) - mean) / std  ==  x * scale - bias, per RGB channel
+        self._scale = (1.0 / (_255 * IMAGENET_STD)).astype(np.float32)
+        self._bias  = (IMAGENET_MEAN / IMAGENET_STD).astype(np.float32)
+
+    def __call__(self, images):
+        """(N, 3, S, S) view of the batch buffer, one row per image."""
+        if len(images) > len(self._batch):
+            self._batch = np.empty((len(images), 3, self.size, self.size), dtype=np.float32)
+        for k, image in enumerate(images):
+            cv2.resize(image, (self.size, self.size), dst=self._resized)
+            for c in range(3):                     # RGB plane c ← BGR channel 2 - c
+                plane = self._batch[k, c]
+                np.multiply(self._resized[:, :, 2 - c], self._scale[c], out=plane, dtype=np.float32)
+                plane -= self._bias[c]
+        return self._batch[:len(images)]
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+d3kOS Pre-roll Buffer — last N seconds of each camera, compressed, for event clips
+Pi path: /opt/d3kos/services/marine-vision/preroll.py
+
+Used by camera_stream_manager. Per camera:
+
+  Demux       ffmpeg copies the camera's H.264 stream into MPEG-TS on a pipe
+              (-c:v copy) — no decode, no encode, a few % of one core
+  Buffer      TS packets are grouped into GOPs, split where a packet carries
+              the random-access (keyframe) flag; GOPs older than `seconds`
+              are dropped, so the buffer always starts on a keyframe. Memory
+              is bitrate × seconds: ~8 MB for 16 s of a 4 Mbit/s main stream
+  Clips       Clip.start() writes the buffered GOPs from pre_s before the
+              event to a .ts file, then appends every new GOP until post_s
+              after it (or stop() for open-ended manual recording) and remuxes
+              to .mp4 with ffmpeg -c copy. The frames that triggered the event
+              are in the clip, and nothing is re-encoded
+
+The latest PAT and PMT are written at the head of each clip so it decodes
+from the first byte whatever GOP it starts on.
+"""
+
+import itertools
+import os
+import queue
+import subprocess
+import time
+from collections import deque
+from datetime import datetime
+from threading import Thread, Lock, Event
+from typing import Optional
+
+FFMPEG_BIN = os.getenv('FFMPEG_BIN', 'ffmpeg')
+
+TS_PACKET    = 188
+TS_SYNC      = 0x47
+READ_PACKETS = 64                  # packets per pipe read (12 KB)
+RESTART_S    = 3.0                 # wait before restarting a failed ffmpeg
+
+
+def _pid(packet) -> int:
+    return ((packet[1] & 0x1F) << 8) | packet[2]
+
+
+def _is_keyframe(packet) -> bool:
+    """Adaptation field present with random_access_indicator set."""
+    return (packet[3] & 0x20) != 0 and packet[4] > 0 and (packet[5] & 0x40) != 0
+
+
+def _pmt_pid(pat) -> Optional[int]:
+    """PMT PID of the first program in a PAT packet."""
+    offset = 4
+    if pat[3] & 0x20:
+        offset += 1 + pat[4]
+    offset += 1 + pat[offset]                        # pointer field
+    section = pat[offset:]
+    if len(section) < 12 or section[0] != 0x00:
+        return None
+    length = ((section[1] & 0x0F) << 8) | section[2]
+    for pos in range(8, min(3 + length - 4, len(section) - 4), 4):
+        if (section[pos] << 8 | section[pos + 1]) != 0:    # program 0 is the NIT
+            return ((section[pos + 2] & 0x1F) << 8) | section[pos + 3]
+    return None
+
+
+class PrerollBuffer:
+    """One camera's recent GOPs, kept in memory by a stream-copy ffmpeg."""
+
+    def __init__(self, url: str, seconds: float = 15.0, name: str = ''):
+        self.url     = url
+        self.seconds = seconds
+        self.name    = name or url
+        self.bytes   = 0                # bytes currently buffered
+        self.restarts = 0
+        self._gops   = deque()          # (start monotonic, start wall, bytes)
+        self._gop    = bytearray()      # GOP being received
+        self._gop_t  = (0.0, 0.0)
+        self._gop_key = False           # GOP in progress began on a keyframe
+        self._pat    = None
+        self._pmt    = None
+        self._pmt_pid = None
+        self._clips  = []               # Clips receiving new GOPs
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock   = Lock()
+        self._stop   = Event()
+        self._thread = Thread(target=self._run, daemon=True, name=f'preroll-{self.name}')
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        proc = self._proc
+        if proc and proc.poll() is None:
+            proc.kill()
+
+    def status(self) -> dict:
+        with self._lock:
+            span = time.monotonic() - self._gops[0][0] if self._gops else 0.0
+            return {
+                'running':   bool(self._proc and self._proc.poll() is None),
+                'seconds':   round(span, 1),
+                'gops':      len(self._gops),
+                'mb':        round(self.bytes / 1_048_576, 2),
+                'restarts':  self.restarts,
+                'clips':     len(self._clips),
+            }
+
+    # ── Clip interface ────────────────────────────────────────────────────────
+
+    def attach(self, clip: 'Clip', pre_s: float) -> None:
+        """Hand a clip the header, the GOPs covering pre_s, then every new GOP."""
+        with self._lock:
+            since = time.monotonic() - pre_s
+            gops = list(self._gops)
+            first = 0
+            for i, (start, _, _) in enumerate(gops):
+                if start <= since:
+                    first = i               # last GOP starting at or before the pre-roll start
+            clip.started_wall = gops[first][1] if gops else time.time()
+            clip.feed((self._pat or b'') + (self._pmt or b''))
+            for _, _, data in gops[first:]:
+                clip.feed(data)
+            self._clips.append(clip)
+
+    def detach(self, clip: 'Clip') -> None:
+        """Stop feeding a clip; it gets the partial GOP received so far."""
+        with self._lock:
+            if clip in self._clips:
+                self._clips.remove(clip)
+                if self._gop_key:
+                    clip.feed(bytes(self._gop))
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _command(self) -> list:
+        cmd = [FFMPEG_BIN, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        if self.url.startswith('rtsp://'):
+            cmd += ['-rtsp_transport', 'tcp']
+        return cmd + ['-i', self.url, '-map', '0:v:0', '-c:v', 'copy',
+                      '-f', 'mpegts', 'pipe:1']
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE,
+                                              stderr=subprocess.DEVNULL, bufsize=0)
+            except OSError as e:
+                print(f'⚠ Pre-roll {self.name}: cannot start ffmpeg: {e}')
+                self._stop.wait(RESTART_S * 10)
+                continue
+            self._read(self._proc.stdout)
+            self._proc.kill()
+            self._proc.wait()
+            with self._lock:
+                self._gop, self._gop_key = bytearray(), False   # a new stream starts on a fresh GOP
+            if not self._stop.is_set():
+                self.restarts += 1
+                print(f'⚠ Pre-roll {self.name}: stream ended — restarting in {RESTART_S:g}s')
+                self._stop.wait(RESTART_S)
+
+    def _read(self, pipe) -> None:
+        block = bytearray(TS_PACKET * READ_PACKETS)
+        view  = memoryview(block)
+        pending = 0
+        while not self._stop.is_set():
+            n = pipe.readinto(view[pending:])
+            if not n:
+                return
+            pending += n
+            whole = pending - pending % TS_PACKET
+            if whole:
+                self._packets(view[:whole])
+                block[:pending - whole] = block[whole:pending]
+                pending -= whole
+
+    def _packets(self, data: memoryview) -> None:
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            cut = 0
+            for off in range(0, len(data), TS_PACKET):
+                packet = data[off:off + TS_PACKET]
+                if packet[0] != TS_SYNC:
+                    continue
+                pid = _pid(packet)
+                if pid == 0:
+                    self._pat = bytes(packet)
+                    self._pmt_pid = _pmt_pid(packet) or self._pmt_pid
+                elif pid == self._pmt_pid:
+                    self._pmt = bytes(packet)
+                elif _is_keyframe(packet):
+                    self._gop += data[cut:off]
+                    self._close_gop(now, wall)
+                    cut = off
+            self._gop += data[cut:]
+
+    def _close_gop(self, now: float, wall: float) -> None:
+        """The GOP in progress is complete. Caller holds the lock."""
+        if self._gop and self._gop_key:       # the stream's first partial GOP can't be decoded alone
+            data = bytes(self._gop)
+            self._gops.append((self._gop_t[0], self._gop_t[1], data))
+            self.bytes += len(data)
+            for clip in self._clips:
+                clip.feed(data)
+        self._gop, self._gop_key = bytearray(), True
+        self._gop_t = (now, wall)
+        # keep the newest GOP that starts before the window, so `seconds` is always covered
+        while len(self._gops) > 1 and self._gops[1][0] <= now - self.seconds:
+            self.bytes -= len(self._gops.popleft()[2])
+
+
+class Clip:
+    """One clip: buffered pre-roll plus post_s (or until stop()), remuxed to .mp4."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, buffer: PrerollBuffer, path: str, event: str = '',
+                 pre_s: float = 10.0, post_s: Optional[float] = 10.0, on_done=None):
+        self.clip_id  = next(self._ids)
+        self.buffer   = buffer
+        self.path     = path                       # final .mp4
+        self.event    = event
+        self.pre_s    = pre_s
+        self.post_s   = post_s                     # None → until stop()
+        self.status   = 'recording'
+        self.error    = None
+        self.started_wall = None
+        self.triggered = time.time()
+        self.finished  = None
+        self.on_done   = on_done
+        self._queue = queue.Queue()
+        self._stop  = Event()
+
+    def start(self) -> 'Clip':
+        Thread(target=self._run, daemon=True, name=f'clip-{self.clip_id}').start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def feed(self, data: bytes) -> None:
+        """Called by the buffer (under its lock) — queue only, the clip thread writes."""
+        if data:
+            self._queue.put(data)
+
+    def info(self) -> dict:
+        return {
+            'clip_id':   self.clip_id,
+            'event':     self.event,
+            'status':    self.status,
+            'filename':  os.path.basename(self.path),
+            'pre_s':     self.pre_s,
+            'post_s':    self.post_s,
+            'triggered': datetime.fromtimestamp(self.triggered).isoformat(timespec='seconds'),
+            'duration_s': round((self.finished or time.time()) - (self.started_wall or self.triggered), 1),
+            'size_mb':   round(os.path.getsize(self.path) / 1_048_576, 2) if os.path.exists(self.path) else None,
+            'error':     self.error,
+        }
+
+    def _run(self) -> None:
+        ts_path = os.path.splitext(self.path)[0] + '.ts'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            with open(ts_path, 'wb') as out:
+                self.buffer.attach(self, self.pre_s)
+                deadline = None if self.post_s is None else time.monotonic() + self.post_s
+                while not self._stop.is_set() and (deadline is None or time.monotonic() < deadline):
+                    self._drain(out, timeout=0.5)
+                self.buffer.detach(self)
+                self._drain(out, timeout=0)
+            self.status = 'remuxing'
+            self._remux(ts_path)
+            self.status = 'done'
+        except (OSError, subprocess.SubprocessError) as e:
+            self.buffer.detach(self)
+            self.status, self.error = 'failed', str(e)[:200]
+            print(f'⚠ Clip {self.clip_id} failed: {e}')
+        self.finished = time.time()
+        if self.on_done:
+            self.on_done(self)
+
+    def _drain(self, out, timeout: float) -> None:
+        try:
+            out.write(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while True:
+                out.write(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _remux(self, ts_path: str) -> None:
+        """.ts → .mp4 by stream copy. On failure the .ts is kept as the clip."""
+        tmp = self.path + '.tmp.mp4'
+        result = subprocess.run(
+            [FFMPEG_BIN, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+             '-fflags', '+genpts', '-i', ts_path, '-c', 'copy', '-movflags', '+faststart', tmp],
+            capture_output=True, text=True, timeout=120)
+        if result.returncode != 0 or not os.path.exists(tmp):
+            self.path = ts_path
+            raise subprocess.SubprocessError(f'remux failed, kept {os.path.basename(ts_path)}: '
+                                             f'{result.stderr.strip()[:120]}')
+        os.replace(tmp, self.path)
+        os.remove(ts_path)
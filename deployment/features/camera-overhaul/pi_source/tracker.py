@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+d3kOS Fish Tracker — groups detections across frames into fish events
+Pi path: /opt/d3kos/services/marine-vision/tracker.py
+
+Used by fish_detector after each detection. Per slot, every detection is
+associated with a live track:
+  1. greedy IoU — pairs ranked by overlap, each track and detection used once,
+     a pair counts from iou_min
+  2. centroid — a detection left over whose centre lies within one box size
+     of a track's last box (a fish moving faster than its own length per frame
+     no longer overlaps itself)
+Detections left after both start new tracks.
+
+A track is a fish event. It keeps the highest-confidence frame seen (the
+frame array itself — the frame bus and HTTP paths hand out a new array per
+read), a frame count and a species vote, and ends when it has not been seen
+for gap_s or has lasted max_s. fish_detector saves one capture when an event
+starts and updates that row with the best frame and the vote when it ends
+(event_update() works out the new row values).
+"""
+
+import itertools
+import time
+from datetime import datetime
+from threading import Lock
+
+
+def iou(a, b):
+    """Intersection over union of two [x1, y1, x2, y2] boxes."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _near(a, b):
+    """Centre of b within one box size (the larger of a's width and height) of a's centre."""
+    reach = max(a[2] - a[0], a[3] - a[1])
+    return (abs((a[0] + a[2]) - (b[0] + b[2])) / 2 <= reach
+            and abs((a[1] + a[3]) - (b[1] + b[3])) / 2 <= reach)
+
+
+def vote_winner(votes):
+    """(species, confidence) from {species: {'frames', 'confidence'}} — most frames,
+    ties to summed confidence. (None, None) for no votes."""
+    if not votes:
+        return None, None
+    name, vote = max(votes.items(),
+                     key=lambda kv: (kv[1]['frames'], kv[1]['frames'] * kv[1]['confidence']))
+    return name, vote['confidence']
+
+
+def merge_votes(a, b):
+    """Two vote summaries as one — frames added, confidence frame-weighted."""
+    merged = {name: dict(vote) for name, vote in (a or {}).items()}
+    for name, vote in (b or {}).items():
+        if name in merged:
+            frames = merged[name]['frames'] + vote['frames']
+            merged[name]['confidence'] = round(
+                (merged[name]['confidence'] * merged[name]['frames']
+                 + vote['confidence'] * vote['frames']) / frames, 3)
+            merged[name]['frames'] = frames
+        else:
+            merged[name] = dict(vote)
+    return merged
+
+
+def event_update(row, event):
+    """How a finished event changes its captures row (a dict from captures_db).
+    An event that re-found a fish already captured merges into the row: votes
+    and frames add up, the end time is the later one, and the image is replaced
+    only by a frame more confident than the row's. Returns a dict with
+    event_end (datetime), duration_s, frames, species, species_confidence,
+    votes and replace_image."""
+    votes = merge_votes(row.get('species_votes'), event.vote_summary())
+    species, species_conf = vote_winner(votes)
+    started = datetime.fromisoformat(row['timestamp'])
+    ended = event.end_wall
+    if row.get('event_end'):
+        ended = max(ended, datetime.fromisoformat(row['event_end']))
+    return {
+        'event_end':          ended,
+        'duration_s':         (ended - started).total_seconds(),
+        'frames':             (row.get('event_frames') or 0) + event.frames,
+        'species':            species or row.get('species'),
+        'species_confidence': species_conf or row.get('species_confidence'),
+        'votes':              votes,
+        'replace_image':      event.best_conf > (row.get('fish_confidence') or 0.0),
+    }
+
+
+class FishEvent:
+    """One tracked fish: first/last sighting, best frame, species vote."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, slot_id, now, wall):
+        self.event_id   = next(self._ids)
+        self.slot_id    = slot_id
+        self.capture_id = None          # set by fish_detector once the opening capture is saved
+        self.started    = now           # monotonic
+        self.last_seen  = now
+        self.start_wall = wall          # datetime, for the captures row
+        self.end_wall   = wall
+        self.box        = None
+        self.frames     = 0
+        self.best_conf  = -1.0
+        self.best       = None          # (frame, detection, all detections of that frame)
+        self.votes      = {}            # species → [frames, summed confidence]
+
+    def add(self, detection, frame, detections, now, wall):
+        self.box        = detection['box']
+        self.last_seen  = now
+        self.end_wall   = wall
+        self.frames    += 1
+        if detection['confidence'] > self.best_conf:
+            self.best_conf = detection['confidence']
+            self.best      = (frame, detection, detections)
+        species = detection.get('species')
+        if species:
+            vote = self.votes.setdefault(species, [0, 0.0])
+            vote[0] += 1
+            vote[1] += detection.get('species_confidence') or 0.0
+
+    def species(self):
+        """(species, mean confidence) of the vote winner."""
+        return vote_winner(self.vote_summary())
+
+    def vote_summary(self):
+        return {name: {'frames': frames, 'confidence': round(total / frames, 3)}
+                for name, (frames, total) in self.votes.items()}
+
+    def duration(self):
+        return self.last_seen - self.started
+
+    def summary(self):
+        species, confidence = self.species()
+        return {
+            'event_id':   self.event_id,
+            'slot_id':    self.slot_id,
+            'capture_id': self.capture_id,
+            'started':    self.start_wall.isoformat(),
+            'ended':      self.end_wall.isoformat(),
+            'duration_s': round(self.duration(), 2),
+            'frames':     self.frames,
+            'confidence': round(self.best_conf, 4),
+            'species':    species,
+            'species_confidence': round(confidence, 4) if confidence is not None else None,
+            'votes':      self.vote_summary(),
+        }
+
+
+class FishTracker:
+    """Per-slot IoU / centroid association of detections into FishEvents."""
+
+    def __init__(self, iou_min=0.3, gap_s=5.0, max_s=300.0):
+        self.iou_min = iou_min
+        self.gap_s   = gap_s
+        self.max_s   = max_s
+        self.opened  = 0
+        self.closed  = 0
+        self.detections = 0
+        self._tracks = {}               # slot → [FishEvent]
+        self._lock   = Lock()
+
+    def update(self, slot_id, frame, detections, wall, now=None):
+        """Associate one frame's detections (each needs 'box'). Sets d['event_id'].
+        Returns (event per detection, events started by this frame)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tracks = [t for t in self._tracks.get(slot_id, ())
+                      if now - t.last_seen <= self.gap_s and now - t.started < self.max_s]
+            pairs = sorted(((iou(t.box, d['box']), ti, di)
+                            for ti, t in enumerate(tracks) for di, d in enumerate(detections)),
+                           reverse=True)
+            match, used = {}, set()
+            for overlap, ti, di in pairs:
+                if overlap < self.iou_min:
+                    break
+                if ti not in used and di not in match:
+                    match[di] = ti
+                    used.add(ti)
+            for di, d in enumerate(detections):
+                if di in match:
+                    continue
+                for ti, t in enumerate(tracks):
+                    if ti not in used and _near(t.box, d['box']):
+                        match[di] = ti
+                        used.add(ti)
+                        break
+
+            events, started = [], []
+            live = self._tracks.setdefault(slot_id, [])
+            for di, d in enumerate(detections):
+                if di in match:
+                    event = tracks[match[di]]
+                else:
+                    event = FishEvent(slot_id, now, wall)
+                    live.append(event)
+                    started.append(event)
+                event.add(d, frame, detections, now, wall)
+                d['event_id'] = event.event_id
+                events.append(event)
+            self.opened     += len(started)
+            self.detections += len(detections)
+            return events, started
+
+    def expire(self, now=None):
+        """Remove and return events not seen for gap_s or older than max_s."""
+        now = time.monotonic() if now is None else now
+        ended = []
+        with self._lock:
+            for slot_id, tracks in list(self._tracks.items()):
+                keep = []
+                for t in tracks:
+                    if now - t.last_seen > self.gap_s or now - t.started >= self.max_s:
+                        ended.append(t)
+                    else:
+                        keep.append(t)
+                if keep:
+                    self._tracks[slot_id] = keep
+                else:
+                    del self._tracks[slot_id]
+            self.closed += len(ended)
+        return ended
+
+    def active(self):
+        with self._lock:
+            return [t.summary() for tracks in self._tracks.values() for t in tracks]
+
+    def stats(self):
+        with self._lock:
+            active = sum(len(tracks) for tracks in self._tracks.values())
+        return {
+            'detections': self.detections,
+            'events_opened': self.opened,
+            'events_closed': self.closed,
+            'active': active,
+            'detections_per_event': round(self.detections / self.opened, 2) if self.opened else 0.0,
+        }
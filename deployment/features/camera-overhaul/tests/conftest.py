@@ -0,0 +1,21 @@
+"""
+pytest configuration for d3kOS marine-vision (camera overhaul) tests.
+
+Adds pi_source/ to sys.path so the service modules import by their Pi
+names (frame_bus, tracker, ...) without installing anything. fish_detector
+is not imported — it needs onnxruntime and loads its models at import;
+camera_stream_manager is, with its module state patched per test.
+test_onnx_runner.py is skipped unless onnxruntime is installed.
+
+Run from deployment/features/camera-overhaul/:
+    pip install pytest numpy opencv-python-headless flask requests
+    pytest tests/ -v
+"""
+
+import os
+import sys
+
+# pi_source/ directory (sibling of this tests/ directory)
+_PI_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pi_source')
+if _PI_SOURCE not in sys.path:
+    sys.path.insert(0, _PI_SOURCE)
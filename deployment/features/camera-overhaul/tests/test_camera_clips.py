@@ -0,0 +1,169 @@
+"""
+camera_stream_manager.py — pre-roll buffer lifecycle and clip bookkeeping.
+Module state (slots, hardware, preroll, clips) is patched per test;
+PrerollBuffer and Clip are replaced so no ffmpeg runs.
+"""
+
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import camera_stream_manager as csm
+
+
+def _slots():
+    return {
+        'bow':   {'assigned': True, 'hardware_id': 'cam1', 'roles': {'forward_watch': True}},
+        'port':  {'assigned': True, 'hardware_id': 'cam2', 'roles': {'fish_detection': True}},
+        'cabin': {'assigned': True, 'hardware_id': 'cam3', 'roles': {}},
+    }
+
+
+def _hardware():
+    return {
+        hw_id: {'hardware_id': hw_id, 'assigned_to_slot': slot,
+                'rtsp_url': f'rtsp://admin:x@10.0.0.{n}:554/h264Preview_01_sub'}
+        for n, (hw_id, slot) in enumerate([('cam1', 'bow'), ('cam2', 'port'), ('cam3', 'cabin')], 1)
+    }
+
+
+class _Buffer:
+    def __init__(self, url, seconds, name=''):
+        self.url, self.seconds, self.name = url, seconds, name
+        self.stop = MagicMock()
+
+    def status(self):
+        return {'seconds': self.seconds}
+
+
+@pytest.fixture
+def state(tmp_path):
+    with patch.object(csm, 'slots', _slots()), \
+         patch.object(csm, 'hardware', _hardware()), \
+         patch.object(csm, 'preroll', {}), \
+         patch.object(csm, 'clips', OrderedDict()), \
+         patch.object(csm, 'RECORDING_PATH', str(tmp_path)), \
+         patch.object(csm, 'PrerollBuffer', _Buffer):
+        yield csm
+
+
+class TestUpdatePreroll:
+    def test_off_by_default(self, state):
+        assert csm.CLIP_PREROLL_S == 0
+        csm.update_preroll()
+        assert csm.preroll == {}
+
+    def test_only_main_stream_roles_get_buffers(self, state):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+        assert set(csm.preroll) == {'cam1', 'cam2'}
+        assert csm.preroll['cam1'].url.endswith('h264Preview_01_main')
+
+    def test_empty_url_stops_and_drops_buffer(self, state):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+            old = csm.preroll['cam1']
+            csm.hardware['cam1']['rtsp_url'] = ''
+            csm.update_preroll()
+        old.stop.assert_called_once()
+        assert 'cam1' not in csm.preroll
+
+    def test_url_change_replaces_buffer(self, state):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+            old = csm.preroll['cam2']
+            csm.hardware['cam2']['rtsp_url_main'] = 'rtsp://admin:x@10.0.0.9:554/main'
+            csm.update_preroll()
+        old.stop.assert_called_once()
+        assert csm.preroll['cam2'].url == 'rtsp://admin:x@10.0.0.9:554/main'
+
+    def test_role_removed_stops_buffer(self, state):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+            old = csm.preroll['cam2']
+            csm.slots['port']['roles'] = {}
+            csm.update_preroll()
+        old.stop.assert_called_once()
+        assert set(csm.preroll) == {'cam1'}
+
+
+class _Clip:
+    """Stand-in for preroll.Clip that never starts a thread."""
+    _next = 0
+
+    def __init__(self, buffer, path, event='', pre_s=0.0, post_s=None, on_done=None):
+        _Clip._next += 1
+        self.clip_id, self.buffer, self.path = _Clip._next, buffer, path
+        self.event, self.on_done, self.status = event, on_done, 'recording'
+        self.stopped = False
+
+    def start(self):
+        return self
+
+    def stop(self):
+        self.stopped = True
+
+    def info(self):
+        return {'clip_id': self.clip_id, 'status': self.status, 'duration_s': 0.0, 'size_mb': 0.0}
+
+
+@pytest.fixture
+def client(state):
+    csm.hw_state['cam1'] = {'connected': True}
+    with patch.object(csm, 'Clip', _Clip), \
+         patch.object(csm, 'recording_clip', None), \
+         patch.object(csm, 'recording_active', False):
+        yield csm.app.test_client()
+    csm.hw_state.pop('cam1', None)
+
+
+class TestClipRoutes:
+    def test_clip_needs_a_buffer(self, client):
+        assert client.post('/camera/clips', json={'slot_id': 'bow'}).status_code == 503
+        assert client.post('/camera/clips', json={'slot_id': 'nope'}).status_code == 404
+        assert client.post('/camera/clips', json={'slot_id': 'all'}).status_code == 503
+
+    def test_clips_from_buffers(self, client):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+            resp = client.post('/camera/clips', json={'slot_id': 'all', 'event': 'mob'})
+        assert resp.status_code == 202
+        assert {c['slot_id'] for c in resp.get_json()['clips']} == {'bow', 'port'}
+        listed = client.get('/camera/clips').get_json()
+        assert [c['clip_id'] for c in listed['clips']] == sorted(csm.clips, reverse=True)
+        assert set(listed['buffers']) == {'bow', 'port'}
+        clip_id = next(iter(csm.clips))
+        assert client.get(f'/camera/clips/{clip_id}').get_json()['clip_id'] == clip_id
+        assert client.get('/camera/clips/999999').status_code == 404
+
+    def test_clips_kept_bounded(self, client):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0), patch.object(csm, 'CLIPS_KEPT', 3):
+            csm.update_preroll()
+            for _ in range(5):
+                client.post('/camera/clips', json={'slot_id': 'bow'})
+        assert len(csm.clips) == 3
+
+    def test_recording_buffer_stopped_by_clip_on_done(self, client):
+        resp = client.post('/camera/record/start')
+        assert resp.status_code == 200
+        clip = csm.clips[resp.get_json()['clip_id']]
+        buf = clip.buffer
+        assert buf.seconds == 0 and 'cam1' not in csm.preroll
+
+        assert client.post('/camera/record/stop').status_code == 200
+        assert clip.stopped
+        buf.stop.assert_not_called()              # still draining into the clip
+        clip.status = 'done'
+        clip.on_done(clip)
+        buf.stop.assert_called_once()
+
+    def test_recording_uses_preroll_buffer_without_stopping_it(self, client):
+        with patch.object(csm, 'CLIP_PREROLL_S', 15.0):
+            csm.update_preroll()
+            resp = client.post('/camera/record/start')
+        clip = csm.clips[resp.get_json()['clip_id']]
+        assert clip.buffer is csm.preroll['cam1']
+        client.post('/camera/record/stop')
+        clip.on_done(clip)
+        csm.preroll['cam1'].stop.assert_not_called()
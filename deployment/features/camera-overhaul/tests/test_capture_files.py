@@ -0,0 +1,104 @@
+"""
+capture_files.py — perceptual hash, per-slot dedup window, content-addressed
+storage with renditions.
+"""
+
+import os
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+from capture_files import (CaptureFiles, RENDITIONS, content_hash, hamming, phash,
+                           rendition_path)
+
+
+def _scene(seed, shape=(480, 640, 3)):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    return cv2.resize(small, (shape[1], shape[0]), interpolation=cv2.INTER_CUBIC)
+
+
+@pytest.fixture
+def files(tmp_path):
+    return CaptureFiles(str(tmp_path / 'captures'), dedup_bits=6, dedup_window_s=120.0)
+
+
+class TestPhash:
+    def test_stable_under_noise_and_jpeg(self):
+        img = _scene(1)
+        noisy = np.clip(img.astype(np.int16) + np.random.default_rng(2).integers(-4, 5, img.shape),
+                        0, 255).astype(np.uint8)
+        jpeg = cv2.imdecode(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 70])[1],
+                            cv2.IMREAD_COLOR)
+        assert hamming(phash(img), phash(noisy)) <= 6
+        assert hamming(phash(img), phash(jpeg)) <= 6
+
+    def test_different_scenes_far_apart(self):
+        assert hamming(phash(_scene(1)), phash(_scene(3))) > 6
+
+    def test_greyscale_input(self):
+        img = _scene(1)
+        assert phash(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)) == phash(img)
+
+
+class TestDedup:
+    def test_same_slot_within_window_is_duplicate(self, files):
+        h = phash(_scene(1))
+        assert files.duplicate_of('port', h) is None
+        files.remember('port', h, 42)
+        assert files.duplicate_of('port', h ^ 0b101) == 42       # 2 bits off
+        assert files.stats()['deduped'] == 1
+
+    def test_other_slot_or_scene_not_duplicate(self, files):
+        files.remember('port', phash(_scene(1)), 42)
+        assert files.duplicate_of('stern', phash(_scene(1))) is None
+        assert files.duplicate_of('port', phash(_scene(3))) is None
+
+    def test_window_expires(self, files):
+        h = phash(_scene(1))
+        with patch('capture_files.time.monotonic', return_value=1000.0):
+            files.remember('port', h, 42)
+        with patch('capture_files.time.monotonic', return_value=1119.0):
+            assert files.duplicate_of('port', h) == 42
+        with patch('capture_files.time.monotonic', return_value=1121.0):
+            assert files.duplicate_of('port', h) is None
+
+    def test_latest_capture_replaces_reference(self, files):
+        files.remember('port', phash(_scene(1)), 1)
+        files.remember('port', phash(_scene(3)), 2)
+        assert files.duplicate_of('port', phash(_scene(1))) is None
+        assert files.duplicate_of('port', phash(_scene(3))) == 2
+
+
+class TestStorage:
+    def test_content_addressed_with_renditions(self, files):
+        path = files.store(_scene(1))
+        files.wait(path)
+        digest = content_hash(path)
+        assert digest is not None
+        assert path == os.path.join(files.root, digest[:2], f'{digest}.jpg')
+        assert files.store(_scene(1)) == path                    # same bytes, same file
+        for size, (width, _) in RENDITIONS.items():
+            img = cv2.imread(rendition_path(path, size))
+            assert img is not None and img.shape[1] == min(width, 640)
+        assert not [f for f in os.listdir(os.path.dirname(path)) if f.endswith('.tmp')]
+
+    def test_missing_rendition_generated_on_request(self, files):
+        path = files.store(_scene(1))
+        files.wait(path)
+        os.remove(rendition_path(path, 'thumb'))
+        assert files.rendition(path, 'thumb') == rendition_path(path, 'thumb')
+        assert os.path.exists(rendition_path(path, 'thumb'))
+        assert files.rendition(path, 'full') == path
+
+    def test_remove_deletes_renditions(self, files):
+        path = files.store(_scene(1))
+        files.remove(path)
+        assert not any(os.path.exists(rendition_path(path, s)) for s in ('full', *RENDITIONS))
+
+    def test_content_hash_of_legacy_name(self):
+        assert content_hash('/captures/catch_20260601_080000.jpg') is None
+        assert rendition_path('/c/ab.jpg', 'full') == '/c/ab.jpg'
+        assert rendition_path('/c/ab.jpg', 'thumb') == '/c/ab_thumb.jpg'
@@ -0,0 +1,160 @@
+"""
+captures_db.py — connection pool, keyset paging, list() filters, event updates.
+"""
+
+import threading
+
+import pytest
+
+from captures_db import CaptureStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = CaptureStore(str(tmp_path / 'data' / 'captures.db'), pool_size=2)
+    s.init()
+    return s
+
+
+def _add(store, ts, slot='port', species='Walleye', conf=0.8, gemini=None):
+    cid = store.add(ts, f'/captures/{ts}.jpg', 0.0, conf, species=species, species_conf=0.7,
+                    species_top3=[{'species': species, 'confidence': 0.7}], slot_id=slot,
+                    detections=[{'box': [1, 2, 3, 4]}])
+    if gemini:
+        store.set_gemini(cid, {'common_name': gemini})
+    return cid
+
+
+class TestPool:
+    def test_connections_reused_across_threads(self, store):
+        _add(store, '2026-06-01T08:00:00')
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.count())) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [1] * 20
+        assert store._opened <= store.pool_size
+        assert store._pool.qsize() == store._opened
+
+    def test_failed_write_rolled_back_and_returned(self, store):
+        with pytest.raises(Exception):
+            with store._db() as db:
+                db.execute("INSERT INTO captures (timestamp, image_path) VALUES ('x', 'y')")
+                raise RuntimeError('boom')
+        assert store.count() == 0
+        assert store._pool.qsize() == store._opened
+
+    def test_init_adds_missing_columns(self, tmp_path):
+        import sqlite3
+        path = tmp_path / 'old.db'
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE captures (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                     'timestamp TEXT NOT NULL, image_path TEXT NOT NULL, person_detected INTEGER, '
+                     'fish_detected INTEGER, person_confidence REAL, fish_confidence REAL, species TEXT)')
+        conn.commit()
+        conn.close()
+        store = CaptureStore(str(path))
+        store.init()
+        cid = _add(store, '2026-06-01T08:00:00')
+        assert store.get(cid)['slot_id'] == 'port'
+
+
+class TestRows:
+    def test_get_parses_json_and_flags(self, store):
+        cid = _add(store, '2026-06-01T08:00:00', gemini='Walleye')
+        row = store.get(cid)
+        assert row['fish_detected'] is True and row['person_detected'] is False
+        assert row['species_top3'] == [{'species': 'Walleye', 'confidence': 0.7}]
+        assert row['gemini_response'] == {'common_name': 'Walleye'}
+        assert row['gemini_species'] == 'Walleye'
+        assert store.get(cid + 1) is None
+
+    def test_update_event_replaces_best_image(self, store):
+        cid = _add(store, '2026-06-01T08:00:00')
+        store.update_event(cid, '2026-06-01T08:00:12', 12.345, 30, 'Bass', 0.9,
+                           {'Bass': {'frames': 30, 'confidence': 0.9}},
+                           best={'image_path': '/captures/best.jpg', 'fish_confidence': 0.95,
+                                 'detections': [{'box': [5, 6, 7, 8]}]})
+        row = store.get(cid)
+        assert row['event_duration_s'] == 12.35 and row['event_frames'] == 30
+        assert row['species'] == 'Bass' and row['species_votes']['Bass']['frames'] == 30
+        assert row['image_path'] == '/captures/best.jpg' and row['fish_confidence'] == 0.95
+        assert store.image_in_use('/captures/best.jpg')
+        assert not store.image_in_use('/captures/2026-06-01T08:00:00.jpg')
+        assert store.image_path(cid) == '/captures/best.jpg'
+
+
+class TestList:
+    def _fill(self, store):
+        ids = {}
+        for day in (1, 2, 3):
+            for hour in (6, 12, 18):
+                ts = f'2026-06-0{day}T{hour:02d}:00:00'
+                ids[ts] = _add(store, ts, slot='port' if hour != 12 else 'stern',
+                               species='Bass' if day == 2 else 'Walleye',
+                               conf=hour / 20, gemini='Pike' if hour == 18 else None)
+        return ids
+
+    def test_keyset_pages_cover_everything_once(self, store):
+        self._fill(store)
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = store.list(limit=4, cursor=cursor)
+            seen += [c['timestamp'] for c in page]
+            pages += 1
+            if cursor is None:
+                break
+        assert pages == 3
+        assert seen == sorted(seen, reverse=True) and len(set(seen)) == 9
+
+    def test_same_timestamp_pages_by_id(self, store):
+        ids = [_add(store, '2026-06-01T08:00:00') for _ in range(5)]
+        first, cursor = store.list(limit=2)
+        assert [c['id'] for c in first] == ids[:-3:-1]
+        assert cursor == f'2026-06-01T08:00:00,{ids[-2]}'
+        rest, cursor = store.list(limit=10, cursor=cursor)
+        assert [c['id'] for c in rest] == ids[-3::-1] and cursor is None
+
+    def test_exact_page_has_no_cursor(self, store):
+        self._fill(store)
+        page, cursor = store.list(limit=9)
+        assert len(page) == 9 and cursor is None
+
+    def test_bad_cursor(self, store):
+        for cursor in ('nonsense', ',5', '2026-06-01T08:00:00,x'):
+            with pytest.raises(ValueError):
+                store.list(cursor=cursor)
+
+    def test_limit_clamped(self, store):
+        self._fill(store)
+        assert len(store.list(limit=0)[0]) == 1
+        assert len(store.list(limit=10_000)[0]) == 9
+
+    def test_filters(self, store):
+        self._fill(store)
+        assert {c['slot_id'] for c in store.list(slot_id='stern')[0]} == {'stern'}
+        assert len(store.list(slot_id='stern')[0]) == 3
+        assert len(store.list(species='Bass')[0]) == 3
+        assert len(store.list(gemini_species='Pike')[0]) == 3
+        assert len(store.list(min_confidence=0.6)[0]) == 6
+        assert len(store.list(species='Walleye', slot_id='port', gemini_species='Pike')[0]) == 2
+
+    def test_filters_apply_across_pages(self, store):
+        self._fill(store)
+        page, cursor = store.list(limit=2, slot_id='port')
+        rest, cursor = store.list(limit=10, slot_id='port', cursor=cursor)
+        assert len(page) + len(rest) == 6 and cursor is None
+        assert all(c['slot_id'] == 'port' for c in page + rest)
+
+    def test_since_until_dates(self, store):
+        self._fill(store)
+        day2 = store.list(since='2026-06-02', until='2026-06-02')[0]
+        assert [c['timestamp'] for c in day2] == [
+            '2026-06-02T18:00:00', '2026-06-02T12:00:00', '2026-06-02T06:00:00']
+
+    def test_until_datetime_not_expanded(self, store):
+        self._fill(store)
+        rows = store.list(until='2026-06-02T12:00:00')[0]
+        assert rows[0]['timestamp'] == '2026-06-02T12:00:00' and len(rows) == 5
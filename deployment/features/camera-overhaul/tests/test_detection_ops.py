@@ -0,0 +1,78 @@
+"""
+detection_ops.py — YOLOv8 decode and NMS, checked against a straightforward
+per-anchor / pairwise reference like the loop it replaced.
+"""
+
+import numpy as np
+
+from detection_ops import NMS_IOU, decode_predictions, nms, yolo_detections
+
+
+def _pred(rows):
+    """(5, N) model output from [(x, y, w, h, conf), ...]."""
+    return np.array(rows, dtype=np.float32).T
+
+
+def _reference(predictions, thr, iou_thr=NMS_IOU):
+    dets = [(float(c), [float(v) for v in predictions[:4, i]])
+            for i, c in enumerate(predictions[4]) if c > thr]
+    dets.sort(key=lambda d: -d[0])
+
+    def iou(a, b):
+        ax1, ay1, ax2, ay2 = a[0] - a[2] / 2, a[1] - a[3] / 2, a[0] + a[2] / 2, a[1] + a[3] / 2
+        bx1, by1, bx2, by2 = b[0] - b[2] / 2, b[1] - b[3] / 2, b[0] + b[2] / 2, b[1] + b[3] / 2
+        w, h = min(ax2, bx2) - max(ax1, bx1), min(ay2, by2) - max(ay1, by1)
+        inter = w * h if w > 0 and h > 0 else 0.0
+        return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+    kept = []
+    for conf, box in dets:
+        if all(iou(box, k[1]) <= iou_thr for k in kept):
+            kept.append((conf, box))
+    return kept
+
+
+class TestDecode:
+    def test_threshold_is_strict(self):
+        boxes, scores = decode_predictions(_pred([(10, 10, 4, 4, 0.5), (20, 20, 4, 4, 0.6)]), 0.5)
+        assert boxes.tolist() == [[20, 20, 4, 4]]
+        assert scores.dtype == np.float64 and scores.tolist() == [np.float32(0.6)]
+
+    def test_nothing_above_threshold(self):
+        boxes, scores = decode_predictions(_pred([(10, 10, 4, 4, 0.1)]), 0.5)
+        assert boxes.shape == (0, 4) and scores.shape == (0,)
+        assert yolo_detections(_pred([(10, 10, 4, 4, 0.1)]), 0.5) == []
+
+
+class TestNms:
+    def test_empty(self):
+        assert nms(np.zeros((0, 4)), np.zeros(0)) == []
+
+    def test_overlapping_box_suppressed(self):
+        boxes = np.array([[50, 50, 20, 20], [52, 50, 20, 20], [150, 150, 20, 20]], dtype=np.float64)
+        scores = np.array([0.7, 0.9, 0.8])
+        assert nms(boxes, scores) == [1, 2]
+
+    def test_equal_scores_keep_anchor_order(self):
+        boxes = np.array([[50, 50, 20, 20], [51, 50, 20, 20]], dtype=np.float64)
+        assert nms(boxes, np.array([0.8, 0.8])) == [0]
+
+    def test_zero_area_boxes_do_not_suppress(self):
+        boxes = np.array([[50, 50, 0, 0], [50, 50, 0, 0]], dtype=np.float64)
+        assert nms(boxes, np.array([0.9, 0.8])) == [0, 1]
+
+    def test_matches_reference_on_random_output(self):
+        rng = np.random.default_rng(7)
+        pred = np.vstack([
+            rng.uniform(0, 640, (2, 8400)),
+            rng.uniform(5, 120, (2, 8400)),
+            rng.uniform(0, 1, (1, 8400)),
+        ]).astype(np.float32)
+        dets = yolo_detections(pred, 0.9)
+        ref = _reference(pred, 0.9)
+        assert len(dets) == len(ref) > 0
+        for det, (conf, box) in zip(dets, ref):
+            assert det['class_name'] == 'fish'
+            assert det['confidence'] == conf
+            b = det['bbox']
+            assert [b['x_center'], b['y_center'], b['width'], b['height']] == box
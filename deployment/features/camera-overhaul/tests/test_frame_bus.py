@@ -0,0 +1,106 @@
+"""
+frame_bus.py — shared-memory frame ring and slot index, writer and reader
+in the same process. Segment names carry a random suffix so runs never
+collide with a live camera manager's rings.
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+
+import frame_bus
+from frame_bus import FrameBusClient, FrameIndex, FrameReader, FrameRing, segment_name
+
+
+@pytest.fixture
+def ring():
+    r = FrameRing(f'd3kos_test_{uuid.uuid4().hex[:8]}')
+    yield r
+    r.close()
+
+
+def _frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+class TestFrameRing:
+    def test_segment_name(self):
+        assert segment_name('cam1') == 'd3kos_frames_cam1'
+
+    def test_no_segment_before_first_publish(self, ring):
+        assert FrameReader(ring.name).read() is None
+        assert ring.reader_active(60) is False
+
+    def test_publish_then_read_newest(self, ring):
+        ring.publish(_frame(1), ts=100.0)
+        seq = ring.publish(_frame(2), ts=200.0)
+        got_seq, ts, frame = FrameReader(ring.name).read()
+        assert got_seq == seq
+        assert ts == 200.0
+        assert frame.shape == (4, 6, 3) and (frame == 2).all()
+
+    def test_nothing_newer_than_after_seq(self, ring):
+        seq = ring.publish(_frame(1))
+        reader = FrameReader(ring.name)
+        assert reader.read(after_seq=seq) is None
+        ring.publish(_frame(3))
+        assert reader.read(after_seq=seq)[0] == seq + 1
+
+    def test_read_into_out_array(self, ring):
+        ring.publish(_frame(7))
+        out = np.zeros((4, 6, 3), dtype=np.uint8)
+        _, _, frame = FrameReader(ring.name).read(out=out)
+        assert frame is out and (out == 7).all()
+
+    def test_frames_are_copies(self, ring):
+        ring.publish(_frame(1))
+        reader = FrameReader(ring.name)
+        first = reader.read()[2]
+        for value in range(2, 2 + frame_bus.RING_SLOTS + 1):
+            ring.publish(_frame(value))
+        assert (first == 1).all()
+
+    def test_greyscale_frame(self, ring):
+        ring.publish(_frame(9, shape=(5, 5)))
+        frame = FrameReader(ring.name).read()[2]
+        assert frame.shape == (5, 5) and (frame == 9).all()
+
+    def test_grown_ring_is_reattached(self, ring):
+        reader = FrameReader(ring.name)
+        ring.publish(_frame(1))
+        assert reader.read()[2].shape == (4, 6, 3)
+        seq = ring.publish(_frame(5, shape=(8, 12, 3)))   # sub → main stream
+        got_seq, _, frame = reader.read()
+        assert got_seq == seq
+        assert frame.shape == (8, 12, 3) and (frame == 5).all()
+
+    def test_reader_heartbeat_marks_consumer(self, ring):
+        ring.publish(_frame(1))
+        assert ring.reader_active(60) is False
+        FrameReader(ring.name).read()
+        assert ring.reader_active(60) is True
+
+
+class TestFrameBusClient:
+    def test_slot_lookup_through_index(self, ring):
+        index_name = f'd3kos_test_index_{uuid.uuid4().hex[:8]}'
+        index = FrameIndex(index_name)
+        try:
+            index.write({'fish_port': ring.name})
+            seq = ring.publish(_frame(4))
+            client = FrameBusClient(index_name)
+            assert client.slots() == ['fish_port']
+            got_seq, _, frame = client.read('fish_port')
+            assert got_seq == seq and (frame == 4).all()
+            assert client.read('bow') is None
+
+            index.write({})
+            assert client.read('fish_port') is None
+        finally:
+            index.close()
+
+    def test_no_index_is_empty(self):
+        client = FrameBusClient(f'd3kos_test_missing_{uuid.uuid4().hex[:8]}')
+        assert client.slots() == []
+        assert client.read('fish_port') is None
@@ -0,0 +1,197 @@
+"""
+frame_decoder.py — ffprobe size detection against a stub ffprobe script, and
+FfmpegCapture's double buffer / newest-frame-wins reader fed through a real
+OS pipe standing in for ffmpeg's stdout.
+"""
+
+import os
+import stat
+import sys
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+import frame_decoder
+from frame_decoder import FfmpegCapture, probe_size
+
+W, H = 4, 2
+FRAME_BYTES = W * H * 3
+
+
+def _stub(tmp_path, name, body):
+    """Executable Python script standing in for an ffmpeg binary."""
+    path = tmp_path / name
+    path.write_text(f'#!{sys.executable}\n{body}')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+class TestProbeSize:
+    def test_parses_width_height(self, tmp_path):
+        probe = _stub(tmp_path, 'ffprobe', 'print("1920,1080")\nprint("640,360")\n')
+        with patch.object(frame_decoder, 'FFPROBE_BIN', probe):
+            assert probe_size('rtsp://cam/h264Preview_01_main') == (1920, 1080)
+
+    def test_rtsp_probed_over_tcp(self, tmp_path):
+        args_file = tmp_path / 'args'
+        probe = _stub(tmp_path, 'ffprobe',
+                      'import sys\n'
+                      f'open({str(args_file)!r}, "w").write(" ".join(sys.argv[1:]))\n'
+                      'print("640,360")\n')
+        with patch.object(frame_decoder, 'FFPROBE_BIN', probe):
+            probe_size('rtsp://cam/stream')
+            rtsp_args = args_file.read_text()
+            probe_size('/tmp/clip.mp4')
+            file_args = args_file.read_text()
+        assert '-rtsp_transport tcp' in rtsp_args
+        assert '-rtsp_transport' not in file_args
+
+    @pytest.mark.parametrize('body', [
+        '',                                  # no stream found
+        'print("N/A,N/A")\n',
+        'import sys\nsys.exit(1)\n',
+    ])
+    def test_bad_output_is_none(self, tmp_path, body):
+        probe = _stub(tmp_path, 'ffprobe', body)
+        with patch.object(frame_decoder, 'FFPROBE_BIN', probe):
+            assert probe_size('rtsp://cam/stream') is None
+
+    def test_missing_binary_is_none(self, tmp_path):
+        with patch.object(frame_decoder, 'FFPROBE_BIN', str(tmp_path / 'nope')):
+            assert probe_size('rtsp://cam/stream') is None
+
+    def test_timeout_is_none(self, tmp_path):
+        probe = _stub(tmp_path, 'ffprobe', 'import time\ntime.sleep(5)\n')
+        with patch.object(frame_decoder, 'FFPROBE_BIN', probe):
+            assert probe_size('rtsp://cam/stream', timeout=0.2) is None
+
+
+class _PipeProc:
+    """Popen stand-in whose stdout is the read end of an OS pipe."""
+
+    def __init__(self, cmd, **kwargs):
+        self.cmd = cmd
+        r, self.write_fd = os.pipe()
+        self.stdout = os.fdopen(r, 'rb', buffering=0)
+        self.returncode = None
+
+    def write(self, data):
+        os.write(self.write_fd, data)
+
+    def close_pipe(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.close_pipe()
+        self.returncode = -9
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def _frame(value):
+    return bytes([value]) * FRAME_BYTES
+
+
+def _wait_until(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def cap():
+    procs = []
+
+    def popen(cmd, **kwargs):
+        procs.append(_PipeProc(cmd, **kwargs))
+        return procs[-1]
+    with patch.object(frame_decoder, 'probe_size', return_value=(W, H)), \
+         patch.object(frame_decoder.subprocess, 'Popen', side_effect=popen), \
+         patch.object(frame_decoder, 'READ_TIMEOUT_S', 0.1):
+        c = FfmpegCapture('rtsp://cam/h264Preview_01_sub')
+        c.proc = procs[0]
+        yield c
+        c.release()
+
+
+class TestFfmpegCapture:
+    def test_opens_with_two_preallocated_buffers(self, cap):
+        assert cap.isOpened()
+        assert (cap.width, cap.height) == (W, H)
+        assert len(cap._buffers) == 2
+        assert all(b.shape == (H, W, 3) and b.dtype == np.uint8 for b in cap._buffers)
+
+    def test_read_returns_private_copy(self, cap):
+        cap.proc.write(_frame(7))
+        ok, frame = cap.read()
+        assert ok and frame.shape == (H, W, 3) and (frame == 7).all()
+        frame[:] = 0
+        assert (cap._buffers[cap._latest] == 7).all()
+
+    def test_newest_frame_wins_and_drops_are_counted(self, cap):
+        cap.proc.write(_frame(1))
+        _wait_until(lambda: cap.frames == 1)
+        for v in (2, 3, 4):
+            cap.proc.write(_frame(v))
+        _wait_until(lambda: cap.frames == 4)
+        ok, frame = cap.read()
+        assert ok and (frame == 4).all()
+        assert cap.dropped == 3                # 1, 2 and 3 were never read
+
+    def test_no_new_frame_times_out(self, cap):
+        cap.proc.write(_frame(1))
+        assert cap.grab() is True
+        start = time.monotonic()
+        assert cap.grab() is False             # same frame is not handed out twice
+        assert cap.read() == (False, None)
+        assert time.monotonic() - start < 1.0
+
+    def test_buffers_reused_not_reallocated(self, cap):
+        ids = [id(b) for b in cap._buffers]
+        for v in range(1, 6):
+            cap.proc.write(_frame(v))
+            _wait_until(lambda: cap.frames == v)
+        assert [id(b) for b in cap._buffers] == ids
+        assert sorted({int(b[0, 0, 0]) for b in cap._buffers}) == [4, 5]
+
+    def test_partial_frame_not_published(self, cap):
+        data = _frame(9)
+        cap.proc.write(data[:FRAME_BYTES // 2])
+        time.sleep(0.05)
+        assert cap.frames == 0
+        cap.proc.write(data[FRAME_BYTES // 2:])
+        ok, frame = cap.read()
+        assert ok and (frame == 9).all()
+
+    def test_eof_closes_capture(self, cap):
+        cap.proc.write(_frame(1))
+        _wait_until(lambda: cap.frames == 1)
+        cap.proc.close_pipe()
+        _wait_until(lambda: not cap.isOpened())
+        ok, frame = cap.read()                 # the unread frame is still delivered
+        assert ok and (frame == 1).all()
+        assert cap.read() == (False, None)
+
+    def test_command_flags(self, cap):
+        cmd = cap.proc.cmd
+        assert cmd[0] == frame_decoder.FFMPEG_BIN
+        assert cmd[cmd.index('-rtsp_transport') + 1] == 'tcp'
+        assert '-skip_frame' not in cmd
+        assert cmd[-5:] == ['-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+
+    def test_keyframes_only_adds_skip_frame(self):
+        with patch.object(frame_decoder, 'probe_size', return_value=None):
+            c = FfmpegCapture('/tmp/clip.mp4', keyframes_only=True)
+        cmd = c._command()
+        assert cmd[cmd.index('-skip_frame') + 1] == 'nokey'
+        assert '-rtsp_transport' not in cmd
+        assert not c.isOpened()                # probe failed — nothing started
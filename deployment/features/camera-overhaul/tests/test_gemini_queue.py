@@ -0,0 +1,181 @@
+"""
+gemini_queue.py — token bucket refill and pause, identify queue ordering,
+429 retries, dedup and the result cache.
+"""
+
+import queue
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from gemini_queue import IdentifyQueue, RateLimited, TokenBucket
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    c = _Clock()
+    with patch('gemini_queue.time.monotonic', c):
+        yield c
+
+
+class TestTokenBucket:
+    def test_burst_then_refill_at_rate(self, clock):
+        bucket = TokenBucket(rate_per_min=60, burst=3)      # one token a second
+        assert [bucket.take() for _ in range(3)] == [True] * 3
+        assert bucket.eta(0) == pytest.approx(1.0)
+        clock.now += 0.5
+        assert bucket.eta(0) == pytest.approx(0.5)
+        clock.now += 0.5
+        assert bucket.take() is True
+
+    def test_refill_capped_at_burst(self, clock):
+        bucket = TokenBucket(rate_per_min=60, burst=2)
+        clock.now += 3600
+        bucket.take(), bucket.take()
+        assert bucket.eta(0) == pytest.approx(1.0)
+
+    def test_eta_by_queue_position(self, clock):
+        bucket = TokenBucket(rate_per_min=30, burst=1)       # one token every 2 s
+        assert bucket.eta(0) == 0.0
+        assert bucket.eta(3) == pytest.approx(6.0)
+
+    def test_pause_empties_and_holds(self, clock):
+        bucket = TokenBucket(rate_per_min=60, burst=5)
+        bucket.pause(10)
+        assert bucket.eta(0) == pytest.approx(11.0)           # pause, then one token's refill
+        assert bucket.eta(2) == pytest.approx(13.0)
+        clock.now += 9.9
+        assert bucket.eta(0) == pytest.approx(1.1)
+        clock.now += 0.1
+        assert bucket.eta(0) == pytest.approx(1.0)           # refill starts after the pause
+        clock.now += 1.0
+        assert bucket.take() is True
+
+    def test_pause_does_not_shorten(self, clock):
+        bucket = TokenBucket(rate_per_min=60, burst=1)
+        bucket.pause(30)
+        bucket.pause(5)
+        assert bucket.eta(0) == pytest.approx(31.0)
+
+    def test_take_returns_false_on_stop(self):
+        bucket = TokenBucket(rate_per_min=1, burst=1)
+        bucket.take()
+        stop = threading.Event()
+        stop.set()
+        assert bucket.take(stop) is False
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+class _Identify:
+    """identify() stand-in: records calls, 429s the listed images once each."""
+
+    def __init__(self, limited=(), retry_after=0.2, gate=None, always=False):
+        self.calls, self.limited, self.retry_after, self.gate = [], set(limited), retry_after, gate
+        self.always = always
+
+    def __call__(self, image_path):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append(image_path)
+        if self.always or image_path in self.limited:
+            self.limited.discard(image_path)
+            raise RateLimited(self.retry_after)
+        return {'common_name': image_path.upper()}
+
+
+def _queue(identify, **kw):
+    kw.setdefault('workers', 1)
+    return IdentifyQueue(identify, TokenBucket(rate_per_min=6000, burst=10), **kw)
+
+
+class TestIdentifyQueue:
+    def test_jobs_run_in_submit_order(self):
+        gate = threading.Event()
+        identify = _Identify(gate=gate)
+        q = _queue(identify)
+        jobs = [q.submit(i, f'img{i}', f'k{i}') for i in range(4)]
+        _wait_for(lambda: q.job(jobs[0]['job_id'])['status'] == 'running')
+        assert [q.job(j['job_id']).get('position') for j in jobs[1:]] == [0, 1, 2]
+        gate.set()
+        _wait_for(lambda: all(q.job(j['job_id'])['status'] == 'done' for j in jobs))
+        assert identify.calls == ['img0', 'img1', 'img2', 'img3']
+        assert q.job(jobs[2]['job_id'])['result'] == {'common_name': 'IMG2'}
+        q.stop()
+
+    def test_rate_limited_job_retried_first_and_reported_first(self):
+        identify = _Identify(limited={'img0'}, retry_after=0.3)
+        q = _queue(identify)
+        first = q.submit(0, 'img0', 'k0')
+        _wait_for(lambda: q.job(first['job_id']).get('attempts') == 1
+                  and q.job(first['job_id'])['status'] == 'queued')
+        later = [q.submit(i, f'img{i}', f'k{i}') for i in (1, 2)]
+        assert q.job(first['job_id'])['position'] == 0
+        assert [q.job(j['job_id'])['position'] for j in later] == [1, 2]
+        _wait_for(lambda: all(q.job(j['job_id'])['status'] == 'done' for j in [first, *later]))
+        assert identify.calls == ['img0', 'img0', 'img1', 'img2']
+        assert q.stats()['rate_limited'] == 1
+        q.stop()
+
+    def test_delayed_retry_is_not_held_by_a_worker(self):
+        """During the retry delay the job waits in the queue, not in a sleeping worker."""
+        identify = _Identify(limited={'img0'}, retry_after=0.3)
+        q = _queue(identify, workers=2)
+        first = q.submit(0, 'img0', 'k0')
+        _wait_for(lambda: q.job(first['job_id'])['status'] == 'queued'
+                  and q.job(first['job_id'])['attempts'] == 1)
+        with q._lock:
+            assert not q._queued[first['job_id']].get('_claimed')
+        _wait_for(lambda: q.job(first['job_id'])['status'] == 'done')
+        assert identify.calls == ['img0', 'img0']
+        q.stop()
+
+    def test_gives_up_after_max_attempts(self):
+        identify = _Identify(retry_after=0.05, always=True)
+        q = _queue(identify, max_attempts=2)
+        job = q.submit(0, 'img0', 'k0')
+        _wait_for(lambda: q.job(job['job_id'])['status'] == 'failed')
+        assert len(identify.calls) == 2
+        assert 'rate limit' in q.job(job['job_id'])['error']
+        q.stop()
+
+    def test_same_image_shares_job_and_result_is_cached(self):
+        gate = threading.Event()
+        done = []
+        q = _queue(_Identify(gate=gate), on_done=lambda job, result: done.append(job['job_id']))
+        a = q.submit(7, 'img', 'key')
+        assert q.submit(7, 'img', 'key')['job_id'] == a['job_id']
+        gate.set()
+        _wait_for(lambda: q.job(a['job_id'])['status'] == 'done')
+        cached = q.submit(7, 'img', 'key')
+        assert cached['status'] == 'done' and cached['result']['cached'] is True
+        assert q.submit(7, 'img', 'key', refresh=True)['status'] == 'queued'
+        assert done[:2] == [a['job_id'], cached['job_id']]
+        q.stop()
+
+    def test_full_queue_raises(self):
+        gate = threading.Event()
+        q = _queue(_Identify(gate=gate), max_pending=2)
+        q.submit(0, 'img0', 'k0')
+        _wait_for(lambda: q.stats()['calls'] == 1)
+        q.submit(1, 'img1', 'k1')
+        q.submit(2, 'img2', 'k2')
+        with pytest.raises(queue.Full):
+            q.submit(3, 'img3', 'k3')
+        gate.set()
+        q.stop()
@@ -0,0 +1,172 @@
+"""
+camera_stream_manager.py — stream selection: Reolink _main/_sub URL
+derivation per role, backend and idle state, and idle cameras decoding
+keyframes only through FfmpegCapture whichever backend is configured.
+FfmpegCapture and cv2.VideoCapture are replaced so nothing is opened.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+import camera_stream_manager as csm
+
+
+class _Cap:
+    opened = True
+
+    def __init__(self, url, keyframes_only=False):
+        self.url, self.keyframes_only = url, keyframes_only
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.released = True
+
+
+class _Ffmpeg(_Cap):
+    backend = 'ffmpeg'
+
+
+class _Cv2(_Cap):
+    pass
+
+
+class _DeadFfmpeg(_Ffmpeg):
+    opened = False
+
+
+@pytest.fixture
+def cams():
+    hardware = {'cam1': {'hardware_id': 'cam1', 'assigned_to_slot': 'bow',
+                         'rtsp_url': 'rtsp://admin:x@10.0.0.1:554/h264Preview_01_main'}}
+    slots = {'bow': {'assigned': True, 'hardware_id': 'cam1', 'roles': {'forward_watch': True}}}
+    with patch.object(csm, 'hardware', hardware), \
+         patch.object(csm, 'slots', slots), \
+         patch.object(csm, 'FfmpegCapture', _Ffmpeg), \
+         patch.object(csm.cv2, 'VideoCapture', _Cv2):
+        yield csm
+
+
+def _state():
+    return {'cap': None, 'url': '', 'idle': False}
+
+
+class TestOpenCvBackend:
+    def test_busy_camera_uses_videocapture_on_configured_url(self, cams):
+        st = _state()
+        csm._reopen_cap('cam1', st)
+        assert isinstance(st['cap'], _Cv2)
+        assert st['url'].endswith('_01_main')
+
+    def test_idle_camera_uses_keyframe_ffmpeg_on_sub_stream(self, cams):
+        st = _state()
+        csm._reopen_cap('cam1', st, keyframes_only=True)
+        assert isinstance(st['cap'], _Ffmpeg)
+        assert st['cap'].keyframes_only is True
+        assert st['url'].endswith('_01_sub')
+        assert csm._decoder_status(st)['backend'] == 'ffmpeg'
+
+    def test_idle_falls_back_to_videocapture_without_ffmpeg(self, cams):
+        st = _state()
+        with patch.object(csm, 'FfmpegCapture', _DeadFfmpeg):
+            csm._reopen_cap('cam1', st, keyframes_only=True)
+        assert isinstance(st['cap'], _Cv2)
+        assert csm._decoder_status(st)['backend'] == 'opencv'
+        # the fallback capture is not reopened on every loop while still idle
+        assert not csm._needs_reopen('cam1', st, idle=True)
+
+    def test_reopen_on_idle_transitions(self, cams):
+        st = _state()
+        csm._reopen_cap('cam1', st)
+        assert not csm._needs_reopen('cam1', st, idle=False)
+        assert csm._needs_reopen('cam1', st, idle=True)
+        csm._reopen_cap('cam1', st, keyframes_only=True)
+        assert not csm._needs_reopen('cam1', st, idle=True)
+        assert csm._needs_reopen('cam1', st, idle=False)
+
+
+class TestFfmpegBackend:
+    def test_busy_main_role_decodes_main_stream(self, cams):
+        st = _state()
+        with patch.object(csm, 'DECODE_BACKEND', 'ffmpeg'):
+            csm._reopen_cap('cam1', st)
+        assert isinstance(st['cap'], _Ffmpeg)
+        assert st['cap'].keyframes_only is False
+        assert st['url'].endswith('_01_main')
+
+    def test_no_videocapture_fallback(self, cams):
+        st = _state()
+        with patch.object(csm, 'DECODE_BACKEND', 'ffmpeg'), \
+             patch.object(csm, 'FfmpegCapture', _DeadFfmpeg):
+            csm._reopen_cap('cam1', st)
+        assert st['cap'] is None
+
+    def test_role_change_reopens(self, cams):
+        st = _state()
+        with patch.object(csm, 'DECODE_BACKEND', 'ffmpeg'):
+            csm._reopen_cap('cam1', st)
+            csm.slots['bow']['roles'] = {}
+            assert csm._needs_reopen('cam1', st, idle=False)
+
+
+_REOLINK = 'rtsp://admin:x@10.0.0.1:554/h264Preview_01_'
+
+
+class TestStreamUrl:
+    @pytest.mark.parametrize('roles, main', [
+        ({'forward_watch': True}, True),
+        ({'fish_detection': True}, True),
+        ({'forward_watch': True, 'fish_detection': True}, True),
+        ({'forward_watch': False}, False),
+        ({'default': True}, False),
+        ({}, False),
+    ])
+    def test_wants_main_stream_by_role(self, cams, roles, main):
+        csm.slots['bow']['roles'] = roles
+        assert csm._wants_main_stream('cam1') is main
+
+    def test_unassigned_or_unknown_hardware_wants_sub(self, cams):
+        csm.hardware['cam1']['assigned_to_slot'] = None
+        assert csm._wants_main_stream('cam1') is False
+        assert csm._wants_main_stream('nope') is False
+
+    @pytest.mark.parametrize('backend, rtsp_url, main_role, idle, expected', [
+        # opencv in use: configured URL untouched
+        ('opencv', _REOLINK + 'sub',  True,  False, _REOLINK + 'sub'),
+        ('opencv', _REOLINK + 'main', False, False, _REOLINK + 'main'),
+        # ffmpeg: suffix follows the role
+        ('ffmpeg', _REOLINK + 'sub',  True,  False, _REOLINK + 'main'),
+        ('ffmpeg', _REOLINK + 'main', True,  False, _REOLINK + 'main'),
+        ('ffmpeg', _REOLINK + 'main', False, False, _REOLINK + 'sub'),
+        ('ffmpeg', _REOLINK + 'sub',  False, False, _REOLINK + 'sub'),
+        # idle: sub stream on either backend, even for a main-stream role
+        ('ffmpeg', _REOLINK + 'main', True,  True,  _REOLINK + 'sub'),
+        ('opencv', _REOLINK + 'main', True,  True,  _REOLINK + 'sub'),
+        # suffix only at the end of the path
+        ('ffmpeg', 'rtsp://10.0.0.1/cam_main/live', False, False, 'rtsp://10.0.0.1/cam_main/live'),
+        ('ffmpeg', 'rtsp://10.0.0.1/h264Preview_01_mainx', False, False,
+         'rtsp://10.0.0.1/h264Preview_01_mainx'),
+        # not a Reolink path — unchanged
+        ('ffmpeg', 'rtsp://10.0.0.1:554/stream1', True, False, 'rtsp://10.0.0.1:554/stream1'),
+        ('ffmpeg', '', True, False, ''),
+    ])
+    def test_derived_url(self, cams, backend, rtsp_url, main_role, idle, expected):
+        csm.hardware['cam1']['rtsp_url'] = rtsp_url
+        csm.slots['bow']['roles'] = {'forward_watch': main_role}
+        with patch.object(csm, 'DECODE_BACKEND', backend):
+            assert csm._stream_url('cam1', idle) == expected
+
+    @pytest.mark.parametrize('main_role, idle, expected', [
+        (True,  False, 'rtsp://10.0.0.1/main-explicit'),
+        (False, False, 'rtsp://10.0.0.1/sub-explicit'),
+        (True,  True,  'rtsp://10.0.0.1/sub-explicit'),
+    ])
+    def test_explicit_urls_win(self, cams, main_role, idle, expected):
+        csm.hardware['cam1'].update(rtsp_url_main='rtsp://10.0.0.1/main-explicit',
+                                    rtsp_url_sub='rtsp://10.0.0.1/sub-explicit')
+        csm.slots['bow']['roles'] = {'fish_detection': main_role}
+        with patch.object(csm, 'DECODE_BACKEND', 'ffmpeg'):
+            assert csm._stream_url('cam1', idle) == expected
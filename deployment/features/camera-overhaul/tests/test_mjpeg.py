@@ -0,0 +1,204 @@
+"""
+camera_stream_manager.py — per-tier JPEG cache (_encoded_frame) and the
+MJPEG generator (_mjpeg_stream): multipart framing, wake-up on a new frame,
+client accounting and clean exit on disconnect. No camera or grabber thread
+— a hw_state-shaped dict is driven by hand.
+"""
+
+import threading
+import time
+from threading import Condition, Lock
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+import camera_stream_manager as csm
+
+
+def _state(width=1280, height=720):
+    lock = Lock()
+    return {
+        'frame':     np.full((height, width, 3), 90, np.uint8),
+        'jpeg':      {},
+        'seq':       1,
+        'lock':      lock,
+        'cond':      Condition(lock),
+        'clients':   0,
+        'last_read': 0.0,
+        'bus':       None,
+    }
+
+
+def _publish(state, value):
+    """What the grabber does for each decoded frame."""
+    with state['cond']:
+        state['frame'] = np.full_like(state['frame'], value)
+        state['jpeg']  = {}
+        state['seq']  += 1
+        state['cond'].notify_all()
+
+
+def _parse_part(part):
+    """Split one multipart chunk into (headers, jpeg); asserts the framing."""
+    head, sep, rest = part.partition(b'\r\n\r\n')
+    assert sep, 'no header terminator'
+    lines = head.split(b'\r\n')
+    assert lines[0] == b'--' + csm.MJPEG_BOUNDARY.encode()
+    headers = dict(line.split(b': ', 1) for line in lines[1:])
+    length = int(headers[b'Content-Length'])
+    assert rest[length:] == b'\r\n'
+    return headers, rest[:length]
+
+
+@pytest.fixture
+def encodes():
+    """Count cv2.imencode calls made by camera_stream_manager."""
+    calls = []
+    real = cv2.imencode
+
+    def counting(ext, img, params=None):
+        calls.append(img.shape)
+        return real(ext, img, params or [])
+    with patch.object(csm.cv2, 'imencode', side_effect=counting):
+        yield calls
+
+
+class TestEncodedFrame:
+    def test_one_encode_per_tier_per_frame(self, encodes):
+        st = _state()
+        first = csm._encoded_frame(st, 'grid')
+        assert csm._encoded_frame(st, 'grid') is first
+        assert len(encodes) == 1
+        csm._encoded_frame(st, 'full')
+        csm._encoded_frame(st, 'full')
+        assert len(encodes) == 2
+        assert set(st['jpeg']) == {'grid', 'full'}
+
+    def test_new_frame_invalidates_cache(self, encodes):
+        st = _state()
+        csm._encoded_frame(st, 'grid')
+        _publish(st, 200)
+        csm._encoded_frame(st, 'grid')
+        assert len(encodes) == 2
+
+    def test_tiers_resize_to_width(self):
+        st = _state()
+        sizes = {}
+        for tier in ('full', 'grid', 'thumb', 'bogus'):
+            img = cv2.imdecode(np.frombuffer(csm._encoded_frame(st, tier), np.uint8),
+                               cv2.IMREAD_COLOR)
+            sizes[tier] = img.shape[:2]
+        assert sizes['full'] == (720, 1280)
+        assert sizes['grid'] == (360, 640)
+        assert sizes['thumb'] == (180, 320)
+        assert sizes['bogus'] == sizes['full']
+
+    def test_stale_encode_not_cached(self):
+        """A frame published during the encode must not get the old JPEG cached."""
+        st = _state()
+        real = cv2.imencode
+
+        def publish_midway(ext, img, params=None):
+            _publish(st, 10)
+            return real(ext, img, params or [])
+        with patch.object(csm.cv2, 'imencode', side_effect=publish_midway):
+            assert csm._encoded_frame(st, 'thumb') is not None
+        assert st['jpeg'] == {}
+
+    def test_no_frame_and_last_read(self):
+        st = _state()
+        st['frame'] = None
+        before = time.monotonic()
+        assert csm._encoded_frame(st) is None
+        assert st['last_read'] >= before
+
+
+class TestMjpegStream:
+    def _open(self, resolve, fps=15, tier='full'):
+        resp = csm._mjpeg_stream(resolve, 'Bow', fps, tier)
+        return resp, iter(resp.response)
+
+    def test_response_headers_and_boundary_framing(self):
+        st = _state(320, 240)
+        resp, gen = self._open(lambda: st)
+        assert resp.mimetype == 'multipart/x-mixed-replace'
+        assert f'boundary={csm.MJPEG_BOUNDARY}' in resp.headers['Content-Type']
+        assert 'no-cache' in resp.headers['Cache-Control']
+        headers, jpeg = _parse_part(next(gen))
+        assert headers[b'Content-Type'] == b'image/jpeg'
+        assert jpeg == st['jpeg']['full']
+        assert jpeg[:2] == b'\xff\xd8'
+        gen.close()
+
+    def test_clients_share_cached_encoding(self, encodes):
+        st = _state(320, 240)
+        gens = [self._open(lambda: st, tier='grid')[1] for _ in range(3)]
+        parts = [_parse_part(next(g))[1] for g in gens]
+        assert parts[0] == parts[1] == parts[2]
+        assert len(encodes) == 1
+        assert st['clients'] == 3
+        for g in gens:
+            g.close()
+
+    def test_new_frame_wakes_waiting_client(self):
+        st = _state(320, 240)
+        with patch.object(csm, 'MJPEG_IDLE_S', 5.0):
+            _, gen = self._open(lambda: st)
+            next(gen)
+            got = {}
+
+            def reader():
+                start = time.monotonic()
+                got['part'] = next(gen)
+                got['waited'] = time.monotonic() - start
+            t = threading.Thread(target=reader)
+            t.start()
+            time.sleep(0.2)
+            assert 'part' not in got          # blocked on the condition
+            _publish(st, 250)
+            t.join(2)
+        assert not t.is_alive()
+        assert got['waited'] < 2.0            # woken by notify, not the idle timeout
+        assert _parse_part(got['part'])[1] == st['jpeg']['full']
+        gen.close()
+
+    def test_idle_timeout_resends_last_frame(self):
+        st = _state(320, 240)
+        with patch.object(csm, 'MJPEG_IDLE_S', 0.1):
+            _, gen = self._open(lambda: st)
+            first = next(gen)
+            assert next(gen) == first
+        gen.close()
+
+    def test_disconnect_releases_client(self):
+        st = _state(320, 240)
+        _, gen = self._open(lambda: st)
+        assert st['clients'] == 0             # nothing runs until the first read
+        next(gen)
+        assert st['clients'] == 1
+        gen.close()                           # what the WSGI server does on disconnect
+        assert st['clients'] == 0
+        with pytest.raises(StopIteration):
+            next(gen)
+
+    def test_unassigned_slot_sends_placeholder(self):
+        with patch.object(csm, 'MJPEG_IDLE_S', 0.0):
+            _, gen = self._open(lambda: None)
+            _, jpeg = _parse_part(next(gen))
+        assert jpeg == csm._offline_placeholder('Bow Offline')
+        gen.close()
+
+    def test_reassignment_moves_client_count(self):
+        a, b = _state(320, 240), _state(320, 240)
+        current = {'state': a}
+        with patch.object(csm, 'MJPEG_IDLE_S', 0.05):
+            _, gen = self._open(lambda: current['state'])
+            next(gen)
+            assert (a['clients'], b['clients']) == (1, 0)
+            current['state'] = b
+            next(gen)
+            assert (a['clients'], b['clients']) == (0, 1)
+        gen.close()
+        assert b['clients'] == 0
@@ -0,0 +1,85 @@
+"""
+motion_gate.py — frame differencing against the running background,
+sensitivity levels, hold and the max_skip_s refresh.
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+
+from motion_gate import MotionGate
+
+
+def _scene(fish_at=None):
+    """Flat grey 640x360 frame, optionally with a dark 40 px 'fish' at x."""
+    frame = np.full((360, 640, 3), 120, dtype=np.uint8)
+    if fish_at is not None:
+        frame[160:200, fish_at:fish_at + 40] = 20
+    return frame
+
+
+def _gate(**kw):
+    return MotionGate(max_skip_s=1000.0, **kw)
+
+
+class TestMotionGate:
+    def test_first_frame_runs_then_static_frames_skip(self):
+        gate = _gate()
+        assert gate.check('a', _scene()) is True
+        assert [gate.check('a', _scene()) for _ in range(5)] == [False] * 5
+        stats = gate.stats()
+        assert stats['checked'] == 6 and stats['skipped'] == 5
+        assert stats['skip_ratio'] == round(5 / 6, 3)
+
+    def test_moving_object_runs(self):
+        gate = _gate()
+        gate.check('a', _scene())
+        gate.check('a', _scene())
+        assert gate.check('a', _scene(fish_at=300)) is True
+        assert gate.stats()['slots']['a']['changed'] > 0
+
+    def test_slow_light_change_folds_into_background(self):
+        gate = _gate()
+        gate.check('a', _scene())
+        frame = _scene()
+        runs = []
+        for step in range(1, 30):
+            frame[:] = 120 + step // 3        # a grey level every few frames
+            runs.append(gate.check('a', frame))
+        assert not any(runs)
+
+    def test_sensitivity_levels(self):
+        gate = _gate()
+        gate.sensitivity = {'low': 'low', 'off': 'off'}
+        small = _scene()
+        small[168:192, 300:324] = 20          # ~0.25% of the 160 px gate image
+        for slot in ('high', 'low', 'off'):
+            gate.check(slot, _scene())
+        gate.sensitivity['high'] = 'high'
+        assert gate.check('high', small) is True
+        assert gate.check('low', small) is False
+        assert gate.check('off', _scene()) is True
+
+    def test_hold_keeps_running_without_motion(self):
+        gate = _gate(hold_s=5.0)
+        gate.check('a', _scene())
+        gate.hold('a')
+        assert gate.check('a', _scene()) is True
+        with patch('motion_gate.time.monotonic', return_value=gate._slots['a']['hold_until'] + 1):
+            assert gate.check('a', _scene()) is False
+
+    def test_max_skip_forces_a_run(self):
+        gate = MotionGate(max_skip_s=30.0)
+        gate.check('a', _scene())
+        last = gate._slots['a']['last_run']
+        with patch('motion_gate.time.monotonic', return_value=last + 10):
+            assert gate.check('a', _scene()) is False
+        with patch('motion_gate.time.monotonic', return_value=last + 31):
+            assert gate.check('a', _scene()) is True
+
+    def test_frame_size_change_reprimes(self):
+        gate = _gate()
+        gate.check('a', _scene())
+        assert gate.check('a', np.full((480, 640, 3), 120, dtype=np.uint8)) is True
+        gate.forget('a')
+        assert 'a' not in gate.stats()['slots']
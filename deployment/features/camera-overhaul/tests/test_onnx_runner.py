@@ -0,0 +1,94 @@
+"""
+onnx_runner.py — BatchRunner chunking and per-item result routing against a
+fake session (no model). Needs onnxruntime importable (module-level
+SessionOptions tables); skipped otherwise.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('onnxruntime')
+
+from onnx_runner import BatchRunner, has_dynamic_batch  # noqa: E402
+
+C, S = 3, 4
+
+
+class _Session:
+    """Echoes each input's mean back as its output row; records batch sizes."""
+
+    def __init__(self, batch_dim):
+        self._inputs = [SimpleNamespace(name='images', shape=[batch_dim, C, S, S])]
+        self.batches = []
+        self.feeds = []
+
+    def get_inputs(self):
+        return self._inputs
+
+    def run(self, outputs, feed):
+        x = feed['images']
+        assert x.ndim == 4
+        self.batches.append(len(x))
+        self.feeds.append(x)
+        return [x.mean(axis=(1, 2, 3)).reshape(-1, 1)]
+
+
+def _item(k, batched=True):
+    shape = (1, C, S, S) if batched else (C, S, S)
+    return np.full(shape, float(k), np.float32)
+
+
+@pytest.mark.parametrize('dim, dynamic', [
+    ('batch_size', True), (None, True), (-1, True), (0, True), (1, False), (4, False),
+])
+def test_has_dynamic_batch(dim, dynamic):
+    assert has_dynamic_batch(_Session(dim)) is dynamic
+
+
+def test_dynamic_batch_chunks_and_routes_results():
+    sess = _Session('batch_size')
+    runner = BatchRunner(sess, max_batch=3)
+    inputs = [_item(k, batched=k % 2 == 0) for k in range(7)]   # [1,C,H,W] and [C,H,W] mixed
+    results = runner.run(inputs)
+    assert sess.batches == [3, 3, 1]
+    assert [r.shape for r in results] == [(1, 1)] * 7
+    assert [float(r[0, 0]) for r in results] == [float(k) for k in range(7)]
+    assert runner.stats() == {'dynamic_batch': True, 'max_batch': 3, 'runs': 3,
+                              'items': 7, 'mean_batch': 2.33}
+
+
+def test_stacked_array_is_sliced_without_copy():
+    sess = _Session('batch_size')
+    runner = BatchRunner(sess, max_batch=4)
+    stacked = np.concatenate([_item(k) for k in range(6)])
+    results = runner.run(stacked)
+    assert sess.batches == [4, 2]
+    assert all(np.shares_memory(feed, stacked) for feed in sess.feeds)
+    assert [float(r[0, 0]) for r in results] == [float(k) for k in range(6)]
+
+
+def test_fixed_batch_runs_one_at_a_time():
+    sess = _Session(1)
+    runner = BatchRunner(sess, max_batch=8)
+    assert runner.max_batch == 1
+    results = runner.run([_item(k) for k in range(3)])
+    assert sess.batches == [1, 1, 1]
+    assert [float(r[0, 0]) for r in results] == [0.0, 1.0, 2.0]
+    assert runner.stats()['mean_batch'] == 1.0
+
+
+def test_single_unbatched_item_gets_batch_axis():
+    sess = _Session('batch_size')
+    results = BatchRunner(sess).run([_item(5, batched=False)])
+    assert sess.feeds[0].shape == (1, C, S, S)
+    assert float(results[0][0, 0]) == 5.0
+
+
+def test_empty_input_runs_nothing():
+    sess = _Session('batch_size')
+    runner = BatchRunner(sess)
+    assert runner.run([]) == []
+    assert sess.batches == []
+    assert runner.stats()['mean_batch'] == 0.0
@@ -0,0 +1,91 @@
+"""
+preprocess.py — letterbox geometry, detector and species input tensors.
+"""
+
+import cv2
+import numpy as np
+
+from preprocess import (DetectionPreprocessor, IMAGENET_MEAN, IMAGENET_STD, Letterbox,
+                        PAD_VALUE, SpeciesPreprocessor)
+
+
+class TestLetterbox:
+    def test_wide_frame_padded_top_and_bottom(self):
+        lb = Letterbox((360, 640))
+        assert (lb.width, lb.height) == (640, 360)
+        assert (lb.left, lb.top) == (0, 140)
+
+    def test_tall_frame_scaled_and_centred(self):
+        lb = Letterbox((1280, 640))
+        assert lb.scale == 0.5
+        assert (lb.width, lb.height, lb.left, lb.top) == (320, 640, 160, 0)
+
+    def test_box_maps_back_to_frame_pixels(self):
+        lb = Letterbox((720, 1280))                    # scale 0.5, top 140
+        bbox = {'x_center': 320, 'y_center': 320, 'width': 100, 'height': 50}
+        assert lb.box(bbox) == [540, 310, 740, 410]
+
+    def test_box_clipped_to_frame(self):
+        lb = Letterbox((360, 640))
+        bbox = {'x_center': 5, 'y_center': 150, 'width': 40, 'height': 40}
+        x1, y1, x2, y2 = lb.box(bbox)
+        assert x1 == 0 and y1 == 0 and x2 == 25 and y2 == 30
+
+    def test_bbox_is_frame_space_box(self):
+        lb = Letterbox((720, 1280))
+        bbox = {'x_center': 320, 'y_center': 320, 'width': 100, 'height': 50}
+        assert lb.bbox(bbox) == {'x_center': 640, 'y_center': 360, 'width': 200, 'height': 100}
+        clipped = {'x_center': 5, 'y_center': 150, 'width': 40, 'height': 40}
+        x1, y1, x2, y2 = lb.box(clipped)
+        assert lb.bbox(clipped) == {'x_center': (x1 + x2) / 2, 'y_center': (y1 + y2) / 2,
+                                    'width': x2 - x1, 'height': y2 - y1}
+
+
+class TestDetectionPreprocessor:
+    def test_tensor_layout_and_padding(self):
+        frame = np.full((360, 640, 3), 255, dtype=np.uint8)
+        tensor, lb = DetectionPreprocessor()(frame, slot='a')
+        assert tensor.shape == (1, 3, 640, 640) and tensor.dtype == np.float32
+        assert np.allclose(tensor[0, :, lb.top:lb.top + lb.height], 1.0)
+        assert np.allclose(tensor[0, :, :lb.top], PAD_VALUE)
+        assert np.allclose(tensor[0, :, lb.top + lb.height:], PAD_VALUE)
+
+    def test_greyscale_replicated_to_three_channels(self):
+        rng = np.random.default_rng(1)
+        frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        tensor, lb = DetectionPreprocessor()(frame)
+        resized = cv2.resize(frame, (lb.width, lb.height), interpolation=cv2.INTER_LINEAR)
+        grey = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255
+        inner = tensor[0, :, lb.top:lb.top + lb.height, lb.left:lb.left + lb.width]
+        assert np.array_equal(inner[0], grey)
+        assert np.array_equal(inner[1], inner[0]) and np.array_equal(inner[2], inner[0])
+
+    def test_buffers_reused_per_slot_until_shape_changes(self):
+        pre = DetectionPreprocessor()
+        frame = np.zeros((360, 640, 3), dtype=np.uint8)
+        first, _ = pre(frame, slot='a')
+        assert pre(frame, slot='a')[0] is first
+        assert pre(frame, slot='b')[0] is not first
+        assert pre(np.zeros((480, 640, 3), dtype=np.uint8), slot='a')[0] is not first
+        pre.forget('a')
+        assert pre(frame, slot='a')[0] is not first
+
+
+class TestSpeciesPreprocessor:
+    def test_imagenet_normalized_rgb(self):
+        crop = np.zeros((50, 80, 3), dtype=np.uint8)
+        crop[:, :] = (10, 128, 250)                    # BGR
+        batch = SpeciesPreprocessor(32)([crop])
+        assert batch.shape == (1, 3, 32, 32) and batch.dtype == np.float32
+        rgb = np.array([250, 128, 10], dtype=np.float32)
+        expected = (rgb / 255 - IMAGENET_MEAN) / IMAGENET_STD
+        assert np.allclose(batch[0].reshape(3, -1).mean(axis=1), expected, atol=1e-5)
+
+    def test_batch_grows_and_returns_views(self):
+        pre = SpeciesPreprocessor(16)
+        crops = [np.full((20, 20, 3), v, dtype=np.uint8) for v in (0, 100, 200)]
+        assert pre(crops[:1]).shape[0] == 1
+        batch = pre(crops)
+        assert batch.shape[0] == 3
+        assert pre(crops[:2]).base is batch.base
+        assert batch[0, 0, 0, 0] < batch[1, 0, 0, 0] < batch[2, 0, 0, 0]
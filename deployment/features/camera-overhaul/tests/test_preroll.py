@@ -0,0 +1,173 @@
+"""
+preroll.py — TS packet parsing and GOP buffering, fed synthetic packets
+directly (no ffmpeg process is started).
+"""
+
+import io
+from unittest.mock import patch
+
+import pytest
+
+import preroll
+from preroll import TS_PACKET, PrerollBuffer, _is_keyframe, _pid, _pmt_pid
+
+VIDEO_PID = 0x101
+PMT_PID   = 0x100
+
+
+def _packet(pid, header=b'', payload_start=False, fill=0xFF):
+    first = (0x40 if payload_start else 0x00) | (pid >> 8)
+    return (bytes([0x47, first, pid & 0xFF]) + header).ljust(TS_PACKET, bytes([fill]))
+
+
+def _pat():
+    section = bytes([0x00, 0xB0, 0x0D, 0x00, 0x01, 0xC1, 0x00, 0x00,
+                     0x00, 0x01, 0xE0 | (PMT_PID >> 8), PMT_PID & 0xFF,
+                     0xDE, 0xAD, 0xBE, 0xEF])
+    return _packet(0, bytes([0x10, 0x00]) + section, payload_start=True)
+
+
+def _pmt():
+    return _packet(PMT_PID, bytes([0x10, 0x00, 0x02]), payload_start=True)
+
+
+def _key(n):
+    return _packet(VIDEO_PID, bytes([0x30, 0x07, 0x40]), payload_start=True, fill=n)
+
+
+def _frame(n):
+    return _packet(VIDEO_PID, bytes([0x10]), fill=n)
+
+
+def _gop(n, frames=3):
+    return _key(n) + b''.join(_frame(n) for _ in range(frames))
+
+
+class _Sink:
+    def __init__(self):
+        self.data = bytearray()
+
+    def feed(self, data):
+        self.data += data
+
+
+@pytest.fixture
+def buffer():
+    with patch('preroll.Thread'):                  # no ffmpeg reader thread
+        buf = PrerollBuffer('rtsp://cam/main', seconds=5.0, name='test')
+    return buf
+
+
+def _feed(buf, data, at):
+    with patch('preroll.time.monotonic', return_value=at), \
+         patch('preroll.time.time', return_value=1_000_000 + at):
+        buf._packets(memoryview(bytes(data)))
+
+
+class TestPackets:
+    def test_header_fields(self):
+        assert _pid(_key(1)) == VIDEO_PID
+        assert _is_keyframe(_key(1)) and not _is_keyframe(_frame(1))
+        assert not _is_keyframe(_packet(VIDEO_PID, bytes([0x30, 0x00])))   # empty adaptation field
+        assert _pmt_pid(_pat()) == PMT_PID
+
+    def test_pat_without_programs(self):
+        pat = _packet(0, bytes([0x10, 0x00, 0x00, 0xB0, 0x09, 0, 1, 0xC1, 0, 0, 1, 2, 3, 4]))
+        assert _pmt_pid(pat) is None
+
+
+class TestGops:
+    def test_gops_cut_at_keyframes_and_leading_partial_dropped(self, buffer):
+        _feed(buffer, _pat() + _pmt() + _frame(9) + _frame(9), at=0.0)
+        _feed(buffer, _gop(1), at=0.0)
+        _feed(buffer, _gop(2), at=1.0)
+        _feed(buffer, _key(3), at=2.0)
+        gops = [g[2] for g in buffer._gops]
+        assert gops == [_gop(1), _gop(2)]
+        assert all(_is_keyframe(g[:TS_PACKET]) for g in gops)
+        assert buffer._pat == _pat() and buffer._pmt == _pmt()
+        assert buffer.bytes == len(_gop(1)) + len(_gop(2))
+
+    def test_keyframe_split_inside_one_read(self, buffer):
+        _feed(buffer, _pat() + _pmt() + _gop(1) + _gop(2) + _key(3), at=0.0)
+        assert [g[2] for g in buffer._gops] == [_gop(1), _gop(2)]
+
+    def test_trimmed_to_window_keeping_one_gop_before_it(self, buffer):
+        _feed(buffer, _pat() + _pmt(), at=0.0)
+        for t in range(21):
+            _feed(buffer, _gop(t % 200, frames=1), at=float(t))
+        starts = [g[0] for g in buffer._gops]
+        assert starts[0] <= 20.0 - buffer.seconds < starts[1]
+        assert buffer.bytes == sum(len(g[2]) for g in buffer._gops)
+
+    def test_read_realigns_packets_across_pipe_chunks(self, buffer):
+        stream = _pat() + _pmt() + _gop(1) + _gop(2) + _gop(3)
+
+        class Pipe(io.RawIOBase):
+            def __init__(self, data):
+                self.data = data
+
+            def readinto(self, view):
+                n = min(len(view), 100, len(self.data))   # never a whole packet
+                view[:n] = self.data[:n]
+                self.data = self.data[n:]
+                return n
+
+        buffer._read(Pipe(stream))
+        assert [g[2] for g in buffer._gops] == [_gop(1), _gop(2)]
+        assert bytes(buffer._gop) == _gop(3)
+
+
+class TestAttach:
+    def test_clip_gets_header_preroll_new_gops_and_partial(self, buffer):
+        _feed(buffer, _pat() + _pmt(), at=0.0)
+        for t in range(5):
+            _feed(buffer, _gop(t), at=float(t))
+        sink = _Sink()
+        with patch('preroll.time.monotonic', return_value=4.5):
+            buffer.attach(sink, pre_s=2.0)             # from the GOP starting at 2
+        assert sink.data == _pat() + _pmt() + _gop(2) + _gop(3)
+        assert sink.started_wall == 1_000_000 + 2.0
+
+        _feed(buffer, _gop(5, frames=1), at=5.0)       # closes GOP 4
+        assert sink.data.endswith(_gop(3) + _gop(4))
+        _feed(buffer, _frame(5), at=5.5)
+        buffer.detach(sink)                            # partial GOP 5 handed over
+        assert sink.data.endswith(_gop(4) + _gop(5, frames=2))
+        _feed(buffer, _gop(6), at=6.0)
+        assert sink.data.endswith(_gop(5, frames=2))   # nothing after detach
+
+    def test_empty_buffer_header_only(self, buffer):
+        sink = _Sink()
+        buffer.attach(sink, pre_s=10.0)
+        assert sink.data == b''
+        assert sink.started_wall is not None
+
+    def test_status(self, buffer):
+        _feed(buffer, _pat() + _pmt() + _gop(1) + _gop(2), at=0.0)
+        with patch('preroll.time.monotonic', return_value=3.0):
+            st = buffer.status()
+        assert st['gops'] == 1 and st['seconds'] == 3.0 and st['running'] is False
+
+
+class TestClip:
+    def test_clip_writes_ts_and_calls_on_done(self, buffer, tmp_path):
+        _feed(buffer, _pat() + _pmt() + _gop(1) + _gop(2), at=0.0)
+        done = []
+        clip = preroll.Clip(buffer, str(tmp_path / 'clips' / 'c.mp4'), event='fish',
+                            pre_s=10.0, post_s=0.0, on_done=done.append)
+        with patch.object(preroll.Clip, '_remux', lambda self, ts_path: None):
+            clip._run()
+        assert done == [clip] and clip.status == 'done'
+        data = (tmp_path / 'clips' / 'c.ts').read_bytes()
+        assert data == _pat() + _pmt() + _gop(1) + _gop(2)
+        assert len(data) % TS_PACKET == 0
+        assert buffer._clips == []
+
+    def test_failed_remux_keeps_ts(self, buffer, tmp_path):
+        _feed(buffer, _pat() + _pmt() + _gop(1) + _gop(2), at=0.0)
+        clip = preroll.Clip(buffer, str(tmp_path / 'c.mp4'), pre_s=10.0, post_s=0.0)
+        with patch('preroll.FFMPEG_BIN', str(tmp_path / 'no-ffmpeg')):
+            clip._run()
+        assert clip.status == 'failed' and clip.error
+        assert (tmp_path / 'c.ts').exists()
@@ -0,0 +1,182 @@
+"""
+tracker.py — IoU / centroid association, event expiry, species votes and
+how a finished event merges into its capture row.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tracker import FishEvent, FishTracker, event_update, iou, merge_votes, vote_winner
+
+T0 = datetime(2026, 6, 1, 8, 0, 0)
+
+
+def _det(box, conf=0.8, species=None, species_conf=None):
+    return {'box': list(box), 'confidence': conf, 'species': species,
+            'species_confidence': species_conf}
+
+
+def _step(tracker, now, *dets, slot='port'):
+    frame = object()
+    return tracker.update(slot, frame, list(dets), T0 + timedelta(seconds=now), now=now)
+
+
+class TestIou:
+    def test_identical_and_disjoint(self):
+        assert iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+        assert iou([0, 0, 10, 10], [10, 0, 20, 10]) == 0.0
+
+    def test_partial_overlap(self):
+        assert iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(50 / 150)
+
+
+class TestAssociation:
+    def test_overlapping_box_continues_event(self):
+        tr = FishTracker()
+        (first,), started = _step(tr, 0.0, _det([100, 100, 200, 150]))
+        assert started == [first]
+        (second,), started = _step(tr, 0.2, _det([110, 100, 210, 150]))
+        assert second is first and started == []
+        assert first.frames == 2 and first.box == [110, 100, 210, 150]
+
+    def test_detection_gets_event_id(self):
+        tr = FishTracker()
+        det = _det([0, 0, 10, 10])
+        (event,), _ = _step(tr, 0.0, det)
+        assert det['event_id'] == event.event_id
+
+    def test_fast_fish_matched_by_centroid(self):
+        tr = FishTracker()
+        (first,), _ = _step(tr, 0.0, _det([100, 100, 200, 150]))
+        (second,), started = _step(tr, 0.2, _det([190, 110, 290, 160]))   # IoU ≈ 0.04
+        assert second is first and started == []
+
+    def test_far_detection_starts_new_event(self):
+        tr = FishTracker()
+        (first,), _ = _step(tr, 0.0, _det([100, 100, 200, 150]))
+        (second,), started = _step(tr, 0.2, _det([400, 300, 500, 350]))
+        assert second is not first and started == [second]
+        assert tr.stats()['active'] == 2
+
+    def test_two_fish_matched_by_best_overlap(self):
+        tr = FishTracker()
+        (a, b), _ = _step(tr, 0.0, _det([0, 0, 100, 50]), _det([120, 0, 220, 50]))
+        # both detections overlap track a somewhat; greedy IoU gives each its own track
+        (nb, na), started = _step(tr, 0.2, _det([115, 0, 215, 50]), _det([5, 0, 105, 50]))
+        assert (na, nb) == (a, b) and started == []
+
+    def test_one_track_per_detection(self):
+        tr = FishTracker()
+        (a,), _ = _step(tr, 0.0, _det([0, 0, 100, 50]))
+        (x, y), started = _step(tr, 0.2, _det([0, 0, 100, 50]), _det([2, 0, 102, 50]))
+        assert x is a and y is not a and started == [y]
+
+    def test_slots_tracked_separately(self):
+        tr = FishTracker()
+        (a,), _ = _step(tr, 0.0, _det([0, 0, 100, 50]), slot='port')
+        (b,), started = _step(tr, 0.2, _det([0, 0, 100, 50]), slot='stern')
+        assert b is not a and started == [b]
+
+    def test_after_gap_a_new_event_starts(self):
+        tr = FishTracker(gap_s=5.0)
+        (a,), _ = _step(tr, 0.0, _det([0, 0, 100, 50]))
+        (b,), started = _step(tr, 6.0, _det([0, 0, 100, 50]))
+        assert b is not a and started == [b]
+
+
+class TestExpiry:
+    def test_expires_after_gap(self):
+        tr = FishTracker(gap_s=5.0)
+        (a,), _ = _step(tr, 0.0, _det([0, 0, 100, 50]))
+        _step(tr, 3.0, _det([0, 0, 100, 50]))
+        assert tr.expire(now=7.0) == []
+        assert tr.expire(now=8.5) == [a]
+        assert tr.active() == []
+        assert tr.stats()['events_closed'] == 1
+
+    def test_expires_at_max_duration(self):
+        tr = FishTracker(gap_s=5.0, max_s=10.0)
+        (a,), _ = _step(tr, 0.0, _det([0, 0, 100, 50]))
+        for t in (2.0, 4.0, 6.0, 8.0):
+            _step(tr, t, _det([0, 0, 100, 50]))
+        assert tr.expire(now=10.0) == [a]
+        (b,), started = _step(tr, 10.5, _det([0, 0, 100, 50]))
+        assert b is not a and started == [b]
+
+    def test_stats(self):
+        tr = FishTracker()
+        _step(tr, 0.0, _det([0, 0, 100, 50]))
+        _step(tr, 0.2, _det([0, 0, 100, 50]))
+        assert tr.stats()['detections_per_event'] == 2.0
+
+
+class TestVotes:
+    def test_best_frame_and_vote(self):
+        event = FishEvent('port', 0.0, T0)
+        frames = [object() for _ in range(3)]
+        for frame, conf, sp in zip(frames, (0.6, 0.9, 0.7), ('Bass', 'Walleye', 'Bass')):
+            event.add(_det([0, 0, 1, 1], conf, sp, 0.5), frame, [], 0.0, T0)
+        assert event.best[0] is frames[1] and event.best_conf == 0.9
+        assert event.vote_summary() == {'Bass': {'frames': 2, 'confidence': 0.5},
+                                        'Walleye': {'frames': 1, 'confidence': 0.5}}
+        assert event.species() == ('Bass', 0.5)
+
+    def test_vote_winner_most_frames_then_confidence(self):
+        assert vote_winner({}) == (None, None)
+        assert vote_winner({'Bass': {'frames': 3, 'confidence': 0.4},
+                            'Pike': {'frames': 2, 'confidence': 0.9}}) == ('Bass', 0.4)
+        assert vote_winner({'Bass': {'frames': 2, 'confidence': 0.4},
+                            'Pike': {'frames': 2, 'confidence': 0.9}}) == ('Pike', 0.9)
+
+    def test_merge_votes_weights_by_frames(self):
+        a = {'Bass': {'frames': 1, 'confidence': 0.9}}
+        b = {'Bass': {'frames': 3, 'confidence': 0.5}, 'Pike': {'frames': 1, 'confidence': 0.7}}
+        assert merge_votes(a, b) == {'Bass': {'frames': 4, 'confidence': 0.6},
+                                     'Pike': {'frames': 1, 'confidence': 0.7}}
+        assert a == {'Bass': {'frames': 1, 'confidence': 0.9}}     # inputs untouched
+        assert merge_votes(None, b) == b and merge_votes(a, None) == a
+
+
+class TestEventUpdate:
+    def _event(self, conf, species='Bass', frames=3, seconds=10):
+        event = FishEvent('port', 0.0, T0)
+        for i in range(frames):
+            event.add(_det([0, 0, 1, 1], conf if i == 0 else conf / 2, species, 0.8),
+                      object(), [], float(i), T0 + timedelta(seconds=seconds * i / max(1, frames - 1)))
+        return event
+
+    def _row(self, **kw):
+        row = {'timestamp': T0.isoformat(), 'fish_confidence': 0.7, 'species': None,
+               'species_confidence': None, 'species_votes': None, 'event_end': None,
+               'event_frames': None}
+        row.update(kw)
+        return row
+
+    def test_new_event_row(self):
+        update = event_update(self._row(fish_confidence=0.7), self._event(0.7))
+        assert update['event_end'] == T0 + timedelta(seconds=10)
+        assert update['duration_s'] == 10.0 and update['frames'] == 3
+        assert (update['species'], update['species_confidence']) == ('Bass', 0.8)
+        assert update['replace_image'] is False        # opening frame is still the best
+
+    def test_better_frame_replaces_image(self):
+        assert event_update(self._row(fish_confidence=0.7), self._event(0.95))['replace_image'] is True
+
+    def test_dedup_merge_into_earlier_capture(self):
+        """A second event deduplicated onto a capture adds to its votes, frames and span."""
+        row = self._row(fish_confidence=0.9, species='Pike', species_confidence=0.6,
+                        species_votes={'Pike': {'frames': 5, 'confidence': 0.6}},
+                        event_end=(T0 + timedelta(seconds=60)).isoformat(), event_frames=5)
+        update = event_update(row, self._event(0.8, species='Bass', frames=3))
+        assert update['frames'] == 8
+        assert update['event_end'] == T0 + timedelta(seconds=60)     # later end kept
+        assert update['votes'] == {'Pike': {'frames': 5, 'confidence': 0.6},
+                                   'Bass': {'frames': 3, 'confidence': 0.8}}
+        assert update['species'] == 'Pike'
+        assert update['replace_image'] is False
+
+    def test_no_votes_keeps_row_species(self):
+        row = self._row(species='Pike', species_confidence=0.6)
+        update = event_update(row, self._event(0.5, species=None))
+        assert (update['species'], update['species_confidence']) == ('Pike', 0.6)
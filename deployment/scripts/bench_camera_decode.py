@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+d3kOS Camera Decode Benchmark
+
+Compares the two frame-grabber decode backends used by camera_stream_manager
+(deployment/features/camera-overhaul/pi_source/):
+  opencv       cv2.VideoCapture — decode in-process
+  ffmpeg       frame_decoder.FfmpegCapture — ffmpeg subprocess → numpy buffer
+  ffmpeg-key   FfmpegCapture with keyframes_only (idle-camera mode)
+
+For each backend it reads frames for --seconds and reports:
+  decoded fps    frames decoded per second
+  delivered fps  frames handed to the grabber (ffmpeg drops frames it can't deliver)
+  CPU %          one core = 100% — this process plus the ffmpeg child
+  CPU ms/frame   CPU time per decoded frame
+
+A file source measures maximum decode throughput; an RTSP source (a real
+camera, or mediamtx serving the test clip) runs at the camera's own rate, so
+CPU % is the per-camera cost on the boat. Run on the Pi for real numbers.
+
+Usage:
+  python3 bench_camera_decode.py                          # generated 1080p + 640x360 clips
+  python3 bench_camera_decode.py --source rtsp://admin:pw@10.42.0.62:554/h264Preview_01_main \\
+                                 --sub-source rtsp://admin:pw@10.42.0.62:554/h264Preview_01_sub
+  python3 bench_camera_decode.py --source clip.mp4 --seconds 20
+
+Requires ffmpeg/ffprobe on PATH (or FFMPEG_BIN / FFPROBE_BIN) and python3-opencv.
+"""
+
+import sys, os, time, pathlib, argparse, subprocess, tempfile
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]
+                       / "features" / "camera-overhaul" / "pi_source"))
+import cv2
+import frame_decoder as fd
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+def child_cpu_s(pid):
+    """utime + stime of a running child process, from /proc."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLK_TCK
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def make_clip(path, size, seconds=20, fps=30):
+    """H.264 test clip with a camera-like GOP (keyframe every 2 s)."""
+    subprocess.run(
+        [fd.FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}",
+         "-t", str(seconds), "-c:v", "libx264", "-preset", "veryfast",
+         "-g", str(fps * 2), "-pix_fmt", "yuv420p", path],
+        check=True)
+
+
+def run(backend, source, seconds):
+    """Read from source for `seconds`. Returns a result dict or None if it won't open."""
+    if backend == "opencv":
+        cap = cv2.VideoCapture(source)
+    else:
+        cap = fd.FfmpegCapture(source, keyframes_only=(backend == "ffmpeg-key"))
+    if not cap.isOpened():
+        cap.release()
+        return None
+
+    pid = getattr(getattr(cap, "_proc", None), "pid", None)
+    cpu0, child0 = time.process_time(), child_cpu_s(pid) if pid else 0.0
+    start, delivered = time.monotonic(), 0
+    while time.monotonic() - start < seconds:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        delivered += 1
+    wall = time.monotonic() - start
+    cpu = time.process_time() - cpu0
+    if pid:
+        cpu += child_cpu_s(pid) - child0
+    decoded = getattr(cap, "frames", delivered)
+    cap.release()
+    return {
+        "decoded_fps":   decoded / wall,
+        "delivered_fps": delivered / wall,
+        "cpu_pct":       cpu / wall * 100,
+        "cpu_ms_frame":  cpu / max(decoded, 1) * 1000,
+        "dropped":       getattr(cap, "dropped", 0),
+    }
+
+
+def report(label, source, seconds, backends):
+    print(f"\n{label}: {source}")
+    print(f"  {'backend':12} {'decoded':>9} {'delivered':>10} {'CPU':>7} {'CPU/frame':>10} {'dropped':>8}")
+    for backend in backends:
+        r = run(backend, source, seconds)
+        if r is None:
+            print(f"  {backend:12} — could not open source")
+            continue
+        print(f"  {backend:12} {r['decoded_fps']:7.1f}/s {r['delivered_fps']:8.1f}/s "
+              f"{r['cpu_pct']:6.1f}% {r['cpu_ms_frame']:8.2f}ms {r['dropped']:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="d3kOS camera decode benchmark")
+    parser.add_argument("--source", help="main-stream file or RTSP URL (default: generated 1080p clip)")
+    parser.add_argument("--sub-source", help="sub-stream file or RTSP URL (default: generated 640x360 clip)")
+    parser.add_argument("--seconds", type=float, default=10, help="read time per backend")
+    parser.add_argument("--backends", default="opencv,ffmpeg,ffmpeg-key",
+                        help="comma-separated: opencv, ffmpeg, ffmpeg-key")
+    args = parser.parse_args()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        main_src, sub_src = args.source, args.sub_source
+        if not main_src:
+            main_src = os.path.join(tmp, "main_1080p.mp4")
+            make_clip(main_src, "1920x1080")
+        if not sub_src and not args.source:
+            sub_src = os.path.join(tmp, "sub_360p.mp4")
+            make_clip(sub_src, "640x360")
+
+        print(f"d3kOS camera decode benchmark — {args.seconds:g}s per backend, CPU % of one core")
+        report("Main stream (forward watch / detection)", main_src, args.seconds, backends)
+        if sub_src:
+            report("Sub stream (grid tiles)", sub_src, args.seconds, backends)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+d3kOS Fish Inference Benchmark
+
+Measures ONNX throughput of the two fish_detector models
+(deployment/features/camera-overhaul/pi_source/) through onnx_runner:
+  default   ort.InferenceSession with stock SessionOptions
+  tuned     onnx_runner.session_options() — thread counts, graph optimization,
+            memory arena, no spin-wait (ORT_* environment variables apply)
+
+For each model, session and batch size it runs --rounds batches of random
+input at the model's own input shape and reports images/sec and ms per
+batch. Models with a fixed batch of 1 (the YOLOv8 detector as exported)
+run a batch as one session.run per image — the same fallback BatchRunner
+uses in the service — so their rows show the per-image ceiling.
+
+Usage:
+  python3 bench_fish_inference.py
+  python3 bench_fish_inference.py --batches 1,2,4,8 --rounds 20
+  python3 bench_fish_inference.py --species-model /path/to/classifier.onnx --no-detector
+
+Run on the Pi for real numbers.
+"""
+
+import sys, time, pathlib, argparse
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]
+                       / "features" / "camera-overhaul" / "pi_source"))
+import numpy as np
+import onnxruntime as ort
+import onnx_runner as orr
+
+DETECTION_MODEL = "/opt/d3kos/models/marine-vision/fish_detector.onnx"
+SPECIES_MODEL   = "/opt/d3kos/models/fish-species/fish_classifier_483species_best.onnx"
+
+
+def random_input(session):
+    """One [1, C, H, W] float32 input at the model's shape (symbolic dims → 640/3)."""
+    shape = session.get_inputs()[0].shape
+    dims = [d if isinstance(d, int) and d > 0 else (3 if i == 1 else 640)
+            for i, d in enumerate(shape)]
+    dims[0] = 1
+    return np.random.rand(*dims).astype(np.float32)
+
+
+def measure(session, batch, rounds):
+    """(images/sec, ms per batch) for `rounds` batches of `batch` images."""
+    runner = orr.BatchRunner(session, max_batch=batch)
+    inputs = [random_input(session) for _ in range(batch)]
+    runner.run(inputs)                                  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        runner.run(inputs)
+    elapsed = time.perf_counter() - start
+    return batch * rounds / elapsed, elapsed / rounds * 1000
+
+
+def report(label, path, batches, rounds):
+    sessions = {
+        "default": ort.InferenceSession(path, providers=["CPUExecutionProvider"]),
+        "tuned":   orr.create_session(path),
+    }
+    dynamic = orr.has_dynamic_batch(sessions["tuned"])
+    print(f"\n{label}: {path}")
+    print(f"  input {sessions['tuned'].get_inputs()[0].shape} — "
+          f"{'dynamic batch' if dynamic else 'fixed batch (one run per image)'}")
+    print(f"  {'batch':>5} {'default img/s':>14} {'tuned img/s':>12} {'tuned ms/batch':>15} {'speedup':>8}")
+    for batch in batches:
+        base, _ = measure(sessions["default"], batch, rounds)
+        tuned, ms = measure(sessions["tuned"], batch, rounds)
+        print(f"  {batch:5d} {base:14.1f} {tuned:12.1f} {ms:15.1f} {tuned / base:7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="d3kOS fish inference benchmark")
+    parser.add_argument("--detection-model", default=DETECTION_MODEL)
+    parser.add_argument("--species-model", default=SPECIES_MODEL)
+    parser.add_argument("--no-detector", action="store_true", help="skip the YOLO detector")
+    parser.add_argument("--no-species", action="store_true", help="skip the species classifier")
+    parser.add_argument("--batches", default="1,2,4,8,16", help="comma-separated batch sizes")
+    parser.add_argument("--rounds", type=int, default=10, help="timed batches per measurement")
+    args = parser.parse_args()
+    batches = [int(b) for b in args.batches.split(",") if b.strip()]
+
+    print(f"d3kOS fish inference benchmark — onnxruntime {ort.__version__}, "
+          f"{args.rounds} rounds per batch size")
+    print(f"  tuned: intra {orr.ORT_INTRA_THREADS}, inter {orr.ORT_INTER_THREADS}, "
+          f"graph {orr.ORT_GRAPH_OPT}, arena {orr.ORT_MEM_ARENA}, spinning {orr.ORT_SPINNING}")
+    if not args.no_detector:
+        report("Fish detector (YOLOv8)", args.detection_model, batches, args.rounds)
+    if not args.no_species:
+        report("Species classifier", args.species_model, batches, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+d3kOS Intent Classifier Benchmark
+
+Compares the compiled intent classifier (deployment/v0.9.4/pi_source/
+intent_classifier.py) against the original nested-loop classification from
+AIQueryHandler over a corpus of real helm phrases:
+  1. equivalence — both must give the same answer for every phrase
+  2. speed       — mean microseconds per classification
+
+Usage:
+  python3 bench_intent_classifier.py
+  python3 bench_intent_classifier.py --rounds 2000
+
+Exit code 1 if any phrase classifies differently.
+"""
+
+import sys, re, time, pathlib, argparse
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "v0.9.4" / "pi_source"))
+import intent_classifier as ic
+
+# ---------------------------------------------------------------------------
+# Corpus — wake-word questions heard at the helm (Vosk transcripts, lower case)
+# plus mixed-case typed variants from the chat UI
+# ---------------------------------------------------------------------------
+
+CORPUS = [
+    "what is the rpm", "current rpm", "engine rpm please", "what's the rpm reading",
+    "how fast is the engine turning", "revolutions per minute",
+    "oil pressure", "what is the oil pressure", "oil psi right now",
+    "coolant temperature", "engine temp", "how hot is the engine",
+    "what is the temperature of the coolant", "what is the temperature",
+    "fuel level", "how much fuel do we have", "how much gas is left", "tank level",
+    "fuel remaining", "fuel percentage",
+    "battery voltage", "what is the voltage", "battery status", "system voltage",
+    "what is my speed", "current speed", "how fast am i going", "speed over ground",
+    "boat speed in knots", "sog", "knots right now",
+    "what is my heading", "current heading", "which way am i pointed",
+    "bearing to the next waypoint", "course over ground",
+    "boost pressure", "turbo pressure", "manifold pressure reading",
+    "engine hours", "how many hours on the engine", "runtime today",
+    "how long has the engine been running",
+    "where am i", "my position", "gps position", "what are my coordinates",
+    "what time is it", "current date", "what is the date today",
+    "what can you do", "help me", "list commands",
+    "system status", "all systems check", "give me an overview", "status report",
+    "how is everything",
+    "reboot", "restart the system", "shut down", "power cycle the display",
+    # Diagnostic — must go to Gemini even when they mention a status word
+    "why is the engine temp high", "what causes white smoke at high speed",
+    "should i be concerned about oil pressure", "is it normal for rpm to drop",
+    "black smoke from the exhaust", "strange noise from the engine",
+    "the boat is vibrating at 3000 rpm", "engine is overheating",
+    "what should i do the battery voltage is low", "explain boost pressure",
+    "tell me about the fuel system", "could it be the impeller",
+    "rough idle when cold", "what happens if the bilge pump fails",
+    # Procedure — RAG
+    "how to change the oil", "what type of oil does the engine take",
+    "which filter do i need", "steps to winterize the engine",
+    "replace the impeller", "service interval for the outdrive",
+    "how do i drain the water heater", "install a new battery",
+    "troubleshoot the chart plotter", "fix the bilge pump",
+    # Complex, neither
+    "where is the nearest fuel dock", "tides at kingston",
+    "anchorage recommendations near main duck island",
+    "what fish can i catch here", "is the marina open on sunday",
+    # Action commands
+    "log a note bilge pump checked", "add a note replaced zincs",
+    "add maintenance note changed fuel filter", "note that the raw water strainer was clean",
+    "remember that the port engine is leaking", "make a note check the belts",
+    "log engine hours 1234.5", "engine hours are 1502", "set engine hours to 998",
+    "record engine hours", "set fuel alarm at 20 percent", "fuel warning at 15",
+    "set low fuel alarm 25", "set fuel alarm", "please log that we anchored at six",
+    "Log A Note Checked The Bilge", "Engine Hours Are 2001",
+    "What Is My Speed", "Why Is The Engine Hot",
+]
+
+# ---------------------------------------------------------------------------
+# Reference — the original AIQueryHandler loops, kept verbatim for comparison
+# ---------------------------------------------------------------------------
+
+def legacy_simple(question):
+    q_lower = question.lower()
+    for intent in ic.DIAGNOSTIC_INTENTS:
+        if intent in q_lower:
+            return None
+    for keyword in ic.PROCEDURE_KEYWORDS:
+        if keyword in q_lower:
+            return None
+    for category, patterns in ic.SIMPLE_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in q_lower:
+                return category
+    return None
+
+
+def legacy_action(question):
+    q_lower = question.lower().strip()
+    for trigger in ic.NOTE_TRIGGERS:
+        if q_lower.startswith(trigger) or (' ' + trigger) in q_lower:
+            idx = q_lower.find(trigger)
+            payload = question[idx + len(trigger):].strip(' .,')
+            return ('log_note', payload or 'Maintenance check performed')
+    for trigger in ic.HOURS_TRIGGERS:
+        if trigger in q_lower:
+            idx = q_lower.find(trigger)
+            after = question[idx + len(trigger):].strip()
+            m = re.search(r'[\d.]+', after)
+            if m:
+                return ('log_hours', m.group(0))
+    for trigger in ic.FUEL_TRIGGERS:
+        if trigger in q_lower:
+            idx = q_lower.find(trigger)
+            after = question[idx + len(trigger):].strip()
+            m = re.search(r'\d+', after)
+            if m:
+                return ('set_fuel_alarm', m.group(0))
+    return None
+
+
+def time_per_call(fn, rounds):
+    """Mean microseconds per call over rounds × corpus."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in CORPUS:
+            fn(q)
+    return (time.perf_counter() - start) / (rounds * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="d3kOS intent classifier benchmark")
+    parser.add_argument("--rounds", type=int, default=500, help="passes over the corpus")
+    args = parser.parse_args()
+
+    mismatches = []
+    for q in CORPUS:
+        if legacy_simple(q) != ic.classify_simple(q):
+            mismatches.append(("simple", q, legacy_simple(q), ic.classify_simple(q)))
+        if legacy_action(q) != ic.classify_action(q):
+            mismatches.append(("action", q, legacy_action(q), ic.classify_action(q)))
+
+    print(f"Corpus: {len(CORPUS)} phrases, {args.rounds} rounds")
+    if mismatches:
+        print(f"✗ {len(mismatches)} mismatches:")
+        for kind, q, old, new in mismatches:
+            print(f"  [{kind}] {q!r}: legacy={old!r} compiled={new!r}")
+    else:
+        print("✓ Compiled classifier matches legacy loops on every phrase")
+
+    def both_legacy(q):
+        return legacy_action(q) or legacy_simple(q)
+
+    def both_compiled(q):
+        return ic.classify_action(q) or ic.classify_simple(q)
+
+    print(f"\n{'':12} {'legacy':>10} {'compiled':>10} {'speed-up':>9}")
+    for name, old, new in (("simple", legacy_simple, ic.classify_simple),
+                           ("action", legacy_action, ic.classify_action),
+                           ("routing", both_legacy, both_compiled)):
+        t_old = time_per_call(old, args.rounds)
+        t_new = time_per_call(new, args.rounds)
+        print(f"{name:12} {t_old:8.2f}µs {t_new:8.2f}µs {t_old / t_new:8.1f}×")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
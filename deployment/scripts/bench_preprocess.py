@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+d3kOS Model Preprocessing Benchmark
+
+Compares fish_detector's preprocessing (deployment/features/camera-overhaul/
+pi_source/preprocess.py) against the original per-call functions:
+  detection   preprocess_detection()  vs  DetectionPreprocessor (letterbox, per-slot buffers)
+  species     preprocess_species()    vs  SpeciesPreprocessor (fused normalize, batch buffer)
+
+For each camera resolution it reports mean latency per frame and the peak
+memory allocated per call (tracemalloc — NumPy and OpenCV arrays), after a
+warm-up call so the new path's buffers already exist, as they do in the
+running service.
+
+Species outputs must match the original within float32 rounding (exit code 1
+otherwise). Detection outputs differ by design — the original stretched the
+frame to 640x640, the new path letterboxes it — so only the greyscale content
+of a square frame (no padding) is compared.
+
+Usage:
+  python3 bench_preprocess.py
+  python3 bench_preprocess.py --rounds 200 --species-size 260
+"""
+
+import sys, time, pathlib, argparse, tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]
+                       / "features" / "camera-overhaul" / "pi_source"))
+import cv2
+import numpy as np
+import preprocess as pp
+
+RESOLUTIONS = [("1080p main", 1920, 1080), ("720p", 1280, 720), ("360p sub", 640, 360)]
+
+# ---------------------------------------------------------------------------
+# Reference — the original fish_detector functions, kept verbatim for comparison
+# ---------------------------------------------------------------------------
+
+species_input_size = 224
+
+
+def preprocess_detection(image):
+    """Preprocess image for YOLOv8 fish detection"""
+    img_resized = cv2.resize(image, (640, 640))
+    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+    img_gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
+    img_3ch = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2RGB)
+    img_normalized = img_3ch.astype(np.float32) / 255.0
+    img_chw = img_normalized.transpose(2, 0, 1)
+    img_batch = np.expand_dims(img_chw, axis=0)
+    return img_batch
+
+
+def preprocess_species(image):
+    """Preprocess image for species classification"""
+    # Resize to model input size
+    img_resized = cv2.resize(image, (species_input_size, species_input_size))
+
+    # Convert BGR to RGB
+    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
+
+    # Normalize to [0, 1]
+    img_normalized = img_rgb.astype(np.float32) / 255.0
+
+    # ImageNet normalization (EfficientNet standard)
+    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+    img_normalized = (img_normalized - mean) / std
+
+    # CHW format
+    img_chw = img_normalized.transpose(2, 0, 1)
+    img_batch = np.expand_dims(img_chw, axis=0)
+
+    return img_batch
+
+# ---------------------------------------------------------------------------
+
+
+def measure(fn, rounds):
+    """(mean ms per call, peak KiB allocated by one call)."""
+    fn()                                               # warm-up: buffers allocated
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000, peak / 1024
+
+
+def row(label, old, new):
+    (t_old, m_old), (t_new, m_new) = old, new
+    print(f"  {label:22} {t_old:8.2f}ms {t_new:8.2f}ms {t_old / t_new:7.1f}× "
+          f"{m_old:10.0f}KiB {m_new:8.0f}KiB")
+
+
+def main():
+    global species_input_size
+    parser = argparse.ArgumentParser(description="d3kOS model preprocessing benchmark")
+    parser.add_argument("--rounds", type=int, default=100, help="calls per measurement")
+    parser.add_argument("--species-size", type=int, default=224, help="species model input size")
+    parser.add_argument("--crops", type=int, default=4, help="fish crops per species batch")
+    args = parser.parse_args()
+    species_input_size = args.species_size
+
+    rng = np.random.default_rng(3)
+    detect = pp.DetectionPreprocessor()
+    species = pp.SpeciesPreprocessor(species_input_size)
+
+    print(f"d3kOS preprocessing benchmark — {args.rounds} rounds, peak = memory allocated per call")
+    print(f"\n  {'':22} {'original':>10} {'new':>10} {'speed-up':>8} {'orig peak':>13} {'new peak':>11}")
+    for label, width, height in RESOLUTIONS:
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        row(f"detection {label}",
+            measure(lambda: preprocess_detection(frame), args.rounds),
+            measure(lambda: detect(frame, label), args.rounds))
+
+    crops = [rng.integers(0, 256, (int(h), int(w), 3), dtype=np.uint8)
+             for w, h in rng.uniform(60, 400, (args.crops, 2))]
+    row(f"species {args.crops} crops",
+        measure(lambda: np.concatenate([preprocess_species(c) for c in crops]), args.rounds),
+        measure(lambda: species(crops), args.rounds))
+
+    failed = False
+    square = rng.integers(0, 256, (640, 640, 3), dtype=np.uint8)
+    det_diff = np.abs(preprocess_detection(square) - detect(square, "square")[0]).max()
+    sp_diff = np.abs(np.concatenate([preprocess_species(c) for c in crops]) - species(crops)).max()
+    print(f"\n  detection, 640x640 frame: max |diff| {det_diff:.2e}")
+    print(f"  species, {args.crops} crops:       max |diff| {sp_diff:.2e}")
+    if det_diff > 1e-6 or sp_diff > 1e-4:
+        print("✗ New preprocessing does not match the original")
+        failed = True
+    else:
+        print("✓ New preprocessing matches the original (float32 rounding)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
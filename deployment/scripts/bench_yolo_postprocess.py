@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+d3kOS YOLO Post-processing Benchmark
+
+Compares fish_detector's vectorized post-processing (deployment/features/
+camera-overhaul/pi_source/detection_ops.py) against the original per-anchor
+loop and pairwise compute_iou NMS over raw detector outputs:
+  1. equivalence — both must return the same detections for every output
+  2. speed       — mean milliseconds per frame (decode + NMS)
+
+Outputs are (1, 5, 8400) or stacked (N, 5, 8400) float32 arrays saved with
+np.save from the detector, e.g. on the Pi:
+  out = detection_session.run(None, {detection_input_name: tensor})[0]
+  np.save('/tmp/yolo_out_001.npy', out)
+Without --outputs, synthetic outputs are generated: low background scores
+plus clusters of overlapping high-score anchors around 0-6 fish per frame.
+
+Usage:
+  python3 bench_yolo_postprocess.py
+  python3 bench_yolo_postprocess.py --outputs /tmp/yolo_out_*.npy --rounds 50
+  python3 bench_yolo_postprocess.py --threshold 0.1
+
+Exit code 1 if any output post-processes differently.
+"""
+
+import sys, time, pathlib, argparse
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]
+                       / "features" / "camera-overhaul" / "pi_source"))
+import numpy as np
+import detection_ops as ops
+
+ANCHORS = 8400
+
+# ---------------------------------------------------------------------------
+# Reference — the original fish_detector functions, kept verbatim for comparison
+# ---------------------------------------------------------------------------
+
+def compute_iou(b1, b2):
+    """Compute IoU between two bounding boxes (center format: x_center, y_center, w, h)."""
+    ax1 = b1['x_center'] - b1['width'] / 2
+    ay1 = b1['y_center'] - b1['height'] / 2
+    ax2 = b1['x_center'] + b1['width'] / 2
+    ay2 = b1['y_center'] + b1['height'] / 2
+
+    bx1 = b2['x_center'] - b2['width'] / 2
+    by1 = b2['y_center'] - b2['height'] / 2
+    bx2 = b2['x_center'] + b2['width'] / 2
+    by2 = b2['y_center'] + b2['height'] / 2
+
+    ix1, iy1 = max(ax1, bx1), max(ay1, by1)
+    ix2, iy2 = min(ax2, bx2), min(ay2, by2)
+
+    if ix2 <= ix1 or iy2 <= iy1:
+        return 0.0
+
+    inter = (ix2 - ix1) * (iy2 - iy1)
+    area_a = (ax2 - ax1) * (ay2 - ay1)
+    area_b = (bx2 - bx1) * (by2 - by1)
+    return inter / (area_a + area_b - inter)
+
+
+def apply_nms(detections, iou_threshold=0.4):
+    """Collapse overlapping bounding boxes — keeps highest-confidence box per cluster."""
+    if len(detections) <= 1:
+        return detections
+    detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
+    kept = []
+    suppressed = set()
+    for i in range(len(detections)):
+        if i in suppressed:
+            continue
+        kept.append(detections[i])
+        for j in range(i + 1, len(detections)):
+            if j not in suppressed:
+                if compute_iou(detections[i]['bbox'], detections[j]['bbox']) > iou_threshold:
+                    suppressed.add(j)
+    return kept
+
+
+def legacy_postprocess(outputs, confidence_threshold=0.45):
+    """Post-process YOLOv8 fish detection output with NMS to suppress duplicate boxes."""
+    predictions = outputs[0][0]
+    predictions = predictions.T
+
+    detections = []
+    for pred in predictions:
+        x_center, y_center, width, height, fish_confidence = pred
+
+        if fish_confidence > confidence_threshold:
+            detections.append({
+                'class_name': 'fish',
+                'confidence': float(fish_confidence),
+                'bbox': {
+                    'x_center': float(x_center),
+                    'y_center': float(y_center),
+                    'width': float(width),
+                    'height': float(height)
+                }
+            })
+
+    return apply_nms(detections)
+
+
+def vectorized_postprocess(outputs, confidence_threshold=0.45):
+    return ops.yolo_detections(outputs[0][0], confidence_threshold)
+
+# ---------------------------------------------------------------------------
+
+
+def synthetic_output(rng):
+    """One (1, 5, ANCHORS) output: background anchors plus fish clusters."""
+    out = np.empty((1, 5, ANCHORS), dtype=np.float32)
+    out[0, 0:2] = rng.uniform(0, 640, (2, ANCHORS))
+    out[0, 2:4] = rng.uniform(8, 200, (2, ANCHORS))
+    out[0, 4] = rng.beta(0.5, 40, ANCHORS)                 # mostly < 0.05
+    anchor = 0
+    for _ in range(rng.integers(0, 7)):
+        cx, cy = rng.uniform(60, 580, 2)
+        w, h = rng.uniform(30, 220, 2)
+        n = int(rng.integers(20, 90))                      # anchors firing on this fish
+        idx = slice(anchor, anchor + n)
+        out[0, 0, idx] = cx + rng.normal(0, w * 0.08, n)
+        out[0, 1, idx] = cy + rng.normal(0, h * 0.08, n)
+        out[0, 2, idx] = w * rng.uniform(0.85, 1.15, n)
+        out[0, 3, idx] = h * rng.uniform(0.85, 1.15, n)
+        out[0, 4, idx] = rng.uniform(0.2, 0.92, n)
+        anchor += n
+    return out
+
+
+def load_outputs(paths):
+    """Recorded outputs as a list of (1, 5, anchors) arrays — the per-frame
+    session output fish_detector passes to postprocess_detections([output])."""
+    outputs = []
+    for path in paths:
+        arr = np.load(path).astype(np.float32)
+        arr = arr.reshape(-1, 1, *arr.shape[-2:])
+        outputs.extend(arr)
+    return outputs
+
+
+def ms_per_frame(fn, outputs, threshold, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for out in outputs:
+            fn([out], threshold)
+    return (time.perf_counter() - start) / (rounds * len(outputs)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="d3kOS YOLO post-processing benchmark")
+    parser.add_argument("--outputs", nargs="*", help="recorded detector outputs (.npy)")
+    parser.add_argument("--frames", type=int, default=50, help="synthetic frames without --outputs")
+    parser.add_argument("--threshold", type=float, default=0.25, help="confidence threshold (service uses 0.25)")
+    parser.add_argument("--rounds", type=int, default=20, help="passes over the outputs")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.outputs:
+        outputs, source = load_outputs(args.outputs), "recorded"
+    else:
+        rng = np.random.default_rng(args.seed)
+        outputs, source = [synthetic_output(rng) for _ in range(args.frames)], "synthetic"
+
+    mismatches = [i for i, out in enumerate(outputs)
+                  if legacy_postprocess([out], args.threshold) != vectorized_postprocess([out], args.threshold)]
+    candidates = np.mean([(out[0, 4] > args.threshold).sum() for out in outputs])
+    kept = np.mean([len(vectorized_postprocess([out], args.threshold)) for out in outputs])
+
+    print(f"Outputs: {len(outputs)} {source} frames, threshold {args.threshold:g}, "
+          f"{candidates:.0f} candidates → {kept:.1f} detections per frame, {args.rounds} rounds")
+    if mismatches:
+        print(f"✗ {len(mismatches)} frames differ: {mismatches[:10]}")
+    else:
+        print("✓ Vectorized post-processing matches the legacy loop on every frame")
+
+    t_old = ms_per_frame(legacy_postprocess, outputs, args.threshold, args.rounds)
+    t_new = ms_per_frame(vectorized_postprocess, outputs, args.threshold, args.rounds)
+    print(f"\n{'':12} {'legacy':>10} {'vectorized':>11} {'speed-up':>9}")
+    print(f"{'per frame':12} {t_old:8.3f}ms {t_new:9.3f}ms {t_old / t_new:8.1f}×")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
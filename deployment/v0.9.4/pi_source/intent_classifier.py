@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+d3kOS Intent Classifier - compiled phrase matching for the AI query handler
+
+Routes a helm question in one regex pass instead of nested substring loops:
+  classify_simple(question)  → 'rpm' | 'oil' | ... | 'reboot' | None
+  classify_action(question)  → ('log_note' | 'log_hours' | 'set_fuel_alarm', payload) | None
+
+Precedence is identical to the original AIQueryHandler loops:
+  simple:  diagnostic phrase → None (Gemini), procedure keyword → None (RAG),
+           else the first category (in table order) with a matching phrase
+  action:  note triggers → engine-hours triggers → fuel-alarm triggers,
+           each tier in list order; hours/fuel need a number after the trigger
+
+Each table is compiled once into a character-trie regex; one lookahead scan
+reports every phrase present, and the lowest rank (earliest in the table)
+is the answer. The diagnostic, procedure and status tables are merged into
+one scan, ranked in that order.
+
+Importable in-process (voice service, query service):
+  sys.path.insert(0, '/opt/d3kos/services/ai')
+  from intent_classifier import classify_simple, classify_action
+"""
+
+import re
+import sys
+
+# ── Phrase tables (order = precedence) ────────────────────────────────────────
+
+# Diagnostic intent — these questions need Gemini, not rule-based answers.
+# "what causes white smoke at high speed" contains 'speed' but is NOT a speed query
+DIAGNOSTIC_INTENTS = [
+    'why ', 'why is', 'why does', 'why am i',
+    'what causes', 'what could cause', 'what would cause',
+    'what is wrong', 'what might be wrong',
+    'is it normal', 'should i be concerned', 'should i worry',
+    'explain ', 'tell me about', 'what does it mean',
+    'could it be', 'what happens when', 'what happens if',
+    'white smoke', 'black smoke', 'blue smoke', 'grey smoke',
+    'strange noise', 'weird noise', 'unusual noise', 'knocking', 'banging',
+    'vibrat', 'shaking', 'rough idle',
+    'overheating', 'running hot', 'too hot',
+    'diagnos', 'what should i do', 'is this bad',
+]
+
+# Procedure/how-to questions — sent to RAG
+PROCEDURE_KEYWORDS = [
+    'procedure', 'how to', 'what type', 'which', 'what kind', 'how do i', 'steps', 'instructions',
+    'change', 'replace', 'install', 'maintenance', 'service',
+    'repair', 'fix', 'troubleshoot', 'winterize', 'drain',
+]
+
+# Simple status queries — answered by rules with live boat data
+SIMPLE_PATTERNS = {
+    'rpm': ['what is the rpm', 'current rpm', 'engine rpm', 'rpm is', 'rpm reading',
+            'revolution', 'how fast is the engine'],
+    'oil': ['oil pressure', 'oil psi', 'lubrication pressure'],
+    'temperature': ['coolant temperature', 'engine temperature', 'coolant temp', 'engine temp',
+                    'how hot is the engine', 'how hot is the coolant', 'what is the temperature'],
+    'fuel': ['fuel level', 'fuel remaining', 'fuel left', 'how much fuel', 'how much gas',
+             'fuel percentage', 'tank level'],
+    'battery': ['battery level', 'battery voltage', 'battery charge', 'battery status',
+                'what is the voltage', 'current voltage', 'system voltage'],
+    'speed': ['what is my speed', 'current speed', 'how fast am i', 'speed over ground',
+              'boat speed', 'sog', 'speed in knots', 'knots right now'],
+    'heading': ['what is my heading', 'current heading', 'what direction am i', 'which way am i',
+                'bearing to', 'course over ground'],
+    'boost': ['boost pressure', 'turbo pressure', 'manifold pressure', 'boost level'],
+    'hours': ['engine hours', 'how many hours', 'operating hours', 'run time', 'runtime',
+              'how long has the engine'],
+    'location': ['where am i', 'my location', 'my position', 'current position',
+                 'coordinates', 'latitude', 'longitude', 'gps position'],
+    'time': ['what time is it', 'current time', 'time is it', 'what is the date', 'current date'],
+    'help': ['what can you do', 'help me', 'your capabilities', 'list commands', 'how to use you'],
+    'status': ['system status', 'all systems', 'overall status', 'boat status', 'engine status',
+               'how is everything', 'status report', 'give me an overview'],
+    'reboot': ['reboot', 'restart', 'power cycle', 'shut down', 'shutdown'],
+}
+
+# Action commands — whitelisted, reversible writes only
+NOTE_TRIGGERS = [
+    'log a note', 'add a note', 'log note', 'add note',
+    'add maintenance note', 'log maintenance note', 'maintenance note',
+    'record that', 'note that', 'make a note', 'write a note',
+    'log that', 'remember that',
+]
+HOURS_TRIGGERS = [
+    'log engine hours', 'record engine hours', 'update engine hours',
+    'set engine hours', 'engine hours are', 'engine hours is',
+]
+FUEL_TRIGGERS = [
+    'set fuel alarm', 'set low fuel alarm', 'fuel alarm at',
+    'fuel warning at', 'low fuel warning', 'set fuel warning',
+]
+
+_DECIMAL = re.compile(r'[\d.]+')
+_INTEGER = re.compile(r'\d+')
+
+
+def _trie_pattern(phrases):
+    """
+    Regex for a set of literal phrases, factored into a character trie so the
+    engine checks one branch per character instead of every phrase in turn.
+    Branches are greedy: at a given position the longest phrase is matched.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[''] = {}                       # end-of-phrase marker
+
+    def emit(node):
+        ends = '' in node
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return f'(?:{body})?' if ends else body
+
+    return emit(trie)
+
+
+class PhraseSet:
+    """
+    Ordered phrase list compiled to one trie regex.
+    ranks(text) returns the rank (list index) of every phrase found, in one pass.
+
+    The scan is a lookahead at each position, which captures the longest
+    phrase starting there; every shorter phrase matching at that position is
+    a prefix of it, so each phrase carries the ranks of its phrase prefixes.
+    """
+
+    def __init__(self, phrases, prefix=''):
+        self.phrases = list(phrases)
+        rank = {}
+        for i, p in enumerate(self.phrases):
+            rank.setdefault(p, i)
+        self._ranks = {
+            p: tuple(sorted({r for q, r in rank.items() if p.startswith(q)}))
+            for p in rank
+        }
+        pattern = _trie_pattern(rank)
+        self._any = re.compile(f'{prefix}{pattern}')
+        self._all = re.compile(f'{prefix}(?=({pattern}))')
+
+    def search(self, text) -> bool:
+        """True if any phrase occurs in text."""
+        return self._any.search(text) is not None
+
+    def ranks(self, text) -> list:
+        """Ranks of the phrases found, lowest (highest precedence) first."""
+        if not self._any.search(text):
+            return []
+        found = set()
+        for longest in self._all.findall(text):
+            found.update(self._ranks[longest])
+        return sorted(found)
+
+    def first(self, text):
+        """Highest-precedence phrase present in text, or None."""
+        found = self.ranks(text)
+        return self.phrases[found[0]] if found else None
+
+
+class IntentClassifier:
+    """All phrase tables compiled once; each classify_* call is one scan per table."""
+
+    def __init__(self):
+        # Diagnostic, procedure and status phrases in one table, in precedence
+        # order: a diagnostic or procedure hit outranks every status category.
+        outcomes = [None] * (len(DIAGNOSTIC_INTENTS) + len(PROCEDURE_KEYWORDS))
+        phrases = DIAGNOSTIC_INTENTS + PROCEDURE_KEYWORDS
+        for category, patterns in SIMPLE_PATTERNS.items():
+            outcomes += [category] * len(patterns)
+            phrases += patterns
+        self._outcomes = outcomes
+        self.simple = PhraseSet(phrases)
+        # Note triggers only count at the start or after a space
+        self.note  = PhraseSet(NOTE_TRIGGERS, prefix='(?:^|(?<= ))')
+        self.hours = PhraseSet(HOURS_TRIGGERS)
+        self.fuel  = PhraseSet(FUEL_TRIGGERS)
+
+    def classify_simple(self, question):
+        """Category for a rule-answerable status query, or None for Gemini/RAG."""
+        found = self.simple.ranks(question.lower())
+        return self._outcomes[found[0]] if found else None
+
+    def classify_action(self, question):
+        """(action_type, payload) for a whitelisted voice command, or None."""
+        q_lower = question.lower().strip()
+
+        trigger = self.note.first(q_lower)
+        if trigger:
+            idx = q_lower.find(trigger)
+            payload = question[idx + len(trigger):].strip(' .,')
+            return ('log_note', payload or 'Maintenance check performed')
+
+        for tier, action, number in ((self.hours, 'log_hours', _DECIMAL),
+                                     (self.fuel, 'set_fuel_alarm', _INTEGER)):
+            for rank in tier.ranks(q_lower):
+                trigger = tier.phrases[rank]
+                idx = q_lower.find(trigger)
+                m = number.search(question[idx + len(trigger):].strip())
+                if m:
+                    return (action, m.group(0))
+
+        return None
+
+
+_classifier = IntentClassifier()
+
+
+def classify_simple(question):
+    """Module-level shortcut — see IntentClassifier.classify_simple."""
+    return _classifier.classify_simple(question)
+
+
+def classify_action(question):
+    """Module-level shortcut — see IntentClassifier.classify_action."""
+    return _classifier.classify_action(question)
+
+
+if __name__ == "__main__":
+    text = " ".join(sys.argv[1:])
+    if not text:
+        print("Usage: intent_classifier.py <question>")
+        sys.exit(1)
+    print(f"simple: {classify_simple(text)}")
+    print(f"action: {classify_action(text)}")
@@ -2,18 +2,31 @@
 """
 d3kOS AI Query Handler v6 - RAG Integrated
 Supports OpenRouter (online), rule-based patterns (offline), and PDF manual retrieval
+
+Run as a persistent local service (used by the voice assistant):
+  query_handler.py --serve        HTTP on 127.0.0.1:8112
+    GET  /health     → {"ok": true, "rag": bool, "uptime_s": n}
+    POST /query      {"question": "...", "force_provider": null} → query() result
+    POST /classify   {"question": "..."} → {"category": "rpm" | null}
+The handler, RAG index, SQLite connection and HTTP session are built once
+and reused, so a voice query no longer pays for interpreter start-up and
+PDF index loading.
 """
 
 import json
 import sqlite3
+import threading
 import time
 import urllib.request
 import urllib.error
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 import sys
 import argparse
 
+from intent_classifier import classify_simple, classify_action
+
 # Import Signal K client
 try:
     from signalk_client import SignalKClient
@@ -38,6 +51,10 @@ DB_PATH = "/opt/d3kos/data/conversation-history.db"
 MAINTENANCE_LOG_PATH = "/opt/d3kos/data/maintenance-log.json"
 PREFS_PATH = "/opt/d3kos/config/user-preferences.json"
 
+# Persistent service (--serve)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8112
+
 # Fallback simulated boat status (used if Signal K unavailable)
 SIMULATED_STATUS = {
     'rpm': 3200,
@@ -67,6 +84,11 @@ class AIQueryHandler:
         else:
             self.pdf_processor = None
 
+        # Reused across queries when running as a service
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._http = None
+
     def load_config(self):
         """Load AI configuration"""
         with open(CONFIG_PATH, 'r') as f:
@@ -80,14 +102,20 @@ class AIQueryHandler:
         except FileNotFoundError:
             return "No skills data available yet."
 
+    def _session(self):
+        """Keep-alive HTTP session to the Gemini proxy, created on first use."""
+        if self._http is None:
+            import requests
+            self._http = requests.Session()
+        return self._http
+
     def _query_gemini(self, text: str, boat_status: dict = None) -> str | None:
         """Query Gemini API proxy. Returns response text or None on failure."""
-        import requests
         try:
             payload = {'message': text}
             if boat_status:
                 payload['context'] = boat_status
-            r = requests.post(
+            r = self._session().post(
                 'http://localhost:8097/gemini/chat',
                 json=payload,
                 timeout=15
@@ -252,51 +280,9 @@ Provide concise, accurate answers based on this boat's specific configuration an
         """
         Detect voice commands that perform an action (write/change something).
         Returns (action_type, payload) tuple, or None if not an action command.
-        Only whitelisted, reversible actions are matched.
+        Only whitelisted, reversible actions are matched (see intent_classifier.py).
         """
-        import re
-        q_lower = question.lower().strip()
-
-        # ── Log maintenance note ──────────────────────────────────────────────
-        note_triggers = [
-            'log a note', 'add a note', 'log note', 'add note',
-            'add maintenance note', 'log maintenance note', 'maintenance note',
-            'record that', 'note that', 'make a note', 'write a note',
-            'log that', 'remember that',
-        ]
-        for trigger in note_triggers:
-            if q_lower.startswith(trigger) or (' ' + trigger) in q_lower:
-                idx = q_lower.find(trigger)
-                payload = question[idx + len(trigger):].strip(' .,')
-                return ('log_note', payload or 'Maintenance check performed')
-
-        # ── Log engine hours ──────────────────────────────────────────────────
-        hours_triggers = [
-            'log engine hours', 'record engine hours', 'update engine hours',
-            'set engine hours', 'engine hours are', 'engine hours is',
-        ]
-        for trigger in hours_triggers:
-            if trigger in q_lower:
-                idx = q_lower.find(trigger)
-                after = question[idx + len(trigger):].strip()
-                m = re.search(r'[\d.]+', after)
-                if m:
-                    return ('log_hours', m.group(0))
-
-        # ── Set fuel alarm threshold ──────────────────────────────────────────
-        fuel_triggers = [
-            'set fuel alarm', 'set low fuel alarm', 'fuel alarm at',
-            'fuel warning at', 'low fuel warning', 'set fuel warning',
-        ]
-        for trigger in fuel_triggers:
-            if trigger in q_lower:
-                idx = q_lower.find(trigger)
-                after = question[idx + len(trigger):].strip()
-                m = re.search(r'\d+', after)
-                if m:
-                    return ('set_fuel_alarm', m.group(0))
-
-        return None
+        return classify_action(question)
 
     def execute_action(self, action_type, payload):
         """
@@ -358,71 +344,12 @@ Provide concise, accurate answers based on this boat's specific configuration an
             print(f"  ⚠ Preference write failed: {e}", flush=True)
 
     def classify_simple_query(self, question):
-        """Check if this is a simple query that can be answered with rules"""
-        q_lower = question.lower()
-
-        # FIRST: Diagnostic intent — these questions need Gemini, not rule-based answers
-        # "what causes white smoke at high speed" contains 'speed' but is NOT a speed query
-        diagnostic_intents = [
-            'why ', 'why is', 'why does', 'why am i',
-            'what causes', 'what could cause', 'what would cause',
-            'what is wrong', 'what might be wrong',
-            'is it normal', 'should i be concerned', 'should i worry',
-            'explain ', 'tell me about', 'what does it mean',
-            'could it be', 'what happens when', 'what happens if',
-            'white smoke', 'black smoke', 'blue smoke', 'grey smoke',
-            'strange noise', 'weird noise', 'unusual noise', 'knocking', 'banging',
-            'vibrat', 'shaking', 'rough idle',
-            'overheating', 'running hot', 'too hot',
-            'diagnos', 'what should i do', 'is this bad',
-        ]
-        for intent in diagnostic_intents:
-            if intent in q_lower:
-                return None  # Send to Gemini
-
-        # SECOND: Procedure/how-to questions — send to RAG
-        procedure_keywords = [
-            'procedure', 'how to', 'what type', 'which', 'what kind', 'how do i', 'steps', 'instructions',
-            'change', 'replace', 'install', 'maintenance', 'service',
-            'repair', 'fix', 'troubleshoot', 'winterize', 'drain'
-        ]
-        for keyword in procedure_keywords:
-            if keyword in q_lower:
-                return None  # Force RAG search for procedures
-
-        # THIRD: Simple status queries — tightened to avoid false positives
-        simple_patterns = {
-            'rpm': ['what is the rpm', 'current rpm', 'engine rpm', 'rpm is', 'rpm reading',
-                    'revolution', 'how fast is the engine'],
-            'oil': ['oil pressure', 'oil psi', 'lubrication pressure'],
-            'temperature': ['coolant temperature', 'engine temperature', 'coolant temp', 'engine temp',
-                            'how hot is the engine', 'how hot is the coolant', 'what is the temperature'],
-            'fuel': ['fuel level', 'fuel remaining', 'fuel left', 'how much fuel', 'how much gas',
-                     'fuel percentage', 'tank level'],
-            'battery': ['battery level', 'battery voltage', 'battery charge', 'battery status',
-                        'what is the voltage', 'current voltage', 'system voltage'],
-            'speed': ['what is my speed', 'current speed', 'how fast am i', 'speed over ground',
-                      'boat speed', 'sog', 'speed in knots', 'knots right now'],
-            'heading': ['what is my heading', 'current heading', 'what direction am i', 'which way am i',
-                        'bearing to', 'course over ground'],
-            'boost': ['boost pressure', 'turbo pressure', 'manifold pressure', 'boost level'],
-            'hours': ['engine hours', 'how many hours', 'operating hours', 'run time', 'runtime',
-                      'how long has the engine'],
-            'location': ['where am i', 'my location', 'my position', 'current position',
-                         'coordinates', 'latitude', 'longitude', 'gps position'],
-            'time': ['what time is it', 'current time', 'time is it', 'what is the date', 'current date'],
-            'help': ['what can you do', 'help me', 'your capabilities', 'list commands', 'how to use you'],
-            'status': ['system status', 'all systems', 'overall status', 'boat status', 'engine status',
-                       'how is everything', 'status report', 'give me an overview'],
-            'reboot': ['reboot', 'restart', 'power cycle', 'shut down', 'shutdown']
-        }
-
-        for category, patterns in simple_patterns.items():
-            for pattern in patterns:
-                if pattern in q_lower:
-                    return category
-
-        return None
+        """
+        Check if this is a simple query that can be answered with rules.
+        Diagnostic and procedure questions return None (Gemini / RAG);
+        phrase tables and precedence live in intent_classifier.py.
+        """
+        return classify_simple(question)
 
 
     def _load_units_preference(self) -> str:
@@ -742,18 +669,90 @@ Provide concise, accurate answers based on this boat's specific configuration an
         }
 
     def store_conversation(self, question, answer, ai_used, provider, model, response_time):
-        """Store conversation in database"""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        """Store conversation in database (one connection, reused for the handler's lifetime)"""
+        with self._db_lock:
+            if self._db is None:
+                self._db = sqlite3.connect(DB_PATH, check_same_thread=False)
+            self._db.execute("""
+                INSERT INTO conversations
+                (question, answer, ai_used, provider, model, response_time_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (question, answer, ai_used, provider, model, response_time))
+            self._db.commit()
+
+
+class QueryServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over one warm AIQueryHandler (see module docstring)."""
+
+    handler = None                    # AIQueryHandler, set by serve()
+    query_lock = threading.Lock()     # queries run one at a time; /health stays responsive
+    started = time.time()
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_question(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            return None, None
+        question = str(body.get('question', '')).strip()
+        return (question or None), body
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {
+                'ok': True,
+                'rag': self.handler.pdf_processor is not None,
+                'uptime_s': int(time.time() - self.started),
+            })
+        else:
+            self._send(404, {'error': 'Not found'})
 
-        cursor.execute("""
-            INSERT INTO conversations
-            (question, answer, ai_used, provider, model, response_time_ms)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (question, answer, ai_used, provider, model, response_time))
+    def do_POST(self):
+        if self.path not in ('/query', '/classify'):
+            self._send(404, {'error': 'Not found'})
+            return
+        question, body = self._read_question()
+        if not question:
+            self._send(400, {'error': 'No question provided'})
+            return
 
-        conn.commit()
-        conn.close()
+        if self.path == '/classify':
+            self._send(200, {'category': self.handler.classify_simple_query(question)})
+            return
+
+        try:
+            with self.query_lock:
+                result = self.handler.query(question, force_provider=body.get('force_provider'))
+            self._send(200, result)
+        except Exception as e:
+            print(f"  ⚠ Query failed: {e}", flush=True)
+            self._send(500, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        pass  # never log question text to the journal
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT):
+    """Run the persistent query service until interrupted."""
+    QueryServiceHandler.handler = AIQueryHandler()
+    QueryServiceHandler.started = time.time()
+    server = ThreadingHTTPServer((host, port), QueryServiceHandler)
+    server.daemon_threads = True
+    print(f"✓ Query handler service listening on {host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 def main():
     """Test the query handler"""
@@ -763,19 +762,25 @@ def main():
                        help='Force specific AI provider')
     parser.add_argument('--classify-only', action='store_true',
                        help='Only classify query as simple or complex, do not answer')
+    parser.add_argument('--serve', action='store_true',
+                       help=f'Run as a persistent service on {SERVICE_HOST}:{SERVICE_PORT}')
     args = parser.parse_args()
 
+    if args.serve:
+        serve()
+        return
+
     if not args.question:
         print("Usage: query_handler.py [--force-provider openrouter|onboard] [--classify-only] <question>")
+        print("       query_handler.py --serve")
         sys.exit(1)
 
     question = " ".join(args.question)
 
-    handler = AIQueryHandler()
-
     # Classify-only mode (for intelligent routing in voice assistant)
+    # No handler needed — skips config, Signal K and RAG index start-up
     if args.classify_only:
-        category = handler.classify_simple_query(question)
+        category = classify_simple(question)
         if category:
             print(f"SIMPLE: {category}")
             sys.exit(0)
@@ -783,6 +788,8 @@ def main():
             print("COMPLEX")
             sys.exit(1)
 
+    handler = AIQueryHandler()
+
     # Regular query mode
     print(f"Question: {question}")
     print("Processing...\n")
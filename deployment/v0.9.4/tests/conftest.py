@@ -0,0 +1,20 @@
+"""
+pytest configuration for d3kOS v0.9.4 AI service tests.
+
+Adds pi_source/ to sys.path so the modules import by their Pi names
+(query_handler, intent_classifier) without installing anything. The
+query service tests never build a real AIQueryHandler — it reads
+/opt/d3kos config at construction — a small fake sits behind the HTTP layer.
+
+Run from deployment/v0.9.4/:
+    pip install pytest
+    pytest tests/ -v
+"""
+
+import os
+import sys
+
+# pi_source/ directory (sibling of this tests/ directory)
+_PI_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pi_source')
+if _PI_SOURCE not in sys.path:
+    sys.path.insert(0, _PI_SOURCE)
@@ -0,0 +1,148 @@
+"""
+intent_classifier.py — compiled classify_simple/classify_action must give
+exactly the answers of the original AIQueryHandler keyword loops, including
+where one phrase is a prefix of another with a different outcome.
+"""
+
+import random
+import re
+
+import pytest
+
+import intent_classifier as ic
+from intent_classifier import classify_action, classify_simple
+
+
+# ── Reference — the original AIQueryHandler loops ────────────────────────────
+
+def legacy_simple(question):
+    q_lower = question.lower()
+    for intent in ic.DIAGNOSTIC_INTENTS:
+        if intent in q_lower:
+            return None
+    for keyword in ic.PROCEDURE_KEYWORDS:
+        if keyword in q_lower:
+            return None
+    for category, patterns in ic.SIMPLE_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in q_lower:
+                return category
+    return None
+
+
+def legacy_action(question):
+    q_lower = question.lower().strip()
+    for trigger in ic.NOTE_TRIGGERS:
+        if q_lower.startswith(trigger) or (' ' + trigger) in q_lower:
+            idx = q_lower.find(trigger)
+            payload = question[idx + len(trigger):].strip(' .,')
+            return ('log_note', payload or 'Maintenance check performed')
+    for trigger in ic.HOURS_TRIGGERS:
+        if trigger in q_lower:
+            idx = q_lower.find(trigger)
+            after = question[idx + len(trigger):].strip()
+            m = re.search(r'[\d.]+', after)
+            if m:
+                return ('log_hours', m.group(0))
+    for trigger in ic.FUEL_TRIGGERS:
+        if trigger in q_lower:
+            idx = q_lower.find(trigger)
+            after = question[idx + len(trigger):].strip()
+            m = re.search(r'\d+', after)
+            if m:
+                return ('set_fuel_alarm', m.group(0))
+    return None
+
+
+# ── Phrases ──────────────────────────────────────────────────────────────────
+
+REPRESENTATIVE = [
+    'what is the rpm', 'engine rpm please', 'oil pressure', 'coolant temp',
+    'how much fuel do we have', 'battery voltage', 'what is my speed', 'sog',
+    'current heading', 'boost pressure', 'how many hours on the engine',
+    'where am i', 'what time is it', 'help me', 'status report', 'reboot',
+    'why is the engine temp high', 'what causes white smoke at high speed',
+    'should i be concerned about oil pressure', 'the boat is vibrating at 3000 rpm',
+    'how to change the oil', 'which filter do i need', 'replace the impeller',
+    'where is the nearest fuel dock', 'tides at kingston',
+    'log a note bilge pump checked', 'note that the strainer was clean',
+    'log engine hours 1234.5', 'engine hours are 1502', 'set fuel alarm at 20 percent',
+    'fuel warning at 15', 'What Is My Speed', 'Log A Note Checked The Bilge',
+]
+
+EDGE_CASES = [
+    '', '   ', '.', 'rpm', 'RPM IS 3000', 'sogginess', 'why',
+    'what is the temperature',                # status, no diagnostic
+    'engine temperature', 'engine temp',      # same category, prefix pair
+    'run time', 'runtime', 'shut down', 'shutdown',
+    'log a note', 'log note.', 'add note ,',  # trigger with no payload
+    '  log a note leading spaces',            # index from the stripped text
+    'denote that the oil is fine',            # 'note that' mid-word is not a trigger
+    'denote that, note that oil is fine',
+    'record engine hours', 'set fuel alarm',  # trigger without a number
+    'set fuel alarm now, fuel warning at 12',
+    'log engine hours, engine hours are 1200',
+    'engine hours are 12.5.3', 'set low fuel alarm 25',
+]
+
+# Prefix-rank ties: the longest phrase at a position belongs to a different
+# (lower-precedence) outcome than a shorter phrase that is its prefix.
+PREFIX_TIES = [
+    ('how to use you', None),        # 'how to' (procedure) beats help's 'how to use you'
+    ('which way am i heading', None),  # 'which' (procedure) beats heading's 'which way am i'
+    ('why is the rpm low', None),    # 'why ' and 'why is' both diagnostic
+    ('current rpm', 'rpm'),
+    ('engine hours', 'hours'),
+    ('engine status', 'status'),
+    ('what is the voltage', 'battery'),
+    ('current position', 'location'),
+    ('speed in knots', 'speed'),
+]
+
+ACTION_TIES = [
+    ('add maintenance note oil changed', ('log_note', 'oil changed')),
+    ('log maintenance note', ('log_note', 'Maintenance check performed')),
+    ('set fuel alarm at 20', ('set_fuel_alarm', '20')),
+    ('set low fuel alarm 30', ('set_fuel_alarm', '30')),
+    ('log engine hours are 77', ('log_hours', '77')),
+    ('engine hours are', None),
+]
+
+
+@pytest.mark.parametrize('question', REPRESENTATIVE + EDGE_CASES)
+def test_matches_legacy(question):
+    assert classify_simple(question) == legacy_simple(question)
+    assert classify_action(question) == legacy_action(question)
+
+
+@pytest.mark.parametrize('question, expected', PREFIX_TIES)
+def test_prefix_rank_ties_simple(question, expected):
+    assert legacy_simple(question) == expected
+    assert classify_simple(question) == expected
+
+
+@pytest.mark.parametrize('question, expected', ACTION_TIES)
+def test_prefix_rank_ties_action(question, expected):
+    assert legacy_action(question) == expected
+    assert classify_action(question) == expected
+
+
+def test_payload_keeps_original_case():
+    assert classify_action('Log A Note Port Zinc Replaced') == ('log_note', 'Port Zinc Replaced')
+
+
+def test_random_phrase_mixes_match_legacy():
+    """Every table phrase, combined with others and filler, in random order."""
+    phrases = (ic.DIAGNOSTIC_INTENTS + ic.PROCEDURE_KEYWORDS +
+               [p for ps in ic.SIMPLE_PATTERNS.values() for p in ps] +
+               ic.NOTE_TRIGGERS + ic.HOURS_TRIGGERS + ic.FUEL_TRIGGERS)
+    filler = ['the', 'please', 'now', '42', '7.5', 'Engine', 'x', ',', '']
+    rng = random.Random(20260601)
+    for _ in range(2000):
+        parts = rng.sample(phrases, rng.randint(1, 3)) + rng.sample(filler, 2)
+        rng.shuffle(parts)
+        question = rng.choice([' ', '', 'a']).join(parts)
+        if rng.random() < 0.3:
+            question = question.title()
+        assert classify_simple(question) == legacy_simple(question), question
+        assert classify_action(question) == legacy_action(question), question
@@ -0,0 +1,153 @@
+"""
+query_handler.py --serve — /health, /query and /classify over a real
+ThreadingHTTPServer on an ephemeral port.
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import query_handler
+from intent_classifier import classify_simple
+from query_handler import QueryServiceHandler
+
+
+class _FakeHandler:
+    """Stands in for AIQueryHandler — records queries, classifies for real."""
+
+    pdf_processor = None
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.queries = []
+
+    def classify_simple_query(self, question):
+        return classify_simple(question)
+
+    def query(self, question, force_provider=None):
+        if self.fail:
+            raise RuntimeError('proxy down')
+        self.queries.append((question, force_provider))
+        return {'question': question, 'answer': 'Oil pressure is 45 PSI.\nMore detail.',
+                'ai_used': 'rules', 'provider': force_provider}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Start the service on 127.0.0.1:<ephemeral> and yield (base_url, fake handler)."""
+    fake = _FakeHandler()
+    monkeypatch.setattr(QueryServiceHandler, 'handler', fake)
+    server = query_handler.ThreadingHTTPServer(('127.0.0.1', 0), QueryServiceHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}', fake
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(timeout=5)
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+def _post(url, body):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class TestHealth:
+    def test_health_reports_rag_and_uptime(self, service):
+        base, _ = service
+        status, body = _get(f'{base}/health')
+        assert status == 200
+        assert body['ok'] is True
+        assert body['rag'] is False
+        assert body['uptime_s'] >= 0
+
+    def test_unknown_get_is_404(self, service):
+        base, _ = service
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            _get(f'{base}/nope')
+        assert exc.value.code == 404
+
+
+class TestQuery:
+    def test_query_returns_handler_result(self, service):
+        base, fake = service
+        status, body = _post(f'{base}/query',
+                             {'question': '  oil pressure?  ', 'force_provider': 'onboard'})
+        assert status == 200
+        assert body['answer'].startswith('Oil pressure is 45 PSI.')
+        assert fake.queries == [('oil pressure?', 'onboard')]
+
+    def test_handler_reused_across_requests(self, service):
+        base, fake = service
+        for _ in range(3):
+            _post(f'{base}/query', {'question': 'fuel level'})
+        assert len(fake.queries) == 3
+        assert QueryServiceHandler.handler is fake
+
+    def test_missing_question_is_400(self, service):
+        base, fake = service
+        assert _post(f'{base}/query', {'question': '   '})[0] == 400
+        assert _post(f'{base}/query', b'not json')[0] == 400
+        assert fake.queries == []
+
+    def test_handler_error_is_500(self, service):
+        base, fake = service
+        fake.fail = True
+        status, body = _post(f'{base}/query', {'question': 'oil pressure'})
+        assert status == 500
+        assert body == {'error': 'proxy down'}
+
+    def test_unknown_post_is_404(self, service):
+        base, _ = service
+        assert _post(f'{base}/answer', {'question': 'rpm'})[0] == 404
+
+    def test_concurrent_health_while_query_runs(self, service):
+        """/health answers while a slow query holds the query lock."""
+        base, fake = service
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_query(question, force_provider=None):
+            started.set()
+            release.wait(5)
+            return {'answer': 'done'}
+        fake.query = slow_query
+
+        t = threading.Thread(target=_post, args=(f'{base}/query', {'question': 'rpm'}))
+        t.start()
+        assert started.wait(5)
+        try:
+            assert _get(f'{base}/health')[0] == 200
+        finally:
+            release.set()
+            t.join(5)
+
+
+class TestClassify:
+    @pytest.mark.parametrize('question, category', [
+        ('what is the rpm', 'rpm'),
+        ('oil pressure please', 'oil'),
+        ('why is the oil pressure low', None),    # diagnostic → Gemini
+        ('how to change the oil', None),          # procedure → RAG
+    ])
+    def test_classify(self, service, question, category):
+        base, fake = service
+        status, body = _post(f'{base}/classify', {'question': question})
+        assert status == 200
+        assert body == {'category': category}
+        assert fake.queries == []
@@ -0,0 +1,106 @@
+"""
+voice-assistant-hybrid-vosk.py — query_ai() asks the warm query service on
+:8112 first and spawns the one-shot query_handler.py only when it is down.
+
+Needs vosk installed (the assistant imports it at module level).
+Run from services/voice/:
+    pytest tests/ -v
+"""
+
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('vosk')
+
+_VOICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _VOICE_DIR not in sys.path:
+    sys.path.insert(0, _VOICE_DIR)  # wake_word_vosk
+
+# Load module from hyphenated filename
+_spec = importlib.util.spec_from_file_location(
+    'voice_assistant_hybrid_vosk',
+    os.path.join(_VOICE_DIR, 'voice-assistant-hybrid-vosk.py'),
+)
+va = importlib.util.module_from_spec(_spec)
+sys.modules['voice_assistant_hybrid_vosk'] = va  # register so monkeypatch resolves it
+_spec.loader.exec_module(va)
+
+
+@pytest.fixture
+def assistant():
+    """Assistant without __init__ — no microphone or model loading."""
+    return va.HybridVoiceAssistant.__new__(va.HybridVoiceAssistant)
+
+
+@pytest.fixture
+def subprocess_calls(monkeypatch):
+    """Replace the one-shot handler run; records each command line."""
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(
+            cmd, 0, stdout='Category: none\nAnswer: Channel 16.\nSecond paragraph.', stderr='')
+    monkeypatch.setattr(va.subprocess, 'run', fake_run)
+    return calls
+
+
+def _refused_port():
+    """A local port with nothing listening — connect() is refused."""
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_falls_back_to_subprocess_when_service_refuses(assistant, subprocess_calls, monkeypatch):
+    monkeypatch.setattr(va, 'AI_QUERY_SERVICE', f'http://127.0.0.1:{_refused_port()}')
+    assert assistant.query_ai_service('distress channel') is None
+
+    answer = assistant.query_ai('distress channel', 'onboard')
+    assert answer == 'Channel 16.'
+    assert len(subprocess_calls) == 1
+    cmd = subprocess_calls[0]
+    assert cmd[:2] == ['python3', va.AI_QUERY_HANDLER]
+    assert cmd[-3:] == ['--force-provider', 'onboard', 'distress channel']
+
+
+def test_running_service_answers_without_subprocess(assistant, subprocess_calls, monkeypatch):
+    received = []
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            received.append((self.path, body))
+            data = json.dumps({'answer': 'Coolant 180 F.\nDetails follow.'}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        monkeypatch.setattr(va, 'AI_QUERY_SERVICE', f'http://127.0.0.1:{server.server_address[1]}')
+        answer = assistant.query_ai('coolant temp', None)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert answer == 'Coolant 180 F.'
+    assert received == [('/query', {'question': 'coolant temp', 'force_provider': None})]
+    assert subprocess_calls == []
@@ -29,6 +29,8 @@ from vosk import Model, KaldiRecognizer
 import argparse
 import time
 import re
+import urllib.request
+import urllib.error
 
 # Import Vosk wake word detector
 sys.path.insert(0, '/opt/d3kos/services/voice')
@@ -39,6 +41,8 @@ VOSK_MODEL = "/opt/d3kos/models/vosk/vosk-model-small-en-us-0.15"
 PIPER_BIN = "/usr/local/bin/piper"
 PIPER_VOICE = "/opt/d3kos/models/piper/en_US-amy-medium.onnx"
 AI_QUERY_HANDLER = "/opt/d3kos/services/ai/query_handler.py"
+# Persistent query handler (d3kos-query-handler.service, query_handler.py --serve)
+AI_QUERY_SERVICE = "http://127.0.0.1:8112"
 
 SAMPLE_RATE = 16000
 LISTEN_DURATION = 3
@@ -175,6 +179,11 @@ class HybridVoiceAssistant:
         mode_name = provider if provider else 'auto'
         print(f"  🤖 Querying AI (mode: {mode_name})...", flush=True)
 
+        # Warm service first — no interpreter start-up or RAG index load per question
+        answer = self.query_ai_service(question, provider)
+        if answer is not None:
+            return answer
+
         try:
             # Build command for AI query handler
             cmd = ["python3", AI_QUERY_HANDLER]
@@ -197,11 +206,7 @@ class HybridVoiceAssistant:
                 # Parse output - look for "Answer:" section
                 output = result.stdout
                 if "Answer:" in output:
-                    answer_section = output.split("Answer:")[1].strip()
-                    # Take first paragraph
-                    lines = answer_section.split('\n')
-                    answer = lines[0].strip() if lines else answer_section
-                    return answer
+                    return self.first_paragraph(output.split("Answer:")[1])
                 else:
                     return "I received a response but couldn't parse it."
             else:
@@ -214,6 +219,39 @@ class HybridVoiceAssistant:
             print(f"  ⚠ AI query error: {e}", flush=True)
             return "I'm having trouble with that question."
 
+    def query_ai_service(self, question, provider=None):
+        """
+        Ask the persistent query handler service.
+        Returns the spoken answer, or None if the service is not running
+        (caller falls back to a one-shot subprocess).
+        """
+        payload = json.dumps({'question': question, 'force_provider': provider}).encode('utf-8')
+        req = urllib.request.Request(
+            f"{AI_QUERY_SERVICE}/query",
+            data=payload,
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                result = json.loads(resp.read().decode('utf-8'))
+            return (self.first_paragraph(result.get('answer', ''))
+                    or "I received a response but couldn't parse it.")
+        except urllib.error.HTTPError as e:
+            print(f"  ⚠ AI service error: HTTP {e.code}", flush=True)
+            return "I'm having trouble answering that question."
+        except TimeoutError:
+            return "The query took too long. Please try again."
+        except (urllib.error.URLError, ConnectionError) as e:
+            print(f"  ℹ️  AI service unavailable ({e}), starting handler", flush=True)
+            return None
+
+    @staticmethod
+    def first_paragraph(text):
+        """First line of an answer — the part worth speaking aloud."""
+        text = text.strip()
+        lines = text.split('\n')
+        return lines[0].strip() if lines else text
+
     def on_wake_word_detected(self, wake_word):
         """Callback when wake word is detected by Vosk"""
         # Store detected wake word for main loop